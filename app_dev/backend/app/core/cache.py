@@ -0,0 +1,147 @@
+"""
+Cache read-through versionado por usuário (Redis) para agregados de leitura.
+
+Uso:
+    from app.core.cache import cached_per_user, bump_data_version
+
+    class DashboardRepository:
+        @cached_per_user("dashboard:metrics")
+        def get_metrics(self, user_id: int, year: int, ...): ...
+
+    # Em todo ponto de mutação (upload confirmado, transação editada, budget salvo...)
+    bump_data_version(user_id)
+
+Chave: cache:{user_id}:v{versão}:{endpoint}:{hash(params)}
+A versão é um contador por usuário (data_version:{user_id}). Incrementá-lo invalida
+TODAS as entradas do usuário em O(1) — as antigas ficam órfãs e expiram pelo TTL.
+
+Garantias:
+- Redis indisponível → bypass (consulta direto o banco), nunca erro
+- Valores que não sobrevivem a JSON (chaves int, tuplas, datetime) não são cacheados,
+  então hit e miss devolvem exatamente o mesmo objeto
+- Versão ausente (primeiro acesso ou chave expulsa por LRU) é inicializada com o
+  timestamp em ms — nunca colide com versões antigas
+
+Métricas hit/miss/bypass por endpoint: cache_stats() (contadores do processo).
+"""
+import functools
+import hashlib
+import json
+import logging
+import threading
+import time
+from collections import defaultdict
+from typing import Any, Callable, Dict, Optional
+
+from .config import settings
+from .redis_client import get_redis
+
+logger = logging.getLogger(__name__)
+
+_stats_lock = threading.Lock()
+_stats: Dict[str, Dict[str, int]] = defaultdict(lambda: {"hit": 0, "miss": 0, "bypass": 0})
+
+
+def _version_key(user_id: int) -> str:
+    return f"data_version:{user_id}"
+
+
+def _count(endpoint: str, kind: str) -> None:
+    with _stats_lock:
+        _stats[endpoint][kind] += 1
+
+
+def get_data_version(user_id: int) -> Optional[int]:
+    """Versão atual dos dados do usuário (inicializa se ausente). None se Redis indisponível."""
+    try:
+        client = get_redis()
+        key = _version_key(user_id)
+        raw = client.get(key)
+        if raw is None:
+            client.set(key, int(time.time() * 1000), nx=True)
+            raw = client.get(key)
+        return int(raw)
+    except Exception as exc:
+        logger.debug("get_data_version(%s) falhou silenciosamente: %s", user_id, exc)
+        return None
+
+
+def bump_data_version(user_id: Optional[int]) -> None:
+    """
+    Invalida o cache de leitura do usuário (incrementa a versão).
+    Chamar após o commit de qualquer escrita que afete agregados do usuário.
+    """
+    if user_id is None:
+        return
+    try:
+        pipe = get_redis().pipeline(transaction=True)
+        pipe.set(_version_key(user_id), int(time.time() * 1000), nx=True)
+        pipe.incr(_version_key(user_id))
+        pipe.execute()
+    except Exception as exc:
+        logger.warning("bump_data_version(%s) falhou: %s", user_id, exc)
+
+
+def _cache_key(user_id: int, version: int, endpoint: str, args: tuple, kwargs: dict) -> str:
+    params = json.dumps([args, kwargs], sort_keys=True, default=str)
+    digest = hashlib.sha1(params.encode()).hexdigest()[:16]
+    return f"cache:{user_id}:v{version}:{endpoint}:{digest}"
+
+
+def cached_per_user(endpoint: str, ttl: Optional[int] = None):
+    """
+    Decorator read-through para métodos (self, user_id, *params).
+
+    Args:
+        endpoint: nome estável da consulta (entra na chave e nas métricas)
+        ttl: segundos (default CACHE_TTL_SECONDS) — só limita memória, a validade
+             vem da versão
+    """
+    def decorator(func: Callable[..., Any]) -> Callable[..., Any]:
+        @functools.wraps(func)
+        def wrapper(self, user_id: int, *args, **kwargs):
+            if not settings.CACHE_ENABLED:
+                return func(self, user_id, *args, **kwargs)
+
+            version = get_data_version(user_id)
+            if version is None:
+                _count(endpoint, "bypass")
+                return func(self, user_id, *args, **kwargs)
+
+            key = _cache_key(user_id, version, endpoint, args, kwargs)
+            client = get_redis()
+            try:
+                raw = client.get(key)
+            except Exception:
+                raw = None
+            if raw is not None:
+                _count(endpoint, "hit")
+                return json.loads(raw)["v"]
+
+            _count(endpoint, "miss")
+            value = func(self, user_id, *args, **kwargs)
+            try:
+                payload = json.dumps({"v": value})
+                if json.loads(payload)["v"] == value:
+                    client.set(key, payload, ex=ttl or settings.CACHE_TTL_SECONDS)
+                else:
+                    logger.debug("cache %s: valor não serializável sem perda — não cacheado", endpoint)
+            except Exception as exc:
+                logger.debug("cache %s: gravação ignorada: %s", endpoint, exc)
+            return value
+
+        return wrapper
+    return decorator
+
+
+def cache_stats() -> dict:
+    """Hit/miss/bypass por endpoint desde o start do processo (+ hit rate)."""
+    with _stats_lock:
+        endpoints = {k: dict(v) for k, v in _stats.items()}
+    for counts in endpoints.values():
+        lookups = counts["hit"] + counts["miss"]
+        counts["hit_rate"] = round(counts["hit"] / lookups, 4) if lookups else None
+    totais = {kind: sum(c[kind] for c in endpoints.values()) for kind in ("hit", "miss", "bypass")}
+    lookups = totais["hit"] + totais["miss"]
+    totais["hit_rate"] = round(totais["hit"] / lookups, 4) if lookups else None
+    return {"enabled": settings.CACHE_ENABLED, "total": totais, "endpoints": endpoints}
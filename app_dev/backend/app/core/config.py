@@ -37,6 +37,42 @@ class Settings(BaseSettings):
     HOST: str = "0.0.0.0"
     PORT: int = 8000
     
+    # Upload — concorrência por worker (ver app/core/executors.py)
+    UPLOAD_THREAD_WORKERS: int = 4   # threads para service síncrono (DB/IO)
+    UPLOAD_PROCESS_WORKERS: int = 2  # processos para parsing/OCR (0 = inline na thread)
+    UPLOAD_BATCH_PARSE_WORKERS: int = 4  # arquivos do /upload/batch na fase 1 ao mesmo tempo
+    UPLOAD_MAX_BYTES: int = 50 * 1024 * 1024   # limite por arquivo, checado durante a cópia (ver upload/ingest.py)
+    UPLOAD_INCREMENTAL_SAVE: bool = False  # debug: grava o preview após cada fase (2/3/4)
+    UPLOAD_PARSE_CACHE_ENABLED: bool = True            # cache do parsing por hash do arquivo (Redis)
+    UPLOAD_PARSE_CACHE_TTL_SECONDS: int = 7 * 24 * 3600  # além do TTL, o Redis expulsa por LRU (allkeys-lru)
+
+    # OCR (fatura Mercado Pago PDF) — ver app/domains/upload/processors/raw/pdf/ocr_engine.py
+    OCR_PROCESS_WORKERS: int = 2          # processos OCR com modelo pré-carregado (0 = páginas em sequência, inline)
+    OCR_PREWARM: bool = False             # sobe o pool OCR (e carrega o modelo) no startup, não no 1º upload
+    OCR_FAST_PATH: bool = False           # tenta cinza + zoom menor antes do render 3x colorido
+    OCR_FAST_PATH_ZOOM: float = 2.0       # zoom do caminho rápido (3.0 = render padrão)
+    OCR_FAST_PATH_MIN_CONFIDENCE: float = 0.9  # confiança média abaixo disso → refaz a página em 3x
+
+    # Dashboard — /dashboard/summary calcula as seções em paralelo (sessão própria por seção)
+    DASHBOARD_SECTION_WORKERS: int = 8              # threads por worker para seções do summary
+    DASHBOARD_SECTION_TIMEOUT_SECONDS: float = 10.0  # seção que estoura vira null na resposta
+
+    # Busca de transações (pg_trgm) — limiar de word_similarity para o casamento aproximado
+    SEARCH_FUZZY_THRESHOLD: float = 0.5  # "ifd" → "IFOOD" = 0.5; default do pg_trgm (0.6) não casa
+
+    # Cache read-through por usuário (Redis — ver app/core/cache.py)
+    CACHE_ENABLED: bool = True
+    CACHE_TTL_SECONDS: int = 3600  # só limita memória: validade vem da versão por usuário
+
+    # Jobs em background (fila persistente — ver app/domains/jobs)
+    JOB_RUNNER_ENABLED: bool = True         # False em workers que não devem consumir a fila
+    JOB_WORKERS: int = 2                    # threads consumidoras por processo
+    JOB_POLL_INTERVAL_SECONDS: float = 2.0
+    JOB_DEBOUNCE_SECONDS: float = 5.0       # janela de coalescing por usuário
+    JOB_MAX_ATTEMPTS: int = 3
+    JOB_RETRY_BACKOFF_SECONDS: float = 30.0  # dobra a cada tentativa
+    JOB_LOCK_TIMEOUT_SECONDS: int = 900     # running além disso (worker morto) → volta para pending
+
     # JWT Authentication
     JWT_SECRET_KEY: str  # ✅ OBRIGATÓRIO via .env (sem fallback inseguro)
     JWT_ALGORITHM: str = "HS256"
@@ -0,0 +1,153 @@
+"""
+Executores compartilhados — tira trabalho bloqueante do event loop do uvicorn.
+
+Uso:
+    from app.core.executors import run_in_thread, run_in_process
+
+    # Em handler async: service síncrono (SQLAlchemy, IO) num pool de threads limitado
+    return await run_in_thread(service.process_and_preview, file=file, ...)
+
+    # Dentro do código síncrono (já numa thread): parsing/OCR CPU-bound num pool de processos
+    result = run_in_process(process_file, banco, tipo, formato, path, ...)
+
+    # Seções do /dashboard/summary: pool separado para não competir com uploads
+    valor = await run_in_dashboard_thread(calcular_secao, ...)
+
+Limites por worker configuráveis em Settings:
+    UPLOAD_THREAD_WORKERS     — threads para DB/IO (default 4)
+    UPLOAD_PROCESS_WORKERS    — processos para CPU (default 2; 0 = executa inline na thread)
+    DASHBOARD_SECTION_WORKERS — threads para seções do dashboard (default 8)
+
+Funções enviadas ao pool de processos precisam ser picklable (nível de módulo) e
+receber/retornar apenas objetos picklable — nunca Session, UploadFile ou closures.
+"""
+
+import asyncio
+import functools
+import logging
+import multiprocessing
+import threading
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, Callable, Optional
+
+from .config import settings
+
+logger = logging.getLogger(__name__)
+
+_lock = threading.Lock()
+_thread_pool: Optional[ThreadPoolExecutor] = None
+_process_pool: Optional[ProcessPoolExecutor] = None
+_dashboard_pool: Optional[ThreadPoolExecutor] = None
+
+# True dentro dos processos do pool de upload (setado pelo initializer)
+_em_worker_de_upload = False
+
+
+def _marcar_worker_de_upload() -> None:
+    """Initializer do pool de processos: identifica o processo como worker de upload."""
+    global _em_worker_de_upload
+    _em_worker_de_upload = True
+
+
+def em_worker_de_upload() -> bool:
+    """True se o código roda num processo do pool de upload (não no processo da API)."""
+    return _em_worker_de_upload
+
+
+def get_thread_pool() -> ThreadPoolExecutor:
+    """Pool de threads (lazy) para trabalho bloqueante de DB/IO."""
+    global _thread_pool
+    if _thread_pool is None:
+        with _lock:
+            if _thread_pool is None:
+                _thread_pool = ThreadPoolExecutor(
+                    max_workers=max(1, settings.UPLOAD_THREAD_WORKERS),
+                    thread_name_prefix="upload-io",
+                )
+    return _thread_pool
+
+
+def get_dashboard_pool() -> ThreadPoolExecutor:
+    """Pool de threads (lazy) para as seções paralelas do /dashboard/summary."""
+    global _dashboard_pool
+    if _dashboard_pool is None:
+        with _lock:
+            if _dashboard_pool is None:
+                _dashboard_pool = ThreadPoolExecutor(
+                    max_workers=max(1, settings.DASHBOARD_SECTION_WORKERS),
+                    thread_name_prefix="dashboard",
+                )
+    return _dashboard_pool
+
+
+def get_process_pool() -> Optional[ProcessPoolExecutor]:
+    """
+    Pool de processos (lazy) para parsing/OCR CPU-bound.
+    Retorna None se UPLOAD_PROCESS_WORKERS=0 (modo inline).
+
+    Usa 'spawn': fork de um processo com threads e conexões do pool SQLAlchemy
+    abertas não é seguro.
+    """
+    global _process_pool
+    if settings.UPLOAD_PROCESS_WORKERS <= 0:
+        return None
+    if _process_pool is None:
+        with _lock:
+            if _process_pool is None:
+                _process_pool = ProcessPoolExecutor(
+                    max_workers=settings.UPLOAD_PROCESS_WORKERS,
+                    mp_context=multiprocessing.get_context("spawn"),
+                    initializer=_marcar_worker_de_upload,
+                )
+    return _process_pool
+
+
+async def run_in_thread(func: Callable[..., Any], *args, **kwargs) -> Any:
+    """Executa função síncrona no pool de threads sem bloquear o event loop."""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(get_thread_pool(), functools.partial(func, *args, **kwargs))
+
+
+async def run_in_dashboard_thread(func: Callable[..., Any], *args, **kwargs) -> Any:
+    """Executa função síncrona no pool de threads do dashboard."""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(get_dashboard_pool(), functools.partial(func, *args, **kwargs))
+
+
+def run_in_process(func: Callable[..., Any], *args, **kwargs) -> Any:
+    """
+    Executa função CPU-bound no pool de processos e aguarda o resultado (bloqueante).
+    Chamar a partir de uma thread do pool, nunca direto do event loop.
+
+    Fallback: sem pool configurado ou pool quebrado (worker morto por OOM/segfault),
+    executa inline na thread atual — o upload não falha por causa do executor.
+    """
+    global _process_pool
+    pool = get_process_pool()
+    if pool is None:
+        return func(*args, **kwargs)
+    try:
+        return pool.submit(func, *args, **kwargs).result()
+    except BrokenProcessPool:
+        logger.warning("⚠️ Pool de processos quebrado — recriando e executando inline")
+        with _lock:
+            if _process_pool is pool:
+                _process_pool = None
+        pool.shutdown(wait=False, cancel_futures=True)
+        return func(*args, **kwargs)
+
+
+def shutdown_executors() -> None:
+    """Encerra os pools (chamado no shutdown da aplicação)."""
+    global _thread_pool, _process_pool, _dashboard_pool
+    with _lock:
+        if _process_pool is not None:
+            _process_pool.shutdown(wait=False, cancel_futures=True)
+            _process_pool = None
+        if _thread_pool is not None:
+            _thread_pool.shutdown(wait=False, cancel_futures=True)
+            _thread_pool = None
+        if _dashboard_pool is not None:
+            _dashboard_pool.shutdown(wait=False, cancel_futures=True)
+            _dashboard_pool = None
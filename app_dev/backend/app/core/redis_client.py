@@ -18,8 +18,9 @@ import redis
 
 logger = logging.getLogger(__name__)
 
-# Pool compartilhado (thread-safe). Reutilizado por todos os workers.
+# Pools compartilhados (thread-safe). Reutilizados por todos os workers.
 _pool: Optional[redis.ConnectionPool] = None
+_binary_pool: Optional[redis.ConnectionPool] = None
 
 
 def _get_pool() -> redis.ConnectionPool:
@@ -34,11 +35,28 @@ def _get_pool() -> redis.ConnectionPool:
     return _pool
 
 
+def _get_binary_pool() -> redis.ConnectionPool:
+    global _binary_pool
+    if _binary_pool is None:
+        redis_url = os.getenv("REDIS_URL", "redis://redis:6379/0")
+        _binary_pool = redis.ConnectionPool.from_url(
+            redis_url,
+            decode_responses=False,
+            max_connections=4,
+        )
+    return _binary_pool
+
+
 def get_redis() -> redis.Redis:
     """Retorna cliente Redis com pool compartilhado."""
     return redis.Redis(connection_pool=_get_pool())
 
 
+def get_redis_binary() -> redis.Redis:
+    """Cliente Redis para valores binários (bytes, sem decode) — ex: cache de parsing comprimido."""
+    return redis.Redis(connection_pool=_get_binary_pool())
+
+
 # ─── API pública ─────────────────────────────────────────────────────────────
 
 def redis_get(key: str) -> Optional[Any]:
@@ -0,0 +1,156 @@
+"""
+Budget - Médias dos 3 meses anteriores em lote
+valor_medio_3_meses de todos os (grupo, mes_referencia) de um usuário em 1 query com janela
+(SUM/COUNT ... OVER RANGE 3..1 PRECEDING) sobre os totais mensais do journal_monthly_rollup —
+em vez de carregar transações e somar em Python por grupo e mês.
+
+Regra (mesma de BudgetService.calcular_media_3_meses):
+  média = soma |Valor| dos 3 MesFatura anteriores / nº desses meses com transações
+  (Despesa, IgnorarDashboard = 0; 0.0 se nenhum mês tiver dados)
+"""
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy import Integer, and_, cast, func, literal, null, select, union, union_all
+from sqlalchemy.orm import Session
+
+from app.domains.transactions.models import JournalMonthlyRollup
+from .repository import BudgetRepository
+
+MESES_JANELA = 3
+
+
+def _indice_mes(mes_referencia: str) -> int:
+    """'YYYY-MM' → índice contínuo de mês (ano * 12 + mes - 1)"""
+    ano, mes = map(int, mes_referencia.split('-'))
+    return ano * 12 + mes - 1
+
+
+def _mes_referencia(indice: int) -> str:
+    """Índice contínuo de mês → 'YYYY-MM'"""
+    return f"{indice // 12:04d}-{indice % 12 + 1:02d}"
+
+
+def medias_3_meses(
+    db: Session,
+    user_id: int,
+    grupos: Optional[Iterable[str]] = None,
+    meses_referencia: Optional[Iterable[str]] = None,
+) -> Dict[Tuple[str, str], float]:
+    """
+    Médias dos 3 meses anteriores por (grupo, mes_referencia) em 1 query.
+
+    Args:
+        db: Sessão
+        user_id: ID do usuário
+        grupos: Grupos a considerar (None = todos os grupos de Despesa do usuário)
+        meses_referencia: Meses alvo YYYY-MM (None = todos com algum dado na janela)
+
+    Returns:
+        {(grupo, 'YYYY-MM'): média} — pares ausentes têm média 0.0
+    """
+    R = JournalMonthlyRollup
+    filtros = [
+        R.user_id == user_id,
+        R.CategoriaGeral == 'Despesa',
+        R.GRUPO.isnot(None),
+        func.length(R.MesFatura) == 6,
+    ]
+    if grupos is not None:
+        grupos = list(set(grupos))
+        if not grupos:
+            return {}
+        filtros.append(R.GRUPO.in_(grupos))
+
+    # Totais mensais (1 linha por grupo × MesFatura com transações)
+    indice = (
+        cast(func.substr(R.MesFatura, 1, 4), Integer) * 12
+        + cast(func.substr(R.MesFatura, 5, 2), Integer) - 1
+    )
+    mensal = (
+        select(R.GRUPO.label('grupo'), indice.label('idx'), func.sum(R.soma_valor_abs).label('total'))
+        .where(*filtros)
+        .group_by(R.GRUPO, indice)
+        .cte('mensal')
+    )
+
+    # Meses alvo: qualquer mês com dado em algum dos 3 meses anteriores (sem total próprio)
+    alvos = union(*(
+        select(mensal.c.grupo, (mensal.c.idx + n).label('idx'))
+        for n in range(1, MESES_JANELA + 1)
+    )).subquery('alvos')
+
+    serie = union_all(
+        select(mensal.c.grupo, mensal.c.idx, mensal.c.total, literal(0).label('alvo')),
+        select(alvos.c.grupo, alvos.c.idx, null().label('total'), literal(1).label('alvo')),
+    ).subquery('serie')
+
+    janela = dict(
+        partition_by=serie.c.grupo,
+        order_by=serie.c.idx,
+        range_=(-MESES_JANELA, -1),
+    )
+    com_janela = select(
+        serie.c.grupo,
+        serie.c.idx,
+        serie.c.alvo,
+        func.sum(serie.c.total).over(**janela).label('soma'),
+        func.count(serie.c.total).over(**janela).label('meses_com_dados'),
+    ).subquery('com_janela')
+
+    condicoes = [com_janela.c.alvo == 1, com_janela.c.meses_com_dados > 0]
+    if meses_referencia is not None:
+        indices = sorted({_indice_mes(m) for m in meses_referencia})
+        if not indices:
+            return {}
+        condicoes.append(com_janela.c.idx.in_(indices))
+
+    linhas = db.execute(
+        select(com_janela.c.grupo, com_janela.c.idx, com_janela.c.soma, com_janela.c.meses_com_dados)
+        .where(and_(*condicoes))
+    ).all()
+
+    return {
+        (grupo, _mes_referencia(idx)): round(float(soma or 0) / qtd, 2)
+        for grupo, idx, soma, qtd in linhas
+    }
+
+
+def gravar_medias_3_meses(
+    db: Session,
+    user_id: int,
+    grupos: Iterable[str],
+    meses_referencia: Iterable[str],
+    valor_planejado_novo: Optional[float] = None,
+    planejado_igual_media: bool = False,
+) -> int:
+    """
+    Grava valor_medio_3_meses em budget_planning para grupos × meses (não faz commit).
+
+    1 query de médias + 1 INSERT ... ON CONFLICT (user_id, grupo, mes_referencia) DO UPDATE.
+
+    Args:
+        valor_planejado_novo: valor_planejado de metas criadas (None = a própria média)
+        planejado_igual_media: também sobrescreve valor_planejado das metas existentes
+
+    Returns:
+        Quantidade de metas gravadas (atualizadas + criadas)
+    """
+    grupos = sorted(set(grupos))
+    meses: List[str] = sorted(set(meses_referencia))
+    if not grupos or not meses:
+        return 0
+
+    medias = medias_3_meses(db, user_id, grupos=grupos, meses_referencia=meses)
+
+    campos_update = ('valor_medio_3_meses', 'valor_planejado') if planejado_igual_media else ('valor_medio_3_meses',)
+    linhas = []
+    for grupo in grupos:
+        for mes in meses:
+            media = medias.get((grupo, mes), 0.0)
+            linhas.append({
+                'grupo': grupo,
+                'mes_referencia': mes,
+                'valor_planejado': media if valor_planejado_novo is None else valor_planejado_novo,
+                'valor_medio_3_meses': media,
+            })
+    return len(BudgetRepository(db).upsert_many(user_id, linhas, campos_update=campos_update))
@@ -7,7 +7,7 @@ CHANGELOG 13/02/2026:
 - ✅ Apenas BudgetPlanning ativo
 - ✅ Migration: 635e060a2434_consolidate_budget_tables
 """
-from sqlalchemy import Column, Integer, String, Float, DateTime, ForeignKey, Boolean
+from sqlalchemy import Column, Integer, String, Float, DateTime, ForeignKey, Boolean, UniqueConstraint
 from datetime import datetime
 
 from app.core.database import Base
@@ -21,6 +21,10 @@ class BudgetPlanning(Base):
     **ÚNICO modelo ativo após consolidação (13/02/2026)**
     """
     __tablename__ = "budget_planning"
+    # Chave natural: 1 meta por grupo/mês — alvo dos upserts em lote (ON CONFLICT)
+    __table_args__ = (
+        UniqueConstraint("user_id", "grupo", "mes_referencia", name="uq_budget_planning_user_grupo_mes"),
+    )
     
     # PK
     id = Column(Integer, primary_key=True, index=True)
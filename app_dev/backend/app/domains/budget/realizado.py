@@ -0,0 +1,79 @@
+"""
+Budget - Valores realizados em lote
+Uma query agrupada (journal_monthly_rollup) por request, reutilizada por planejado vs realizado,
+subgrupos e dashboard budget-vs-actual — em vez de um SUM por meta (N+1).
+"""
+from collections import defaultdict
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+
+from app.domains.transactions.models import JournalMonthlyRollup
+
+
+class RealizadoPorGrupo:
+    """
+    Somas realizadas (Valor com sinal) por (CategoriaGeral, GRUPO, SUBGRUPO) de um período.
+    O rollup já exclui IgnorarDashboard = 1.
+
+    Uso:
+        realizado = RealizadoPorGrupo.carregar(db, user_id, meses_fatura=["202503"])
+        realizado.grupo("Casa", "Despesa")      # soma do grupo
+        realizado.por_grupo("Investimentos")    # {grupo: soma}
+        realizado.subgrupos("Casa")             # [(subgrupo, soma)]
+    """
+
+    def __init__(self, linhas: Iterable[Tuple[Optional[str], Optional[str], Optional[str], float]]):
+        self._somas: Dict[Tuple[Optional[str], Optional[str], Optional[str]], float] = {}
+        for categoria, grupo, subgrupo, total in linhas:
+            self._somas[(categoria, grupo, subgrupo)] = float(total or 0)
+
+    @classmethod
+    def carregar(
+        cls,
+        db: Session,
+        user_id: int,
+        meses_fatura: Optional[List[str]] = None,
+        ano: Optional[int] = None,
+    ) -> "RealizadoPorGrupo":
+        """
+        1 query agrupada para o período: MesFatura IN (meses_fatura) ou Ano = ano.
+        """
+        R = JournalMonthlyRollup
+        filtros = [R.user_id == user_id, R.CategoriaGeral.in_(['Despesa', 'Investimentos'])]
+        if meses_fatura is not None:
+            filtros.append(R.MesFatura.in_(meses_fatura))
+        if ano is not None:
+            filtros.append(R.Ano == ano)
+        linhas = (
+            db.query(R.CategoriaGeral, R.GRUPO, R.SUBGRUPO, func.sum(R.soma_valor))
+            .filter(*filtros)
+            .group_by(R.CategoriaGeral, R.GRUPO, R.SUBGRUPO)
+            .all()
+        )
+        return cls(linhas)
+
+    def por_grupo(self, categoria_geral: str, ignorar_vazio: bool = True) -> Dict[str, float]:
+        """{grupo: soma} da categoria (GRUPO nulo sempre fora; '' fora se ignorar_vazio)"""
+        totais: Dict[str, float] = defaultdict(float)
+        for (categoria, grupo, _), total in self._somas.items():
+            if categoria != categoria_geral or grupo is None or (ignorar_vazio and grupo == ''):
+                continue
+            totais[grupo] += total
+        return dict(totais)
+
+    def grupo(self, grupo: str, categoria_geral: str = 'Despesa') -> float:
+        """Soma de um grupo na categoria (0.0 se não houver transações)"""
+        return sum(
+            (total for (categoria, g, _), total in self._somas.items()
+             if categoria == categoria_geral and g == grupo),
+            0.0,
+        )
+
+    def subgrupos(self, grupo: str, categoria_geral: str = 'Despesa') -> List[Tuple[Optional[str], float]]:
+        """[(subgrupo, soma)] de um grupo na categoria"""
+        return [
+            (subgrupo, total) for (categoria, g, subgrupo), total in self._somas.items()
+            if categoria == categoria_geral and g == grupo
+        ]
@@ -3,8 +3,9 @@ Budget Repository
 Camada de acesso a dados para budget_planning
 """
 from sqlalchemy.orm import Session
-from sqlalchemy import and_
-from typing import List, Optional
+from sqlalchemy import and_, func
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
 from datetime import datetime
 
 from .models import BudgetPlanning
@@ -108,15 +109,66 @@ class BudgetRepository:
                 "valor_medio_3_meses": valor_medio_3_meses
             })
     
+    def upsert_many(
+        self,
+        user_id: int,
+        linhas: Iterable[dict],
+        campos_update: Sequence[str] = ("valor_planejado",),
+        atualizar_existentes: bool = True,
+    ) -> List[BudgetPlanning]:
+        """
+        Upsert em lote: um único INSERT ... ON CONFLICT (user_id, grupo, mes_referencia)
+        DO UPDATE (ou DO NOTHING) ... RETURNING. Não faz commit — fica com o chamador.
+
+        Args:
+            linhas: dicts com grupo, mes_referencia, valor_planejado (+ cor, valor_medio_3_meses)
+            campos_update: colunas sobrescritas quando a meta já existe
+                ('cor' nula preserva a cor atual)
+            atualizar_existentes: False = só cria metas que ainda não existem
+
+        Returns:
+            Metas gravadas (com DO NOTHING, apenas as criadas)
+        """
+        # ON CONFLICT não aceita a mesma chave duas vezes no lote → último vence
+        agora = datetime.now()
+        por_chave: Dict[Tuple[str, str], dict] = {}
+        for linha in linhas:
+            por_chave[(linha["grupo"], linha["mes_referencia"])] = {
+                "user_id": user_id,
+                "grupo": linha["grupo"],
+                "mes_referencia": linha["mes_referencia"],
+                "valor_planejado": linha["valor_planejado"],
+                "valor_medio_3_meses": linha.get("valor_medio_3_meses", 0.0),
+                "cor": linha.get("cor"),
+                "ativo": True,
+                "created_at": agora,
+                "updated_at": agora,
+            }
+
+        if not por_chave:
+            return []
+
+        stmt = pg_insert(BudgetPlanning).values(list(por_chave.values()))
+        chave = ["user_id", "grupo", "mes_referencia"]
+        if atualizar_existentes:
+            set_ = {campo: stmt.excluded[campo] for campo in campos_update}
+            if "cor" in set_:
+                set_["cor"] = func.coalesce(stmt.excluded.cor, BudgetPlanning.cor)
+            set_["updated_at"] = stmt.excluded.updated_at
+            stmt = stmt.on_conflict_do_update(index_elements=chave, set_=set_)
+        else:
+            stmt = stmt.on_conflict_do_nothing(index_elements=chave)
+
+        return list(self.db.scalars(
+            stmt.returning(BudgetPlanning),
+            execution_options={"populate_existing": True},
+        ))
+
     def bulk_upsert(self, user_id: int, mes_referencia: str, budgets: List[dict]) -> List[BudgetPlanning]:
         """Cria ou atualiza múltiplos budgets de uma vez"""
-        result = []
-        for budget_data in budgets:
-            budget = self.upsert(
-                user_id=user_id,
-                grupo=budget_data["grupo"],
-                mes_referencia=mes_referencia,
-                valor_planejado=budget_data["valor_planejado"]
-            )
-            result.append(budget)
+        result = self.upsert_many(user_id, [
+            {"grupo": b["grupo"], "mes_referencia": mes_referencia, "valor_planejado": b["valor_planejado"]}
+            for b in budgets
+        ])
+        self.db.commit()
         return result
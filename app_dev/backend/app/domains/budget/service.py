@@ -7,6 +7,7 @@ CHANGELOG 13/02/2026:
 - ✅ Apenas BudgetRepository (para budget_planning)
 """
 import logging
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.orm import Session
 
 logger = logging.getLogger(__name__)
@@ -15,9 +16,11 @@ from typing import List, Optional, Dict, Any
 from fastapi import HTTPException, status
 import json
 
+from app.core.cache import bump_data_version, cached_per_user
 from .repository import BudgetRepository
+from .medias import medias_3_meses
+from .realizado import RealizadoPorGrupo
 from .schemas import BudgetCreate, BudgetUpdate, BudgetResponse, BudgetListResponse
-from app.domains.transactions.models import JournalEntry
 
 
 class BudgetService:
@@ -37,6 +40,8 @@ class BudgetService:
         """
         Copia metas de mes_origem para todos os meses de ano_destino
         
+        1 SELECT das metas de origem + 1 INSERT ... ON CONFLICT para os 11/12 meses.
+        
         Args:
             user_id: ID do usuário
             mes_origem: Mês de origem no formato YYYY-MM
@@ -46,12 +51,12 @@ class BudgetService:
         Returns:
             dict com sucesso, meses_criados, metas_copiadas, mensagem
         """
-        from .models import BudgetGeral
+        from .models import BudgetPlanning
         
         # 1. Buscar metas do mês de origem
-        metas_origem = self.db.query(BudgetGeral).filter(
-            BudgetGeral.user_id == user_id,
-            BudgetGeral.mes_referencia == mes_origem
+        metas_origem = self.db.query(BudgetPlanning).filter(
+            BudgetPlanning.user_id == user_id,
+            BudgetPlanning.mes_referencia == mes_origem
         ).all()
         
         if not metas_origem:
@@ -60,53 +65,50 @@ class BudgetService:
                 detail=f"Nenhuma meta encontrada para {mes_origem}"
             )
         
-        # 2. Gerar lista de meses do ano
+        # 2. Gerar lista de meses do ano (exceto o de origem)
         meses_ano = [f"{ano_destino}-{str(m).zfill(2)}" for m in range(1, 13)]
-        
-        # 3. Para cada mês, copiar ou atualizar metas
-        meses_criados = 0
-        metas_copiadas = 0
-        
-        for mes_destino in meses_ano:
-            if mes_destino == mes_origem:
-                continue  # Pular mês de origem
-            
-            for meta_origem in metas_origem:
-                # Verificar se já existe
-                meta_existente = self.db.query(BudgetGeral).filter(
-                    BudgetGeral.user_id == user_id,
-                    BudgetGeral.categoria_geral == meta_origem.categoria_geral,
-                    BudgetGeral.mes_referencia == mes_destino
-                ).first()
-                
-                if meta_existente and not substituir_existentes:
-                    continue  # Pular se já existe e não deve substituir
-                
-                if meta_existente:
-                    # Atualizar
-                    meta_existente.valor_planejado = meta_origem.valor_planejado
-                else:
-                    # Criar nova
-                    nova_meta = BudgetGeral(
-                        user_id=user_id,
-                        categoria_geral=meta_origem.categoria_geral,
-                        mes_referencia=mes_destino,
-                        valor_planejado=meta_origem.valor_planejado
-                    )
-                    self.db.add(nova_meta)
-                    meses_criados += 1
-                
-                metas_copiadas += 1
+        meses_destino = [m for m in meses_ano if m != mes_origem]
+        
+        # 3. Copiar todas as metas × meses em um único upsert
+        gravadas = self.repository.upsert_many(
+            user_id,
+            [
+                {
+                    "grupo": meta.grupo,
+                    "mes_referencia": mes_destino,
+                    "valor_planejado": meta.valor_planejado,
+                    "cor": meta.cor,
+                }
+                for mes_destino in meses_destino
+                for meta in metas_origem
+            ],
+            campos_update=("valor_planejado",),
+            atualizar_existentes=substituir_existentes
+        )
+        meses_afetados = sorted({b.mes_referencia for b in gravadas})
         
         self.db.commit()
+        bump_data_version(user_id)
+        self._invalidar_cashflow(user_id, meses_afetados)
         
         return {
             "sucesso": True,
-            "meses_criados": meses_criados,
-            "metas_copiadas": metas_copiadas,
-            "mensagem": f"Metas copiadas de {mes_origem} para {meses_criados} meses de {ano_destino}"
+            "meses_criados": len(meses_afetados),
+            "metas_copiadas": len(gravadas),
+            "mensagem": f"Metas copiadas de {mes_origem} para {len(meses_afetados)} meses de {ano_destino}"
         }
     
+    def _invalidar_cashflow(self, user_id: int, meses: List[str]) -> None:
+        """Invalida o cashflow materializado de todos os meses afetados em 1 chamada"""
+        if not meses:
+            return
+        try:
+            from app.domains.plano.service import invalidate_cashflow_cache
+            invalidate_cashflow_cache(self.db, user_id, mes_referencia=sorted(set(meses)))
+        except Exception:
+            pass  # Não bloquear a operação se a invalidação falhar
+    
+    @cached_per_user("budget:planning")
     def get_budget_planning(self, user_id: int, mes_referencia: str) -> dict:
         """
         Lista metas de budget planning + grupos com gastos sem meta definida.
@@ -143,42 +145,17 @@ class BudgetService:
         # Mapa grupo -> budget (para juntar com grupos que têm gastos)
         by_grupo = {b.grupo: b for b in budgets}
         
-        # Grupos com gastos no mês (Despesa) que não estão em budget_planning
+        # Realizados do mês em 1 query agrupada: metas, grupos sem meta (Despesa/Investimentos)
         ano, mes = mes_referencia.split('-')
-        mes_fatura = f"{ano}{mes}"
-        grupos_com_gasto = (
-            self.db.query(JournalEntry.GRUPO, func.sum(JournalEntry.Valor).label('total'))
-            .filter(
-                JournalEntry.user_id == user_id,
-                JournalEntry.MesFatura == mes_fatura,
-                JournalEntry.CategoriaGeral == 'Despesa',
-                JournalEntry.IgnorarDashboard == 0,
-                JournalEntry.GRUPO.isnot(None),
-                JournalEntry.GRUPO != ''
-            )
-            .group_by(JournalEntry.GRUPO)
-            .all()
-        )
-        # Grupos com investimentos no mês que não estão em budget_planning
-        grupos_com_investimento = (
-            self.db.query(JournalEntry.GRUPO, func.sum(JournalEntry.Valor).label('total'))
-            .filter(
-                JournalEntry.user_id == user_id,
-                JournalEntry.MesFatura == mes_fatura,
-                JournalEntry.CategoriaGeral == 'Investimentos',
-                JournalEntry.IgnorarDashboard == 0,
-                JournalEntry.GRUPO.isnot(None),
-                JournalEntry.GRUPO != ''
-            )
-            .group_by(JournalEntry.GRUPO)
-            .all()
-        )
+        realizado = RealizadoPorGrupo.carregar(self.db, user_id, meses_fatura=[f"{ano}{mes}"])
+        grupos_com_gasto = realizado.por_grupo('Despesa').items()
+        grupos_com_investimento = realizado.por_grupo('Investimentos').items()
         
         resultado = []
         for budget in budgets:
             categoria_geral = grupos_config.get(budget.grupo) or 'Despesa'
             valor_realizado_raw = self._calcular_valor_realizado_grupo(
-                user_id, budget.grupo, mes_referencia, categoria_geral
+                user_id, budget.grupo, mes_referencia, categoria_geral, realizado=realizado
             )
             valor_realizado = abs(float(valor_realizado_raw)) if valor_realizado_raw else 0.0
             percentual = (valor_realizado / budget.valor_planejado * 100) if budget.valor_planejado > 0 else 0
@@ -281,38 +258,8 @@ class BudgetService:
         meses_ref = [f"{year}-{m:02d}" for m in range(1, ytd_month + 1)]
         mes_faturas = [f"{year}{m:02d}" for m in range(1, ytd_month + 1)]
 
-        # Somar realizados por grupo para o intervalo Jan..ytd_month
-        realizados_desp = (
-            self.db.query(JournalEntry.GRUPO, func.sum(JournalEntry.Valor).label('total'))
-            .filter(
-                JournalEntry.user_id == user_id,
-                JournalEntry.MesFatura.in_(mes_faturas),
-                JournalEntry.CategoriaGeral == 'Despesa',
-                JournalEntry.IgnorarDashboard == 0,
-                JournalEntry.GRUPO.isnot(None),
-                JournalEntry.GRUPO != ''
-            )
-            .group_by(JournalEntry.GRUPO)
-            .all()
-        )
-        realizados_inv = (
-            self.db.query(JournalEntry.GRUPO, func.sum(JournalEntry.Valor).label('total'))
-            .filter(
-                JournalEntry.user_id == user_id,
-                JournalEntry.MesFatura.in_(mes_faturas),
-                JournalEntry.CategoriaGeral == 'Investimentos',
-                JournalEntry.IgnorarDashboard == 0,
-                JournalEntry.GRUPO.isnot(None),
-                JournalEntry.GRUPO != ''
-            )
-            .group_by(JournalEntry.GRUPO)
-            .all()
-        )
-        realizado_map: dict = {}
-        for grupo, total in realizados_desp:
-            realizado_map[grupo] = abs(float(total or 0))
-        for grupo, total in realizados_inv:
-            realizado_map[grupo] = abs(float(total or 0))
+        # Somar realizados por grupo para o intervalo Jan..ytd_month (1 query agrupada)
+        realizado_map = self._realizado_map(user_id, mes_faturas)
 
         # Somar planejados por grupo para o intervalo (metas de todos os meses)
         budgets_rows = self.db.query(BudgetPlanning).filter(
@@ -376,37 +323,7 @@ class BudgetService:
         mes_faturas = [f"{year}{m:02d}" for m in range(1, 13)]
         meses_ref = [f"{year}-{m:02d}" for m in range(1, 13)]
 
-        realizados_desp = (
-            self.db.query(JournalEntry.GRUPO, func.sum(JournalEntry.Valor).label('total'))
-            .filter(
-                JournalEntry.user_id == user_id,
-                JournalEntry.MesFatura.in_(mes_faturas),
-                JournalEntry.CategoriaGeral == 'Despesa',
-                JournalEntry.IgnorarDashboard == 0,
-                JournalEntry.GRUPO.isnot(None),
-                JournalEntry.GRUPO != ''
-            )
-            .group_by(JournalEntry.GRUPO)
-            .all()
-        )
-        realizados_inv = (
-            self.db.query(JournalEntry.GRUPO, func.sum(JournalEntry.Valor).label('total'))
-            .filter(
-                JournalEntry.user_id == user_id,
-                JournalEntry.MesFatura.in_(mes_faturas),
-                JournalEntry.CategoriaGeral == 'Investimentos',
-                JournalEntry.IgnorarDashboard == 0,
-                JournalEntry.GRUPO.isnot(None),
-                JournalEntry.GRUPO != ''
-            )
-            .group_by(JournalEntry.GRUPO)
-            .all()
-        )
-        realizado_map: dict = {}
-        for grupo, total in realizados_desp:
-            realizado_map[grupo] = abs(float(total or 0))
-        for grupo, total in realizados_inv:
-            realizado_map[grupo] = abs(float(total or 0))
+        realizado_map = self._realizado_map(user_id, mes_faturas)
 
         # Planejado: soma dos 12 meses
         budgets_rows = self.db.query(BudgetPlanning).filter(
@@ -463,12 +380,14 @@ class BudgetService:
             BaseGruposConfig.nome_grupo == budget.grupo
         ).first()
         categoria_geral = grupo_config.categoria_geral if grupo_config else 'Despesa'
+        ano, mes = mes_referencia.split('-')
+        realizado = RealizadoPorGrupo.carregar(self.db, user_id, meses_fatura=[f"{ano}{mes}"])
         valor_realizado_raw = self._calcular_valor_realizado_grupo(
-            user_id, budget.grupo, mes_referencia, categoria_geral
+            user_id, budget.grupo, mes_referencia, categoria_geral, realizado=realizado
         )
         valor_realizado = abs(float(valor_realizado_raw)) if valor_realizado_raw else 0.0
         percentual = (valor_realizado / budget.valor_planejado * 100) if budget.valor_planejado > 0 else 0
-        subgrupos = self._get_subgrupos_grupo(user_id, budget.grupo, mes_referencia)
+        subgrupos = self._get_subgrupos_grupo(user_id, budget.grupo, mes_referencia, realizado=realizado)
         return {
             "id": budget.id,
             "grupo": budget.grupo,
@@ -502,68 +421,58 @@ class BudgetService:
         """
         from .models import BudgetPlanning
         
-        resultado = []
-        for budget_data in budgets:
-            grupo = budget_data["grupo"]
-            valor_planejado = budget_data["valor_planejado"]
-            cor = budget_data.get("cor")
-            budget_id = budget_data.get("id")
-            
-            # Se id fornecido, buscar por id; senão por grupo+mes
-            if budget_id:
-                budget_existente = self.db.query(BudgetPlanning).filter(
-                    BudgetPlanning.id == budget_id,
-                    BudgetPlanning.user_id == user_id
-                ).first()
-                if budget_existente:
-                    budget_existente.grupo = grupo  # permite alterar grupo
-            else:
-                budget_existente = self.db.query(BudgetPlanning).filter(
+        # Metas referenciadas por id (permite alterar grupo): 1 SELECT para todas
+        ids = [b["id"] for b in budgets if b.get("id")]
+        por_id = {}
+        if ids:
+            por_id = {
+                b.id: b for b in self.db.query(BudgetPlanning).filter(
                     BudgetPlanning.user_id == user_id,
-                    BudgetPlanning.grupo == grupo,
-                    BudgetPlanning.mes_referencia == mes_referencia
-                ).first()
-            
-            if budget_existente:
-                # Atualizar (também por id se fornecido)
-                budget_existente.valor_planejado = valor_planejado
-                if cor is not None:
-                    budget_existente.cor = cor
-                self.db.flush()
-                resultado.append({
-                    "id": budget_existente.id,
-                    "grupo": budget_existente.grupo,
-                    "cor": getattr(budget_existente, 'cor', None),
-                    "mes_referencia": budget_existente.mes_referencia,
-                    "valor_planejado": float(budget_existente.valor_planejado)
-                })
-            else:
-                # Criar novo
-                novo_budget = BudgetPlanning(
-                    user_id=user_id,
-                    grupo=grupo,
-                    mes_referencia=mes_referencia,
-                    valor_planejado=valor_planejado,
-                    cor=cor
+                    BudgetPlanning.id.in_(ids)
                 )
-                self.db.add(novo_budget)
-                self.db.flush()
-                resultado.append({
-                    "id": novo_budget.id,
-                    "grupo": novo_budget.grupo,
-                    "cor": getattr(novo_budget, 'cor', None),
-                    "mes_referencia": novo_budget.mes_referencia,
-                    "valor_planejado": float(novo_budget.valor_planejado)
-                })
+            }
+        
+        renomear = []
+        linhas = []
+        for budget_data in budgets:
+            existente = por_id.get(budget_data.get("id"))
+            if existente is not None and existente.grupo != budget_data["grupo"]:
+                renomear.append({"id": existente.id, "grupo": budget_data["grupo"]})
+            linhas.append({
+                "grupo": budget_data["grupo"],
+                "mes_referencia": existente.mes_referencia if existente is not None else mes_referencia,
+                "valor_planejado": budget_data["valor_planejado"],
+                "cor": budget_data.get("cor"),
+            })
         
-        self.db.commit()
-
-        # Invalida cache de cashflow para o mês afetado
         try:
-            from app.domains.plano.service import invalidate_cashflow_cache
-            invalidate_cashflow_cache(self.db, user_id, mes_referencia=[mes_referencia])
-        except Exception:
-            pass  # Não bloquear a operação se a invalidação falhar
+            if renomear:
+                self.db.bulk_update_mappings(BudgetPlanning, renomear)
+            gravadas = self.repository.upsert_many(
+                user_id, linhas, campos_update=("valor_planejado", "cor")
+            )
+        except IntegrityError:
+            self.db.rollback()
+            raise HTTPException(
+                status_code=status.HTTP_409_CONFLICT,
+                detail="Já existe meta para o grupo informado neste mês"
+            )
+        
+        por_chave = {(b.grupo, b.mes_referencia): b for b in gravadas}
+        resultado = []
+        for linha in linhas:
+            budget = por_chave[(linha["grupo"], linha["mes_referencia"])]
+            resultado.append({
+                "id": budget.id,
+                "grupo": budget.grupo,
+                "cor": budget.cor,
+                "mes_referencia": budget.mes_referencia,
+                "valor_planejado": float(budget.valor_planejado)
+            })
+        
+        self.db.commit()
+        bump_data_version(user_id)
+        self._invalidar_cashflow(user_id, [linha["mes_referencia"] for linha in linhas])
 
         return resultado
 
@@ -599,38 +508,34 @@ class BudgetService:
             if mes > 12:
                 mes, ano = 1, ano + 1
 
-        from .models import BudgetPlanning
-        for mes_ref in meses:
-            existente = self.db.query(BudgetPlanning).filter(
-                BudgetPlanning.user_id == user_id,
-                BudgetPlanning.grupo == grupo,
-                BudgetPlanning.mes_referencia == mes_ref,
-            ).first()
-            if existente:
-                existente.valor_planejado = valor
-                self.db.flush()
-            else:
-                self.db.add(BudgetPlanning(
-                    user_id=user_id,
-                    grupo=grupo,
-                    mes_referencia=mes_ref,
-                    valor_planejado=valor,
-                ))
-                self.db.flush()
+        self.repository.upsert_many(user_id, [
+            {"grupo": grupo, "mes_referencia": mes_ref, "valor_planejado": valor}
+            for mes_ref in meses
+        ])
 
         self.db.commit()
+        bump_data_version(user_id)
 
         # Invalida cache de cashflow para todos os meses afetados
-        try:
-            from app.domains.plano.service import invalidate_cashflow_cache
-            invalidate_cashflow_cache(self.db, user_id, mes_referencia=meses)
-        except Exception:
-            pass
+        self._invalidar_cashflow(user_id, meses)
 
         return meses, len(meses)
 
+    def _realizado_map(self, user_id: int, mes_faturas: List[str]) -> Dict[str, float]:
+        """
+        {grupo: |realizado|} no intervalo (Despesa + Investimentos, 1 query agrupada).
+        Grupo presente nas duas categorias: prevalece Investimentos.
+        """
+        realizado = RealizadoPorGrupo.carregar(self.db, user_id, meses_fatura=mes_faturas)
+        realizado_map: Dict[str, float] = {}
+        for categoria in ('Despesa', 'Investimentos'):
+            for grupo, total in realizado.por_grupo(categoria).items():
+                realizado_map[grupo] = abs(total)
+        return realizado_map
+
     def _calcular_valor_realizado_grupo(
-        self, user_id: int, grupo: str, mes_referencia: str, categoria_geral: str = 'Despesa'
+        self, user_id: int, grupo: str, mes_referencia: str, categoria_geral: str = 'Despesa',
+        realizado: Optional[RealizadoPorGrupo] = None
     ) -> float:
         """
         Calcula valor realizado de um grupo em um mês.
@@ -641,56 +546,37 @@ class BudgetService:
             grupo: Nome do grupo
             mes_referencia: Mês no formato YYYY-MM
             categoria_geral: 'Despesa' ou 'Investimentos' (define qual CategoriaGeral filtrar)
+            realizado: Realizados já carregados para o mês (evita 1 query por grupo)
             
         Returns:
             Valor realizado (float)
         """
-        ano, mes = mes_referencia.split('-')
-        mes_fatura = f"{ano}{mes}"  # YYYYMM
         cat_geral = 'Investimentos' if categoria_geral == 'Investimentos' else 'Despesa'
-        
-        total = self.db.query(func.sum(JournalEntry.Valor)).filter(
-            JournalEntry.user_id == user_id,
-            JournalEntry.GRUPO == grupo,
-            JournalEntry.MesFatura == mes_fatura,
-            JournalEntry.CategoriaGeral == cat_geral,
-            JournalEntry.IgnorarDashboard == 0
-        ).scalar()
-        
-        return float(total) if total else 0.0
+        if realizado is None:
+            ano, mes = mes_referencia.split('-')
+            realizado = RealizadoPorGrupo.carregar(self.db, user_id, meses_fatura=[f"{ano}{mes}"])
+        return realizado.grupo(grupo, cat_geral)
     
-    def _get_subgrupos_grupo(self, user_id: int, grupo: str, mes_referencia: str) -> List[dict]:
+    def _get_subgrupos_grupo(
+        self, user_id: int, grupo: str, mes_referencia: str, realizado: Optional[RealizadoPorGrupo] = None
+    ) -> List[dict]:
         """
         Retorna subgrupos de um grupo no mês - mesma fonte que valor realizado
         Garante que a soma dos subgrupos = valor realizado total
         """
-        ano, mes = mes_referencia.split('-')
-        mes_fatura = f"{ano}{mes}"
+        if realizado is None:
+            ano, mes = mes_referencia.split('-')
+            realizado = RealizadoPorGrupo.carregar(self.db, user_id, meses_fatura=[f"{ano}{mes}"])
+        results = realizado.subgrupos(grupo, 'Despesa')
         
-        from sqlalchemy import func
-        results = (
-            self.db.query(
-                JournalEntry.SUBGRUPO.label('subgrupo'),
-                func.sum(JournalEntry.Valor).label('valor')
-            )
-            .filter(
-                JournalEntry.user_id == user_id,
-                JournalEntry.GRUPO == grupo,
-                JournalEntry.MesFatura == mes_fatura,
-                JournalEntry.CategoriaGeral == 'Despesa',
-                JournalEntry.IgnorarDashboard == 0
-            )
-            .group_by(JournalEntry.SUBGRUPO)
-        ).all()
-        
-        total_abs = abs(sum(r.valor for r in results)) or 1.0
+        total_abs = abs(sum(valor for _, valor in results)) or 1.0
         return [
             {
-                "subgrupo": r.subgrupo or "Sem subgrupo",
-                "valor": abs(float(r.valor)),
-                "percentual": round((abs(r.valor) / total_abs) * 100, 1)
+                "subgrupo": subgrupo or "Sem subgrupo",
+                "valor": abs(float(valor)),
+                "percentual": round((abs(valor) / total_abs) * 100, 1)
             }
-            for r in sorted(results, key=lambda x: abs(x.valor), reverse=True)
+            for subgrupo, valor in sorted(results, key=lambda x: abs(x[1]), reverse=True)
         ]
     
     def calcular_media_3_meses(self, user_id: int, grupo: str, mes_referencia: str) -> float:
@@ -705,57 +591,8 @@ class BudgetService:
         Returns:
             float: Média calculada (ou 0 se não houver dados)
         """
-        # Converter mes_referencia para calcular meses anteriores
-        ano, mes = map(int, mes_referencia.split('-'))
-        
-        # Calcular os 3 meses anteriores
-        meses_anteriores = []
-        for i in range(1, 4):  # 3 meses atrás
-            m = mes - i
-            a = ano
-            if m < 1:
-                m += 12
-                a -= 1
-            meses_anteriores.append(f"{a:04d}-{m:02d}")
-        
-        # Criar condições para cada mês
-        from sqlalchemy import or_
-        condicoes_meses = []
-        for mes_anterior in meses_anteriores:
-            ano_mes, mes_num = mes_anterior.split('-')
-            mes_fatura_format = f"{ano_mes}{mes_num}"  # YYYYMM
-            condicoes_meses.append(JournalEntry.MesFatura == mes_fatura_format)
-        
-        # Buscar transações dos 3 meses anteriores
-        transacoes = self.db.query(JournalEntry).filter(
-            JournalEntry.user_id == user_id,
-            JournalEntry.GRUPO == grupo,
-            JournalEntry.CategoriaGeral == 'Despesa',
-            JournalEntry.IgnorarDashboard == 0,  # Excluir transações ignoradas
-            or_(*condicoes_meses)
-        ).all()
-        
-        if not transacoes:
-            return 0.0
-        
-        # Agrupar por mês e calcular soma
-        meses_com_dados = {}
-        for t in transacoes:
-            # Usar MesFatura para agrupar
-            if t.MesFatura:
-                mes_fatura = t.MesFatura  # YYYYMM
-                if mes_fatura not in meses_com_dados:
-                    meses_com_dados[mes_fatura] = 0
-                meses_com_dados[mes_fatura] += abs(t.Valor)
-        
-        # Calcular média (soma / qtd_meses_com_dados)
-        if meses_com_dados:
-            total = sum(meses_com_dados.values())
-            qtd_meses = len(meses_com_dados)
-            media = total / qtd_meses
-            return round(media, 2)
-        
-        return 0.0
+        medias = medias_3_meses(self.db, user_id, grupos=[grupo], meses_referencia=[mes_referencia])
+        return medias.get((grupo, mes_referencia), 0.0)
     
     def get_detalhamento_media(
         self, 
@@ -774,7 +611,8 @@ class BudgetService:
         Returns:
             DetalhamentoMediaResponse com lista de meses detalhados
         """
-        from .schemas import DetalhamentoMediaResponse, MesDetalhamento
+        from .schemas import DetalhamentoMediaResponse, MesDetalhamento, SubgrupoDetalhamento
+        from app.domains.transactions.models import JournalMonthlyRollup as R
         
         # Converter mes_referencia para calcular meses anteriores
         ano, mes = map(int, mes_referencia.split('-'))
@@ -797,102 +635,65 @@ class BudgetService:
             '10': 'Outubro', '11': 'Novembro', '12': 'Dezembro'
         }
         
-        # Criar condições para cada mês
-        from sqlalchemy import or_
-        condicoes_meses = []
-        for mes_anterior in meses_anteriores:
-            ano_mes, mes_num = mes_anterior.split('-')
-            mes_fatura_format = f"{ano_mes}{mes_num}"  # YYYYMM
-            condicoes_meses.append(JournalEntry.MesFatura == mes_fatura_format)
-        
-        # Buscar transações dos 3 meses anteriores
-        transacoes = self.db.query(JournalEntry).filter(
-            JournalEntry.user_id == user_id,
-            JournalEntry.GRUPO == grupo,
-            JournalEntry.CategoriaGeral == 'Despesa',
-            JournalEntry.IgnorarDashboard == 0,  # Excluir transações ignoradas
-            or_(*condicoes_meses)
-        ).all()
-        
-        # Agrupar por mês
-        detalhes_por_mes = {}
-        for mes_ant in meses_anteriores:
-            ano_mes, mes_num = mes_ant.split('-')
-            mes_fatura_format = f"{ano_mes}{mes_num}"  # YYYYMM
-            detalhes_por_mes[mes_fatura_format] = {
-                'mes_referencia': mes_ant,
-                'transacoes': [],
-                'total': 0.0
-            }
-        
-        for t in transacoes:
-            if t.MesFatura and t.MesFatura in detalhes_por_mes:
-                detalhes_por_mes[t.MesFatura]['transacoes'].append(t)
-                detalhes_por_mes[t.MesFatura]['total'] += abs(t.Valor)
-                
-                # Agrupar por subgrupo
-                if 'subgrupos' not in detalhes_por_mes[t.MesFatura]:
-                    detalhes_por_mes[t.MesFatura]['subgrupos'] = {}
-                
-                subgrupo_key = t.SUBGRUPO if t.SUBGRUPO else '__SEM_SUBGRUPO__'
-                if subgrupo_key not in detalhes_por_mes[t.MesFatura]['subgrupos']:
-                    detalhes_por_mes[t.MesFatura]['subgrupos'][subgrupo_key] = {
-                        'valor': 0.0,
-                        'quantidade': 0
-                    }
-                
-                detalhes_por_mes[t.MesFatura]['subgrupos'][subgrupo_key]['valor'] += abs(t.Valor)
-                detalhes_por_mes[t.MesFatura]['subgrupos'][subgrupo_key]['quantidade'] += 1
-        
-        # Construir lista de MesDetalhamento
+        # Totais por mês e subgrupo direto do rollup (sem carregar transações)
+        meses_fatura = [m.replace('-', '') for m in meses_anteriores]  # YYYYMM
+        linhas = self.db.query(
+            R.MesFatura,
+            R.SUBGRUPO,
+            func.sum(R.soma_valor_abs),
+            func.sum(R.quantidade),
+        ).filter(
+            R.user_id == user_id,
+            R.GRUPO == grupo,
+            R.CategoriaGeral == 'Despesa',
+            R.MesFatura.in_(meses_fatura)
+        ).group_by(R.MesFatura, R.SUBGRUPO).all()
+        
+        # {YYYYMM: {subgrupo: [valor, quantidade]}} ('' e nulo = sem subgrupo)
+        por_mes: Dict[str, Dict[Optional[str], List[float]]] = {m: {} for m in meses_fatura}
+        for mes_fatura, subgrupo, valor, quantidade in linhas:
+            acumulado = por_mes[mes_fatura].setdefault(subgrupo or None, [0.0, 0])
+            acumulado[0] += float(valor or 0)
+            acumulado[1] += int(quantidade or 0)
+        
+        # Construir lista de MesDetalhamento (do mais antigo para o mais recente)
         meses_detalhados = []
         total_geral = 0.0
-        
-        # Ordenar meses do mais antigo para o mais recente
         for mes_ref in sorted(meses_anteriores):
             ano_mes, mes_num = mes_ref.split('-')
-            mes_fatura_format = f"{ano_mes}{mes_num}"  # YYYYMM
-            
-            if mes_fatura_format in detalhes_por_mes:
-                detalhes = detalhes_por_mes[mes_fatura_format]
-                mes_nome = f"{meses_nomes[mes_num]} {ano_mes}"
-                
-                # Criar lista de subgrupos
-                subgrupos_list = []
-                if 'subgrupos' in detalhes:
-                    from .schemas import SubgrupoDetalhamento
-                    for subgrupo_key, dados in detalhes['subgrupos'].items():
-                        subgrupo_nome = None if subgrupo_key == '__SEM_SUBGRUPO__' else subgrupo_key
-                        subgrupos_list.append(SubgrupoDetalhamento(
-                            subgrupo=subgrupo_nome,
-                            valor_total=round(dados['valor'], 2),
-                            quantidade_transacoes=dados['quantidade']
-                        ))
-                    # Ordenar por valor decrescente
-                    subgrupos_list.sort(key=lambda x: x.valor_total, reverse=True)
-                
-                mes_det = MesDetalhamento(
-                    mes_referencia=mes_ref,
-                    mes_nome=mes_nome,
-                    valor_total=round(detalhes['total'], 2),
-                    quantidade_transacoes=len(detalhes['transacoes']),
-                    subgrupos=subgrupos_list if subgrupos_list else None
-                )
-                meses_detalhados.append(mes_det)
-                total_geral += detalhes['total']
-        
-        # Calcular média (apenas meses com transações)
-        meses_com_dados = [m for m in meses_detalhados if m.quantidade_transacoes > 0]
-        if meses_com_dados:
-            media_calculada = total_geral / len(meses_com_dados)
-        else:
-            media_calculada = 0.0
+            subgrupos = por_mes[f"{ano_mes}{mes_num}"]
+            subgrupos_list = sorted(
+                (
+                    SubgrupoDetalhamento(
+                        subgrupo=subgrupo,
+                        valor_total=round(valor, 2),
+                        quantidade_transacoes=quantidade
+                    )
+                    for subgrupo, (valor, quantidade) in subgrupos.items()
+                ),
+                key=lambda x: x.valor_total,
+                reverse=True
+            )
+            total_mes = sum(valor for valor, _ in subgrupos.values())
+            meses_detalhados.append(MesDetalhamento(
+                mes_referencia=mes_ref,
+                mes_nome=f"{meses_nomes[mes_num]} {ano_mes}",
+                valor_total=round(total_mes, 2),
+                quantidade_transacoes=sum(quantidade for _, quantidade in subgrupos.values()),
+                subgrupos=subgrupos_list or None
+            ))
+            total_geral += total_mes
+        
+        # Média pelo mesmo motor em lote usado para gravar valor_medio_3_meses
+        media_calculada = medias_3_meses(
+            self.db, user_id, grupos=[grupo], meses_referencia=[mes_referencia]
+        ).get((grupo, mes_referencia), 0.0)
         
         return DetalhamentoMediaResponse(
             grupo=grupo,
             mes_planejado=mes_referencia,
             meses_considerados=meses_detalhados,
-            media_calculada=round(media_calculada, 2),
+            media_calculada=media_calculada,
             total_geral=round(total_geral, 2)
         )
     
@@ -937,6 +738,7 @@ class BudgetService:
             )
         
         budget = self.repository.create(user_id, data.dict())
+        bump_data_version(user_id)
         return BudgetResponse.from_orm(budget)
     
     def update_budget(self, budget_id: int, user_id: int, data: BudgetUpdate) -> BudgetResponse:
@@ -969,6 +771,7 @@ class BudgetService:
                     )
         
         updated = self.repository.update(budget, data.dict(exclude_unset=True))
+        bump_data_version(user_id)
         return BudgetResponse.from_orm(updated)
     
     def delete_budget(self, budget_id: int, user_id: int) -> None:
@@ -982,6 +785,7 @@ class BudgetService:
             )
         
         self.repository.delete(budget)
+        bump_data_version(user_id)
     
     def toggle_budget_ativo(self, budget_id: int, user_id: int, ativo: int) -> dict:
         """
@@ -999,6 +803,7 @@ class BudgetService:
         
         # Atualizar apenas campo ativo (repository.update precisa de dict)
         updated_budget = self.repository.update(budget, {"ativo": bool(ativo)})
+        bump_data_version(user_id)
         
         return {
             "id": updated_budget.id,
@@ -1030,34 +835,39 @@ class BudgetService:
                     detail="valor_planejado deve ser maior que zero"
                 )
         
-        # Criar ou atualizar cada budget com média calculada
-        result = []
-        for budget_data in budgets:
-            # Calcular média dos 3 meses anteriores
-            media = self.calcular_media_3_meses(
-                user_id=user_id,
-                grupo=budget_data["grupo"],
-                mes_referencia=mes_referencia
-            )
-            
-            # Upsert com média
-            budget = self.repository.upsert(
-                user_id=user_id,
-                grupo=budget_data["grupo"],
-                mes_referencia=mes_referencia,
-                valor_planejado=budget_data["valor_planejado"],
-                valor_medio_3_meses=media
-            )
-            result.append(budget)
+        # Médias dos 3 meses anteriores de todos os grupos em 1 query
+        medias = medias_3_meses(
+            self.db, user_id,
+            grupos=[b["grupo"] for b in budgets],
+            meses_referencia=[mes_referencia]
+        )
+        
+        # Criar ou atualizar todos os budgets com a média em um único upsert
+        gravadas = self.repository.upsert_many(
+            user_id,
+            [
+                {
+                    "grupo": budget_data["grupo"],
+                    "mes_referencia": mes_referencia,
+                    "valor_planejado": budget_data["valor_planejado"],
+                    "valor_medio_3_meses": medias.get((budget_data["grupo"], mes_referencia), 0.0),
+                }
+                for budget_data in budgets
+            ],
+            campos_update=("valor_planejado", "valor_medio_3_meses")
+        )
+        por_grupo = {b.grupo: b for b in gravadas}
+        result = [
+            BudgetResponse.from_orm(por_grupo[grupo])
+            for grupo in dict.fromkeys(budget_data["grupo"] for budget_data in budgets)
+        ]
+        self.db.commit()
+        bump_data_version(user_id)
 
         # Invalida cache de cashflow para o mês afetado
-        try:
-            from app.domains.plano.service import invalidate_cashflow_cache
-            invalidate_cashflow_cache(self.db, user_id, mes_referencia=[mes_referencia])
-        except Exception:
-            pass  # Não bloquear a operação se a invalidação falhar
+        self._invalidar_cashflow(user_id, [mes_referencia])
 
-        return [BudgetResponse.from_orm(b) for b in result]
+        return result
 
     
     # ═══════════════════════════════════════════════════════════════════════════════
@@ -5,11 +5,13 @@ Queries SQL para estatísticas
 import logging
 from sqlalchemy.orm import Session
 from sqlalchemy import func, or_, and_, case
-from datetime import datetime
+from datetime import date, datetime, timedelta
 from typing import Optional, List, Dict
 
-from app.domains.transactions.models import JournalEntry
+from app.core.cache import cached_per_user
+from app.domains.transactions.models import JournalEntry, JournalMonthlyRollup
 from app.domains.budget.models import BudgetPlanning
+from app.domains.budget.realizado import RealizadoPorGrupo
 from app.domains.grupos.models import BaseGruposConfig
 from app.domains.investimentos.models import InvestimentoPortfolio, InvestimentoHistorico, InvestimentoPlanejamento
 from app.domains.investimentos.repository import InvestimentoRepository
@@ -92,24 +94,43 @@ class DashboardRepository:
                 return {"year": int(result.Ano), "month": int(result.Mes)}
         return {"year": datetime.now().year, "month": datetime.now().month}
     
-    def _build_date_filter(self, year: int, month: Optional[int] = None, ytd_month: Optional[int] = None):
+    def _build_date_filter(
+        self, year: int, month: Optional[int] = None, ytd_month: Optional[int] = None, modelo=JournalEntry
+    ):
         """Constrói filtro usando MesFatura/Ano/Mes
-        
+
         Args:
             year: Ano a filtrar
             month: Mês específico (1-12) ou None para ano inteiro / YTD
             ytd_month: Se informado com month=None, filtra Jan..ytd_month (YTD)
+            modelo: JournalEntry ou JournalMonthlyRollup (mesmas colunas de período)
         """
         if month is not None:
             # Mês específico
             mes_fatura = f"{year}{month:02d}"
-            return JournalEntry.MesFatura == mes_fatura
+            return modelo.MesFatura == mes_fatura
         if ytd_month is not None:
             # YTD: Jan até ytd_month
-            return and_(JournalEntry.Ano == year, JournalEntry.Mes <= ytd_month)
+            return and_(modelo.Ano == year, modelo.Mes <= ytd_month)
         # Ano inteiro
-        return JournalEntry.Ano == year
-    
+        return modelo.Ano == year
+
+    def _totais_periodo(self, user_id: int, date_filter):
+        """
+        Despesas (soma bruta), receitas, cartões (soma de |Valor|) e nº de transações do período.
+        1 query no journal_monthly_rollup (já restrito a IgnorarDashboard = 0).
+        """
+        R = JournalMonthlyRollup
+        row = self.db.query(
+            func.sum(case((R.CategoriaGeral == 'Despesa', R.soma_valor), else_=0)),
+            func.sum(case((R.CategoriaGeral == 'Receita', R.soma_valor), else_=0)),
+            func.sum(case((R.TipoTransacao == 'Cartão de Crédito', R.soma_valor_abs), else_=0)),
+            func.sum(R.quantidade),
+        ).filter(R.user_id == user_id, date_filter).one()
+        despesas_raw, receitas, cartoes, quantidade = row
+        return despesas_raw or 0.0, receitas or 0.0, cartoes or 0.0, int(quantidade or 0)
+
+    @cached_per_user("dashboard:metrics")
     def get_metrics(
         self,
         user_id: int,
@@ -125,33 +146,12 @@ class DashboardRepository:
             month: Mês específico (1-12) ou None para ano inteiro / YTD
             ytd_month: Se informado com month=None, soma Jan..ytd_month (YTD)
         """
-        # Filtro base - SEMPRE filtrar por IgnorarDashboard = 0
-        date_filter = self._build_date_filter(year, month, ytd_month)
-        base_query = self.db.query(JournalEntry).filter(
-            JournalEntry.user_id == user_id,
-            date_filter,
-            JournalEntry.IgnorarDashboard == 0  # Apenas transações que aparecem no dashboard
-        )
-        
-        # Total de despesas (CategoriaGeral = 'Despesa') - soma valores negativos
-        despesas_raw = base_query.filter(
-            JournalEntry.CategoriaGeral == 'Despesa'
-        ).with_entities(func.sum(JournalEntry.Valor)).scalar() or 0.0
+        # Rollup mensal (só IgnorarDashboard = 0): despesas (valores negativos), receitas,
+        # cartões (TipoTransacao = 'Cartão de Crédito') e nº de transações em 1 query
+        date_filter = self._build_date_filter(year, month, ytd_month, modelo=JournalMonthlyRollup)
+        despesas_raw, total_receitas, total_cartoes, num_transacoes = self._totais_periodo(user_id, date_filter)
         total_despesas = abs(despesas_raw)  # Aplicar abs() só para exibição
-        
-        # Total de receitas (CategoriaGeral = 'Receita') - soma valores positivos
-        total_receitas = base_query.filter(
-            JournalEntry.CategoriaGeral == 'Receita'
-        ).with_entities(func.sum(JournalEntry.Valor)).scalar() or 0.0
-        
-        # Total de cartões (TipoTransacao = 'Cartão de Crédito')
-        total_cartoes = base_query.filter(
-            JournalEntry.TipoTransacao == 'Cartão de Crédito'
-        ).with_entities(func.sum(func.abs(JournalEntry.Valor))).scalar() or 0.0
-        
-        # Número de transações
-        num_transacoes = base_query.count()
-        
+
         # Saldo do período (Receitas + Despesas, onde Despesas são negativas)
         saldo_periodo = total_receitas + despesas_raw
         
@@ -174,19 +174,9 @@ class DashboardRepository:
         despesas_vs_plano_percent = None
 
         if prev_month is not None:
-            prev_date_filter = self._build_date_filter(prev_year, prev_month)
-            prev_query = self.db.query(JournalEntry).filter(
-                JournalEntry.user_id == user_id,
-                prev_date_filter,
-                JournalEntry.IgnorarDashboard == 0
-            )
-            prev_despesas_raw = prev_query.filter(
-                JournalEntry.CategoriaGeral == 'Despesa'
-            ).with_entities(func.sum(JournalEntry.Valor)).scalar() or 0.0
+            prev_date_filter = self._build_date_filter(prev_year, prev_month, modelo=JournalMonthlyRollup)
+            prev_despesas_raw, prev_total_receitas, _, _ = self._totais_periodo(user_id, prev_date_filter)
             prev_total_despesas = abs(prev_despesas_raw)
-            prev_total_receitas = prev_query.filter(
-                JournalEntry.CategoriaGeral == 'Receita'
-            ).with_entities(func.sum(JournalEntry.Valor)).scalar() or 0.0
 
             if prev_total_despesas > 0:
                 change_percentage = ((total_despesas - prev_total_despesas) / prev_total_despesas) * 100
@@ -296,6 +286,7 @@ class DashboardRepository:
             "patrimonio_vs_plano_percent": patrimonio_vs_plano_percent,
         }
     
+    @cached_per_user("dashboard:chart_data")
     def get_chart_data(self, user_id: int, year: int, month: int) -> List[Dict]:
         """Retorna dados para gráfico de área (receitas vs despesas) - sempre 12 meses de histórico
 
@@ -316,22 +307,22 @@ class DashboardRepository:
             meses_fatura.append(f"{d.year}{d.month:02d}")
             meses_meta.append((d.year, d.month))
 
-        # 1 query com IN + GROUP BY em vez de 12 queries separadas
+        # 1 query com IN + GROUP BY no rollup mensal (já restrito a IgnorarDashboard = 0)
+        R = JournalMonthlyRollup
         rows = self.db.query(
-            JournalEntry.MesFatura,
+            R.MesFatura,
             func.sum(case(
-                (JournalEntry.CategoriaGeral == 'Receita', JournalEntry.Valor),
+                (R.CategoriaGeral == 'Receita', R.soma_valor),
                 else_=0
             )).label('receitas'),
             func.abs(func.sum(case(
-                (JournalEntry.CategoriaGeral == 'Despesa', JournalEntry.Valor),
+                (R.CategoriaGeral == 'Despesa', R.soma_valor),
                 else_=0
             ))).label('despesas')
         ).filter(
-            JournalEntry.user_id == user_id,
-            JournalEntry.MesFatura.in_(meses_fatura),
-            JournalEntry.IgnorarDashboard == 0
-        ).group_by(JournalEntry.MesFatura).all()
+            R.user_id == user_id,
+            R.MesFatura.in_(meses_fatura)
+        ).group_by(R.MesFatura).all()
 
         by_mes = {r.MesFatura: r for r in rows}
 
@@ -346,6 +337,44 @@ class DashboardRepository:
             for mf, (ano, mes) in zip(meses_fatura, meses_meta)
         ]
     
+    @cached_per_user("dashboard:chart_data_daily")
+    def get_chart_data_daily(self, user_id: int, data_inicio: date, data_fim: date) -> List[Dict]:
+        """Receitas vs despesas por dia (data da transação) no intervalo [data_inicio, data_fim].
+
+        1 query com range em data_transacao (idx_je_user_data_transacao) + GROUP BY dia;
+        dias sem movimento entram com zero.
+        """
+        rows = self.db.query(
+            JournalEntry.data_transacao,
+            func.sum(case(
+                (JournalEntry.CategoriaGeral == 'Receita', JournalEntry.Valor),
+                else_=0
+            )).label('receitas'),
+            func.abs(func.sum(case(
+                (JournalEntry.CategoriaGeral == 'Despesa', JournalEntry.Valor),
+                else_=0
+            ))).label('despesas')
+        ).filter(
+            JournalEntry.user_id == user_id,
+            JournalEntry.data_transacao >= data_inicio,
+            JournalEntry.data_transacao <= data_fim,
+            JournalEntry.IgnorarDashboard == 0
+        ).group_by(JournalEntry.data_transacao).all()
+
+        by_dia = {r.data_transacao: r for r in rows}
+        dias = (data_fim - data_inicio).days + 1
+
+        pontos = []
+        for i in range(max(dias, 0)):
+            dia = data_inicio + timedelta(days=i)
+            r = by_dia.get(dia)
+            pontos.append({
+                "date": dia.isoformat(),
+                "receitas": float(r.receitas or 0) if r else 0.0,
+                "despesas": float(r.despesas or 0) if r else 0.0,
+            })
+        return pontos
+
     def get_chart_data_yearly(
         self,
         user_id: int,
@@ -360,33 +389,33 @@ class DashboardRepository:
             ytd_month: Se informado, soma apenas Jan..ytd_month de cada ano (YTD).
                        Se None, soma o ano inteiro.
         """
+        R = JournalMonthlyRollup
         years_data = []
         for target_year in sorted(years):
             base_filter = [
-                JournalEntry.user_id == user_id,
-                JournalEntry.Ano == target_year,
-                JournalEntry.IgnorarDashboard == 0
+                R.user_id == user_id,
+                R.Ano == target_year
             ]
             if ytd_month is not None:
-                base_filter.append(JournalEntry.Mes <= ytd_month)
-            
+                base_filter.append(R.Mes <= ytd_month)
+
             result = self.db.query(
                 func.sum(
                     case(
-                        (JournalEntry.CategoriaGeral == 'Receita', JournalEntry.Valor),
+                        (R.CategoriaGeral == 'Receita', R.soma_valor),
                         else_=0
                     )
                 ).label('receitas'),
                 func.abs(
                     func.sum(
                         case(
-                            (JournalEntry.CategoriaGeral == 'Despesa', JournalEntry.Valor),
+                            (R.CategoriaGeral == 'Despesa', R.soma_valor),
                             else_=0
                         )
                     )
                 ).label('despesas')
             ).filter(*base_filter).first()
-            
+
             years_data.append({
                 "date": f"{target_year}-01-01",
                 "receitas": float(result.receitas or 0) if result else 0.0,
@@ -396,6 +425,7 @@ class DashboardRepository:
         
         return years_data
     
+    @cached_per_user("dashboard:category_expenses")
     def get_category_expenses(self, user_id: int, year: int, month: Optional[int] = None) -> List[Dict]:
         """Retorna despesas agrupadas por categoria
         
@@ -404,36 +434,35 @@ class DashboardRepository:
             year: Ano a filtrar
             month: Mês específico (1-12) ou None para ano inteiro
         """
-        date_filter = self._build_date_filter(year, month)
-        
-        # Total geral de despesas (para calcular percentual) - FILTRAR IgnorarDashboard = 0
+        R = JournalMonthlyRollup
+        date_filter = self._build_date_filter(year, month, modelo=R)
+
+        # Total geral de despesas (para calcular percentual) - rollup já exclui IgnorarDashboard
         # Somar valores e depois aplicar abs() para evitar somar positivos e negativos separadamente
         total_despesas_raw = self.db.query(
-            func.sum(JournalEntry.Valor)
+            func.sum(R.soma_valor)
         ).filter(
-            JournalEntry.user_id == user_id,
+            R.user_id == user_id,
             date_filter,
-            JournalEntry.CategoriaGeral == 'Despesa',
-            JournalEntry.IgnorarDashboard == 0
+            R.CategoriaGeral == 'Despesa'
         ).scalar() or 0.0
         total_despesas = abs(total_despesas_raw) if total_despesas_raw != 0 else 1.0  # Evita divisão por zero
-        
+
         # Despesas por categoria - somar primeiro, depois aplicar abs()
         results = self.db.query(
-            JournalEntry.GRUPO.label('categoria'),
-            func.sum(JournalEntry.Valor).label('total')
+            R.GRUPO.label('categoria'),
+            func.sum(R.soma_valor).label('total')
         ).filter(
-            JournalEntry.user_id == user_id,
+            R.user_id == user_id,
             date_filter,
-            JournalEntry.CategoriaGeral == 'Despesa',
-            JournalEntry.IgnorarDashboard == 0,
-            JournalEntry.GRUPO.isnot(None)
+            R.CategoriaGeral == 'Despesa',
+            R.GRUPO.isnot(None)
         ).group_by(
-            JournalEntry.GRUPO
+            R.GRUPO
         ).order_by(
-            func.abs(func.sum(JournalEntry.Valor)).desc()
+            func.abs(func.sum(R.soma_valor)).desc()
         ).all()
-        
+
         return [
             {
                 "categoria": row.categoria or "Sem categoria",
@@ -443,6 +472,7 @@ class DashboardRepository:
             for row in results
         ]
     
+    @cached_per_user("dashboard:budget_vs_actual")
     def get_budget_vs_actual(self, user_id: int, year: int, month: Optional[int] = None) -> Dict:
         """Comparação Realizado vs Planejado por Grupo
         
@@ -485,30 +515,20 @@ class DashboardRepository:
             # Criar dict de planejados
             planejado_dict = {b.grupo: float(b.valor_planejado) for b in budgets}
         
-        # 2. Buscar valores realizados agrupados por Grupo
-        # REGRA: NUNCA usar campo Data (string) para filtros - usar Ano/Mes (integer)
-        realizados_filters = [
-            JournalEntry.user_id == user_id,
-            JournalEntry.Ano == year,
-            JournalEntry.CategoriaGeral == 'Despesa',  # FILTRO CRÍTICO: Apenas despesas
-            JournalEntry.IgnorarDashboard == 0,
-            JournalEntry.GRUPO.isnot(None)
-        ]
-        
+        # 2. Buscar valores realizados agrupados por Grupo (mesmo motor do budget, 1 query)
+        # REGRA: NUNCA usar campo Data (string) para filtros - usar Ano/MesFatura
         # Se month=None, buscar todo o ano; se month especificado, filtrar mês
         if month is not None:
-            mes_fatura = f"{year}{month:02d}"  # Formato YYYYMM
-            realizados_filters.append(JournalEntry.MesFatura == mes_fatura)
-            
-        realizados = self.db.query(
-            JournalEntry.GRUPO,
-            func.sum(JournalEntry.Valor).label('total')
-        ).filter(*realizados_filters).group_by(
-            JournalEntry.GRUPO
-        ).all()
+            realizado = RealizadoPorGrupo.carregar(
+                self.db, user_id, meses_fatura=[f"{year}{month:02d}"], ano=year
+            )
+        else:
+            realizado = RealizadoPorGrupo.carregar(self.db, user_id, ano=year)
         
-        # Criar dict de realizados (converter para positivo apenas na exibição)
-        realizado_dict = {r.GRUPO: abs(float(r.total)) for r in realizados}
+        # Criar dict de realizados (FILTRO CRÍTICO: apenas despesas; positivo apenas na exibição)
+        realizado_dict = {
+            grupo: abs(total) for grupo, total in realizado.por_grupo('Despesa', ignorar_vazio=False).items()
+        }
         
         # 3. Combinar ambos (união de todos os Grupos)
         all_grupos = set(planejado_dict.keys()) | set(realizado_dict.keys())
@@ -631,6 +651,7 @@ class DashboardRepository:
         result = query.scalar()
         return float(result) if result else 0.0
     
+    @cached_per_user("dashboard:credit_card_expenses")
     def get_credit_card_expenses(self, user_id: int, year: int, month: Optional[int] = None) -> List[Dict]:
         """Retorna despesas agrupadas por cartão de crédito
         
@@ -642,28 +663,28 @@ class DashboardRepository:
         Returns:
             Lista de dicts com: cartao, total, percentual, num_transacoes
         """
-        # Filtro base
-        date_filter = self._build_date_filter(year, month)
-        
+        # Filtro base (rollup mensal já exclui IgnorarDashboard)
+        R = JournalMonthlyRollup
+        date_filter = self._build_date_filter(year, month, modelo=R)
+
         # Query agrupada por cartão - apenas transações com NomeCartao não nulo
         query = (
             self.db.query(
-                JournalEntry.NomeCartao.label('cartao'),
-                func.abs(func.sum(JournalEntry.Valor)).label('total'),
-                func.count(JournalEntry.id).label('num_transacoes')
+                R.NomeCartao.label('cartao'),
+                func.abs(func.sum(R.soma_valor)).label('total'),
+                func.sum(R.quantidade).label('num_transacoes')
             )
             .filter(
-                JournalEntry.user_id == user_id,
+                R.user_id == user_id,
                 date_filter,
-                JournalEntry.IgnorarDashboard == 0,
-                JournalEntry.CategoriaGeral == 'Despesa',  # Apenas despesas
-                JournalEntry.NomeCartao.isnot(None),  # Apenas com cartão
-                JournalEntry.NomeCartao != ''  # Não vazio
+                R.CategoriaGeral == 'Despesa',  # Apenas despesas
+                R.NomeCartao.isnot(None),  # Apenas com cartão
+                R.NomeCartao != ''  # Não vazio
             )
-            .group_by(JournalEntry.NomeCartao)
-            .order_by(func.abs(func.sum(JournalEntry.Valor)).desc())
+            .group_by(R.NomeCartao)
+            .order_by(func.abs(func.sum(R.soma_valor)).desc())
         )
-        
+
         results = query.all()
         
         if not results:
@@ -772,6 +793,7 @@ class DashboardRepository:
             'items': items
         }
     
+    @cached_per_user("dashboard:income_sources")
     def get_income_sources(self, user_id: int, year: int, month: Optional[int] = None) -> List[Dict]:
         """Retorna breakdown de receitas por fonte (grupo)
         
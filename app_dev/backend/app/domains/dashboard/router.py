@@ -2,15 +2,20 @@
 Domínio Dashboard - Router
 Endpoints HTTP para métricas e estatísticas
 """
+import asyncio
+import logging
+import time
 from typing import Optional
-from fastapi import APIRouter, Depends, Query, HTTPException
+from fastapi import APIRouter, Depends, Query, HTTPException, Response
 from sqlalchemy.orm import Session
-from datetime import datetime
+from datetime import date, datetime, timedelta
 
-from app.core.database import get_db
+from app.core.config import settings
+from app.core.database import get_db, SessionLocal
+from app.core.executors import run_in_dashboard_thread
 from app.shared.dependencies import get_current_user_id
 from .service import DashboardService
-from app.domains.plano.service import PlanoService
+from app.domains.plano.service import get_cashflow_mes_cached
 from app.domains.investimentos.service import InvestimentoService
 from .schemas import (
     DashboardMetrics, 
@@ -22,6 +27,8 @@ from .schemas import (
     OrcamentoInvestimentosResponse,
 )
 
+logger = logging.getLogger(__name__)
+
 router = APIRouter(prefix="/dashboard", tags=["dashboard"])
 
 
@@ -79,6 +86,26 @@ def get_chart_data(
     return service.get_chart_data(user_id, year, month)
 
 
+@router.get("/chart-data-daily", response_model=ChartDataResponse)
+def get_chart_data_daily(
+    data_inicio: Optional[date] = Query(None, description="Data inicial YYYY-MM-DD (default: data_fim - 29 dias)"),
+    data_fim: Optional[date] = Query(None, description="Data final YYYY-MM-DD (default: hoje)"),
+    user_id: int = Depends(get_current_user_id),
+    db: Session = Depends(get_db)
+):
+    """
+    Retorna dados para gráfico diário:
+    - Receitas e despesas por dia da transação (default: últimos 30 dias), máximo 366 dias
+    """
+    data_fim = data_fim or date.today()
+    data_inicio = data_inicio or (data_fim - timedelta(days=29))
+    if data_inicio > data_fim or (data_fim - data_inicio).days > 365:
+        raise HTTPException(status_code=400, detail="Intervalo inválido (data_inicio <= data_fim, máximo 366 dias)")
+    
+    service = DashboardService(db)
+    return service.get_chart_data_daily(user_id, data_inicio, data_fim)
+
+
 @router.get("/chart-data-yearly", response_model=ChartDataResponse)
 def get_chart_data_yearly(
     years: str = Query(..., description="Anos separados por vírgula (ex: 2023,2024,2025)"),
@@ -246,8 +273,79 @@ def get_income_sources(
     return service.get_income_sources(user_id, year, month)
 
 
+def _secao_cashflow_mes(db: Session, user_id: int, year: int, month: int, ytd_month: Optional[int]):
+    try:
+        mes_data = get_cashflow_mes_cached(db, user_id, year, month)
+        return None if mes_data.get("status_mes") == "erro" else mes_data
+    except Exception:
+        return None
+
+
+def _secao_aporte_mes(db: Session, user_id: int, year: int, month: int, ytd_month: Optional[int]):
+    try:
+        aporte = InvestimentoService(db).get_aporte_principal_por_mes(user_id, year, month)
+        return {"aporte": aporte or 0}
+    except Exception:
+        return {"aporte": 0}
+
+
+def _secao_chart_yearly(db: Session, user_id: int, year: int, month: int, ytd_month: Optional[int]):
+    current_year = datetime.now().year
+    years = [current_year - 2, current_year - 1, current_year]
+    return DashboardService(db).get_chart_data_yearly(user_id, years, ytd_month)
+
+
+# Seções do /summary: nome (query) → (chave na resposta, função(db, user_id, year, month, ytd_month))
+SUMMARY_SECTIONS = {
+    "metrics": ("metrics", lambda db, u, y, m, ytd: DashboardService(db).get_metrics(u, y, m, ytd)),
+    "chart": ("chart", lambda db, u, y, m, ytd: DashboardService(db).get_chart_data(u, y, m)),
+    "chart-yearly": ("chart_yearly", _secao_chart_yearly),
+    "income-sources": ("income_sources", lambda db, u, y, m, ytd: DashboardService(db).get_income_sources(u, y, m)),
+    "budget-vs-actual": ("budget_vs_actual", lambda db, u, y, m, ytd: DashboardService(db).get_budget_vs_actual(u, y, m)),
+    "credit-cards": ("credit_cards", lambda db, u, y, m, ytd: DashboardService(db).get_credit_card_expenses(u, y, m)),
+    "orcamento-investimentos": (
+        "orcamento_investimentos",
+        lambda db, u, y, m, ytd: DashboardService(db).get_orcamento_investimentos(u, y, m, ytd),
+    ),
+    "cashflow-mes": ("cashflow_mes", _secao_cashflow_mes),
+    "aporte-mes": ("aporte_mes", _secao_aporte_mes),
+}
+
+
+def _calcular_secao(func_secao, user_id: int, year: int, month: int, ytd_month: Optional[int]):
+    """Roda uma seção numa sessão própria do pool (sessões não são thread-safe)."""
+    db = SessionLocal()
+    try:
+        return func_secao(db, user_id, year, month, ytd_month)
+    finally:
+        try:
+            db.rollback()
+        except Exception:
+            pass
+        db.close()
+
+
+async def _secao_com_timeout(nome: str, func_secao, user_id: int, year: int, month: int, ytd_month: Optional[int]):
+    """Executa a seção no pool do dashboard com timeout. Retorna (valor, duração_ms, falha)."""
+    inicio = time.perf_counter()
+    falha = None
+    try:
+        valor = await asyncio.wait_for(
+            run_in_dashboard_thread(_calcular_secao, func_secao, user_id, year, month, ytd_month),
+            timeout=settings.DASHBOARD_SECTION_TIMEOUT_SECONDS,
+        )
+    except asyncio.TimeoutError:
+        logger.warning(f"⏱️ dashboard/summary: seção '{nome}' excedeu {settings.DASHBOARD_SECTION_TIMEOUT_SECONDS}s (user {user_id})")
+        valor, falha = None, "timeout"
+    except Exception as e:
+        logger.error(f"❌ dashboard/summary: seção '{nome}' falhou (user {user_id}): {e}", exc_info=True)
+        valor, falha = None, "error"
+    return valor, (time.perf_counter() - inicio) * 1000, falha
+
+
 @router.get("/summary")
-def dashboard_summary(
+async def dashboard_summary(
+    response: Response,
     year: int = Query(..., description="Ano"),
     month: int = Query(..., description="Mês (1-12)"),
     ytd_month: Optional[int] = Query(None, description="YTD: mês limite (1-12). Se informado com month, usado em seções que suportam YTD"),
@@ -255,7 +353,6 @@ def dashboard_summary(
         default="metrics,chart,income-sources,budget-vs-actual,credit-cards,orcamento-investimentos,cashflow-mes,aporte-mes",
         description="Seções a incluir, separadas por vírgula",
     ),
-    db: Session = Depends(get_db),
     user_id: int = Depends(get_current_user_id),
 ):
     """
@@ -265,57 +362,30 @@ def dashboard_summary(
     Seções disponíveis: metrics, chart, chart-yearly, income-sources,
     budget-vs-actual, credit-cards, orcamento-investimentos, cashflow-mes, aporte-mes.
 
-    Campos ausentes na resposta = seção não solicitada (nunca null).
+    As seções rodam em paralelo, cada uma com sessão própria e timeout
+    (DASHBOARD_SECTION_TIMEOUT_SECONDS). Campos ausentes na resposta = seção não
+    solicitada; null = seção falhou ou estourou o timeout.
+    Tempo de cada seção no header Server-Timing (ex.: metrics;dur=42.1).
     """
     requested = set(sections.split(",")) if sections else set()
-    result: dict = {}
-
-    dashboard_svc = DashboardService(db)
-
-    if "metrics" in requested:
-        result["metrics"] = dashboard_svc.get_metrics(user_id, year, month, ytd_month)
-
-    if "chart" in requested:
-        result["chart"] = dashboard_svc.get_chart_data(user_id, year, month)
-
-    if "chart-yearly" in requested:
-        current_year = datetime.now().year
-        years = [current_year - 2, current_year - 1, current_year]
-        result["chart_yearly"] = dashboard_svc.get_chart_data_yearly(user_id, years, ytd_month)
-
-    if "income-sources" in requested:
-        result["income_sources"] = dashboard_svc.get_income_sources(user_id, year, month)
+    nomes = [nome for nome in SUMMARY_SECTIONS if nome in requested]
 
-    if "budget-vs-actual" in requested:
-        result["budget_vs_actual"] = dashboard_svc.get_budget_vs_actual(user_id, year, month)
+    inicio = time.perf_counter()
+    resultados = await asyncio.gather(*(
+        _secao_com_timeout(nome, SUMMARY_SECTIONS[nome][1], user_id, year, month, ytd_month)
+        for nome in nomes
+    ))
+    total_ms = (time.perf_counter() - inicio) * 1000
 
-    if "credit-cards" in requested:
-        result["credit_cards"] = dashboard_svc.get_credit_card_expenses(user_id, year, month)
-
-    if "orcamento-investimentos" in requested:
-        result["orcamento_investimentos"] = dashboard_svc.get_orcamento_investimentos(
-            user_id, year, month, ytd_month
-        )
-
-    if "cashflow-mes" in requested:
-        try:
-            plano_svc = PlanoService(db)
-            cashflow = plano_svc.get_cashflow(user_id, year)
-            meses = cashflow.get("meses", []) if isinstance(cashflow, dict) else []
-            mes_ref = f"{year}-{str(month).zfill(2)}"
-            result["cashflow_mes"] = next(
-                (m for m in meses if m.get("mes_referencia") == mes_ref), None
-            )
-        except Exception:
-            result["cashflow_mes"] = None
-
-    if "aporte-mes" in requested:
-        try:
-            inv_svc = InvestimentoService(db)
-            aporte = inv_svc.get_aporte_principal_por_mes(user_id, year, month)
-            result["aporte_mes"] = {"aporte": aporte or 0}
-        except Exception:
-            result["aporte_mes"] = {"aporte": 0}
+    result: dict = {}
+    timings = []
+    for nome, (valor, duracao_ms, falha) in zip(nomes, resultados):
+        result[SUMMARY_SECTIONS[nome][0]] = valor
+        timing = f"{nome};dur={duracao_ms:.1f}"
+        if falha:
+            timing += f';desc="{falha}"'
+        timings.append(timing)
+    timings.append(f"total;dur={total_ms:.1f}")
+    response.headers["Server-Timing"] = ", ".join(timings)
 
     return result
-
@@ -4,7 +4,7 @@ Lógica de negócio para dashboard
 """
 from typing import Optional, List
 from sqlalchemy.orm import Session
-from datetime import datetime
+from datetime import date, datetime
 
 from .repository import DashboardRepository
 from .schemas import (
@@ -55,6 +55,11 @@ class DashboardService:
         chart_points = [ChartDataPoint(**point) for point in data]
         return ChartDataResponse(data=chart_points)
     
+    def get_chart_data_daily(self, user_id: int, data_inicio: date, data_fim: date) -> ChartDataResponse:
+        """Retorna dados para gráfico diário (receitas vs despesas por dia)"""
+        data = self.repository.get_chart_data_daily(user_id, data_inicio, data_fim)
+        return ChartDataResponse(data=[ChartDataPoint(**point) for point in data])
+    
     def get_chart_data_yearly(
         self,
         user_id: int,
@@ -6,6 +6,7 @@ from typing import List, Optional
 from sqlalchemy.orm import Session
 from fastapi import HTTPException
 
+from app.core.cache import bump_data_version
 from .repository import GrupoRepository
 from .schemas import GrupoCreate, GrupoUpdate, GrupoResponse, GrupoListResponse
 from .models import BaseGruposConfig
@@ -57,6 +58,7 @@ class GrupoService:
             )
         
         grupo = self.repository.create(user_id, grupo_data)
+        bump_data_version(user_id)
         return GrupoResponse.model_validate(grupo)
 
     def update_grupo(self, user_id: int, grupo_id: int, grupo_data: GrupoUpdate) -> GrupoResponse:
@@ -94,6 +96,7 @@ class GrupoService:
                 )
         
         grupo = self.repository.update(user_id, grupo_id, grupo_data)
+        bump_data_version(user_id)
         return GrupoResponse.model_validate(grupo)
 
     def delete_grupo(self, user_id: int, grupo_id: int) -> dict:
@@ -115,6 +118,7 @@ class GrupoService:
         if not success:
             raise HTTPException(status_code=500, detail="Erro ao excluir grupo")
         
+        bump_data_version(user_id)
         return {"message": f"Grupo '{existing.nome_grupo}' excluído com sucesso"}
     
     def get_opcoes(self) -> dict:
@@ -9,6 +9,7 @@ from decimal import Decimal
 from calendar import monthrange
 from sqlalchemy.orm import Session
 
+from app.core.cache import bump_data_version
 from .repository import InvestimentoRepository
 
 
@@ -91,13 +92,16 @@ class InvestimentoService:
             )
             self.repository.create_historico(hist)
 
+        bump_data_version(data.user_id)
         return schemas.InvestimentoPortfolioResponse.model_validate(investimento)
 
     def copiar_mes_anterior(
         self, user_id: int, anomes_destino: int
     ) -> int:
         """Copia investimentos do mês anterior para o mês destino. Retorna quantidade copiada."""
-        return self.repository.copiar_mes_anterior(user_id, anomes_destino)
+        copiados = self.repository.copiar_mes_anterior(user_id, anomes_destino)
+        bump_data_version(user_id)
+        return copiados
 
     def get_investimento(
         self,
@@ -197,11 +201,14 @@ class InvestimentoService:
             setattr(investimento, field, value)
 
         investimento = self.repository.update(investimento)
+        bump_data_version(user_id)
         return schemas.InvestimentoPortfolioResponse.model_validate(investimento)
 
     def delete_investimento(self, investimento_id: int, user_id: int) -> bool:
         """Deleta investimento (soft delete)"""
-        return self.repository.delete(investimento_id, user_id)
+        deletado = self.repository.delete(investimento_id, user_id)
+        bump_data_version(user_id)
+        return deletado
 
     # ============================================================================
     # PORTFOLIO ANALYTICS
@@ -272,6 +279,11 @@ class InvestimentoService:
         """Adiciona registro de histórico"""
         historico = InvestimentoHistorico(**data.model_dump())
         historico = self.repository.create_historico(historico)
+        bump_data_version(
+            self.db.query(InvestimentoPortfolio.user_id)
+            .filter(InvestimentoPortfolio.id == historico.investimento_id)
+            .scalar()
+        )
 
         return schemas.InvestimentoHistoricoResponse.model_validate(historico)
 
@@ -330,6 +342,7 @@ class InvestimentoService:
             historico.valor_total = Decimal(str(vt)) if vt is not None else None
 
         historico = self.repository.update_historico(historico)
+        bump_data_version(user_id)
         return schemas.InvestimentoHistoricoResponse.model_validate(historico)
 
     def delete_historico_mes(
@@ -339,9 +352,11 @@ class InvestimentoService:
         investimento = self.repository.get_by_id(investimento_id, user_id)
         if not investimento:
             return False
-        return self.repository.delete_historico_by_investimento_and_anomes(
+        removido = self.repository.delete_historico_by_investimento_and_anomes(
             investimento_id, anomes
         )
+        bump_data_version(user_id)
+        return removido
 
     # ============================================================================
     # CENARIOS & SIMULACAO
@@ -685,6 +700,7 @@ class InvestimentoService:
         """Cria ou atualiza planejamento mensal"""
         planejamento = InvestimentoPlanejamento(**data.model_dump())
         planejamento = self.repository.upsert_planejamento(planejamento)
+        bump_data_version(planejamento.user_id)
 
         return schemas.InvestimentoPlanejamentoResponse.model_validate(planejamento)
 
@@ -0,0 +1,21 @@
+"""
+Domínio Jobs
+Fila persistente de jobs em background
+"""
+from .models import BackgroundJob
+from .schemas import JobResponse, JobListResponse
+from .service import JobService, JobRunner, enqueue_job, register_job_handler
+from .repository import JobRepository
+from .router import router
+
+__all__ = [
+    "BackgroundJob",
+    "JobResponse",
+    "JobListResponse",
+    "JobService",
+    "JobRunner",
+    "enqueue_job",
+    "register_job_handler",
+    "JobRepository",
+    "router",
+]
@@ -0,0 +1,55 @@
+"""
+Domínio Jobs - Models
+Fila persistente de jobs em background (fases pós-confirmação do upload, etc.)
+"""
+from sqlalchemy import Column, Integer, String, DateTime, Text, ForeignKey, JSON, Index, text
+from sqlalchemy.sql import func
+
+from app.core.database import Base
+
+
+class BackgroundJob(Base):
+    """
+    Job em background persistido no PostgreSQL.
+
+    Ciclo de vida: pending → running → success | error
+    - pending: aguardando run_after (debounce/backoff); no máximo 1 por (user_id, job_type)
+      — enqueues seguidos do mesmo usuário são mesclados (coalescing)
+    - running: reivindicado por um worker (locked_by/locked_at); lock expirado volta para pending
+    - error: esgotou max_attempts (last_error guarda a última falha)
+    """
+    __tablename__ = "background_jobs"
+    __table_args__ = (
+        Index("idx_background_jobs_status_run_after", "status", "run_after"),
+        Index("idx_background_jobs_user_type_status", "user_id", "job_type", "status"),
+        Index(
+            "uq_background_jobs_user_type_pending",
+            "user_id", "job_type",
+            unique=True,
+            postgresql_where=text("status = 'pending'"),
+            sqlite_where=text("status = 'pending'"),
+        ),
+    )
+
+    id = Column(Integer, primary_key=True, index=True)
+    user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), nullable=False, index=True)
+    job_type = Column(String(50), nullable=False)           # ex: 'upload_post_confirm'
+    payload = Column(JSON, nullable=True)                   # ex: {"upload_history_ids": [12, 13]}
+    status = Column(String(20), nullable=False, default="pending")  # pending | running | success | error
+
+    attempts = Column(Integer, nullable=False, default=0)
+    max_attempts = Column(Integer, nullable=False, default=3)
+    run_after = Column(DateTime, nullable=False, server_default=func.now())
+
+    locked_at = Column(DateTime, nullable=True)
+    locked_by = Column(String(100), nullable=True)         # host:pid:thread do worker
+
+    result = Column(JSON, nullable=True)
+    last_error = Column(Text, nullable=True)
+
+    created_at = Column(DateTime, server_default=func.now())
+    updated_at = Column(DateTime, server_default=func.now(), onupdate=func.now())
+    finished_at = Column(DateTime, nullable=True)
+
+    def __repr__(self):
+        return f"<BackgroundJob(id={self.id}, user_id={self.user_id}, type={self.job_type}, status={self.status})>"
@@ -0,0 +1,97 @@
+"""
+Domínio Jobs - Repository
+Queries da fila — claim com FOR UPDATE SKIP LOCKED (vários workers/uvicorn em paralelo)
+
+`agora` é o relógio da fila vindo do service (now() do banco — ver service._agora).
+"""
+from datetime import timedelta
+from typing import List, Optional
+
+from sqlalchemy import exists, select, update
+from sqlalchemy.orm import Session, aliased
+
+from .models import BackgroundJob
+
+
+class JobRepository:
+    """Repository para background_jobs"""
+
+    def __init__(self, db: Session):
+        self.db = db
+
+    def get_by_id(self, job_id: int, user_id: int) -> Optional[BackgroundJob]:
+        return self.db.query(BackgroundJob).filter(
+            BackgroundJob.id == job_id,
+            BackgroundJob.user_id == user_id,
+        ).first()
+
+    def list_by_user(
+        self,
+        user_id: int,
+        limit: int = 20,
+        status: Optional[str] = None,
+        job_type: Optional[str] = None,
+    ) -> List[BackgroundJob]:
+        query = self.db.query(BackgroundJob).filter(BackgroundJob.user_id == user_id)
+        if status:
+            query = query.filter(BackgroundJob.status == status)
+        if job_type:
+            query = query.filter(BackgroundJob.job_type == job_type)
+        return query.order_by(BackgroundJob.id.desc()).limit(limit).all()
+
+    def get_pending_for_update(self, user_id: int, job_type: str) -> Optional[BackgroundJob]:
+        """Job pendente do usuário (no máximo 1 — índice único parcial), com lock de linha."""
+        return self.db.query(BackgroundJob).filter(
+            BackgroundJob.user_id == user_id,
+            BackgroundJob.job_type == job_type,
+            BackgroundJob.status == "pending",
+        ).with_for_update().first()
+
+    def claim_next(self, worker_id: str, agora) -> Optional[int]:
+        """
+        Reivindica o próximo job pronto (run_after <= agora) e marca como running.
+
+        Nunca reivindica job de um (user_id, job_type) que já tem outro running —
+        garante execução serial por usuário (sem rebuilds sobrepostos).
+        Retorna o id do job ou None.
+        """
+        j = aliased(BackgroundJob, name="j")
+        r = aliased(BackgroundJob, name="r")
+        proximo = (
+            select(j.id)
+            .where(
+                j.status == "pending",
+                j.run_after <= agora,
+                ~exists().where(
+                    r.user_id == j.user_id,
+                    r.job_type == j.job_type,
+                    r.status == "running",
+                ),
+            )
+            .order_by(j.run_after, j.id)
+            .limit(1)
+            .with_for_update(skip_locked=True)
+            .scalar_subquery()
+        )
+        row = self.db.execute(
+            update(BackgroundJob)
+            .where(BackgroundJob.id == proximo)
+            .values(
+                status="running",
+                locked_at=agora,
+                locked_by=worker_id,
+                attempts=BackgroundJob.attempts + 1,
+                updated_at=agora,
+            )
+            .returning(BackgroundJob.id)
+            .execution_options(synchronize_session=False)
+        ).fetchone()
+        self.db.commit()
+        return row[0] if row else None
+
+    def get_stale_running_for_update(self, lock_timeout_seconds: int, agora) -> List[BackgroundJob]:
+        """Jobs running com lock expirado (worker morreu/reiniciou no meio da execução)."""
+        return self.db.query(BackgroundJob).filter(
+            BackgroundJob.status == "running",
+            BackgroundJob.locked_at < agora - timedelta(seconds=lock_timeout_seconds),
+        ).with_for_update(skip_locked=True).all()
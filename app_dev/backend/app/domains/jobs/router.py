@@ -0,0 +1,38 @@
+"""
+Domínio Jobs - Router
+Polling de status dos jobs em background (ex: fases 5/6/7 pós-confirmação do upload)
+"""
+from typing import Optional
+from fastapi import APIRouter, Depends, Query
+from sqlalchemy.orm import Session
+
+from app.core.database import get_db
+from app.shared.dependencies import get_current_user_id
+from .schemas import JobResponse, JobListResponse
+from .service import JobService
+
+router = APIRouter(prefix="/jobs", tags=["jobs"])
+
+
+@router.get("", response_model=JobListResponse)
+def list_jobs(
+    limit: int = Query(20, ge=1, le=100),
+    status: Optional[str] = Query(None, description="pending | running | success | error"),
+    job_type: Optional[str] = Query(None, description="ex: upload_post_confirm"),
+    user_id: int = Depends(get_current_user_id),
+    db: Session = Depends(get_db),
+):
+    """Lista jobs recentes do usuário (mais novos primeiro)"""
+    service = JobService(db)
+    return service.list_jobs(user_id, limit, status=status, job_type=job_type)
+
+
+@router.get("/{job_id}", response_model=JobResponse)
+def get_job(
+    job_id: int,
+    user_id: int = Depends(get_current_user_id),
+    db: Session = Depends(get_db),
+):
+    """Status de um job (pending/running/success/error) — frontend faz polling após confirmar upload"""
+    service = JobService(db)
+    return service.get_job(job_id, user_id)
@@ -0,0 +1,32 @@
+"""
+Domínio Jobs - Schemas
+"""
+from pydantic import BaseModel
+from typing import Optional, List, Any
+from datetime import datetime
+
+
+class JobResponse(BaseModel):
+    """Status de um job em background (polling do frontend)"""
+    id: int
+    job_type: str
+    status: str
+    attempts: int
+    max_attempts: int
+    payload: Optional[Any] = None
+    result: Optional[Any] = None
+    last_error: Optional[str] = None
+    run_after: Optional[datetime] = None
+    created_at: Optional[datetime] = None
+    updated_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
+
+    class Config:
+        from_attributes = True
+
+
+class JobListResponse(BaseModel):
+    """Lista de jobs do usuário"""
+    success: bool
+    total: int
+    jobs: List[JobResponse]
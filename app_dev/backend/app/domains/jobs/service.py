@@ -0,0 +1,313 @@
+"""
+Domínio Jobs - Service
+Fila persistente (PostgreSQL) com coalescing por usuário, workers limitados e retries.
+
+Uso:
+    from app.domains.jobs.service import register_job_handler, enqueue_job
+
+    @register_job_handler("upload_post_confirm")
+    def run_post_confirm(db, user_id, payload) -> dict:
+        ...
+
+    job = enqueue_job(db, user_id, "upload_post_confirm", {"upload_history_ids": [42]})
+
+Coalescing: enquanto existe job 'pending' do mesmo (user_id, job_type), novos enqueues
+mesclam o payload nele (listas viram união) e empurram run_after pelo debounce —
+uma rajada de confirmações vira UMA execução.
+
+Workers: JobRunner sobe JOB_WORKERS threads por processo uvicorn no startup. O claim usa
+FOR UPDATE SKIP LOCKED, então vários processos dividem a fila sem duplicar execução, e
+nunca há dois jobs 'running' do mesmo (user_id, job_type).
+"""
+import logging
+import os
+import socket
+import threading
+from datetime import timedelta
+from typing import Callable, Dict, List, Optional
+
+from fastapi import HTTPException, status
+from sqlalchemy import func
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from .models import BackgroundJob
+from .repository import JobRepository
+from .schemas import JobResponse, JobListResponse
+
+logger = logging.getLogger(__name__)
+
+JobHandler = Callable[[Session, int, dict], Optional[dict]]
+
+# Registry job_type → handler(db, user_id, payload) -> result dict
+JOB_HANDLERS: Dict[str, JobHandler] = {}
+
+
+def register_job_handler(job_type: str):
+    """Decorator que registra o handler de um job_type."""
+    def decorator(func_handler: JobHandler) -> JobHandler:
+        JOB_HANDLERS[job_type] = func_handler
+        return func_handler
+    return decorator
+
+
+def _agora():
+    """Relógio da fila: now() do banco — o mesmo para todos os processos/workers."""
+    return func.now()
+
+
+def _merge_payload(atual: Optional[dict], novo: Optional[dict]) -> dict:
+    """Mescla payloads de jobs coalescidos: listas → união (ordem preservada), demais → último vence."""
+    merged = dict(atual or {})
+    for key, value in (novo or {}).items():
+        if isinstance(value, list) and isinstance(merged.get(key), list):
+            merged[key] = merged[key] + [v for v in value if v not in merged[key]]
+        else:
+            merged[key] = value
+    return merged
+
+
+def enqueue_job(
+    db: Session,
+    user_id: int,
+    job_type: str,
+    payload: Optional[dict] = None,
+    debounce_seconds: Optional[float] = None,
+) -> BackgroundJob:
+    """
+    Enfileira job (ou mescla no pendente do mesmo usuário) e faz commit.
+
+    Args:
+        debounce_seconds: atraso antes de executar (default JOB_DEBOUNCE_SECONDS);
+                          cada novo enqueue coalescido reinicia a janela
+    """
+    if debounce_seconds is None:
+        debounce_seconds = settings.JOB_DEBOUNCE_SECONDS
+    run_after = _agora() + timedelta(seconds=debounce_seconds)
+    repository = JobRepository(db)
+
+    for tentativa in range(2):
+        pendente = repository.get_pending_for_update(user_id, job_type)
+        if pendente:
+            pendente.payload = _merge_payload(pendente.payload, payload)
+            pendente.run_after = run_after
+            db.commit()
+            db.refresh(pendente)
+            logger.info(f"🔗 Job {pendente.id} ({job_type}) coalescido para user {user_id}: {pendente.payload}")
+            return pendente
+
+        job = BackgroundJob(
+            user_id=user_id,
+            job_type=job_type,
+            payload=payload or {},
+            status="pending",
+            attempts=0,
+            max_attempts=settings.JOB_MAX_ATTEMPTS,
+            run_after=run_after,
+        )
+        db.add(job)
+        try:
+            db.commit()
+        except IntegrityError:
+            # Corrida com outro enqueue: índice único parcial garante 1 pending → mesclar nele
+            db.rollback()
+            if tentativa == 0:
+                continue
+            raise
+        db.refresh(job)
+        logger.info(f"📥 Job {job.id} ({job_type}) enfileirado para user {user_id}")
+        return job
+
+
+def _execute_job(job_id: int, worker_id: str) -> None:
+    """Executa um job já reivindicado (status=running) numa sessão própria."""
+    from app.core.database import SessionLocal
+
+    db = SessionLocal()
+    try:
+        job = db.query(BackgroundJob).filter(BackgroundJob.id == job_id).first()
+        if not job:
+            return
+        handler = JOB_HANDLERS.get(job.job_type)
+        user_id, payload = job.user_id, dict(job.payload or {})
+
+        try:
+            if not handler:
+                raise RuntimeError(f"Handler não registrado para job_type='{job.job_type}'")
+            logger.info(f"▶️ [{worker_id}] Job {job_id} ({job.job_type}) user {user_id} tentativa {job.attempts}")
+            result = handler(db, user_id, payload)
+        except Exception as e:
+            db.rollback()
+            job = db.query(BackgroundJob).filter(BackgroundJob.id == job_id).first()
+            job.last_error = str(e)[:2000]
+            job.locked_at = None
+            job.locked_by = None
+            if handler and job.attempts < job.max_attempts:
+                backoff = settings.JOB_RETRY_BACKOFF_SECONDS * (2 ** (job.attempts - 1))
+                job.status = "pending"
+                job.run_after = _agora() + timedelta(seconds=backoff)
+                logger.warning(f"⚠️ Job {job_id} falhou (tentativa {job.attempts}), retry em {backoff:.0f}s: {e}")
+            else:
+                job.status = "error"
+                job.finished_at = _agora()
+                logger.error(f"❌ Job {job_id} falhou definitivamente após {job.attempts} tentativas: {e}")
+            try:
+                db.commit()
+            except IntegrityError:
+                # Já existe outro pending do mesmo usuário: mescla o payload nele e encerra este
+                db.rollback()
+                enqueue_job(db, user_id, job.job_type, payload, debounce_seconds=0)
+                job = db.query(BackgroundJob).filter(BackgroundJob.id == job_id).first()
+                job.status = "error"
+                job.last_error = f"{str(e)[:1900]} (retry mesclado em job pendente)"
+                job.finished_at = _agora()
+                db.commit()
+            return
+
+        job.status = "success"
+        job.result = result or {}
+        job.last_error = None
+        job.finished_at = _agora()
+        db.commit()
+        logger.info(f"✅ [{worker_id}] Job {job_id} concluído: {result}")
+    finally:
+        db.close()
+
+
+def requeue_stale_jobs(db: Session) -> int:
+    """
+    Devolve para a fila jobs 'running' com lock expirado (worker reiniciado/morto).
+    Se já houver outro pending do mesmo usuário, o payload é mesclado nele.
+    """
+    repository = JobRepository(db)
+    stale = repository.get_stale_running_for_update(settings.JOB_LOCK_TIMEOUT_SECONDS, _agora())
+    if not stale:
+        db.rollback()
+        return 0
+
+    for job in stale:
+        job.locked_at = None
+        job.locked_by = None
+        if job.attempts >= job.max_attempts:
+            job.status = "error"
+            job.last_error = "Lock expirado (worker interrompido) e tentativas esgotadas"
+            job.finished_at = _agora()
+            continue
+        pendente = db.query(BackgroundJob).filter(
+            BackgroundJob.user_id == job.user_id,
+            BackgroundJob.job_type == job.job_type,
+            BackgroundJob.status == "pending",
+        ).first()
+        if pendente:
+            pendente.payload = _merge_payload(pendente.payload, job.payload)
+            job.status = "error"
+            job.last_error = f"Lock expirado; payload mesclado no job {pendente.id}"
+            job.finished_at = _agora()
+        else:
+            job.status = "pending"
+            job.run_after = _agora()
+        logger.warning(f"♻️ Job {job.id} ({job.job_type}) com lock expirado → {job.status}")
+    db.commit()
+    return len(stale)
+
+
+class JobRunner:
+    """
+    Workers em threads que consomem background_jobs.
+    Um runner por processo uvicorn; limite de concorrência = JOB_WORKERS.
+    """
+
+    def __init__(self, workers: int, poll_interval: float):
+        self.workers = max(1, workers)
+        self.poll_interval = poll_interval
+        self._stop = threading.Event()
+        self._threads: List[threading.Thread] = []
+
+    def start(self) -> None:
+        for i in range(self.workers):
+            t = threading.Thread(target=self._loop, args=(i,), name=f"job-worker-{i}", daemon=True)
+            t.start()
+            self._threads.append(t)
+        logger.info(f"🧵 JobRunner iniciado: {self.workers} workers (poll {self.poll_interval}s)")
+
+    def stop(self, timeout: float = 5.0) -> None:
+        self._stop.set()
+        for t in self._threads:
+            t.join(timeout=timeout)
+        self._threads = []
+
+    def _loop(self, index: int) -> None:
+        from app.core.database import SessionLocal
+
+        worker_id = f"{socket.gethostname()}:{os.getpid()}:{index}"
+        while not self._stop.is_set():
+            job_id = None
+            db = SessionLocal()
+            try:
+                if index == 0:
+                    requeue_stale_jobs(db)
+                job_id = JobRepository(db).claim_next(worker_id, _agora())
+            except Exception as e:
+                db.rollback()
+                logger.warning(f"⚠️ [{worker_id}] Erro ao buscar job: {e}")
+            finally:
+                db.close()
+
+            if job_id is None:
+                self._stop.wait(self.poll_interval)
+                continue
+            try:
+                _execute_job(job_id, worker_id)
+            except Exception as e:
+                logger.error(f"❌ [{worker_id}] Erro inesperado no job {job_id}: {e}", exc_info=True)
+
+
+_runner: Optional[JobRunner] = None
+
+
+def start_job_runner() -> None:
+    """Sobe o JobRunner do processo (idempotente). Desligável via JOB_RUNNER_ENABLED=false."""
+    global _runner
+    if not settings.JOB_RUNNER_ENABLED or _runner is not None:
+        return
+    _runner = JobRunner(settings.JOB_WORKERS, settings.JOB_POLL_INTERVAL_SECONDS)
+    _runner.start()
+
+
+def stop_job_runner() -> None:
+    """Para o JobRunner do processo (jobs em execução terminam ou expiram o lock)."""
+    global _runner
+    if _runner is not None:
+        _runner.stop()
+        _runner = None
+
+
+class JobService:
+    """Service de consulta de jobs (endpoint de polling)"""
+
+    def __init__(self, db: Session):
+        self.repository = JobRepository(db)
+
+    def get_job(self, job_id: int, user_id: int) -> JobResponse:
+        job = self.repository.get_by_id(job_id, user_id)
+        if not job:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail={"errorCode": "JOB_001", "error": "Job não encontrado"}
+            )
+        return JobResponse.model_validate(job)
+
+    def list_jobs(
+        self,
+        user_id: int,
+        limit: int = 20,
+        status: Optional[str] = None,
+        job_type: Optional[str] = None,
+    ) -> JobListResponse:
+        jobs = self.repository.list_by_user(user_id, limit, status=status, job_type=job_type)
+        return JobListResponse(
+            success=True,
+            total=len(jobs),
+            jobs=[JobResponse.model_validate(j) for j in jobs],
+        )
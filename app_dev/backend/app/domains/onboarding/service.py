@@ -1,11 +1,12 @@
 """Service do domínio Onboarding"""
 import logging
-from datetime import datetime
+from datetime import date, datetime
 from sqlalchemy.orm import Session
 from sqlalchemy import func
 
 from .schemas import OnboardingProgressResponse
 from .demo_seed import DEMO_SEED, GRUPO_FALLBACK
+from app.core.cache import bump_data_version
 from app.core.redis_client import redis_get, redis_set, redis_delete
 
 logger = logging.getLogger(__name__)
@@ -96,8 +97,11 @@ class OnboardingService:
         Retorna quantidade de transações criadas.
         """
         from app.domains.transactions.models import JournalEntry
+        from app.domains.transactions.rollup import refresh_journal_rollup
         from app.domains.grupos.models import BaseGruposConfig
         from app.shared.utils.hasher import generate_id_transacao
+        from app.shared.utils.normalizer import normalizar_estabelecimento
+        from app.domains.upload.processors.pattern_generator import chave_padrao
 
         # Mapear grupo -> (tipo_gasto, categoria_geral) do usuário
         grupos_rows = (
@@ -120,6 +124,7 @@ class OnboardingService:
             tipo_tx = "CREDITO" if valor >= 0 else "DEBITO"
             dia = 5 + (criadas % 20)
             data_str = f"{dia:02d}/{mes:02d}/{ano}"
+            data_transacao = date(ano, mes, dia)
             mes_fatura = f"{ano}{mes:02d}"
 
             chave = (data_str, estab, valor)
@@ -130,7 +135,10 @@ class OnboardingService:
             entry = JournalEntry(
                 user_id=user_id,
                 Data=data_str,
+                data_transacao=data_transacao,
                 Estabelecimento=estab,
+                EstabelecimentoNorm=normalizar_estabelecimento(estab),
+                ChavePadrao=chave_padrao(estab, valor),
                 Valor=valor,
                 ValorPositivo=valor_pos,
                 TipoTransacao=tipo_tx,
@@ -150,18 +158,23 @@ class OnboardingService:
             self.db.add(entry)
             criadas += 1
 
+        refresh_journal_rollup(self.db, user_id)
         self.db.commit()
+        bump_data_version(user_id)
         logger.info("Modo demo: %d transações criadas para user_id=%s", criadas, user_id)
         return criadas
 
     def limpar_dados_demo(self, user_id: int) -> int:
         """Remove todas as transações demo do usuário. Retorna quantidade removida."""
         from app.domains.transactions.models import JournalEntry
+        from app.domains.transactions.rollup import refresh_journal_rollup
 
         result = self.db.query(JournalEntry).filter(
             JournalEntry.user_id == user_id,
             JournalEntry.fonte == "demo",
         ).delete()
+        refresh_journal_rollup(self.db, user_id)
         self.db.commit()
+        bump_data_version(user_id)
         logger.info("Modo demo: %d transações removidas para user_id=%s", result, user_id)
         return result
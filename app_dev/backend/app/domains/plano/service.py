@@ -302,7 +302,7 @@ class PlanoService:
         reajuste_ano_num = int(profile.reajuste_ano or ano) if profile else ano
 
         from app.domains.budget.models import BudgetPlanning
-        from app.domains.transactions.models import JournalEntry
+        from app.domains.transactions.models import JournalMonthlyRollup as R
         from app.domains.grupos.models import BaseGruposConfig
 
         # Pré-carrega extraordinários do ano inteiro UMA vez (evita N+1 queries)
@@ -316,6 +316,46 @@ class PlanoService:
         n_anos_gastos = max(0, ano - reajuste_ano_num) if crescimento_gastos_pct > 0 else 0
         fator_gastos = (1 + crescimento_gastos_pct / 100) ** n_anos_gastos
 
+        meses_ref = [f"{ano}-{str(m).zfill(2)}" for m in range(1, 13)]
+        meses_fatura = [f"{ano}{str(m).zfill(2)}" for m in range(1, 13)]
+
+        # Realizados do ano em UMA query no rollup mensal (só IgnorarDashboard = 0):
+        # soma por (MesFatura, CategoriaGeral)
+        realizados_rows = (
+            self.db.query(
+                R.MesFatura,
+                R.CategoriaGeral,
+                func.sum(R.soma_valor),
+            )
+            .filter(
+                R.user_id == user_id,
+                R.MesFatura.in_(meses_fatura),
+                R.CategoriaGeral.in_(["Receita", "Investimentos", "Despesa"]),
+            )
+            .group_by(R.MesFatura, R.CategoriaGeral)
+            .all()
+        )
+        realizados = {(mes_fatura, categoria): total for mes_fatura, categoria, total in realizados_rows}
+
+        # Gastos recorrentes planejados do ano em UMA query: soma por mes_referencia
+        planejados_rows = (
+            self.db.query(BudgetPlanning.mes_referencia, func.sum(BudgetPlanning.valor_planejado))
+            .join(
+                BaseGruposConfig,
+                (BudgetPlanning.user_id == BaseGruposConfig.user_id)
+                & (BudgetPlanning.grupo == BaseGruposConfig.nome_grupo),
+            )
+            .filter(
+                BudgetPlanning.user_id == user_id,
+                BudgetPlanning.mes_referencia.in_(meses_ref),
+                BudgetPlanning.ativo == True,
+                BaseGruposConfig.categoria_geral == "Despesa",
+            )
+            .group_by(BudgetPlanning.mes_referencia)
+            .all()
+        )
+        planejados = dict(planejados_rows)
+
         meses = []
         hoje_ano = 0
         hoje_mes = 0
@@ -327,49 +367,20 @@ class PlanoService:
             pass
 
         for m in range(1, 13):
-            mes_ref = f"{ano}-{str(m).zfill(2)}"
-            mes_fatura = f"{ano}{str(m).zfill(2)}"
-
-            # ── Dados realizados ────────────────────────────────────────────────
-            renda_total = self.db.query(func.sum(JournalEntry.Valor)).filter(
-                JournalEntry.user_id == user_id,
-                JournalEntry.MesFatura == mes_fatura,
-                JournalEntry.CategoriaGeral == "Receita",
-                JournalEntry.IgnorarDashboard == 0,
-            ).scalar()
+            mes_ref = meses_ref[m - 1]
+            mes_fatura = meses_fatura[m - 1]
+
+            # ── Dados realizados (pré-agregados acima) ──────────────────────────
+            renda_total = realizados.get((mes_fatura, "Receita"))
             renda_realizada = max(0.0, float(renda_total)) if renda_total else None
 
-            inv_total = self.db.query(func.sum(JournalEntry.Valor)).filter(
-                JournalEntry.user_id == user_id,
-                JournalEntry.MesFatura == mes_fatura,
-                JournalEntry.CategoriaGeral == "Investimentos",
-                JournalEntry.IgnorarDashboard == 0,
-            ).scalar()
+            inv_total = realizados.get((mes_fatura, "Investimentos"))
             investimentos_realizados = abs(float(inv_total)) if inv_total else None
 
-            gastos_rec_raw = (
-                self.db.query(func.sum(BudgetPlanning.valor_planejado))
-                .join(
-                    BaseGruposConfig,
-                    (BudgetPlanning.user_id == BaseGruposConfig.user_id)
-                    & (BudgetPlanning.grupo == BaseGruposConfig.nome_grupo),
-                )
-                .filter(
-                    BudgetPlanning.user_id == user_id,
-                    BudgetPlanning.mes_referencia == mes_ref,
-                    BudgetPlanning.ativo == True,
-                    BaseGruposConfig.categoria_geral == "Despesa",
-                )
-                .scalar()
-            )
+            gastos_rec_raw = planejados.get(mes_ref)
             gastos_recorrentes = float(gastos_rec_raw or 0)
 
-            gastos_real = self.db.query(func.sum(JournalEntry.Valor)).filter(
-                JournalEntry.user_id == user_id,
-                JournalEntry.MesFatura == mes_fatura,
-                JournalEntry.CategoriaGeral == "Despesa",
-                JournalEntry.IgnorarDashboard == 0,
-            ).scalar()
+            gastos_real = realizados.get((mes_fatura, "Despesa"))
             gastos_realizados = abs(float(gastos_real)) if gastos_real else None
 
             # ── Renda planejada com crescimento anual ───────────────────────────
@@ -1268,40 +1279,71 @@ def invalidate_cashflow_cache(
     db.commit()
 
 
-def _compute_cashflow_mes(db: Session, user_id: int, ano: int, mes: int) -> dict:
+# Campos de cada mês do get_cashflow persistidos em plano_cashflow_mes
+CASHFLOW_MES_CAMPOS = (
+    "renda_realizada", "gastos_realizados", "investimentos_realizados",
+    "renda_esperada", "gastos_recorrentes", "extras_creditos", "extras_debitos",
+    "renda_usada", "total_gastos", "aporte_planejado", "aporte_usado",
+    "use_realizado", "status_mes",
+)
+
+
+def _nudge_acumulado(meses: list) -> float:
+    """Soma dos aportes negativos do ano (mesma lógica de PlanoService.get_cashflow)."""
+    nudge = sum(
+        (m.get("aporte_usado") or 0)
+        for m in meses
+        if isinstance(m, dict) and (m.get("aporte_usado") or 0) < 0
+    )
+    return round(nudge, 2)
+
+
+def _is_cashflow_mes_stale(row: Optional[PlanoCashflowMes]) -> bool:
+    """Linha ausente, invalidada ou mais velha que CASHFLOW_MES_TTL_HOURS."""
+    return (
+        row is None
+        or row.invalidated
+        or (datetime.now(timezone.utc) - row.computed_at.replace(tzinfo=timezone.utc))
+        > timedelta(hours=CASHFLOW_MES_TTL_HOURS)
+    )
+
+
+def _materializar_cashflow_ano(db: Session, user_id: int, ano: int) -> dict:
     """
-    Computa o cashflow de 1 mês usando PlanoService.get_cashflow e extrai
-    os campos armazenáveis na tabela materializada.
+    Computa os 12 meses UMA vez (get_cashflow) e persiste todos em plano_cashflow_mes
+    num único INSERT ... ON CONFLICT DO UPDATE (seguro com requests simultâneas).
+    Retorna o resultado completo de get_cashflow (inclui expectativas, não armazenadas).
     """
-    service = PlanoService(db)
-    resultado = service.get_cashflow(user_id, ano)
-    mes_ref = f"{ano}-{mes:02d}"
-    mes_data = next(
-        (m for m in resultado.get("meses", []) if m.get("mes_referencia") == mes_ref),
-        None,
+    resultado = PlanoService(db).get_cashflow(user_id, ano)
+    meses = resultado.get("meses", [])
+    if not meses:
+        return resultado
+
+    computed_at = datetime.now(timezone.utc)
+    valores = []
+    for mes_data in meses:
+        mes_ref = mes_data["mes_referencia"]
+        valores.append({
+            **{campo: mes_data.get(campo) for campo in CASHFLOW_MES_CAMPOS},
+            "user_id": user_id,
+            "ano": ano,
+            "mes": int(mes_ref[5:7]),
+            "mes_referencia": mes_ref,
+            "computed_at": computed_at,
+            "invalidated": False,
+        })
+
+    stmt = pg_insert(PlanoCashflowMes).values(valores)
+    update_cols = {c: stmt.excluded[c] for c in CASHFLOW_MES_CAMPOS}
+    update_cols["computed_at"] = stmt.excluded.computed_at
+    update_cols["invalidated"] = stmt.excluded.invalidated
+    stmt = stmt.on_conflict_do_update(
+        constraint="uq_plano_cashflow_mes",
+        set_=update_cols,
     )
-    if not mes_data:
-        return {}
-    return {
-        "renda_realizada":          mes_data.get("renda_realizada"),
-        "gastos_realizados":        mes_data.get("gastos_realizados"),
-        "investimentos_realizados": mes_data.get("investimentos_realizados"),
-        "renda_esperada":           mes_data.get("renda_esperada"),
-        "gastos_recorrentes":       mes_data.get("gastos_recorrentes"),
-        "extras_creditos":          mes_data.get("extras_creditos"),
-        "extras_debitos":           mes_data.get("extras_debitos"),
-        "renda_usada":              mes_data.get("renda_usada"),
-        "total_gastos":             mes_data.get("total_gastos"),
-        "aporte_planejado":         mes_data.get("aporte_planejado"),
-        "aporte_usado":             mes_data.get("aporte_usado"),
-        "use_realizado":            mes_data.get("use_realizado"),
-        "status_mes":               mes_data.get("status_mes"),
-        # Campos extras passados diretamente (não armazenados, mas incluídos no retorno)
-        "_saldo_projetado":         mes_data.get("saldo_projetado"),
-        "_gastos_usados":           mes_data.get("gastos_usados"),
-        "_gastos_extras_esperados": mes_data.get("gastos_extras_esperados"),
-        "_expectativas":            mes_data.get("expectativas", []),
-    }
+    db.execute(stmt)
+    db.commit()
+    return resultado
 
 
 def _cashflow_mes_to_dict(row: PlanoCashflowMes) -> dict:
@@ -1339,73 +1381,42 @@ def get_cashflow_mes_cached(
     """
     Retorna o cashflow de um único mês com lazy recompute.
     - Cache hit (fresh):  leitura simples na tabela plano_cashflow_mes (~5ms)
-    - Cache miss / stale: chama get_cashflow (computa 12 meses) e persiste (~300-800ms)
+    - Cache miss / stale: computa o ano inteiro e persiste os 12 meses (~300-800ms) —
+      os demais meses do ano já ficam quentes para as próximas requests
     """
-    # Busca SEM filtro de invalidated para poder fazer UPDATE em vez de INSERT
     existing = db.query(PlanoCashflowMes).filter_by(
         user_id=user_id, ano=ano, mes=mes
     ).first()
 
-    is_stale = (
-        existing is None
-        or existing.invalidated
-        or (datetime.now(timezone.utc) - existing.computed_at.replace(tzinfo=timezone.utc))
-        > timedelta(hours=CASHFLOW_MES_TTL_HOURS)
-    )
-
-    if not is_stale:
+    if not _is_cashflow_mes_stale(existing):
         return _cashflow_mes_to_dict(existing)
 
-    # ── Cache miss / invalidado / expirado: recomputar ─────────────────────
-    computed = _compute_cashflow_mes(db, user_id, ano, mes)
-    if not computed:
-        # Fallback defensivo: retorna dict vazio com shape correto
-        return {"mes_referencia": f"{ano}-{mes:02d}", "status_mes": "erro"}
-
-    # Campos persistidos (sem os prefixados com _)
-    stored = {k: v for k, v in computed.items() if not k.startswith("_")}
-
-    # Upsert atômico (PostgreSQL ON CONFLICT DO UPDATE) para evitar race condition
-    # quando múltiplas requests chegam simultaneamente com existing=None
-    upsert_values = {
-        **stored,
-        "user_id": user_id,
-        "ano": ano,
-        "mes": mes,
-        "mes_referencia": f"{ano}-{mes:02d}",
-        "computed_at": datetime.now(timezone.utc),
-        "invalidated": False,
-    }
-    stmt = pg_insert(PlanoCashflowMes).values(**upsert_values)
-    update_cols = {c: stmt.excluded[c] for c in stored.keys()}
-    update_cols["computed_at"] = stmt.excluded.computed_at
-    update_cols["invalidated"] = stmt.excluded.invalidated
-    stmt = stmt.on_conflict_do_update(
-        constraint="uq_plano_cashflow_mes",
-        set_=update_cols,
+    # ── Cache miss / invalidado / expirado: recomputar o ano ───────────────
+    resultado = _materializar_cashflow_ano(db, user_id, ano)
+    mes_ref = f"{ano}-{mes:02d}"
+    mes_data = next(
+        (m for m in resultado.get("meses", []) if m.get("mes_referencia") == mes_ref),
+        None,
     )
-    db.execute(stmt)
-    db.commit()
+    if not mes_data:
+        # Fallback defensivo: retorna dict vazio com shape correto
+        return {"mes_referencia": mes_ref, "status_mes": "erro"}
+    return mes_data
 
-    # Retornar no shape completo (inclui campos extras não persistidos)
-    return {
-        "mes_referencia":          f"{ano}-{mes:02d}",
-        "renda_esperada":          stored.get("renda_esperada"),
-        "renda_realizada":         stored.get("renda_realizada"),
-        "renda_usada":             stored.get("renda_usada"),
-        "gastos_recorrentes":      stored.get("gastos_recorrentes"),
-        "extras_creditos":         stored.get("extras_creditos"),
-        "extras_debitos":          stored.get("extras_debitos"),
-        "gastos_extras_esperados": computed.get("_gastos_extras_esperados"),
-        "gastos_realizados":       stored.get("gastos_realizados"),
-        "gastos_usados":           computed.get("_gastos_usados"),
-        "total_gastos":            stored.get("total_gastos"),
-        "aporte_planejado":        stored.get("aporte_planejado"),
-        "investimentos_realizados": stored.get("investimentos_realizados"),
-        "aporte_usado":            stored.get("aporte_usado"),
-        "saldo_projetado":         computed.get("_saldo_projetado"),
-        "use_realizado":           stored.get("use_realizado"),
-        "status_mes":              stored.get("status_mes"),
-        "grupos":                  [],
-        "expectativas":            computed.get("_expectativas", []),
-    }
\ No newline at end of file
+
+def get_cashflow_cached(db: Session, user_id: int, ano: int) -> dict:
+    """
+    Cashflow dos 12 meses servido da tabela plano_cashflow_mes.
+    - Todos os meses frescos: 1 query na tabela materializada
+    - Qualquer mês ausente/invalidado/expirado: recomputa o ano uma vez e persiste os 12
+    """
+    rows = db.query(PlanoCashflowMes).filter(
+        PlanoCashflowMes.user_id == user_id,
+        PlanoCashflowMes.ano == ano,
+    ).order_by(PlanoCashflowMes.mes).all()
+
+    if len(rows) == 12 and not any(_is_cashflow_mes_stale(r) for r in rows):
+        meses = [_cashflow_mes_to_dict(r) for r in rows]
+        return {"ano": ano, "nudge_acumulado": _nudge_acumulado(meses), "meses": meses}
+
+    return _materializar_cashflow_ano(db, user_id, ano)
@@ -2,10 +2,64 @@
 Domínio Transactions - Model
 Contém apenas o modelo JournalEntry isolado
 """
-from sqlalchemy import Column, Integer, String, Float, DateTime, ForeignKey, Index
-from sqlalchemy.orm import relationship
+from sqlalchemy import Column, Integer, String, Float, Date, DateTime, ForeignKey, Index, Text, Computed, UniqueConstraint, func
+from sqlalchemy.ext.compiler import compiles
+from sqlalchemy.orm import relationship, deferred
+from sqlalchemy.sql.functions import FunctionElement
 from app.core.database import Base
 
+# Dobra de acentos da busca — a MESMA tabela no SQL (translate) e no Python (dobrar_acentos_texto)
+ACENTOS = "áàâãäéèêëíìîïóòôõöúùûüçñ" + "áàâãäéèêëíìîïóòôõöúùûüçñ".upper()
+SEM_ACENTOS = "aaaaaeeeeiiiiooooouuuucn" * 2
+_TABELA_ACENTOS = str.maketrans(ACENTOS, SEM_ACENTOS)
+
+
+class dobrar_acentos(FunctionElement):
+    """
+    lower() + remoção de acentos em SQL.
+    PostgreSQL: translate(lower(x), ...) — IMMUTABLE, usável em coluna gerada e índice.
+    Outros dialetos (SQLite dos testes): só lower(x).
+    """
+    type = Text()
+    name = "dobrar_acentos"
+    inherit_cache = True
+
+
+@compiles(dobrar_acentos, "postgresql")
+def _dobrar_acentos_pg(element, compiler, **kw):
+    return "translate(lower(%s), '%s', '%s')" % (compiler.process(element.clauses, **kw), ACENTOS, SEM_ACENTOS)
+
+
+@compiles(dobrar_acentos)
+def _dobrar_acentos_default(element, compiler, **kw):
+    return "lower(%s)" % compiler.process(element.clauses, **kw)
+
+
+class greatest(FunctionElement):
+    """
+    Maior entre os argumentos (ex.: qtd_pagas no upsert de base_parcelas — nunca diminui).
+    PostgreSQL: greatest(a, b). SQLite dos testes: max(a, b) escalar.
+    """
+    type = Integer()
+    name = "greatest"
+    inherit_cache = True
+
+
+@compiles(greatest)
+def _greatest_default(element, compiler, **kw):
+    return "greatest(%s)" % compiler.process(element.clauses, **kw)
+
+
+@compiles(greatest, "sqlite")
+def _greatest_sqlite(element, compiler, **kw):
+    return "max(%s)" % compiler.process(element.clauses, **kw)
+
+
+def dobrar_acentos_texto(texto: str) -> str:
+    """Equivalente Python de dobrar_acentos() — aplicar ao termo antes de comparar com as colunas de busca"""
+    return (texto or "").lower().translate(_TABELA_ACENTOS)
+
+
 class JournalEntry(Base):
     """
     Modelo de transação financeira
@@ -20,6 +74,7 @@ class JournalEntry(Base):
     
     # Dados principais
     Data = Column(String)  # Formato DD/MM/YYYY
+    data_transacao = Column(Date)  # Data como DATE (consultas por intervalo de datas)
     Estabelecimento = Column(String)
     Valor = Column(Float)
     ValorPositivo = Column(Float)
@@ -38,6 +93,8 @@ class JournalEntry(Base):
     IdTransacao = Column(String, unique=True, index=True)
     IdParcela = Column(String)
     EstabelecimentoBase = Column(String)  # ✅ Estabelecimento sem parcela XX/YY
+    EstabelecimentoNorm = Column(String)  # normalizar_estabelecimento(EstabelecimentoBase or Estabelecimento)
+    ChavePadrao = Column(String)          # chave_padrao(Estabelecimento, Valor, tipodocumento) — bucket de base_padroes
     parcela_atual = Column(Integer)        # ✅ Ex: 1 (de 12)
     TotalParcelas = Column(Integer)        # ✅ Ex: 12
     
@@ -62,6 +119,17 @@ class JournalEntry(Base):
     
     # Flags
     IgnorarDashboard = Column(Integer, default=0)
+
+    # Busca (colunas geradas pelo banco — nunca escritas pela aplicação; índices GIN pg_trgm)
+    estabelecimento_busca = deferred(Column(
+        Text, Computed(dobrar_acentos(func.coalesce(Estabelecimento, '')), persisted=True)
+    ))
+    busca_texto = deferred(Column(
+        Text, Computed(dobrar_acentos(
+            func.coalesce(Estabelecimento, '') + ' ' + func.coalesce(GRUPO, '') + ' '
+            + func.coalesce(SUBGRUPO, '') + ' ' + func.coalesce(Data, '')
+        ), persisted=True)
+    ))
     
     # Relationships
     upload_history = relationship("UploadHistory", back_populates="transactions")
@@ -77,6 +145,26 @@ class JournalEntry(Base):
 
         # Cobre: WHERE user_id = ? AND IgnorarDashboard = 0 AND MesFatura = ?
         Index("idx_je_user_ignorar_mesfatura", "user_id", "IgnorarDashboard", "MesFatura"),
+
+        # Cobre: WHERE user_id = ? AND data_transacao BETWEEN ? AND ?  (listagem, gráfico diário)
+        Index("idx_je_user_data_transacao", "user_id", "data_transacao"),
+
+        # Cobre: propagação de padrão — WHERE user_id = ? AND EstabelecimentoNorm = ? AND valor na faixa
+        Index("idx_je_user_estab_norm", "user_id", "EstabelecimentoNorm", "ValorPositivo"),
+
+        # Cobre: base_padroes incremental — WHERE user_id = ? AND ChavePadrao IN (...)
+        Index("idx_je_user_chave_padrao", "user_id", "ChavePadrao"),
+
+        # Cobre: listagem por cursor (keyset) — WHERE user_id = ? AND (mes, id) < (?, ?)
+        # ORDER BY mes DESC, id DESC. coalesce: MesFatura nulo vira '' e fica no fim da lista
+        Index("idx_je_user_mesfatura_id_desc", user_id,
+              func.coalesce(MesFatura, '').desc(), id.desc()),
+
+        # Cobre: busca de transações (LIKE '%termo%' e similaridade %> via pg_trgm)
+        Index("idx_je_busca_texto_trgm", "busca_texto",
+              postgresql_using="gin", postgresql_ops={"busca_texto": "gin_trgm_ops"}),
+        Index("idx_je_estabelecimento_busca_trgm", "estabelecimento_busca",
+              postgresql_using="gin", postgresql_ops={"estabelecimento_busca": "gin_trgm_ops"}),
     )
 
 
@@ -86,6 +174,10 @@ class BaseParcelas(Base):
     Contém informações de parcelamentos
     """
     __tablename__ = "base_parcelas"
+    # 1 linha por compra parcelada do usuário — alvo do upsert em lote da fase 5 do upload
+    __table_args__ = (
+        UniqueConstraint("user_id", "id_parcela", name="uq_base_parcelas_user_id_parcela"),
+    )
     
     id = Column(Integer, primary_key=True, index=True)
     user_id = Column(Integer, index=True)
@@ -114,3 +206,49 @@ class BaseParcelas(Base):
     # Temporal
     created_at = Column(DateTime)
     updated_at = Column(DateTime)
+
+
+class JournalMonthlyRollup(Base):
+    """
+    Fato agregado de journal_entries por mês e dimensões de leitura.
+
+    Dashboard, budget e plano leem daqui: custo O(grupos × meses) em vez de O(transações).
+    Só entram transações visíveis no dashboard (IgnorarDashboard = 0).
+    Mantido por refresh_journal_rollup() nos caminhos de escrita (ver transactions/rollup.py);
+    reconstrução completa: scripts/rebuild_journal_rollup.py
+    """
+    __tablename__ = "journal_monthly_rollup"
+
+    id = Column(Integer, primary_key=True, index=True)
+    user_id = Column(Integer, nullable=False)
+
+    # Dimensões (mesmos nomes de journal_entries)
+    MesFatura = Column(String)  # YYYYMM
+    Ano = Column(Integer)
+    Mes = Column(Integer)
+    CategoriaGeral = Column(String)
+    GRUPO = Column(String)
+    SUBGRUPO = Column(String)
+    NomeCartao = Column(String)
+    TipoTransacao = Column(String)
+
+    # Medidas
+    soma_valor = Column(Float, nullable=False, default=0.0)      # SUM(Valor)
+    soma_valor_abs = Column(Float, nullable=False, default=0.0)  # SUM(ABS(Valor))
+    quantidade = Column(Integer, nullable=False, default=0)      # COUNT(*)
+
+    __table_args__ = (
+        # Cobre: WHERE user_id = ? AND MesFatura IN (...)  e o DELETE do refresh por mês
+        Index("idx_jmr_user_mesfatura", "user_id", "MesFatura"),
+        # Cobre: WHERE user_id = ? AND Ano = ? [AND Mes <= ?]  (ano inteiro / YTD)
+        Index("idx_jmr_user_ano_mes", "user_id", "Ano", "Mes"),
+        # Uma linha por combinação de dimensões (NULL = NULL): um refresh concorrente que
+        # escapasse do lock do refresh_journal_rollup falha em vez de duplicar os totais
+        Index(
+            "uq_jmr_dimensoes",
+            "user_id", "MesFatura", "Ano", "Mes", "CategoriaGeral", "GRUPO", "SUBGRUPO",
+            "NomeCartao", "TipoTransacao",
+            unique=True,
+            postgresql_nulls_not_distinct=True,
+        ),
+    )
@@ -3,11 +3,16 @@ Domínio Transactions - Repository
 Camada de acesso a dados - TODAS as queries SQL isoladas aqui
 """
 from sqlalchemy.orm import Session
-from sqlalchemy import func, or_
-from typing import Optional, List
-from .models import JournalEntry
+from sqlalchemy import func, or_, case, literal, literal_column, select, tuple_
+from typing import Optional, List, Tuple
+from app.core.config import settings
+from .models import JournalEntry, dobrar_acentos_texto
 from .schemas import TransactionFilters
 
+# Termos menores que isso (ou sem letras, ex.: "15/03") usam só substring — trigramas curtos
+# casariam quase tudo por similaridade
+BUSCA_FUZZY_MIN_CHARS = 3
+
 class TransactionRepository:
     """
     Repository pattern para transações
@@ -37,7 +42,7 @@ class TransactionRepository:
         skip: int = 0,
         limit: int = 100
     ) -> List[JournalEntry]:
-        """Lista transações com filtros. Ordenação: mais recentes primeiro."""
+        """Lista transações com filtros. Ordenação: relevância da busca (se houver), depois mais recentes."""
         query = self.db.query(JournalEntry).filter(JournalEntry.user_id == user_id)
         
         # Sprint F: período customizado (year_inicio/month_inicio até year_fim/month_fim)
@@ -56,10 +61,8 @@ class TransactionRepository:
             # Ano inteiro: filtra MesFatura começando com o ano
             query = query.filter(JournalEntry.MesFatura.like(f"{filters.year}%"))
         
-        if filters.estabelecimento:
-            query = query.filter(
-                JournalEntry.Estabelecimento.ilike(f"%{filters.estabelecimento}%")
-            )
+        query = self._aplicar_intervalo_datas(query, filters)
+        query = self._aplicar_busca(query, filters)
         
         if filters.grupo:
             query = query.filter(JournalEntry.GRUPO == filters.grupo)
@@ -86,15 +89,9 @@ class TransactionRepository:
         if filters.cartao:
             query = query.filter(JournalEntry.NomeCartao == filters.cartao)
         
+        # Com busca: relevância primeiro (substring > similaridade), depois os mais recentes
         if filters.search:
-            query = query.filter(
-                or_(
-                    JournalEntry.Estabelecimento.ilike(f"%{filters.search}%"),
-                    JournalEntry.GRUPO.ilike(f"%{filters.search}%"),
-                    JournalEntry.SUBGRUPO.ilike(f"%{filters.search}%"),
-                    JournalEntry.Data.ilike(f"%{filters.search}%")
-                )
-            )
+            query = query.order_by(self._relevancia_busca(filters.search).desc())
         
         # Sprint F: ordenação mais recentes primeiro (MesFatura DESC, id DESC)
         query = query.order_by(JournalEntry.MesFatura.desc(), JournalEntry.id.desc())
@@ -119,10 +116,8 @@ class TransactionRepository:
             query = query.filter(JournalEntry.MesFatura == mes_fatura)
         elif filters.year:
             query = query.filter(JournalEntry.MesFatura.like(f"{filters.year}%"))
-        if filters.estabelecimento:
-            query = query.filter(
-                JournalEntry.Estabelecimento.ilike(f"%{filters.estabelecimento}%")
-            )
+        query = self._aplicar_intervalo_datas(query, filters)
+        query = self._aplicar_busca(query, filters)
         if filters.grupo:
             query = query.filter(JournalEntry.GRUPO == filters.grupo)
         if getattr(filters, 'subgrupo_null', None):
@@ -142,15 +137,6 @@ class TransactionRepository:
                 query = query.filter(JournalEntry.TipoGasto == filters.tipo_gasto)
         if filters.cartao:
             query = query.filter(JournalEntry.NomeCartao == filters.cartao)
-        if filters.search:
-            query = query.filter(
-                or_(
-                    JournalEntry.Estabelecimento.ilike(f"%{filters.search}%"),
-                    JournalEntry.GRUPO.ilike(f"%{filters.search}%"),
-                    JournalEntry.SUBGRUPO.ilike(f"%{filters.search}%"),
-                    JournalEntry.Data.ilike(f"%{filters.search}%")
-                )
-            )
         
         return query.scalar()
 
@@ -158,20 +144,52 @@ class TransactionRepository:
         self,
         user_id: int,
         filters: TransactionFilters,
-        cursor_id: int,
+        apos: Optional[Tuple[Optional[str], int]] = None,
         limit: int = 50,
     ) -> List[JournalEntry]:
         """
-        Lista transações com cursor-based pagination.
-        cursor_id = id (PK integer) da última transação vista — busca registros
-        com id < cursor_id mantendo a mesma ordenação (MesFatura DESC, id DESC).
+        Lista transações com cursor-based pagination (keyset).
+        apos = (MesFatura, id) da última transação vista (None = primeira página). A condição
+        (mes, id) < (mes_cursor, id_cursor) usa a MESMA chave da ordenação (mes DESC, id DESC),
+        então nenhuma linha é pulada ou repetida entre páginas; o índice
+        idx_je_user_mesfatura_id_desc resolve cada página em O(limit), em qualquer profundidade.
         """
-        query = self.db.query(JournalEntry).filter(
+        query = self._query_filtrada(user_id, filters)
+        mes = self._ordem_mes_fatura()
+        if apos is not None:
+            mes_cursor, id_cursor = apos
+            query = query.filter(
+                tuple_(mes, JournalEntry.id) < tuple_(literal(mes_cursor or ''), literal(id_cursor))
+            )
+
+        return query.order_by(mes.desc(), JournalEntry.id.desc()).limit(limit).all()
+
+    def get_posicao_cursor(self, user_id: int, transaction_pk: int) -> Optional[Tuple[Optional[str], int]]:
+        """(MesFatura, id) de uma transação pelo id (PK) — converte cursores antigos (só id)"""
+        row = self.db.query(JournalEntry.MesFatura, JournalEntry.id).filter(
+            JournalEntry.id == transaction_pk,
             JournalEntry.user_id == user_id,
-            JournalEntry.id < cursor_id,
-        )
+        ).first()
+        return (row.MesFatura, row.id) if row else None
+
+    def estimar_total_com_filtros(self, user_id: int, filters: TransactionFilters) -> Optional[int]:
+        """
+        Total APROXIMADO (estimativa do planner via EXPLAIN, sem executar a query).
+        Só PostgreSQL; nos demais dialetos retorna None (o frontend mostra "muitas").
+        """
+        if not self._is_postgres():
+            return None
+        query = self._query_filtrada(user_id, filters).with_entities(JournalEntry.id)
+        compilado = query.statement.compile(dialect=self.db.get_bind().dialect)
+        plano = self.db.connection().exec_driver_sql(
+            "EXPLAIN (FORMAT JSON) " + str(compilado), compilado.params
+        ).scalar()
+        return int(plano[0]["Plan"]["Plan Rows"])
+
+    def _query_filtrada(self, user_id: int, filters: TransactionFilters):
+        """Query base da listagem por cursor: user_id + mesmos filtros de list_with_filters"""
+        query = self.db.query(JournalEntry).filter(JournalEntry.user_id == user_id)
 
-        # Mesmos filtros de list_with_filters
         if filters.year_inicio is not None and filters.month_inicio is not None \
                 and filters.year_fim is not None and filters.month_fim is not None:
             mes_ini = f"{filters.year_inicio}{filters.month_inicio:02d}"
@@ -186,10 +204,8 @@ class TransactionRepository:
         elif filters.year:
             query = query.filter(JournalEntry.MesFatura.like(f"{filters.year}%"))
 
-        if filters.estabelecimento:
-            query = query.filter(
-                JournalEntry.Estabelecimento.ilike(f"%{filters.estabelecimento}%")
-            )
+        query = self._aplicar_intervalo_datas(query, filters)
+        query = self._aplicar_busca(query, filters)
         if filters.grupo:
             query = query.filter(JournalEntry.GRUPO == filters.grupo)
         if getattr(filters, 'subgrupo_null', None):
@@ -209,19 +225,149 @@ class TransactionRepository:
                 query = query.filter(JournalEntry.TipoGasto == filters.tipo_gasto)
         if filters.cartao:
             query = query.filter(JournalEntry.NomeCartao == filters.cartao)
-        if filters.search:
-            query = query.filter(
-                or_(
-                    JournalEntry.Estabelecimento.ilike(f"%{filters.search}%"),
-                    JournalEntry.GRUPO.ilike(f"%{filters.search}%"),
-                    JournalEntry.SUBGRUPO.ilike(f"%{filters.search}%"),
-                    JournalEntry.Data.ilike(f"%{filters.search}%"),
-                )
+
+        return query
+
+    @staticmethod
+    def _aplicar_intervalo_datas(query, filters: TransactionFilters):
+        """data_inicio/data_fim → range em data_transacao (idx_je_user_data_transacao)"""
+        if filters.data_inicio is not None:
+            query = query.filter(JournalEntry.data_transacao >= filters.data_inicio)
+        if filters.data_fim is not None:
+            query = query.filter(JournalEntry.data_transacao <= filters.data_fim)
+        return query
+
+    @staticmethod
+    def _ordem_mes_fatura():
+        """Chave de ordenação do cursor — mesma expressão do índice idx_je_user_mesfatura_id_desc"""
+        return func.coalesce(JournalEntry.MesFatura, literal_column("''"))
+
+    # ========== PROPAGAÇÃO DE PADRÃO (EstabelecimentoNorm) ==========
+
+    def _filtro_mesmo_padrao(self, user_id: int, estab_norm: str, v_min: float, v_max: Optional[float]):
+        """
+        Mesmo estabelecimento normalizado e ValorPositivo na faixa do padrão (v_max None = sem limite).
+        Coberto por idx_je_user_estab_norm (user_id, EstabelecimentoNorm, ValorPositivo).
+        """
+        if v_max is None:
+            return [
+                JournalEntry.user_id == user_id,
+                JournalEntry.EstabelecimentoNorm == estab_norm,
+                JournalEntry.ValorPositivo >= v_min,
+            ]
+        return [
+            JournalEntry.user_id == user_id,
+            JournalEntry.EstabelecimentoNorm == estab_norm,
+            JournalEntry.ValorPositivo.between(v_min, v_max),
+        ]
+
+    def count_mesmo_padrao(
+        self,
+        user_id: int,
+        estab_norm: str,
+        v_min: float,
+        v_max: Optional[float],
+        exclude_id_transacao: Optional[str] = None,
+    ) -> int:
+        """Quantas transações seriam afetadas pela propagação do padrão (1 COUNT indexado)"""
+        query = self.db.query(func.count(JournalEntry.id)).filter(
+            *self._filtro_mesmo_padrao(user_id, estab_norm, v_min, v_max)
+        )
+        if exclude_id_transacao:
+            query = query.filter(JournalEntry.IdTransacao != exclude_id_transacao)
+        return query.scalar()
+
+    def update_mesmo_padrao(
+        self,
+        user_id: int,
+        estab_norm: str,
+        v_min: float,
+        v_max: Optional[float],
+        valores: dict,
+    ) -> int:
+        """
+        Aplica `valores` em todas as transações do padrão num único UPDATE (sem carregar linhas).
+        Não faz commit. Retorna linhas atualizadas.
+        """
+        return self.db.query(JournalEntry).filter(
+            *self._filtro_mesmo_padrao(user_id, estab_norm, v_min, v_max)
+        ).update(valores, synchronize_session=False)
+
+    def chaves_mesmo_padrao(
+        self,
+        user_id: int,
+        estab_norm: str,
+        v_min: float,
+        v_max: Optional[float],
+    ) -> set:
+        """ChavePadrao distintas das transações do padrão (buckets de base_padroes atingidos)"""
+        return {
+            chave for (chave,) in self.db.query(JournalEntry.ChavePadrao).filter(
+                *self._filtro_mesmo_padrao(user_id, estab_norm, v_min, v_max)
+            ).distinct()
+        }
+
+    # ========== BUSCA (pg_trgm) ==========
+
+    def _is_postgres(self) -> bool:
+        return self.db.get_bind().dialect.name == "postgresql"
+
+    @staticmethod
+    def _termo_busca(termo: str) -> str:
+        """Termo em minúsculas/sem acento (mesma dobra das colunas geradas)"""
+        return dobrar_acentos_texto(termo.strip())
+
+    @staticmethod
+    def _padrao_contem(termo: str) -> str:
+        """LIKE '%termo%' com curingas do usuário escapados"""
+        escapado = termo.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+        return f"%{escapado}%"
+
+    def _usa_fuzzy(self, termo: str) -> bool:
+        return (
+            self._is_postgres()
+            and len(termo) >= BUSCA_FUZZY_MIN_CHARS
+            and any(c.isalpha() for c in termo)
+        )
+
+    def _filtro_busca(self, coluna, termo_original: str):
+        """
+        Substring (LIKE '%termo%') OU palavra parecida (coluna %> termo, ex.: "ifd" → "IFOOD").
+        Ambos servidos pelo índice GIN gin_trgm_ops da coluna.
+        """
+        termo = self._termo_busca(termo_original)
+        contem = coluna.like(self._padrao_contem(termo), escape="\\")
+        if not self._usa_fuzzy(termo):
+            return contem
+        return or_(contem, coluna.op("%>")(termo))
+
+    def _aplicar_busca(self, query, filters: TransactionFilters, search: bool = True):
+        """Filtros estabelecimento / search nas colunas de busca (sem acento, indexadas)"""
+        termos = [t for t in (filters.estabelecimento, filters.search if search else None) if t and t.strip()]
+        if any(self._usa_fuzzy(self._termo_busca(t)) for t in termos):
+            # Limiar do operador %> (word_similarity) — SET LOCAL vale só para esta transação
+            self.db.execute(
+                select(func.set_config(
+                    "pg_trgm.word_similarity_threshold", str(settings.SEARCH_FUZZY_THRESHOLD), True
+                ))
             )
+        if filters.estabelecimento and filters.estabelecimento.strip():
+            query = query.filter(self._filtro_busca(JournalEntry.estabelecimento_busca, filters.estabelecimento))
+        if search and filters.search and filters.search.strip():
+            query = query.filter(self._filtro_busca(JournalEntry.busca_texto, filters.search))
+        return query
 
-        return query.order_by(
-            JournalEntry.MesFatura.desc(), JournalEntry.id.desc()
-        ).limit(limit).all()
+    def _relevancia_busca(self, termo_original: str):
+        """
+        1.0 para quem contém o termo (mantém a ordem cronológica entre eles),
+        word_similarity para os casados só por similaridade.
+        """
+        termo = self._termo_busca(termo_original)
+        coluna = JournalEntry.busca_texto
+        contem = coluna.like(self._padrao_contem(termo), escape="\\")
+        if not self._usa_fuzzy(termo):
+            return case((contem, literal(1.0)), else_=literal(0.0))
+        return case((contem, literal(1.0)), else_=func.word_similarity(termo, coluna))
 
     def create(self, transaction: JournalEntry) -> JournalEntry:
         """Cria nova transação"""
@@ -277,17 +423,7 @@ class TransactionRepository:
             )
         elif filters.subgrupo:
             query = query.filter(JournalEntry.SUBGRUPO == filters.subgrupo)
-        if filters.estabelecimento:
-            query = query.filter(JournalEntry.Estabelecimento.ilike(f"%{filters.estabelecimento}%"))
-        if filters.search:
-            query = query.filter(
-                or_(
-                    JournalEntry.Estabelecimento.ilike(f"%{filters.search}%"),
-                    JournalEntry.GRUPO.ilike(f"%{filters.search}%"),
-                    JournalEntry.SUBGRUPO.ilike(f"%{filters.search}%"),
-                    JournalEntry.Data.ilike(f"%{filters.search}%")
-                )
-            )
+        query = self._aplicar_busca(query, filters)
         if filters.cartao:
             query = query.filter(JournalEntry.NomeCartao == filters.cartao)
         
@@ -305,8 +441,7 @@ class TransactionRepository:
             JournalEntry.Valor < 0
         )
         q_max = self._apply_period_filters(q_max, filters)
-        if filters.estabelecimento:
-            q_max = q_max.filter(JournalEntry.Estabelecimento.ilike(f"%{filters.estabelecimento}%"))
+        q_max = self._aplicar_busca(q_max, filters)
         if filters.grupo:
             q_max = q_max.filter(JournalEntry.GRUPO == filters.grupo)
         if getattr(filters, 'subgrupo_null', None):
@@ -315,15 +450,6 @@ class TransactionRepository:
             q_max = q_max.filter(JournalEntry.SUBGRUPO == filters.subgrupo)
         if filters.categoria_geral:
             q_max = q_max.filter(JournalEntry.CategoriaGeral == filters.categoria_geral)
-        if filters.search:
-            q_max = q_max.filter(
-                or_(
-                    JournalEntry.Estabelecimento.ilike(f"%{filters.search}%"),
-                    JournalEntry.GRUPO.ilike(f"%{filters.search}%"),
-                    JournalEntry.SUBGRUPO.ilike(f"%{filters.search}%"),
-                    JournalEntry.Data.ilike(f"%{filters.search}%")
-                )
-            )
         maior_gasto = q_max.scalar() or 0
         
         # Dias no período (approx)
@@ -379,23 +505,13 @@ class TransactionRepository:
             JournalEntry.GRUPO != ''
         )
         query = self._apply_period_filters(query, filters)
-        if filters.estabelecimento:
-            query = query.filter(JournalEntry.Estabelecimento.ilike(f"%{filters.estabelecimento}%"))
+        query = self._aplicar_busca(query, filters, search=False)
         if filters.grupo:
             query = query.filter(JournalEntry.GRUPO == filters.grupo)
         if getattr(filters, 'subgrupo_null', None):
             query = query.filter(or_(JournalEntry.SUBGRUPO.is_(None), JournalEntry.SUBGRUPO == ''))
         elif filters.subgrupo:
             query = query.filter(JournalEntry.SUBGRUPO == filters.subgrupo)
-        if filters.search:
-            query = query.filter(
-                or_(
-                    JournalEntry.Estabelecimento.ilike(f"%{filters.search}%"),
-                    JournalEntry.GRUPO.ilike(f"%{filters.search}%"),
-                    JournalEntry.SUBGRUPO.ilike(f"%{filters.search}%"),
-                    JournalEntry.Data.ilike(f"%{filters.search}%")
-                )
-            )
         rows = query.group_by(JournalEntry.GRUPO).order_by(func.sum(func.abs(JournalEntry.Valor)).desc()).all()
         return [{"grupo": r.GRUPO, "total": float(r.total)} for r in rows]
 
@@ -411,9 +527,9 @@ class TransactionRepository:
         if filters.grupo:
             query = query.filter(JournalEntry.GRUPO == filters.grupo)
         query = self._apply_period_filters(query, filters)
-        if filters.estabelecimento:
-            query = query.filter(JournalEntry.Estabelecimento.ilike(f"%{filters.estabelecimento}%"))
+        query = self._aplicar_busca(query, filters, search=False)
         if filters.search:
+            # Drill-down de um grupo: busca só em Estabelecimento/SUBGRUPO (sem o nome do grupo)
             query = query.filter(
                 or_(
                     JournalEntry.Estabelecimento.ilike(f"%{filters.search}%"),
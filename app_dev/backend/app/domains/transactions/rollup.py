@@ -0,0 +1,129 @@
+"""
+Domínio Transactions - Rollup mensal
+Mantém journal_monthly_rollup (JournalMonthlyRollup) consistente com journal_entries.
+
+refresh_journal_rollup() recalcula, em 2 statements (DELETE + INSERT ... SELECT ... GROUP BY),
+as linhas de um usuário — todas ou só dos MesFatura informados. Não faz commit: roda na
+mesma transação do caminho de escrita que alterou journal_entries.
+
+Concorrência (PostgreSQL, READ COMMITTED): dois refreshes do mesmo usuário (edição de
+transação + job pós-confirmação, dois confirms) fariam cada DELETE não ver o INSERT do
+outro e os totais do mês dobrariam. O refresh toma pg_advisory_xact_lock por usuário
+(liberado no commit/rollback do chamador), e o índice único uq_jmr_dimensoes garante
+uma linha por combinação de dimensões.
+"""
+import logging
+from typing import Iterable, Optional, Set
+
+from sqlalchemy import func, insert, or_, select, text
+from sqlalchemy.orm import Session
+
+from app.core.cache import bump_data_version
+from .models import JournalEntry, JournalMonthlyRollup
+
+logger = logging.getLogger(__name__)
+
+# Namespace do advisory lock (pg_advisory_xact_lock(namespace, user_id))
+LOCK_NAMESPACE_ROLLUP = 4201
+
+DIMENSOES = (
+    "user_id", "MesFatura", "Ano", "Mes", "CategoriaGeral",
+    "GRUPO", "SUBGRUPO", "NomeCartao", "TipoTransacao",
+)
+
+
+def _filtro_meses(coluna, meses_fatura: Set[Optional[str]]):
+    """MesFatura IN (...), incluindo MesFatura nulo quando None está no conjunto"""
+    meses = sorted(m for m in meses_fatura if m)
+    condicoes = [coluna.in_(meses)] if meses else []
+    if None in meses_fatura or "" in meses_fatura:
+        condicoes.append(coluna.is_(None))
+        condicoes.append(coluna == "")
+    return or_(*condicoes)
+
+
+def _travar_rollup_do_usuario(db: Session, user_id: int) -> None:
+    """Serializa os refreshes do usuário até o fim da transação (no-op fora do PostgreSQL)."""
+    if db.get_bind().dialect.name != "postgresql":
+        return
+    db.execute(
+        text("SELECT pg_advisory_xact_lock(:namespace, :user_id)"),
+        {"namespace": LOCK_NAMESPACE_ROLLUP, "user_id": user_id},
+    )
+
+
+def refresh_journal_rollup(
+    db: Session,
+    user_id: int,
+    meses_fatura: Optional[Iterable[Optional[str]]] = None,
+) -> None:
+    """
+    Recalcula o rollup do usuário a partir de journal_entries.
+
+    Args:
+        db: Sessão (o chamador faz commit)
+        user_id: ID do usuário
+        meses_fatura: MesFatura (YYYYMM) afetados; None = todos os meses do usuário
+    """
+    meses = None if meses_fatura is None else set(meses_fatura)
+    if meses is not None and not meses:
+        return
+
+    db.flush()
+    _travar_rollup_do_usuario(db, user_id)
+
+    delete = db.query(JournalMonthlyRollup).filter(JournalMonthlyRollup.user_id == user_id)
+    origem = [JournalEntry.user_id == user_id, JournalEntry.IgnorarDashboard == 0]
+    if meses is not None:
+        delete = delete.filter(_filtro_meses(JournalMonthlyRollup.MesFatura, meses))
+        origem.append(_filtro_meses(JournalEntry.MesFatura, meses))
+    delete.delete(synchronize_session=False)
+
+    dimensoes = [getattr(JournalEntry, d) for d in DIMENSOES]
+    agregado = select(
+        *dimensoes,
+        func.coalesce(func.sum(JournalEntry.Valor), 0.0),
+        func.coalesce(func.sum(func.abs(JournalEntry.Valor)), 0.0),
+        func.count(),
+    ).where(*origem).group_by(*dimensoes)
+
+    db.execute(
+        insert(JournalMonthlyRollup).from_select(
+            [*DIMENSOES, "soma_valor", "soma_valor_abs", "quantidade"], agregado
+        )
+    )
+
+
+def meses_do_upload(db: Session, user_id: int, upload_history_id: int) -> Set[Optional[str]]:
+    """MesFatura distintos das transações de um upload (escopo do refresh em confirmação/exclusão)"""
+    rows = db.query(JournalEntry.MesFatura).filter(
+        JournalEntry.user_id == user_id,
+        JournalEntry.upload_history_id == upload_history_id,
+    ).distinct().all()
+    return {r[0] for r in rows}
+
+
+def rebuild_journal_rollup(db: Session, user_id: Optional[int] = None) -> int:
+    """
+    Reconstrói o rollup (um usuário ou todos): commit + invalidação de cache por usuário.
+
+    Returns:
+        Quantidade de usuários reconstruídos
+    """
+    if user_id is not None:
+        user_ids = [user_id]
+    else:
+        user_ids = [r[0] for r in db.query(JournalEntry.user_id).distinct().all() if r[0] is not None]
+        # Usuários sem transações: limpar linhas órfãs
+        orfas = db.query(JournalMonthlyRollup)
+        if user_ids:
+            orfas = orfas.filter(JournalMonthlyRollup.user_id.notin_(user_ids))
+        orfas.delete(synchronize_session=False)
+
+    for uid in user_ids:
+        refresh_journal_rollup(db, uid)
+        db.commit()
+        bump_data_version(uid)
+        logger.info("journal_monthly_rollup reconstruído para user_id=%s", uid)
+    db.commit()
+    return len(user_ids)
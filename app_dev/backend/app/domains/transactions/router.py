@@ -6,6 +6,7 @@ from fastapi import APIRouter, Depends, Query
 from pydantic import BaseModel
 from sqlalchemy.orm import Session
 from typing import Optional, List
+from datetime import date
 
 from app.core.database import get_db
 from app.shared.dependencies import get_current_user_id
@@ -128,13 +129,16 @@ def list_transactions(
     page: int = Query(1, ge=1),
     limit: int = Query(10, ge=1, le=500),
     # Cursor-based pagination (se informado, tem prioridade sobre page)
-    cursor: Optional[str] = Query(None, description="ID da última transação vista (cursor pagination)"),
+    cursor: Optional[str] = Query(None, description="next_cursor da página anterior; vazio = 1ª página (cursor pagination)"),
+    incluir_total: bool = Query(False, description="Cursor mode: devolve total_aproximado na 1ª página"),
     year: Optional[int] = None,
     month: Optional[int] = None,
     year_inicio: Optional[int] = Query(None, description="Sprint F: início do período"),
     month_inicio: Optional[int] = Query(None, ge=1, le=12),
     year_fim: Optional[int] = Query(None, description="Sprint F: fim do período"),
     month_fim: Optional[int] = Query(None, ge=1, le=12),
+    data_inicio: Optional[date] = Query(None, description="Data da transação inicial (YYYY-MM-DD, inclusiva)"),
+    data_fim: Optional[date] = Query(None, description="Data da transação final (YYYY-MM-DD, inclusiva)"),
     estabelecimento: Optional[str] = None,
     grupo: Optional[str] = None,
     subgrupo: Optional[str] = None,
@@ -152,9 +156,11 @@ def list_transactions(
 
     Suporta dois modos de paginação:
     - **Offset** (padrão): `?page=1&limit=10` — retrocompatível
-    - **Cursor** (novo): `?cursor=<id>&limit=10` — performance O(1), evita drift em inserts
+    - **Cursor** (novo): `?cursor=&limit=10` na 1ª página, depois `?cursor=<next_cursor>` —
+      keyset em (MesFatura, id): custo O(página) em qualquer profundidade, evita drift em inserts
 
     Quando `cursor` é informado, `page` é ignorado e a resposta inclui `next_cursor`.
+    Cursor mode nunca roda COUNT(*): com `incluir_total=true` a 1ª página traz `total_aproximado`.
     """
     service = TransactionService(db)
     
@@ -165,6 +171,8 @@ def list_transactions(
         month_inicio=month_inicio,
         year_fim=year_fim,
         month_fim=month_fim,
+        data_inicio=data_inicio,
+        data_fim=data_fim,
         estabelecimento=estabelecimento,
         grupo=grupo,
         subgrupo=subgrupo,
@@ -177,7 +185,7 @@ def list_transactions(
     )
 
     if cursor is not None:
-        return service.list_transactions_cursor(user_id, filters, cursor, limit)
+        return service.list_transactions_cursor(user_id, filters, cursor, limit, incluir_total)
     
     return service.list_transactions(user_id, filters, page, limit)
 
@@ -4,7 +4,7 @@ Pydantic schemas para validação e serialização
 """
 from pydantic import BaseModel, Field
 from typing import Optional, Union, List
-from datetime import datetime
+from datetime import date, datetime
 
 class TransactionBase(BaseModel):
     """Schema base de transação"""
@@ -65,6 +65,8 @@ class TransactionListResponse(BaseModel):
     # Cursor pagination (opcional — apenas quando cursor mode)
     next_cursor: Optional[str] = None
     has_more: bool = False
+    # Estimativa do planner (só na 1ª página com incluir_total=true; None fora do PostgreSQL)
+    total_aproximado: Optional[int] = None
 
 class TransactionFilters(BaseModel):
     """Schema de filtros de transação"""
@@ -75,6 +77,9 @@ class TransactionFilters(BaseModel):
     month_inicio: Optional[int] = None
     year_fim: Optional[int] = None
     month_fim: Optional[int] = None
+    # Intervalo pela data da transação (data_transacao, inclusivo) — combina com os filtros de mês
+    data_inicio: Optional[date] = None
+    data_fim: Optional[date] = None
     estabelecimento: Optional[str] = None
     grupo: Optional[str] = None
     subgrupo: Optional[str] = None
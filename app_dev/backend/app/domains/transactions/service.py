@@ -2,16 +2,19 @@
 Domínio Transactions - Service
 Lógica de negócio isolada
 """
+import base64
+import json
 import logging
 from sqlalchemy.orm import Session
 from sqlalchemy import func
-from typing import Optional, List
+from typing import Optional, List, Set, Tuple
 from fastapi import HTTPException
 from datetime import datetime, timedelta
 from .repository import TransactionRepository
 
 logger = logging.getLogger(__name__)
 from .models import JournalEntry
+from .rollup import refresh_journal_rollup
 from .schemas import (
     TransactionCreate,
     TransactionUpdate,
@@ -21,8 +24,12 @@ from .schemas import (
     TiposGastoComMediaResponse,
     TipoGastoComMedia
 )
-from app.shared.utils import determine_categoria_geral
+from app.shared.utils import determine_categoria_geral, normalizar_estabelecimento, parse_data_transacao
 from app.domains.plano.service import invalidate_cashflow_cache
+from app.core.cache import bump_data_version
+
+# Campos que entram nas estatísticas de base_padroes (ver agrupar_por_padrao)
+CAMPOS_PADRAO = {"Estabelecimento", "Valor", "tipodocumento", "GRUPO", "SUBGRUPO", "TipoGasto", "Data"}
 
 class TransactionService:
     """
@@ -276,28 +283,30 @@ class TransactionService:
         filters: Optional[TransactionFilters],
         cursor: str,
         limit: int = 50,
+        incluir_total: bool = False,
     ) -> TransactionListResponse:
         """
-        Lista transações com cursor-based pagination (O(1) vs O(n) do offset).
-        cursor = id (PK integer) da última transação da página anterior.
-        Retorna até `limit + 1` itens para detectar se há mais páginas.
+        Lista transações com cursor-based pagination (keyset em (MesFatura, id)).
+        cursor = valor opaco de `next_cursor` da página anterior ("" = primeira página).
+        Retorna até `limit + 1` itens para detectar se há mais páginas — nunca roda COUNT(*).
+        incluir_total: na primeira página, devolve `total_aproximado` (estimativa do planner).
         """
-        try:
-            cursor_id = int(cursor)
-        except (ValueError, TypeError):
-            raise ValueError(f"Cursor inválido: {cursor!r}. Deve ser o id (inteiro) da última transação.")
+        apos = self._decode_cursor(user_id, cursor)
 
         effective_filters = filters if filters else TransactionFilters()
         # Busca limit+1 para saber se tem próxima página
         items = self.repository.list_with_filters_cursor(
-            user_id, effective_filters, cursor_id, limit + 1
+            user_id, effective_filters, apos, limit + 1
         )
 
         has_more = len(items) > limit
         if has_more:
             items = items[:limit]
 
-        next_cursor = str(items[-1].id) if has_more and items else None
+        next_cursor = self._encode_cursor(items[-1]) if has_more and items else None
+        total_aproximado = None
+        if incluir_total and apos is None:
+            total_aproximado = self.repository.estimar_total_com_filtros(user_id, effective_filters)
 
         return TransactionListResponse(
             transactions=[TransactionResponse.from_orm(t) for t in items],
@@ -306,6 +315,42 @@ class TransactionService:
             limit=limit,
             next_cursor=next_cursor,
             has_more=has_more,
+            total_aproximado=total_aproximado,
+        )
+
+    @staticmethod
+    def _encode_cursor(transaction: JournalEntry) -> str:
+        """Cursor opaco: base64url de [MesFatura, id] da última transação da página"""
+        bruto = json.dumps([transaction.MesFatura, transaction.id], separators=(",", ":"))
+        return base64.urlsafe_b64encode(bruto.encode()).decode().rstrip("=")
+
+    def _decode_cursor(self, user_id: int, cursor: str) -> Optional[Tuple[Optional[str], int]]:
+        """
+        Cursor opaco -> (MesFatura, id). "" = primeira página.
+        Cursores antigos (só o id inteiro) são convertidos buscando o MesFatura da transação.
+        """
+        cursor = (cursor or "").strip()
+        if not cursor:
+            return None
+        if cursor.isdigit():
+            posicao = self.repository.get_posicao_cursor(user_id, int(cursor))
+            if posicao is None:
+                raise self._cursor_invalido(cursor)
+            return posicao
+        try:
+            bruto = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+            mes_fatura, transaction_pk = json.loads(bruto)
+        except (ValueError, TypeError):
+            raise self._cursor_invalido(cursor)
+        if not (mes_fatura is None or isinstance(mes_fatura, str)) or type(transaction_pk) is not int:
+            raise self._cursor_invalido(cursor)
+        return mes_fatura, transaction_pk
+
+    @staticmethod
+    def _cursor_invalido(cursor: str) -> HTTPException:
+        return HTTPException(
+            status_code=400,
+            detail={"errorCode": "TRX_001", "error": f"Cursor inválido: {cursor!r}. Use o next_cursor da página anterior."}
         )
 
     def create_transaction(
@@ -325,6 +370,21 @@ class TransactionService:
         
         # Lógica de negócio: calcular ValorPositivo
         transaction.ValorPositivo = abs(transaction.Valor)
+        # EstabelecimentoBase como no marker (sem parcela XX/YY) → mesma chave normalizada do upload
+        from app.domains.upload.processors.marker import extrair_parcela_do_estabelecimento
+        if not transaction.EstabelecimentoBase:
+            info_parcela = extrair_parcela_do_estabelecimento(transaction.Estabelecimento or '')
+            transaction.EstabelecimentoBase = (
+                info_parcela['estabelecimento_base'] if info_parcela else transaction.Estabelecimento
+            )
+        transaction.EstabelecimentoNorm = normalizar_estabelecimento(
+            transaction.EstabelecimentoBase or transaction.Estabelecimento
+        )
+        from app.domains.upload.processors.pattern_generator import chave_padrao
+        transaction.ChavePadrao = chave_padrao(
+            transaction.Estabelecimento, transaction.Valor, transaction.tipodocumento
+        )
+        transaction.data_transacao = parse_data_transacao(transaction.Data)
         
         # Extrair ano da data (formato DD/MM/YYYY)
         if transaction.Data and "/" in transaction.Data:
@@ -334,6 +394,9 @@ class TransactionService:
         
         # Salvar
         created = self.repository.create(transaction)
+        refresh_journal_rollup(self.repository.db, created.user_id, [created.MesFatura])
+        self.repository.db.commit()
+        bump_data_version(created.user_id)
         return TransactionResponse.from_orm(created)
     
     def update_transaction(
@@ -360,6 +423,7 @@ class TransactionService:
         update_dict = update_data.dict(exclude_unset=True)
         propagate_parcela = update_dict.pop("propagate_parcela", None)
         propagate_padrao = update_dict.pop("propagate_padrao", None)
+        chave_antiga = transaction.ChavePadrao
         
         for field, value in update_dict.items():
             setattr(transaction, field, value)
@@ -372,6 +436,18 @@ class TransactionService:
         if "Valor" in update_dict:
             transaction.ValorPositivo = abs(transaction.Valor)
         
+        if "Estabelecimento" in update_dict:
+            transaction.EstabelecimentoNorm = normalizar_estabelecimento(
+                transaction.EstabelecimentoBase or transaction.Estabelecimento
+            )
+        
+        # Chave do padrão depende do nome e do valor (valor total dos parcelados)
+        if "Estabelecimento" in update_dict or "Valor" in update_dict:
+            from app.domains.upload.processors.pattern_generator import chave_padrao
+            transaction.ChavePadrao = chave_padrao(
+                transaction.Estabelecimento, transaction.Valor, transaction.tipodocumento
+            )
+        
         # Se GRUPO ou SUBGRUPO mudaram, buscar TipoGasto na base_marcacoes
         if "GRUPO" in update_dict or "SUBGRUPO" in update_dict:
             # Buscar TipoGasto e CategoriaGeral da base_grupos_config
@@ -406,9 +482,12 @@ class TransactionService:
         except Exception as _inv_exc:
             logger.warning(f"Falha ao invalidar cashflow cache após update_transaction: {_inv_exc}")
 
+        # Buckets de base_padroes tocados: chave antiga e nova (+ os atingidos pela propagação)
+        chaves_tocadas = {chave_antiga, updated.ChavePadrao}
+        
         # Propagação: parcelas (IdParcela)
         if propagate_parcela and updated.IdParcela and ("GRUPO" in update_dict or "SUBGRUPO" in update_dict):
-            self._propagate_to_parcela(
+            chaves_tocadas |= self._propagate_to_parcela(
                 user_id=user_id,
                 id_parcela=updated.IdParcela,
                 grupo=updated.GRUPO,
@@ -418,21 +497,45 @@ class TransactionService:
         
         # Propagação: base padrões
         if propagate_padrao and ("GRUPO" in update_dict or "SUBGRUPO" in update_dict):
-            self._propagate_to_padrao(
+            chaves_tocadas |= self._propagate_to_padrao(
                 user_id=user_id,
                 transaction=updated,
                 grupo=updated.GRUPO,
                 subgrupo=updated.SUBGRUPO
             )
         
+        # Rollup: propagações podem atingir qualquer mês → recalcula o usuário inteiro
+        propagou = (propagate_parcela or propagate_padrao) and ("GRUPO" in update_dict or "SUBGRUPO" in update_dict)
+        refresh_journal_rollup(self.repository.db, user_id, None if propagou else [updated.MesFatura])
+        self.repository.db.commit()
+        bump_data_version(user_id)
+        
+        if CAMPOS_PADRAO & update_dict.keys():
+            self._atualizar_padroes_tocados(user_id, chaves_tocadas)
         return TransactionResponse.from_orm(updated)
     
+    def _atualizar_padroes_tocados(self, user_id: int, chaves: Set[str]) -> None:
+        """
+        Recalcula em base_padroes só os buckets (ChavePadrao) tocados por uma edição.
+        Falha aqui não desfaz a edição já gravada — só deixa o padrão para o próximo upload.
+        """
+        from app.domains.upload.processors.pattern_generator import atualizar_base_padroes_incremental
+        
+        chaves = [c for c in chaves if c]
+        if not chaves:
+            return
+        try:
+            atualizar_base_padroes_incremental(self.repository.db, user_id, chaves=chaves)
+        except Exception as exc:
+            self.repository.db.rollback()
+            logger.warning(f"Falha ao atualizar base_padroes após edição: {exc}")
+    
     def get_propagate_info(self, transaction_id: str, user_id: int) -> dict:
         """
         Retorna quantas transações seriam afetadas ao propagar grupo/subgrupo.
         """
         from app.domains.patterns.models import BasePadroes
-        from app.shared.utils import normalizar_estabelecimento, get_faixa_valor
+        from app.shared.utils import get_faixa_valor
         
         transaction = self.repository.get_by_id(transaction_id, user_id)
         if not transaction:
@@ -469,19 +572,11 @@ class TransactionService:
             if padrao:
                 has_padrao = True
                 v_min = padrao.valor_min if padrao.valor_min is not None else 0
-                v_max = padrao.valor_max if padrao.valor_max is not None else float('inf')
+                v_max = padrao.valor_max  # None = sem limite superior
                 
-                all_t = self.repository.db.query(JournalEntry).filter(
-                    JournalEntry.user_id == user_id
-                ).all()
-                for t in all_t:
-                    if t.IdTransacao == transaction_id:
-                        continue
-                    e = t.EstabelecimentoBase or t.Estabelecimento or ""
-                    v = abs(t.Valor or 0)
-                    en = normalizar_estabelecimento(e)
-                    if en == estab_norm and v_min <= v <= v_max:
-                        same_padrao_count += 1
+                same_padrao_count = self.repository.count_mesmo_padrao(
+                    user_id, estab_norm, v_min, v_max, exclude_id_transacao=transaction_id
+                )
         
         return {
             "same_parcela_count": same_parcela_count,
@@ -496,8 +591,11 @@ class TransactionService:
         grupo: Optional[str],
         subgrupo: Optional[str],
         exclude_id_transacao: Optional[str] = None
-    ) -> None:
-        """Atualiza todas as transações com mesmo IdParcela e base_parcelas."""
+    ) -> Set[str]:
+        """
+        Atualiza todas as transações com mesmo IdParcela e base_parcelas.
+        Retorna as ChavePadrao das transações atualizadas.
+        """
         from app.domains.grupos.models import BaseGruposConfig
         from app.domains.transactions.models import BaseParcelas
         from datetime import datetime
@@ -521,7 +619,9 @@ class TransactionService:
         if exclude_id_transacao:
             others = others.filter(JournalEntry.IdTransacao != exclude_id_transacao)
         
+        chaves = set()
         for t in others.all():
+            chaves.add(t.ChavePadrao)
             t.GRUPO = grupo
             t.SUBGRUPO = subgrupo
             t.origem_classificacao = "Manual"
@@ -545,6 +645,7 @@ class TransactionService:
             parcela.updated_at = datetime.now()
         
         self.repository.db.commit()
+        return chaves
     
     def _propagate_to_padrao(
         self,
@@ -552,11 +653,14 @@ class TransactionService:
         transaction: JournalEntry,
         grupo: Optional[str],
         subgrupo: Optional[str]
-    ) -> None:
-        """Atualiza BasePadroes e transações que batem no mesmo padrão."""
+    ) -> Set[str]:
+        """
+        Atualiza BasePadroes e transações que batem no mesmo padrão.
+        Retorna as ChavePadrao das transações atualizadas.
+        """
         from app.domains.grupos.models import BaseGruposConfig
         from app.domains.patterns.models import BasePadroes
-        from app.shared.utils import normalizar_estabelecimento, get_faixa_valor
+        from app.shared.utils import get_faixa_valor
         
         estab_base = transaction.EstabelecimentoBase or transaction.Estabelecimento
         valor_pos = abs(transaction.Valor or 0)
@@ -587,7 +691,7 @@ class TransactionService:
             ).first()
         
         if not padrao:
-            return
+            return set()
         
         padrao.grupo_sugerido = grupo
         padrao.subgrupo_sugerido = subgrupo
@@ -600,24 +704,20 @@ class TransactionService:
         v_min = padrao.valor_min if padrao.valor_min is not None else (valor_pos * 0.5)
         v_max = padrao.valor_max if padrao.valor_max is not None else (valor_pos * 1.5)
         
-        all_user = self.repository.db.query(JournalEntry).filter(
-            JournalEntry.user_id == user_id
-        ).all()
-        
-        for t in all_user:
-            e = t.EstabelecimentoBase or t.Estabelecimento or ""
-            v = abs(t.Valor or 0)
-            en = normalizar_estabelecimento(e)
-            if en == estab_norm and v_min <= v <= v_max:
-                t.GRUPO = grupo
-                t.SUBGRUPO = subgrupo
-                t.origem_classificacao = "Manual"
-                if tipo_gasto:
-                    t.TipoGasto = tipo_gasto
-                if categoria_geral:
-                    t.CategoriaGeral = categoria_geral
+        valores = {
+            JournalEntry.GRUPO: grupo,
+            JournalEntry.SUBGRUPO: subgrupo,
+            JournalEntry.origem_classificacao: "Manual",
+        }
+        if tipo_gasto:
+            valores[JournalEntry.TipoGasto] = tipo_gasto
+        if categoria_geral:
+            valores[JournalEntry.CategoriaGeral] = categoria_geral
+        self.repository.update_mesmo_padrao(user_id, estab_norm, v_min, v_max, valores)
+        chaves = self.repository.chaves_mesmo_padrao(user_id, estab_norm, v_min, v_max)
         
         self.repository.db.commit()
+        return chaves
     
     def _buscar_tipo_gasto_base_marcacoes(
         self, 
@@ -660,7 +760,11 @@ class TransactionService:
                 detail=f"Transaction {transaction_id} not found"
             )
         
+        mes_fatura = transaction.MesFatura
         self.repository.delete(transaction)
+        refresh_journal_rollup(self.repository.db, user_id, [mes_fatura])
+        self.repository.db.commit()
+        bump_data_version(user_id)
         return {"message": "Transaction deleted successfully"}
     
     def get_filtered_total(
@@ -836,6 +940,7 @@ class TransactionService:
         """
         from .schemas_migration import MigrationExecuteResponse
         from app.domains.grupos.repository import GrupoRepository
+        from app.domains.budget.medias import gravar_medias_3_meses
         from datetime import datetime
         from dateutil.relativedelta import relativedelta
         
@@ -864,81 +969,31 @@ class TransactionService:
         total_atualizadas = len(transacoes)
         
         # Atualizar todas as transações
+        chaves_migradas = set()
         for t in transacoes:
+            chaves_migradas.add(t.ChavePadrao)
             t.GRUPO = grupo_destino
             t.SUBGRUPO = subgrupo_destino
             t.TipoGasto = grupo_config.tipo_gasto_padrao
             t.CategoriaGeral = grupo_config.categoria_geral
         
+        refresh_journal_rollup(self.repository.db, user_id, {t.MesFatura for t in transacoes})
         self.repository.db.commit()
         
-        # Recalcular médias no budget_planning para ambos os grupos
-        grupos_recalculados = []
-        
-        for grupo in [grupo_origem, grupo_destino]:
-            # Gerar lista de meses (últimos 36 meses + próximos 12)
-            data_atual = datetime.now()
-            meses = []
-            for i in range(-36, 13):
-                mes = data_atual + relativedelta(months=i)
-                meses.append(mes.strftime('%Y-%m'))
-            
-            for mes_ref in meses:
-                ano, mes = map(int, mes_ref.split('-'))
-                data_ref = datetime(ano, mes, 1)
-                
-                # Calcular 3 meses anteriores
-                mes_1 = (data_ref - relativedelta(months=1)).strftime('%Y%m')
-                mes_2 = (data_ref - relativedelta(months=2)).strftime('%Y%m')
-                mes_3 = (data_ref - relativedelta(months=3)).strftime('%Y%m')
-                
-                # Calcular média
-                result = self.repository.db.query(
-                    func.avg(
-                        func.coalesce(
-                            self.repository.db.query(func.sum(func.abs(JournalEntry.Valor)))
-                            .filter(
-                                JournalEntry.user_id == user_id,
-                                JournalEntry.GRUPO == grupo,
-                                JournalEntry.CategoriaGeral == 'Despesa',
-                                JournalEntry.MesFatura.in_([mes_1, mes_2, mes_3])
-                            )
-                            .group_by(JournalEntry.MesFatura)
-                            .subquery()
-                            .c[0],
-                            0
-                        )
-                    )
-                ).scalar()
-                
-                media = round(result or 0, 2)
-                
-                # Atualizar ou inserir no budget_planning
-                from app.domains.budget.models import BudgetPlanning
-                
-                planning = self.repository.db.query(BudgetPlanning).filter(
-                    BudgetPlanning.user_id == user_id,
-                    BudgetPlanning.grupo == grupo,
-                    BudgetPlanning.mes_referencia == mes_ref
-                ).first()
-                
-                if planning:
-                    planning.valor_medio_3_meses = media
-                    planning.valor_planejado = media
-                    planning.updated_at = datetime.now()
-                else:
-                    planning = BudgetPlanning(
-                        user_id=user_id,
-                        grupo=grupo,
-                        mes_referencia=mes_ref,
-                        valor_planejado=media,
-                        valor_medio_3_meses=media
-                    )
-                    self.repository.db.add(planning)
-            
-            grupos_recalculados.append(grupo)
-        
+        # Recalcular médias no budget_planning para ambos os grupos (últimos 36 meses + próximos 12)
+        # em lote: 1 query com janela para todas as médias + UPDATE/INSERT em lote
+        data_atual = datetime.now()
+        meses = [(data_atual + relativedelta(months=i)).strftime('%Y-%m') for i in range(-36, 13)]
+        grupos_recalculados = [grupo_origem, grupo_destino]
+        gravar_medias_3_meses(
+            self.repository.db, user_id, grupos_recalculados, meses, planejado_igual_media=True
+        )
         self.repository.db.commit()
+        # Só depois do último commit: leitura entre os commits recachearia médias antigas
+        bump_data_version(user_id)
+        
+        # base_padroes: buckets das transações migradas (grupo sugerido mudou)
+        self._atualizar_padroes_tocados(user_id, chaves_migradas)
         
         return MigrationExecuteResponse(
             success=True,
@@ -1,53 +1,65 @@
 """
 Extrai texto legível de arquivos binários para detecção por conteúdo.
 Prioridade: conteúdo é a validação principal; filename é fallback.
+
+Recebe o caminho do upload já em disco (ver ingest.py) e lê só o necessário:
+os primeiros KB de texto, as primeiras linhas da planilha, a primeira página do PDF.
 """
-import io
-import tempfile
 from pathlib import Path
-from typing import Optional
+from typing import Union
+
+AMOSTRA_TEXTO_BYTES = 8192
+AMOSTRA_FALLBACK_BYTES = 4096
+
+
+def _ler_cabeca(file_path: Union[str, Path], n: int) -> str:
+    """Primeiros n bytes do arquivo, decodificados (sem ler o resto)."""
+    with open(file_path, "rb") as f:
+        return f.read(n).decode("utf-8", errors="ignore")
 
 
-def extract_content_sample(file_bytes: bytes, filename: str) -> str:
+def extract_content_sample(file_path: Union[str, Path], filename: str) -> str:
     """
     Extrai amostra de texto do arquivo para detecção.
-    - CSV: decode UTF-8 direto (já feito no router)
+    - CSV/TXT/OFX: primeiros 8KB
     - XLS/XLSX: lê células das primeiras linhas
     - PDF: extrai texto da primeira página
 
     Retorna string vazia se não conseguir extrair.
     """
     ext = Path(filename).suffix.lower()
-    if ext == ".csv" or ext == ".txt":
-        return file_bytes[:8192].decode("utf-8", errors="ignore")
+    if ext in (".csv", ".txt", ".ofx"):
+        return _ler_cabeca(file_path, AMOSTRA_TEXTO_BYTES)
 
     if ext in (".xls", ".xlsx"):
-        return _extract_excel(file_bytes, ext)
+        return _extract_excel(file_path, ext)
 
     if ext == ".pdf":
-        return _extract_pdf(file_bytes)
+        return _extract_pdf(file_path)
 
-    if ext == ".ofx":
-        return file_bytes[:8192].decode("utf-8", errors="ignore")
+    return _ler_cabeca(file_path, AMOSTRA_FALLBACK_BYTES)
 
-    return file_bytes[:4096].decode("utf-8", errors="ignore")
 
-
-def _extract_excel(file_bytes: bytes, ext: str) -> str:
+def _extract_excel(file_path: Union[str, Path], ext: str) -> str:
     """Extrai texto das primeiras linhas do Excel."""
     try:
         if ext == ".xls":
             import xlrd
-            wb = xlrd.open_workbook(file_contents=file_bytes)
-            sheet = wb.sheet_by_index(0)
-            lines = []
-            for row_idx in range(min(25, sheet.nrows)):
-                row_vals = [str(sheet.cell_value(row_idx, col_idx)) for col_idx in range(min(10, sheet.ncols))]
-                lines.append(" ".join(row_vals))
-            return "\n".join(lines)
+            # on_demand: só a primeira planilha é carregada
+            wb = xlrd.open_workbook(str(file_path), on_demand=True)
+            try:
+                sheet = wb.sheet_by_index(0)
+                lines = []
+                for row_idx in range(min(25, sheet.nrows)):
+                    row_vals = [str(sheet.cell_value(row_idx, col_idx)) for col_idx in range(min(10, sheet.ncols))]
+                    lines.append(" ".join(row_vals))
+                return "\n".join(lines)
+            finally:
+                wb.release_resources()
         else:
             import openpyxl
-            wb = openpyxl.load_workbook(io.BytesIO(file_bytes), read_only=True, data_only=True)
+            # read_only: linhas lidas sob demanda do zip, sem montar a planilha inteira
+            wb = openpyxl.load_workbook(str(file_path), read_only=True, data_only=True)
             sheet = wb.active
             lines = []
             for i, row in enumerate(sheet.iter_rows(max_row=25, values_only=True)):
@@ -56,18 +68,19 @@ def _extract_excel(file_bytes: bytes, ext: str) -> str:
             wb.close()
             return "\n".join(lines)
     except Exception:
-        return file_bytes[:4096].decode("utf-8", errors="ignore")
+        return _ler_cabeca(file_path, AMOSTRA_FALLBACK_BYTES)
 
 
-def _extract_pdf(file_bytes: bytes) -> str:
+def _extract_pdf(file_path: Union[str, Path]) -> str:
     """Extrai texto da primeira página do PDF."""
     try:
         import pdfplumber
-        with pdfplumber.open(io.BytesIO(file_bytes)) as pdf:
+        # Conteúdo das páginas é interpretado sob demanda: só a primeira é extraída
+        with pdfplumber.open(str(file_path)) as pdf:
             if pdf.pages:
                 page = pdf.pages[0]
                 text = page.extract_text()
                 return text or ""
     except Exception:
         pass
-    return file_bytes[:4096].decode("utf-8", errors="ignore")
+    return _ler_cabeca(file_path, AMOSTRA_FALLBACK_BYTES)
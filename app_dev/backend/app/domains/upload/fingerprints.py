@@ -86,9 +86,16 @@ FINGERPRINTS = {
 class DetectionEngine:
     """Detecta banco, tipo e período a partir do conteúdo do arquivo"""
 
-    def detect(self, filename: str, content_sample: str, file_bytes: bytes) -> DetectionResult:
+    def detect(
+        self,
+        filename: str,
+        content_sample: str,
+        file_bytes: bytes = b"",
+        arquivo_hash: Optional[str] = None,
+    ) -> DetectionResult:
+        """arquivo_hash: SHA-256 já calculado na ingestão (senão, calculado de file_bytes)."""
         ext = Path(filename).suffix.lower()
-        arquivo_hash = hashlib.sha256(file_bytes).hexdigest()
+        arquivo_hash = arquivo_hash or hashlib.sha256(file_bytes).hexdigest()
         content_lower = content_sample.lower()
 
         for key, fp in FINGERPRINTS.items():
@@ -2,7 +2,7 @@
 Model para histórico de uploads
 Rastreabilidade completa de importações
 """
-from sqlalchemy import Column, Integer, String, DateTime, Text, ForeignKey, JSON
+from sqlalchemy import Column, Integer, String, DateTime, Text, ForeignKey, JSON, Index
 from sqlalchemy.orm import relationship
 from datetime import datetime
 
@@ -15,6 +15,10 @@ class UploadHistory(Base):
     Permite auditoria, troubleshooting e estatísticas
     """
     __tablename__ = "upload_history"
+    __table_args__ = (
+        # "Este arquivo já foi importado?" — busca exata por hash (ver UploadRepository.get_imported_by_hash)
+        Index("ix_upload_history_user_arquivo_hash", "user_id", "arquivo_hash"),
+    )
     
     # PK
     id = Column(Integer, primary_key=True, index=True)
@@ -27,6 +31,7 @@ class UploadHistory(Base):
     banco = Column(String(100), nullable=False)
     tipo_documento = Column(String(50), nullable=False)  # extrato/fatura
     nome_arquivo = Column(String(255), nullable=False)
+    arquivo_hash = Column(String(64), nullable=True)  # SHA-256 do arquivo enviado (NULL em revisões/legado)
     
     # Dados específicos de fatura
     nome_cartao = Column(String(100), nullable=True)
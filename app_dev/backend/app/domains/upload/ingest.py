@@ -0,0 +1,186 @@
+"""
+Ingestão de arquivos enviados (UploadFile → arquivo temporário em disco).
+
+Antes, /detect fazia `await file.read()` (arquivo inteiro na memória, depois copiado
+para o pool de processos) e o service lia tudo de novo para gravar um tempfile.
+Agora o upload é copiado em blocos para um arquivo temporário, e na mesma passada:
+  - SHA-256 incremental (chave do cache de parsing e do "arquivo já importado")
+  - cabeçalho guardado para checar os magic bytes contra a extensão
+  - limite de tamanho (UPLOAD_MAX_BYTES) checado a cada bloco — aborta sem ler o resto
+
+Processadores e extrator de conteúdo recebem o caminho (nunca bytes); a memória
+usada por upload fica limitada ao tamanho do bloco.
+
+Uso:
+    from .ingest import ingerir_upload
+
+    with ingerir_upload(file.file, file.filename, file.size) as arquivo:
+        process_file(arquivo.path, ...)      # arquivo.sha256, arquivo.tamanho, arquivo.tipo
+    # arquivo temporário removido na saída do with (ou com arquivo.remover())
+"""
+import hashlib
+import logging
+import os
+import tempfile
+from dataclasses import dataclass
+from pathlib import Path
+from typing import BinaryIO, Optional
+
+from fastapi import HTTPException, status
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+TAMANHO_BLOCO = 1024 * 1024  # 1 MiB por leitura
+TAMANHO_CABECALHO = 2048      # bytes guardados para sniffing (%PDF- pode vir até o byte 1024)
+
+EXTENSOES_PERMITIDAS = ("csv", "txt", "ofx", "xls", "xlsx", "xlsm", "pdf")
+
+# Tipo real pelo conteúdo (magic bytes)
+TIPO_PDF = "pdf"
+TIPO_ZIP = "zip"        # xlsx/xlsm
+TIPO_OLE = "ole"        # xls e xlsx protegido por senha (container OLE do msoffcrypto)
+TIPO_TEXTO = "texto"    # csv, txt, ofx — e .xls que na verdade é HTML/CSV exportado pelo banco
+TIPO_BINARIO = "binario"
+
+# Tipos aceitos por extensão
+TIPOS_POR_EXTENSAO = {
+    "pdf": (TIPO_PDF,),
+    "xlsx": (TIPO_ZIP, TIPO_OLE),
+    "xlsm": (TIPO_ZIP, TIPO_OLE),
+    "xls": (TIPO_OLE, TIPO_ZIP, TIPO_TEXTO),
+    "csv": (TIPO_TEXTO,),
+    "txt": (TIPO_TEXTO,),
+    "ofx": (TIPO_TEXTO,),
+}
+
+_MAGIC_ZIP = b"PK\x03\x04"
+_MAGIC_OLE = b"\xd0\xcf\x11\xe0\xa1\xb1\x1a\xe1"
+_BOMS_UTF16 = (b"\xff\xfe", b"\xfe\xff")
+
+
+@dataclass
+class ArquivoRecebido:
+    """Upload já em disco: caminho temporário + metadados calculados na cópia."""
+    path: Path
+    nome: str
+    tamanho: int
+    sha256: str
+    tipo: str
+
+    def cabecalho(self, n: int = TAMANHO_CABECALHO) -> bytes:
+        """Primeiros n bytes do arquivo (sem carregar o resto)."""
+        with open(self.path, "rb") as f:
+            return f.read(n)
+
+    def remover(self) -> None:
+        """Remove o arquivo temporário (idempotente)."""
+        try:
+            os.unlink(self.path)
+        except OSError:
+            pass
+
+    def __enter__(self) -> "ArquivoRecebido":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.remover()
+
+
+def extensao(nome: Optional[str]) -> str:
+    """Extensão em minúsculas, sem ponto ('' se não houver)."""
+    return Path(nome or "").suffix.lower().lstrip(".")
+
+
+def detectar_tipo(cabecalho: bytes) -> str:
+    """Tipo real do arquivo pelos magic bytes do cabeçalho."""
+    if b"%PDF-" in cabecalho[:1024]:
+        return TIPO_PDF
+    if cabecalho.startswith(_MAGIC_ZIP):
+        return TIPO_ZIP
+    if cabecalho.startswith(_MAGIC_OLE):
+        return TIPO_OLE
+    if cabecalho.startswith(_BOMS_UTF16) or b"\x00" not in cabecalho:
+        return TIPO_TEXTO
+    return TIPO_BINARIO
+
+
+def _erro_tamanho(max_bytes: int) -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+        detail={
+            "errorCode": "UPL_015",
+            "error": f"Arquivo excede o limite de {max_bytes // (1024 * 1024)}MB",
+        },
+    )
+
+
+def ingerir_upload(
+    origem: BinaryIO,
+    nome: Optional[str],
+    tamanho_declarado: Optional[int] = None,
+    max_bytes: Optional[int] = None,
+) -> ArquivoRecebido:
+    """
+    Copia o upload em blocos para um arquivo temporário, calculando SHA-256 e tipo.
+
+    Args:
+        origem: arquivo de origem (UploadFile.file — o spool do Starlette)
+        nome: nome original (define a extensão validada e o sufixo do temporário)
+        tamanho_declarado: UploadFile.size, se conhecido — rejeita antes de copiar
+        max_bytes: limite em bytes (padrão: settings.UPLOAD_MAX_BYTES)
+
+    Raises:
+        HTTPException 400: extensão não permitida ou conteúdo incompatível com a extensão
+        HTTPException 413: arquivo maior que o limite
+    """
+    nome = nome or "arquivo"
+    max_bytes = max_bytes or settings.UPLOAD_MAX_BYTES
+    ext = extensao(nome)
+    if ext not in EXTENSOES_PERMITIDAS:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail={
+                "errorCode": "UPL_016",
+                "error": f"Extensão .{ext} não permitida. Use: {', '.join(EXTENSOES_PERMITIDAS)}",
+            },
+        )
+    if tamanho_declarado is not None and tamanho_declarado > max_bytes:
+        raise _erro_tamanho(max_bytes)
+
+    digest = hashlib.sha256()
+    cabecalho = b""
+    tamanho = 0
+    tmp = tempfile.NamedTemporaryFile(delete=False, suffix=f"_{Path(nome).name}")
+    try:
+        with tmp:
+            while True:
+                bloco = origem.read(TAMANHO_BLOCO)
+                if not bloco:
+                    break
+                tamanho += len(bloco)
+                if tamanho > max_bytes:
+                    raise _erro_tamanho(max_bytes)
+                if len(cabecalho) < TAMANHO_CABECALHO:
+                    cabecalho += bloco[:TAMANHO_CABECALHO - len(cabecalho)]
+                digest.update(bloco)
+                tmp.write(bloco)
+
+        tipo = detectar_tipo(cabecalho)
+        if tamanho and tipo not in TIPOS_POR_EXTENSAO[ext]:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail={
+                    "errorCode": "UPL_017",
+                    "error": f"Conteúdo do arquivo não corresponde à extensão .{ext}",
+                },
+            )
+    except BaseException:
+        os.unlink(tmp.name)
+        raise
+
+    logger.debug("upload ingerido: %s (%d bytes, %s)", nome, tamanho, tipo)
+    return ArquivoRecebido(
+        path=Path(tmp.name), nome=nome, tamanho=tamanho, sha256=digest.hexdigest(), tipo=tipo,
+    )
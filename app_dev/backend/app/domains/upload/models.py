@@ -2,7 +2,7 @@
 Domínio Upload - Models
 Contém o modelo PreviewTransacao e helpers
 """
-from sqlalchemy import Column, Integer, String, Float, DateTime, Boolean, Text
+from sqlalchemy import Column, Integer, String, Float, Date, DateTime, Boolean, Text
 from app.core.database import Base
 
 class PreviewTransacao(Base):
@@ -14,7 +14,7 @@ class PreviewTransacao(Base):
     
     Campos preenchidos por fase:
     - Fase 1 (Raw): data, lancamento, valor, banco, tipo_documento, nome_cartao, nome_arquivo, data_criacao
-    - Fase 2 (Marking): IdTransacao, IdParcela, EstabelecimentoBase, ParcelaAtual, TotalParcelas, ValorPositivo, TipoTransacao, Ano, Mes
+    - Fase 2 (Marking): IdTransacao, IdParcela, EstabelecimentoBase, EstabelecimentoNorm, ChavePadrao, data_transacao, ParcelaAtual, TotalParcelas, ValorPositivo, TipoTransacao, Ano, Mes
     - Fase 3 (Classification): GRUPO, SUBGRUPO, TipoGasto, CategoriaGeral, origem_classificacao, padrao_buscado
     - Fase 4 (Deduplication): is_duplicate, duplicate_reason
     """
@@ -43,6 +43,9 @@ class PreviewTransacao(Base):
     IdTransacao = Column(String, index=True)  # FNV-1a hash
     IdParcela = Column(String, index=True)  # MD5 para parcelas
     EstabelecimentoBase = Column(String)  # Sem XX/YY
+    EstabelecimentoNorm = Column(String)  # normalizar_estabelecimento(EstabelecimentoBase)
+    ChavePadrao = Column(String)  # chave_padrao(lancamento, valor, tipo_documento) → journal_entries
+    data_transacao = Column(Date)  # data como DATE
     ParcelaAtual = Column(Integer)  # Ex: 1
     TotalParcelas = Column(Integer)  # Ex: 12
     ValorPositivo = Column(Float)  # abs(valor)
@@ -0,0 +1,141 @@
+"""
+Cache do parsing bruto (Fase 1) endereçado pelo conteúdo do arquivo.
+
+Reenviar o mesmo arquivo (preview cancelado, lote repetido, arquivo já importado) refazia
+todo o processador — extração de texto do PDF, msoffcrypto, OCR. Agora o resultado do
+processador fica no Redis, comprimido, e o reenvio pula direto para as fases 2-4.
+
+Uso:
+    from .parse_cache import chave_parse, get_parse_cache, set_parse_cache
+
+    chave = chave_parse(user_id, arquivo_hash, banco, tipo, formato, nome_arquivo, cartao, final)
+    result = get_parse_cache(chave)
+    if result is None:
+        result = run_in_process(process_file, ...)
+        set_parse_cache(chave, result)
+
+Chave: parse:{sha256 de [user_id, sha256 do arquivo, banco, tipo, formato, nome_arquivo,
+nome_cartao, final_cartao, versão dos parsers]}
+  - user_id: o resultado contém o conteúdo do arquivo (inclusive de PDFs com senha) —
+    nunca é servido a outro usuário
+  - nome_arquivo/cartão: alguns processadores extraem mes_fatura/cartão desses argumentos
+  - versão dos parsers: hash do código-fonte de processors/raw — qualquer mudança em um
+    parser invalida o cache inteiro (as entradas antigas expiram pelo TTL/LRU)
+
+Valor: zlib(JSON colunar) — {"campos": [...], "linhas": [[...]], "balance": {...}, "tupla": bool}.
+data_criacao não é guardada: no hit recebe datetime.now(), como num parsing novo.
+
+Garantias (como app.core.cache):
+- Redis indisponível ou UPLOAD_PARSE_CACHE_ENABLED=False → bypass, nunca erro
+- Eviction: TTL (UPLOAD_PARSE_CACHE_TTL_SECONDS) + maxmemory-policy allkeys-lru do Redis
+"""
+import functools
+import hashlib
+import json
+import logging
+import zlib
+from dataclasses import fields
+from datetime import datetime
+from pathlib import Path
+from typing import List, Optional, Tuple, Union
+
+from app.core.config import settings
+from app.core.redis_client import get_redis_binary
+from .processors.raw.base import BalanceValidation, RawTransaction
+
+logger = logging.getLogger(__name__)
+
+# Formato do valor serializado — incrementar se a serialização mudar
+FORMATO_CACHE = 1
+
+# Campos de RawTransaction guardados (data_criacao é recriada no hit)
+CAMPOS_RAW = tuple(f.name for f in fields(RawTransaction) if f.name != 'data_criacao')
+
+ResultadoParse = Union[List[RawTransaction], Tuple[List[RawTransaction], Optional[BalanceValidation]]]
+
+_DIR_PARSERS = Path(__file__).parent / "processors" / "raw"
+
+
+@functools.lru_cache(maxsize=1)
+def versao_parsers() -> str:
+    """Hash do código-fonte de processors/raw (calculado uma vez por processo)."""
+    digest = hashlib.sha256(str(FORMATO_CACHE).encode())
+    for path in sorted(_DIR_PARSERS.rglob("*.py")):
+        digest.update(path.relative_to(_DIR_PARSERS).as_posix().encode())
+        digest.update(path.read_bytes())
+    return digest.hexdigest()[:16]
+
+
+def chave_parse(
+    user_id: int,
+    arquivo_hash: str,
+    banco: str,
+    tipo_documento: str,
+    formato: str,
+    nome_arquivo: str,
+    nome_cartao: Optional[str] = None,
+    final_cartao: Optional[str] = None,
+) -> str:
+    """Chave do cache para um arquivo + argumentos do processador."""
+    partes = [
+        user_id, arquivo_hash, (banco or '').strip().lower(), (tipo_documento or '').lower(),
+        (formato or '').lower(), nome_arquivo, nome_cartao, final_cartao, versao_parsers(),
+    ]
+    digest = hashlib.sha256(json.dumps(partes, ensure_ascii=False).encode()).hexdigest()
+    return f"parse:{digest}"
+
+
+def serializar(result: ResultadoParse) -> bytes:
+    """Resultado do processador → bytes comprimidos."""
+    tupla = isinstance(result, tuple)
+    transactions, balance = result if tupla else (result, None)
+    payload = {
+        "campos": CAMPOS_RAW,
+        "linhas": [[getattr(t, campo) for campo in CAMPOS_RAW] for t in transactions],
+        "balance": balance.to_dict() if balance is not None else None,
+        "tupla": tupla,
+    }
+    return zlib.compress(json.dumps(payload, ensure_ascii=False, separators=(',', ':')).encode())
+
+
+def desserializar(raw: bytes) -> ResultadoParse:
+    """Bytes comprimidos → mesmo tipo de retorno do processador (lista ou tupla)."""
+    payload = json.loads(zlib.decompress(raw))
+    agora = datetime.now()
+    campos = payload["campos"]
+    transactions = [
+        RawTransaction(data_criacao=agora, **dict(zip(campos, linha)))
+        for linha in payload["linhas"]
+    ]
+    if not payload["tupla"]:
+        return transactions
+    balance = BalanceValidation(**payload["balance"]) if payload["balance"] is not None else None
+    return transactions, balance
+
+
+def get_parse_cache(chave: str) -> Optional[ResultadoParse]:
+    """Resultado em cache ou None (miss, cache desligado ou Redis indisponível)."""
+    if not settings.UPLOAD_PARSE_CACHE_ENABLED:
+        return None
+    try:
+        raw = get_redis_binary().get(chave)
+        if raw is None:
+            return None
+        return desserializar(raw)
+    except Exception as exc:
+        logger.debug("get_parse_cache falhou silenciosamente: %s", exc)
+        return None
+
+
+def set_parse_cache(chave: str, result: ResultadoParse) -> bool:
+    """Grava o resultado (falha silenciosa). Retorna True se gravou."""
+    if not settings.UPLOAD_PARSE_CACHE_ENABLED:
+        return False
+    try:
+        raw = serializar(result)
+        get_redis_binary().set(chave, raw, ex=settings.UPLOAD_PARSE_CACHE_TTL_SECONDS)
+        logger.debug("parse cache: %d bytes gravados (%s)", len(raw), chave[:22])
+        return True
+    except Exception as exc:
+        logger.debug("set_parse_cache falhou silenciosamente: %s", exc)
+        return False
@@ -1,17 +1,29 @@
 """
 Upload Processors Package
 Processamento em fases de arquivos financeiros
+
+Os processadores PDF são exportados sob demanda (PEP 562): importar o pacote não
+carrega pdfplumber/PyMuPDF — ver processors/raw/registry.py.
 """
 
 from .raw import RawTransaction, get_processor
-from .raw.pdf import (
-    process_itau_extrato_pdf,
-    process_itau_fatura_pdf,
-    process_mercadopago_extrato_pdf,
-)
 from .marker import TransactionMarker, MarkedTransaction
 from .classifier import CascadeClassifier, ClassifiedTransaction
 
+_PDF_LAZY = (
+    "process_itau_extrato_pdf",
+    "process_itau_fatura_pdf",
+    "process_mercadopago_extrato_pdf",
+)
+
+
+def __getattr__(name):
+    if name in _PDF_LAZY:
+        from .raw import pdf
+        return getattr(pdf, name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
 __all__ = [
     "RawTransaction",
     "get_processor",
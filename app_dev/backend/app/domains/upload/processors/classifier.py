@@ -4,11 +4,12 @@ Classifica transações em 5 níveis hierárquicos
 """
 
 import logging
+from collections import defaultdict
 from dataclasses import dataclass
 from typing import Optional
 from sqlalchemy.orm import Session
 from sqlalchemy import func, and_
-from datetime import datetime, timedelta
+from datetime import date, datetime, timedelta
 
 from .marker import MarkedTransaction
 from .generic_rules_classifier import GenericRulesClassifier
@@ -88,13 +89,48 @@ class CascadeClassifier:
         # Passar cache pré-carregado para GenericRulesClassifier (0 queries por transação)
         self.generic_classifier = GenericRulesClassifier(db=db, preloaded_rules=generic_rules)
 
+        # 5) Índice invertido token → posições do histórico (nivel 3), montado UMA vez
+        self._build_historico_index()
+
         elapsed = (datetime.now() - t0).total_seconds()
         logger.info(
-            f"CascadeClassifier init: {len(self._historico_cache)} históricos, "
+            f"CascadeClassifier init: {len(self._historico_cache)} históricos "
+            f"({len(self._historico_rows)} indexados, {len(self._historico_index)} tokens), "
             f"{len(self._parcelas_cache)} parcelas, {len(self._padroes_cache)} padrões, "
             f"{len(generic_rules)} regras genéricas pré-carregados em {elapsed:.2f}s"
         )
     
+    def _build_historico_index(self):
+        """
+        Pré-tokeniza o histórico do nível 3 e monta índice invertido token → posições.
+
+        Cada linha indexada guarda (row, n_tokens, valor_abs, data_key), calculados uma
+        única vez — tokensValidos()/toNumberFlexible() saem do loop upload × histórico.
+        Linhas incompletas (sem GRUPO/SUBGRUPO/TipoGasto) ou sem tokens nunca viram
+        candidatas e ficam fora do índice. Posições preservam a ordem de
+        _historico_cache, o que mantém o desempate da ordenação por data.
+        """
+        from app.shared.utils import tokensValidos, toNumberFlexible
+
+        self._historico_rows = []
+        self._historico_index = defaultdict(list)
+
+        for h in self._historico_cache:
+            if not (h.GRUPO and h.SUBGRUPO and h.TipoGasto):
+                continue
+            tokens_hist = tokensValidos(h.Estabelecimento or '')
+            if not tokens_hist:
+                continue
+            pos = len(self._historico_rows)
+            self._historico_rows.append((
+                h,
+                len(tokens_hist),
+                abs(toNumberFlexible(h.Valor)),
+                h.data_transacao or date.min,
+            ))
+            for token in set(tokens_hist):
+                self._historico_index[token].append(pos)
+
     def classify(self, marked: MarkedTransaction) -> ClassifiedTransaction:
         """
         Classifica uma transação marcada
@@ -286,26 +322,45 @@ class CascadeClassifier:
     def _classify_nivel3_journal(self, marked: MarkedTransaction) -> Optional[ClassifiedTransaction]:
         """
         Nível 3: Journal Entries
-        Usa cache pré-carregado no __init__ — era N queries de 8k rows (1 por transação).
+        Usa índice invertido montado no __init__ — só visita linhas do histórico que
+        compartilham tokens com o estabelecimento (era varredura completa + tokensValidos
+        de cada linha por transação). Vencedor idêntico à varredura do n8n.
         """
         try:
-            from app.shared.utils import tokensValidos, intersecaoCount, toNumberFlexible
+            from app.shared.utils import tokensValidos, toNumberFlexible
 
-            # Cache pré-carregado no __init__: 0 queries aqui (era 1 query de 8k rows por transação)
-            historico = self._historico_cache
-            if not historico:
+            if not self._historico_rows:
                 return None
-            
+
+            # Filtrar PIX igual ao n8n (não usar histórico de PIX)
+            estab_upper = marked.estabelecimento_base.upper()
+            if 'PIX' in estab_upper:
+                logger.debug(f"❌ Nível 3 (Journal): PIX ignorado: {marked.estabelecimento_base[:30]}...")
+                return None
+
             # Implementar lógica igual ao n8n
             tokens_estab = tokensValidos(marked.estabelecimento_base)
+            if not tokens_estab:
+                return None
             v_trans = abs(toNumberFlexible(marked.valor_positivo))
-            
+
+            # Interseção via posting lists (mesma contagem de intersecaoCount:
+            # tokens do estabelecimento, com repetição, presentes no histórico)
+            inter_por_pos = defaultdict(int)
+            for token in tokens_estab:
+                for pos in self._historico_index.get(token, ()):
+                    inter_por_pos[pos] += 1
+
             candidatos = []
-            for h in historico:
-                tokens_hist = tokensValidos(h.Estabelecimento or '')
-                inter = intersecaoCount(tokens_hist, tokens_estab)
-                v_hist = abs(toNumberFlexible(h.Valor))
-                
+            for pos in sorted(inter_por_pos):
+                h, n_tokens_hist, v_hist, data_key = self._historico_rows[pos]
+                inter = inter_por_pos[pos]
+
+                # Calcular limiar de interseção igual ao n8n
+                limiar = 1 if min(len(tokens_estab), n_tokens_hist) == 1 else 2
+                if inter < limiar:
+                    continue
+
                 # Lógica de valor igual ao n8n
                 if not (v_trans and v_hist):  # Se algum valor inválido
                     valor_ok = True
@@ -313,32 +368,22 @@ class CascadeClassifier:
                     valor_ok = True
                 else:  # Diferença percentual <= 20%
                     valor_ok = abs(v_hist - v_trans) / max(v_hist, v_trans) <= 0.20
-                
-                completo = bool(h.GRUPO and h.SUBGRUPO and h.TipoGasto)
-                
-                # Calcular limiar de interseção igual ao n8n
-                limiar = 1 if min(len(tokens_estab), len(tokens_hist)) == 1 else 2
-                
-                if completo and valor_ok and inter >= limiar:
+
+                if valor_ok:
                     candidatos.append({
                         'h': h,
                         'inter': inter,
                         'valor_ok': valor_ok,
-                        'data': h.Data or datetime.min
+                        'data': data_key
                     })
-            
+
             if not candidatos:
                 return None
-            
-            # Ordenar por data mais recente primeiro (igual ao n8n)
+
+            # Ordenar por data mais recente primeiro (igual ao n8n) — data_transacao (DATE),
+            # cronológica de verdade; a string DD/MM/YYYY ordenava pelo dia
             candidatos.sort(key=lambda x: x['data'], reverse=True)
-            
-            # Filtrar PIX igual ao n8n (não usar histórico de PIX)
-            estab_upper = marked.estabelecimento_base.upper()
-            if 'PIX' in estab_upper:
-                logger.debug(f"❌ Nível 3 (Journal): PIX ignorado: {marked.estabelecimento_base[:30]}...")
-                return None
-            
+
             # Retornar o primeiro candidato (mais recente)
             escolhido = candidatos[0]['h']
             logger.debug(f"✅ Nível 3 (Journal): {marked.estabelecimento_base[:30]}... (inter: {candidatos[0]['inter']}, valor_ok: {candidatos[0]['valor_ok']})")
@@ -26,6 +26,7 @@ import hashlib
 import logging
 import re
 from dataclasses import dataclass
+from datetime import date
 from typing import Optional
 
 # Imports de utilitários compartilhados
@@ -33,8 +34,10 @@ from app.shared.utils import (
     fnv1a_64_hash,
     generate_id_transacao,
     normalizar_estabelecimento,
+    parse_data_transacao,
     arredondar_2_decimais
 )
+from .pattern_generator import chave_padrao
 
 from .raw.base import RawTransaction
 
@@ -139,6 +142,9 @@ class MarkedTransaction(RawTransaction):
     # Campos de identificação (preenchidos sempre, mas têm default para herança funcionar)
     id_transacao: str = ""                  # Hash FNV-1a 64-bit
     estabelecimento_base: str = ""          # Sem XX/YY parcela
+    estabelecimento_norm: str = ""          # normalizar_estabelecimento(estabelecimento_base) → EstabelecimentoNorm
+    chave_padrao: str = ""                  # chave_padrao(lancamento, valor, tipo_documento) → ChavePadrao
+    data_transacao: Optional[date] = None   # raw.data como date (parseada uma vez) → data_transacao
     valor_positivo: float = 0.0             # abs(valor)
     
     # Campos de parcela (opcionais)
@@ -282,17 +288,24 @@ class TransactionMarker:
             tipo_doc_lower = raw.tipo_documento.lower() if raw.tipo_documento else ''
             is_fatura = 'fatura' in tipo_doc_lower or 'cartao' in tipo_doc_lower or 'cartão' in tipo_doc_lower
             
-            # 2c. Ano e Mes: FATURA → da MesFatura | EXTRATO → da Data da transação
+            # 2c. Data da transação parseada UMA vez (vai para data_transacao)
+            data_transacao = parse_data_transacao(raw.data)
+            
+            # 2d. Ano e Mes: FATURA → da MesFatura | EXTRATO → da Data da transação
             if is_fatura and raw.mes_fatura:
                 # Fatura: Ano e Mes vêm da MesFatura (ex: 202601 → ano=2026, mes=1)
                 mes_fatura = raw.mes_fatura.replace('-', '').strip()
                 if len(mes_fatura) >= 6:
                     ano = int(mes_fatura[:4])
                     mes = int(mes_fatura[4:6])
+                elif data_transacao:
+                    ano, mes = data_transacao.year, data_transacao.month
                 else:
                     ano, mes = self._extrair_ano_mes(raw.data)
-            else:
+            elif data_transacao:
                 # Extrato: Ano e Mes da Data da transação
+                ano, mes = data_transacao.year, data_transacao.month
+            else:
                 ano, mes = self._extrair_ano_mes(raw.data)
             
             # estab_normalizado: ainda usado para IdParcela e EstabelecimentoBase
@@ -373,6 +386,9 @@ class TransactionMarker:
                 # Novos campos (Fase 2)
                 id_transacao=id_transacao,
                 estabelecimento_base=estabelecimento_base,
+                estabelecimento_norm=normalizar_estabelecimento(estabelecimento_base),
+                chave_padrao=chave_padrao(raw.lancamento, raw.valor, raw.tipo_documento),
+                data_transacao=data_transacao,
                 valor_positivo=valor_positivo,
                 id_parcela=id_parcela,
                 parcela_atual=parcela_atual,
@@ -273,7 +273,32 @@ def estatisticas_do_padrao(registros: List[Dict]) -> Dict:
     }
 
 
-def gerar_padroes_segmentados(db: Session, user_id: int, padrao_str: str, registros: List[Dict], stats: Dict) -> List[Dict]:
+def carregar_categorias_por_grupo(db: Session, user_id: int) -> Dict[str, str]:
+    """
+    Mapa nome_grupo → categoria_geral do usuário (1 query).
+    Equivale a get_categoria_geral_from_grupo para todos os grupos de uma vez.
+    """
+    from sqlalchemy import text
+
+    rows = db.execute(
+        text("SELECT nome_grupo, categoria_geral FROM base_grupos_config WHERE user_id = :user_id"),
+        {"user_id": user_id}
+    ).fetchall()
+
+    categorias: Dict[str, str] = {}
+    for nome_grupo, categoria_geral in rows:
+        categorias.setdefault(nome_grupo, categoria_geral)
+    return categorias
+
+
+def gerar_padroes_segmentados(
+    db: Session,
+    user_id: int,
+    padrao_str: str,
+    registros: List[Dict],
+    stats: Dict,
+    categorias: Optional[Dict[str, str]] = None
+) -> List[Dict]:
     """
     Gera padrões (segmentados por faixa de valor ou simples)
     
@@ -281,7 +306,16 @@ def gerar_padroes_segmentados(db: Session, user_id: int, padrao_str: str, regist
     - Critério 1: Múltiplos contextos (classificações diferentes por faixa)
     - Critério 2: Coef. variação > 0.3 E consistência < 85%
     - Critério 3: Pelo menos 4 registros
+
+    Args:
+        categorias: mapa grupo → categoria_geral pré-carregado (carregar_categorias_por_grupo);
+                    se None, busca no banco padrão a padrão
     """
+    def _categoria(grupo: str) -> str:
+        if categorias is None:
+            return get_categoria_geral_from_grupo(db, grupo, user_id)
+        return categorias.get(grupo, '') if grupo else ''
+
     padroes = []
     
     criterio1 = stats['temMultiplosContextos']
@@ -320,7 +354,7 @@ def gerar_padroes_segmentados(db: Session, user_id: int, padrao_str: str, regist
                 confianca_faixa = "media"
             
             # Buscar categoria_geral
-            categoria_geral = get_categoria_geral_from_grupo(db, stats_faixa['grupo'], user_id)
+            categoria_geral = _categoria(stats_faixa['grupo'])
             
             padroes.append({
                 'padrao_estabelecimento': padrao_com_faixa,
@@ -360,7 +394,7 @@ def gerar_padroes_segmentados(db: Session, user_id: int, padrao_str: str, regist
         confianca = "media"
     
     # Buscar categoria_geral
-    categoria_geral = get_categoria_geral_from_grupo(db, stats['grupo'], user_id)
+    categoria_geral = _categoria(stats['grupo'])
     
     return [{
         'padrao_estabelecimento': padrao_str,
@@ -385,42 +419,35 @@ def gerar_padroes_segmentados(db: Session, user_id: int, padrao_str: str, regist
     }]
 
 
-def gerar_base_padroes(db: Session, user_id: int) -> List[Dict]:
+def chave_padrao(estabelecimento: str, valor: float, origem: str = "") -> str:
     """
-    Gera base_padroes a partir de journal_entries
-    
-    Processo:
-    1. Buscar todas as transações do usuário
-    2. Agrupar por padrão normalizado
-    3. Calcular estatísticas por grupo
-    4. Gerar padrões (segmentados ou simples)
-    5. Filtrar apenas alta confiança
-    
-    Returns:
-        Lista de dicionários com padrões gerados
+    Chave (bucket) do padrão de uma transação — sem faixa de valor.
+    Vazia quando o estabelecimento não gera padrão.
+    """
+    estab = estabelecimento or ''
+    parcela_info = detectar_parcela_no_final(estab, origem or '')
+    return normalizar_chave_padrao(montar_padrao(estab, valor or 0, parcela_info))
+
+
+def agrupar_por_padrao(transacoes, chaves: Optional[set] = None) -> Dict[str, List[Dict]]:
+    """
+    Agrupa transações (JournalEntry ou rows com os mesmos atributos) por chave de padrão.
+
+    Args:
+        chaves: se informado, mantém apenas os buckets dessas chaves (modo incremental)
     """
-    # 1. Buscar transações
-    transacoes = db.query(JournalEntry).filter(
-        JournalEntry.user_id == user_id
-    ).all()
-    
-    if not transacoes:
-        return []
-    
-    # 2. Agrupar por padrão
     buckets = defaultdict(list)
-    
+
     for t in transacoes:
         estab = t.Estabelecimento or ''
         valor = t.Valor or 0
-        origem = t.tipodocumento or ''
-        
-        parcela_info = detectar_parcela_no_final(estab, origem)
-        padrao_str = normalizar_chave_padrao(montar_padrao(estab, valor, parcela_info))
-        
+        padrao_str = chave_padrao(estab, valor, t.tipodocumento or '')
+
         if not padrao_str:
             continue
-        
+        if chaves is not None and padrao_str not in chaves:
+            continue
+
         registro = {
             'padraoStr': padrao_str,
             'GRUPO': t.GRUPO or '',
@@ -430,23 +457,61 @@ def gerar_base_padroes(db: Session, user_id: int) -> List[Dict]:
             'Estabelecimento': estab,
             'Data': t.Data or ''
         }
-        
+
         buckets[padrao_str].append(registro)
-    
-    # 3. Gerar padrões
+
+    return buckets
+
+
+def gerar_padroes_dos_buckets(
+    db: Session,
+    user_id: int,
+    buckets: Dict[str, List[Dict]],
+    categorias: Optional[Dict[str, str]] = None
+) -> List[Dict]:
+    """
+    Calcula estatísticas de cada bucket, gera os padrões (segmentados ou simples)
+    e filtra apenas alta confiança (>= 95% consistência e >= 2 ocorrências)
+    """
     saida = []
     for padrao_str, registros in buckets.items():
         stats = estatisticas_do_padrao(registros)
-        padroes = gerar_padroes_segmentados(db, user_id, padrao_str, registros, stats)
+        padroes = gerar_padroes_segmentados(db, user_id, padrao_str, registros, stats, categorias)
         saida.extend(padroes)
-    
-    # 4. Filtrar apenas alta confiança (>= 95% consistência e >= 2 ocorrências)
-    filtrados = [
-        p for p in saida 
+
+    return [
+        p for p in saida
         if p['contagem'] >= 2 and p['percentual_consistencia'] >= 95
     ]
+
+
+def gerar_base_padroes(db: Session, user_id: int) -> List[Dict]:
+    """
+    Gera base_padroes a partir de journal_entries
+    
+    Processo:
+    1. Buscar todas as transações do usuário
+    2. Agrupar por padrão normalizado
+    3. Calcular estatísticas por grupo
+    4. Gerar padrões (segmentados ou simples)
+    5. Filtrar apenas alta confiança
+    
+    Returns:
+        Lista de dicionários com padrões gerados
+    """
+    # 1. Buscar transações
+    transacoes = db.query(JournalEntry).filter(
+        JournalEntry.user_id == user_id
+    ).all()
+    
+    if not transacoes:
+        return []
     
-    return filtrados
+    # 2. Agrupar por padrão
+    buckets = agrupar_por_padrao(transacoes)
+    
+    # 3-4. Gerar padrões e filtrar alta confiança
+    return gerar_padroes_dos_buckets(db, user_id, buckets)
 
 
 def atualizar_base_padroes(db: Session, user_id: int, padroes: List[Dict]) -> Tuple[int, int]:
@@ -541,3 +606,124 @@ def regenerar_base_padroes_completa(db: Session, user_id: int) -> Dict:
         'atualizados': atualizados,
         'user_id': user_id
     }
+
+
+# Campos sobrescritos quando o padrão já existe (padrao_num/padrao_estabelecimento ficam)
+CAMPOS_UPDATE_PADRAO = [
+    'contagem', 'valor_medio', 'valor_min', 'valor_max',
+    'desvio_padrao', 'coef_variacao', 'percentual_consistencia',
+    'confianca', 'grupo_sugerido', 'subgrupo_sugerido',
+    'tipo_gasto_sugerido', 'categoria_geral_sugerida',
+    'faixa_valor', 'segmentado', 'exemplos', 'status', 'data_criacao'
+]
+
+
+def upsert_base_padroes(db: Session, user_id: int, padroes: List[Dict]) -> int:
+    """
+    Upsert em lote: um único INSERT ... ON CONFLICT (user_id, padrao_num) DO UPDATE.
+    Mesma semântica de atualizar_base_padroes (sem commit — fica com o chamador).
+
+    Returns:
+        Número de padrões gravados
+    """
+    from sqlalchemy.dialects.postgresql import insert as pg_insert
+
+    # ON CONFLICT não aceita a mesma chave duas vezes no lote → último vence
+    por_hash: Dict[str, Dict] = {}
+    for padrao_dict in padroes:
+        if padrao_dict.get('padrao_num'):
+            por_hash[padrao_dict['padrao_num']] = {**padrao_dict, 'user_id': user_id}
+
+    if not por_hash:
+        return 0
+
+    stmt = pg_insert(BasePadroes).values(list(por_hash.values()))
+    stmt = stmt.on_conflict_do_update(
+        constraint='base_padroes_user_id_padrao_num_key',
+        set_={campo: stmt.excluded[campo] for campo in CAMPOS_UPDATE_PADRAO}
+    )
+    db.execute(stmt)
+    return len(por_hash)
+
+
+def atualizar_base_padroes_incremental(
+    db: Session,
+    user_id: int,
+    upload_history_ids: Optional[List[int]] = None,
+    transaction_ids: Optional[List[str]] = None,
+    chaves: Optional[List[str]] = None
+) -> Dict:
+    """
+    Atualização incremental de base_padroes — recalcula só os padrões tocados.
+
+    Chaves tocadas = ChavePadrao das transações dos uploads informados, das transações
+    editadas (IdTransacao) e `chaves` (ex.: chave antiga de uma transação cujo
+    Valor/Estabelecimento mudou). ChavePadrao é gravada na escrita (marker no upload,
+    create/update, demo) com chave_padrao(), e idx_je_user_chave_padrao
+    (user_id, ChavePadrao) entrega só as linhas desses buckets — sem varrer o journal
+    do usuário.
+
+    Os agregados de cada chave tocada (contagem, soma, dispersão, contagem de
+    classificações por faixa) são recalculados a partir de TODAS as transações do
+    bucket com estatisticas_do_padrao — o resultado é idêntico ao da regeneração
+    completa para essas chaves; as demais linhas de base_padroes não mudam, como
+    já acontece na regeneração completa. Gravação num único INSERT ... ON CONFLICT.
+
+    Returns:
+        Estatísticas da operação
+    """
+    import logging
+    from sqlalchemy import or_
+    logger = logging.getLogger(__name__)
+
+    # 1. Chaves tocadas (índices de upload_history_id/IdTransacao + a coluna persistida)
+    chaves = set(c for c in (chaves or []) if c)
+    filtros = []
+    if upload_history_ids:
+        filtros.append(JournalEntry.upload_history_id.in_(upload_history_ids))
+    if transaction_ids:
+        filtros.append(JournalEntry.IdTransacao.in_(transaction_ids))
+
+    if filtros:
+        chaves.update(
+            chave for (chave,) in db.query(JournalEntry.ChavePadrao).filter(
+                JournalEntry.user_id == user_id,
+                or_(*filtros),
+                JournalEntry.ChavePadrao.isnot(None),
+                JournalEntry.ChavePadrao != '',
+            ).distinct()
+        )
+
+    resultado = {
+        'chaves_tocadas': len(chaves),
+        'total_padroes_gerados': 0,
+        'gravados': 0,
+        'user_id': user_id
+    }
+    if not chaves:
+        return resultado
+
+    # 2. Buckets só das chaves tocadas (busca indexada por ChavePadrao, projeção leve)
+    linhas = db.query(
+        JournalEntry.Estabelecimento, JournalEntry.Valor, JournalEntry.tipodocumento,
+        JournalEntry.GRUPO, JournalEntry.SUBGRUPO, JournalEntry.TipoGasto, JournalEntry.Data
+    ).filter(
+        JournalEntry.user_id == user_id,
+        JournalEntry.ChavePadrao.in_(chaves)
+    ).all()
+    buckets = agrupar_por_padrao(linhas, chaves=chaves)
+
+    # 3. Estatísticas + filtro de alta confiança (categorias em 1 query)
+    categorias = carregar_categorias_por_grupo(db, user_id)
+    padroes = gerar_padroes_dos_buckets(db, user_id, buckets, categorias)
+
+    # 4. Upsert em lote
+    resultado['total_padroes_gerados'] = len(padroes)
+    resultado['gravados'] = upsert_base_padroes(db, user_id, padroes)
+    db.commit()
+
+    logger.info(
+        f"✅ Base padrões (incremental): {len(chaves)} chaves tocadas, "
+        f"{resultado['gravados']} padrões gravados"
+    )
+    return resultado
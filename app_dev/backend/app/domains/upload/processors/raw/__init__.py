@@ -4,10 +4,11 @@ Processadores brutos por banco/tipo
 """
 
 from .base import RawTransaction, BalanceValidation
-from .registry import get_processor
+from .registry import get_processor, process_file
 
 __all__ = [
     "RawTransaction",
     "BalanceValidation",
     "get_processor",
+    "process_file",
 ]
@@ -19,6 +19,10 @@ class PasswordRequiredException(Exception):
         )
         super().__init__(msg)
 
+    def __reduce__(self):
+        # Preserva filename/wrong_password ao atravessar o pool de processos
+        return (self.__class__, (self.filename, self.wrong_password))
+
 from dataclasses import dataclass
 from datetime import datetime
 from typing import Optional
@@ -1,13 +1,27 @@
 """
 Processadores PDF para extração de transações bancárias e faturas.
+
+Exportados sob demanda (PEP 562): importar o pacote (ex: pdf.ocr_engine) não carrega
+pdfplumber nem os outros processadores.
 """
 
-from .itau_extrato_pdf import process_itau_extrato_pdf
-from .itau_fatura_pdf import process_itau_fatura_pdf
-from .mercadopago_extrato_pdf import process_mercadopago_extrato_pdf
+import importlib
+
+_LAZY = {
+    "process_itau_extrato_pdf": ".itau_extrato_pdf",
+    "process_itau_fatura_pdf": ".itau_fatura_pdf",
+    "process_mercadopago_extrato_pdf": ".mercadopago_extrato_pdf",
+}
+
+
+def __getattr__(name):
+    if name in _LAZY:
+        return getattr(importlib.import_module(_LAZY[name], __name__), name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
 
 __all__ = [
     "process_itau_extrato_pdf",
-    "process_itau_fatura_pdf", 
+    "process_itau_fatura_pdf",
     "process_mercadopago_extrato_pdf",
 ]
@@ -14,7 +14,8 @@ DEPENDÊNCIAS:
 NOTA DE PERFORMANCE:
     - Sem download de modelos na primeira execução
     - Por página: ~1-4s (CPU) dependendo do hardware
-    - Por fatura: ~8-20s (5-7 páginas úteis)
+    - Páginas em paralelo no pool OCR com modelo pré-carregado (ver ocr_engine.py);
+      o parse das linhas segue sequencial, na ordem das páginas
 
 RETORNO: Tuple[List[RawTransaction], BalanceValidation]
     - saldo_inicial=0.0 (fatura, sem saldo inicial)
@@ -33,23 +34,10 @@ from typing import List, Optional, Tuple
 import fitz  # PyMuPDF
 
 from ..base import RawTransaction, BalanceValidation
+from .ocr_engine import ocr_paginas
 
 logger = logging.getLogger(__name__)
 
-# ─── Cache do leitor OCR (rapidocr: inicialização rápida, sem download)
-_ocr_reader = None
-
-
-def _get_reader():
-    """Retorna o leitor RapidOCR inicializado (singleton)."""
-    global _ocr_reader
-    if _ocr_reader is None:
-        from rapidocr_onnxruntime import RapidOCR
-        logger.info("Inicializando RapidOCR...")
-        _ocr_reader = RapidOCR()
-        logger.info("RapidOCR pronto.")
-    return _ocr_reader
-
 
 # ─── Regex de apoio ────────────────────────────────────────────────────────────
 
@@ -140,23 +128,24 @@ def process_mercadopago_fatura_pdf(
     else:
         logger.warning("Total a pagar não encontrado na capa")
 
-    # ── OCR em cada página de transações ──────────────────────────────────────
-    reader = _get_reader()
-    transactions: List[RawTransaction] = []
-    pagamento_fatura_valor: Optional[float] = None
-    pagamento_fatura_data: Optional[str] = None
-
+    # ── Páginas de transações (texto nativo, rápido: parcelamento é ignorado) ──
+    paginas_ocr: List[int] = []
     for page_num in range(1, doc.page_count):
-        page = doc[page_num]
-
-        # Verificar rapidamente se é página de parcelamento (ignorar)
-        quick_text = page.get_text('text')
+        quick_text = doc[page_num].get_text('text')
         if _is_installment_page(quick_text):
             logger.debug(f"Pág {page_num + 1}: página de parcelamento — ignorada")
             continue
+        paginas_ocr.append(page_num)
+
+    doc.close()
+
+    # ── OCR das páginas em paralelo; parse na ordem das páginas ───────────────
+    transactions: List[RawTransaction] = []
+    pagamento_fatura_valor: Optional[float] = None
+    pagamento_fatura_data: Optional[str] = None
 
-        logger.debug(f"Pág {page_num + 1}: rodando OCR...")
-        rows = _ocr_page_to_rows(reader, page)
+    logger.debug(f"Rodando OCR em {len(paginas_ocr)} páginas...")
+    for page_num, (rows, _metrica) in zip(paginas_ocr, ocr_paginas(file_path, paginas_ocr)):
         page_transactions, pag_valor, pag_data = _parse_rows(
             rows, nome_arquivo, nome_cartao, mes_fatura,
             ano_fatura, num_mes_fatura, data_criacao
@@ -167,8 +156,6 @@ def process_mercadopago_fatura_pdf(
             pagamento_fatura_data = pag_data
         logger.debug(f"Pág {page_num + 1}: {len(page_transactions)} transações extraídas")
 
-    doc.close()
-
     # ── Ajuste de saldo anterior ──────────────────────────────────────────────
     # Se o pagamento real da fatura (linha 'Pagamento da fatura' no PDF) for
     # maior que a soma das compras do período, a diferença corresponde a um
@@ -213,80 +200,6 @@ def process_mercadopago_fatura_pdf(
     return transactions, balance
 
 
-# ─── OCR: renderizar página e agrupar por linha ────────────────────────────────
-
-def _ocr_page_to_rows(reader, page) -> List[List[Tuple]]:
-    """
-    Renderiza página como imagem, aplica OCR e agrupa resultados por linha.
-
-    Returns:
-        Lista de linhas. Cada linha é uma lista de (bbox, text, conf)
-        ordenada da esquerda para a direita.
-    """
-    import numpy as np
-    # Renderizar em 3x (≈216 DPI) — resolução suficiente para OCR preciso
-    mat = fitz.Matrix(3.0, 3.0)
-    pix = page.get_pixmap(matrix=mat)
-    img_bytes = pix.tobytes('png')
-
-    # rapidocr retorna: List[ [bbox, text, score] ] ou None
-    result, elapse = reader(img_bytes)
-    if not result:
-        return []
-
-    # Normalizar para o mesmo formato que easyocr: (bbox, text, conf)
-    # rapidocr bbox: [[x1,y1],[x2,y1],[x2,y2],[x1,y2]]
-    normalized = []
-    for item in result:
-        bbox_raw, text, conf = item[0], item[1], item[2] if len(item) > 2 else 0.9
-        # Converter para lista de 4 pontos [[x1,y1],...] se vier como array
-        if hasattr(bbox_raw, 'tolist'):
-            bbox = [list(p) for p in bbox_raw.tolist()]
-        else:
-            bbox = [list(p) for p in bbox_raw]
-        normalized.append((bbox, text, float(conf) if conf is not None else 0.9))
-
-    # Agrupar por y (centro da bbox), tolerância de 25px na imagem 3x
-    return _group_by_row(normalized, y_tolerance=25)
-
-
-def _group_by_row(results, y_tolerance: int = 25) -> List[List[Tuple]]:
-    """
-    Agrupa elementos OCR pelo eixo Y (mesma linha visual).
-    Compatível com bbox de 4 pontos: [[x1,y1],[x2,y1],[x2,y2],[x1,y2]]
-    """
-    if not results:
-        return []
-
-    items = list(enumerate(results))
-    # bbox[0][1] = y do ponto superior-esquerdo
-    items_sorted = sorted(items, key=lambda x: x[1][0][0][1])
-    used = [False] * len(results)
-    rows = []
-
-    for i, (orig_i, (bbox, text, conf)) in enumerate(items_sorted):
-        if used[orig_i]:
-            continue
-        # Centro Y entre ponto 0 (top) e ponto 2 (bottom)
-        y_center = (bbox[0][1] + bbox[2][1]) / 2
-        row = [(bbox, text, conf)]
-        used[orig_i] = True
-
-        for j, (orig_j, (bbox2, text2, conf2)) in enumerate(items_sorted):
-            if used[orig_j]:
-                continue
-            y2_center = (bbox2[0][1] + bbox2[2][1]) / 2
-            if abs(y_center - y2_center) < y_tolerance:
-                row.append((bbox2, text2, conf2))
-                used[orig_j] = True
-
-        # Ordenar da esquerda para direita dentro da linha
-        row.sort(key=lambda x: x[0][0][0])
-        rows.append(row)
-
-    return rows
-
-
 # ─── Parser de linhas OCR ──────────────────────────────────────────────────────
 
 def _parse_rows(
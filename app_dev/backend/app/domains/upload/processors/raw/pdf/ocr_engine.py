@@ -0,0 +1,365 @@
+"""
+Motor OCR por página — usado pela fatura Mercado Pago PDF (mercadopago_fatura_pdf.py).
+
+Antes: cada página era renderizada em 3x e passada ao RapidOCR em sequência, e o modelo
+ONNX só era carregado no primeiro upload depois de cada start do worker.
+
+Agora:
+    - Pool de processos próprio (spawn) com initializer que carrega o modelo uma vez por
+      processo. Dono único: o processo da API — o registry não manda este parser ao pool
+      de upload (registry.usa_pool_proprio), e dentro de um worker de upload não se cria
+      pool aninhado (OCR inline). Modelos residentes por worker da API = OCR_PROCESS_WORKERS
+    - Fan-out por página (pool.map) com merge na ordem das páginas — o parser continua
+      sequencial sobre as linhas, então as transações extraídas são idênticas
+    - Caminho rápido opcional (OCR_FAST_PATH): cinza + zoom menor; confiança média abaixo
+      de OCR_FAST_PATH_MIN_CONFIDENCE (ou página vazia) refaz a página no render 3x padrão
+    - Métricas por página (render, OCR, itens, confiança, fallback) no log
+
+Configuração (Settings):
+    OCR_PROCESS_WORKERS          — processos OCR (default 2; 0 = páginas em sequência, inline)
+    OCR_PREWARM                  — sobe o pool no startup da API (ver app/main.py)
+    OCR_FAST_PATH                — liga o caminho rápido (default False: saída byte a byte igual)
+    OCR_FAST_PATH_ZOOM           — zoom do caminho rápido (default 2.0)
+    OCR_FAST_PATH_MIN_CONFIDENCE — limiar de confiança média do caminho rápido (default 0.9)
+
+O que vai ao pool é nível de módulo e picklable: caminho do PDF + nº da página; cada
+worker reabre o PDF com fitz (Document/Page não atravessam processos).
+"""
+
+import logging
+import multiprocessing
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from dataclasses import dataclass
+from itertools import repeat
+from pathlib import Path
+from typing import List, Optional, Sequence, Tuple, Union
+
+import fitz  # PyMuPDF
+
+from app.core.config import settings
+from app.core.executors import em_worker_de_upload
+
+logger = logging.getLogger(__name__)
+
+# Render padrão: 3x (≈216 DPI) — resolução suficiente para OCR preciso
+ZOOM_PADRAO = 3.0
+# Tolerância (px na imagem 3x) para agrupar itens OCR na mesma linha visual
+Y_TOLERANCIA = 25
+
+# ─── Cache do leitor OCR (rapidocr: inicialização rápida, sem download)
+_ocr_reader = None
+
+_lock = threading.Lock()
+_ocr_pool: Optional[ProcessPoolExecutor] = None
+
+
+def _get_reader():
+    """Retorna o leitor RapidOCR inicializado (singleton por processo)."""
+    global _ocr_reader
+    if _ocr_reader is None:
+        from rapidocr_onnxruntime import RapidOCR
+        logger.info("Inicializando RapidOCR...")
+        _ocr_reader = RapidOCR()
+        logger.info("RapidOCR pronto.")
+    return _ocr_reader
+
+
+@dataclass(frozen=True)
+class OpcoesOCR:
+    """Opções do OCR por página (picklable — viaja junto com cada página ao pool)."""
+    fast_path: bool = False
+    zoom_rapido: float = 2.0
+    confianca_minima: float = 0.9
+
+    @classmethod
+    def de_settings(cls) -> "OpcoesOCR":
+        return cls(
+            fast_path=settings.OCR_FAST_PATH,
+            zoom_rapido=settings.OCR_FAST_PATH_ZOOM,
+            confianca_minima=settings.OCR_FAST_PATH_MIN_CONFIDENCE,
+        )
+
+
+@dataclass
+class MetricaPagina:
+    """Tempos e qualidade do OCR de uma página."""
+    pagina: int  # 1-based, como nos logs do processador
+    zoom: float
+    render_ms: float
+    ocr_ms: float
+    itens: int
+    confianca_media: Optional[float]
+    fallback: bool = False  # caminho rápido rejeitado → página refeita em 3x
+
+    @property
+    def total_ms(self) -> float:
+        return self.render_ms + self.ocr_ms
+
+
+# ─── Pool de processos OCR ──────────────────────────────────────────────────────
+
+def _inicializar_worker() -> None:
+    """Initializer do pool: carrega o modelo antes da primeira página."""
+    _get_reader()
+
+
+def _ping() -> bool:
+    return True
+
+
+def get_ocr_pool() -> Optional[ProcessPoolExecutor]:
+    """
+    Pool de processos OCR (lazy, no processo da API). Retorna None se OCR_PROCESS_WORKERS=0
+    ou se chamado dentro de um worker do pool de upload (sem pools aninhados: OCR inline).
+
+    Usa 'spawn' pelo mesmo motivo de app.core.executors: fork com threads/conexões abertas
+    não é seguro.
+    """
+    global _ocr_pool
+    if settings.OCR_PROCESS_WORKERS <= 0 or em_worker_de_upload():
+        return None
+    if _ocr_pool is None:
+        with _lock:
+            if _ocr_pool is None:
+                _ocr_pool = ProcessPoolExecutor(
+                    max_workers=settings.OCR_PROCESS_WORKERS,
+                    mp_context=multiprocessing.get_context("spawn"),
+                    initializer=_inicializar_worker,
+                )
+    return _ocr_pool
+
+
+def _descartar_pool(pool: ProcessPoolExecutor) -> None:
+    """Remove um pool quebrado (worker morto por OOM/segfault); o próximo uso recria."""
+    global _ocr_pool
+    with _lock:
+        if _ocr_pool is pool:
+            _ocr_pool = None
+    pool.shutdown(wait=False, cancel_futures=True)
+
+
+def aquecer_pool_ocr() -> None:
+    """
+    Sobe o pool OCR e espera todos os workers com o modelo carregado (idempotente).
+    Sem pool (OCR_PROCESS_WORKERS=0), carrega o modelo no próprio processo.
+
+    Um _ping por worker, todos em voo ao mesmo tempo: o pool 'spawn' cria um processo
+    novo a cada submit sem worker ocioso, até OCR_PROCESS_WORKERS.
+    """
+    pool = get_ocr_pool()
+    if pool is None:
+        _get_reader()
+        return
+    try:
+        futuros = [pool.submit(_ping) for _ in range(settings.OCR_PROCESS_WORKERS)]
+        for futuro in futuros:
+            futuro.result()
+    except BrokenProcessPool:
+        logger.warning("⚠️ Pool OCR quebrado no aquecimento — será recriado no próximo upload")
+        _descartar_pool(pool)
+
+
+def encerrar_pool_ocr() -> None:
+    """Encerra o pool OCR deste processo (chamado no shutdown da aplicação)."""
+    global _ocr_pool
+    with _lock:
+        if _ocr_pool is not None:
+            _ocr_pool.shutdown(wait=False, cancel_futures=True)
+            _ocr_pool = None
+
+
+# ─── OCR de uma página ──────────────────────────────────────────────────────────
+
+def _ocr_itens(reader, page, zoom: float = ZOOM_PADRAO, cinza: bool = False) -> Tuple[List[Tuple], float, float]:
+    """
+    Renderiza a página e aplica OCR.
+
+    Returns:
+        (itens, render_s, ocr_s) — itens no formato (bbox, text, conf), bbox com
+        4 pontos [[x1,y1],[x2,y1],[x2,y2],[x1,y2]] em pixels da imagem renderizada
+    """
+    inicio = time.perf_counter()
+    mat = fitz.Matrix(zoom, zoom)
+    if cinza:
+        pix = page.get_pixmap(matrix=mat, colorspace=fitz.csGRAY)
+    else:
+        pix = page.get_pixmap(matrix=mat)
+    img_bytes = pix.tobytes('png')
+    render_s = time.perf_counter() - inicio
+
+    # rapidocr retorna: List[ [bbox, text, score] ] ou None
+    inicio = time.perf_counter()
+    result, elapse = reader(img_bytes)
+    ocr_s = time.perf_counter() - inicio
+    if not result:
+        return [], render_s, ocr_s
+
+    # Normalizar para o mesmo formato que easyocr: (bbox, text, conf)
+    # rapidocr bbox: [[x1,y1],[x2,y1],[x2,y2],[x1,y2]]
+    normalized = []
+    for item in result:
+        bbox_raw, text, conf = item[0], item[1], item[2] if len(item) > 2 else 0.9
+        # Converter para lista de 4 pontos [[x1,y1],...] se vier como array
+        if hasattr(bbox_raw, 'tolist'):
+            bbox = [list(p) for p in bbox_raw.tolist()]
+        else:
+            bbox = [list(p) for p in bbox_raw]
+        normalized.append((bbox, text, float(conf) if conf is not None else 0.9))
+    return normalized, render_s, ocr_s
+
+
+def _reescalar(itens: List[Tuple], fator: float) -> List[Tuple]:
+    """Leva as bboxes do zoom do caminho rápido para a escala 3x (Y_TOLERANCIA é em px 3x)."""
+    return [
+        ([[x * fator, y * fator] for x, y in bbox], text, conf)
+        for bbox, text, conf in itens
+    ]
+
+
+def _confianca_media(itens: List[Tuple]) -> Optional[float]:
+    if not itens:
+        return None
+    return sum(conf for _, _, conf in itens) / len(itens)
+
+
+def _ocr_page_to_rows(reader, page) -> List[List[Tuple]]:
+    """
+    Renderiza página em 3x, aplica OCR e agrupa resultados por linha.
+
+    Returns:
+        Lista de linhas. Cada linha é uma lista de (bbox, text, conf)
+        ordenada da esquerda para a direita.
+    """
+    itens, _, _ = _ocr_itens(reader, page)
+    return _group_by_row(itens, y_tolerance=Y_TOLERANCIA)
+
+
+def _ocr_pagina(caminho: str, page_num: int, opcoes: OpcoesOCR) -> Tuple[List[List[Tuple]], MetricaPagina]:
+    """
+    OCR de uma página do PDF (nível de módulo: roda no pool ou inline).
+
+    Caminho rápido (opcoes.fast_path): cinza + zoom_rapido; aceito só se a confiança
+    média ≥ confianca_minima — senão a página é refeita no render 3x padrão.
+    """
+    reader = _get_reader()
+    render_s = ocr_s = 0.0
+    fallback = False
+    doc = fitz.open(caminho)
+    try:
+        page = doc[page_num]
+
+        if opcoes.fast_path and opcoes.zoom_rapido < ZOOM_PADRAO:
+            itens, r, o = _ocr_itens(reader, page, opcoes.zoom_rapido, cinza=True)
+            render_s, ocr_s = render_s + r, ocr_s + o
+            confianca = _confianca_media(itens)
+            if confianca is not None and confianca >= opcoes.confianca_minima:
+                rows = _group_by_row(_reescalar(itens, ZOOM_PADRAO / opcoes.zoom_rapido), y_tolerance=Y_TOLERANCIA)
+                return rows, MetricaPagina(
+                    pagina=page_num + 1, zoom=opcoes.zoom_rapido,
+                    render_ms=render_s * 1000, ocr_ms=ocr_s * 1000,
+                    itens=len(itens), confianca_media=confianca,
+                )
+            fallback = True
+
+        itens, r, o = _ocr_itens(reader, page)
+        render_s, ocr_s = render_s + r, ocr_s + o
+    finally:
+        doc.close()
+
+    return _group_by_row(itens, y_tolerance=Y_TOLERANCIA), MetricaPagina(
+        pagina=page_num + 1, zoom=ZOOM_PADRAO,
+        render_ms=render_s * 1000, ocr_ms=ocr_s * 1000,
+        itens=len(itens), confianca_media=_confianca_media(itens), fallback=fallback,
+    )
+
+
+def ocr_paginas(
+    caminho: Union[str, Path],
+    paginas: Sequence[int],
+    opcoes: Optional[OpcoesOCR] = None,
+) -> List[Tuple[List[List[Tuple]], MetricaPagina]]:
+    """
+    OCR das páginas (índices 0-based) em paralelo no pool, na ordem de `paginas`.
+
+    Fallback: sem pool configurado ou pool quebrado, processa as páginas em sequência
+    no processo atual — o upload não falha por causa do executor.
+
+    Returns:
+        [(linhas, métrica)] — um item por página, na mesma ordem da entrada
+    """
+    paginas = list(paginas)
+    if not paginas:
+        return []
+    opcoes = opcoes or OpcoesOCR.de_settings()
+    caminho = str(caminho)
+    inicio = time.perf_counter()
+
+    resultados = None
+    pool = get_ocr_pool()
+    if pool is not None:
+        try:
+            # map preserva a ordem de entrada, independente de qual página termina antes
+            resultados = list(pool.map(_ocr_pagina, repeat(caminho), paginas, repeat(opcoes)))
+        except BrokenProcessPool:
+            logger.warning("⚠️ Pool OCR quebrado — recriando e executando as páginas inline")
+            _descartar_pool(pool)
+    if resultados is None:
+        resultados = [_ocr_pagina(caminho, page_num, opcoes) for page_num in paginas]
+
+    _log_metricas([metrica for _, metrica in resultados], time.perf_counter() - inicio)
+    return resultados
+
+
+def _log_metricas(metricas: List[MetricaPagina], total_s: float) -> None:
+    for m in metricas:
+        confianca = f"{m.confianca_media:.3f}" if m.confianca_media is not None else "-"
+        logger.debug(
+            f"Pág {m.pagina}: OCR {m.zoom:g}x | render {m.render_ms:.0f}ms | ocr {m.ocr_ms:.0f}ms | "
+            f"{m.itens} itens | conf {confianca}{' | fallback 3x' if m.fallback else ''}"
+        )
+    logger.info(
+        f"⏱️ OCR: {len(metricas)} páginas em {total_s * 1000:.0f}ms "
+        f"(soma por página: render {sum(m.render_ms for m in metricas):.0f}ms, "
+        f"ocr {sum(m.ocr_ms for m in metricas):.0f}ms; "
+        f"{sum(m.fallback for m in metricas)} fallback)"
+    )
+
+
+def _group_by_row(results, y_tolerance: int = Y_TOLERANCIA) -> List[List[Tuple]]:
+    """
+    Agrupa elementos OCR pelo eixo Y (mesma linha visual).
+    Compatível com bbox de 4 pontos: [[x1,y1],[x2,y1],[x2,y2],[x1,y2]]
+    """
+    if not results:
+        return []
+
+    items = list(enumerate(results))
+    # bbox[0][1] = y do ponto superior-esquerdo
+    items_sorted = sorted(items, key=lambda x: x[1][0][0][1])
+    used = [False] * len(results)
+    rows = []
+
+    for i, (orig_i, (bbox, text, conf)) in enumerate(items_sorted):
+        if used[orig_i]:
+            continue
+        # Centro Y entre ponto 0 (top) e ponto 2 (bottom)
+        y_center = (bbox[0][1] + bbox[2][1]) / 2
+        row = [(bbox, text, conf)]
+        used[orig_i] = True
+
+        for j, (orig_j, (bbox2, text2, conf2)) in enumerate(items_sorted):
+            if used[orig_j]:
+                continue
+            y2_center = (bbox2[0][1] + bbox2[2][1]) / 2
+            if abs(y_center - y2_center) < y_tolerance:
+                row.append((bbox2, text2, conf2))
+                used[orig_j] = True
+
+        # Ordenar da esquerda para direita dentro da linha
+        row.sort(key=lambda x: x[0][0][0])
+        rows.append(row)
+
+    return rows
@@ -1,26 +1,21 @@
 """
 Registry de processadores raw
 Mapeia (banco, tipo, formato) → função processadora
+
+Lazy: o registry guarda o caminho "módulo:função" e só importa o processador (e com ele
+pandas, openpyxl, pdfplumber, PyMuPDF, OCR...) no primeiro get_processor que o usa.
+Importar app.main não carrega nenhum parser — worker que nunca recebe upload não paga
+o tempo de import nem a memória deles (ver tests/test_import_time.py).
 """
 
+import functools
+import importlib
 import logging
 import unicodedata
 from typing import Callable, Optional, Tuple, List
 from pathlib import Path
-import pandas as pd
 
 from .base import RawTransaction
-from .csv.itau_fatura import process_itau_fatura as csv_itau_fatura
-from .excel.itau_extrato import process_itau_extrato
-from .excel.btg_extrato import process_btg_extrato
-from .excel.mercadopago_extrato import process_mercadopago_extrato
-from .pdf.itau_extrato_pdf import process_itau_extrato_pdf
-from .pdf.itau_fatura_pdf import process_itau_fatura_pdf
-from .pdf.mercadopago_extrato_pdf import process_mercadopago_extrato_pdf
-from .pdf.btg_fatura_pdf import process_btg_fatura_pdf
-from .pdf.btg_extrato_pdf import process_btg_extrato_pdf
-from .excel.btg_fatura_xlsx import process_btg_fatura_xlsx
-from .pdf.mercadopago_fatura_pdf import process_mercadopago_fatura_pdf
 
 logger = logging.getLogger(__name__)
 
@@ -37,37 +32,67 @@ def _wrap_extrato_pdf(processor_func):
         return transactions
     return wrapper
 
-# Registry de processadores (banco, tipo, formato)
-PROCESSORS: dict[Tuple[str, str, str], ProcessorFunc] = {
+# Caminhos "módulo:função" relativos a este pacote
+ITAU_FATURA_CSV = '.csv.itau_fatura:process_itau_fatura'
+ITAU_EXTRATO_EXCEL = '.excel.itau_extrato:process_itau_extrato'
+ITAU_EXTRATO_PDF = '.pdf.itau_extrato_pdf:process_itau_extrato_pdf'
+ITAU_FATURA_PDF = '.pdf.itau_fatura_pdf:process_itau_fatura_pdf'
+BTG_EXTRATO_EXCEL = '.excel.btg_extrato:process_btg_extrato'
+BTG_EXTRATO_PDF = '.pdf.btg_extrato_pdf:process_btg_extrato_pdf'
+BTG_FATURA_EXCEL = '.excel.btg_fatura_xlsx:process_btg_fatura_xlsx'
+BTG_FATURA_PDF = '.pdf.btg_fatura_pdf:process_btg_fatura_pdf'
+MP_EXTRATO_EXCEL = '.excel.mercadopago_extrato:process_mercadopago_extrato'
+MP_EXTRATO_PDF = '.pdf.mercadopago_extrato_pdf:process_mercadopago_extrato_pdf'
+MP_FATURA_PDF = '.pdf.mercadopago_fatura_pdf:process_mercadopago_fatura_pdf'
+
+# Processadores carregados com _wrap_extrato_pdf
+_EXTRATOS_PDF_COM_SALDO = (ITAU_EXTRATO_PDF, MP_EXTRATO_PDF)
+
+# Processadores com pool de processos próprio (OCR por página em ocr_engine.py): rodam na
+# thread do processo da API, nunca no pool de upload — um único dono para o pool OCR
+_COM_POOL_PROPRIO = (MP_FATURA_PDF,)
+
+# Registry de processadores (banco, tipo, formato) → "módulo:função"
+PROCESSORS: dict[Tuple[str, str, str], str] = {
     # Itaú
-    ('itau', 'fatura', 'csv'): csv_itau_fatura,
-    ('itau', 'extrato', 'excel'): process_itau_extrato,
-    ('itau', 'extrato', 'pdf'): _wrap_extrato_pdf(process_itau_extrato_pdf),
-    ('itau', 'fatura', 'pdf'): process_itau_fatura_pdf,
+    ('itau', 'fatura', 'csv'): ITAU_FATURA_CSV,
+    ('itau', 'extrato', 'excel'): ITAU_EXTRATO_EXCEL,
+    ('itau', 'extrato', 'pdf'): ITAU_EXTRATO_PDF,
+    ('itau', 'fatura', 'pdf'): ITAU_FATURA_PDF,
     # BTG Pactual - Extrato XLS
-    ('btg', 'extrato', 'excel'): process_btg_extrato,
-    ('btg pactual', 'extrato', 'excel'): process_btg_extrato,
-    ('btg-pactual', 'extrato', 'excel'): process_btg_extrato,  # Variação com hífen
+    ('btg', 'extrato', 'excel'): BTG_EXTRATO_EXCEL,
+    ('btg pactual', 'extrato', 'excel'): BTG_EXTRATO_EXCEL,
+    ('btg-pactual', 'extrato', 'excel'): BTG_EXTRATO_EXCEL,  # Variação com hífen
     # BTG Pactual - Extrato PDF
-    ('btg', 'extrato', 'pdf'): process_btg_extrato_pdf,
-    ('btg pactual', 'extrato', 'pdf'): process_btg_extrato_pdf,
-    ('btg-pactual', 'extrato', 'pdf'): process_btg_extrato_pdf,
+    ('btg', 'extrato', 'pdf'): BTG_EXTRATO_PDF,
+    ('btg pactual', 'extrato', 'pdf'): BTG_EXTRATO_PDF,
+    ('btg-pactual', 'extrato', 'pdf'): BTG_EXTRATO_PDF,
     # BTG Pactual - Fatura
-    ('btg', 'fatura', 'excel'): process_btg_fatura_xlsx,
-    ('btg pactual', 'fatura', 'excel'): process_btg_fatura_xlsx,
-    ('btg', 'fatura', 'pdf'): process_btg_fatura_pdf,
-    ('btg pactual', 'fatura', 'pdf'): process_btg_fatura_pdf,
+    ('btg', 'fatura', 'excel'): BTG_FATURA_EXCEL,
+    ('btg pactual', 'fatura', 'excel'): BTG_FATURA_EXCEL,
+    ('btg', 'fatura', 'pdf'): BTG_FATURA_PDF,
+    ('btg pactual', 'fatura', 'pdf'): BTG_FATURA_PDF,
     # Mercado Pago
-    ('mercado pago', 'extrato', 'excel'): process_mercadopago_extrato,
-    ('mercadopago', 'extrato', 'excel'): process_mercadopago_extrato,  # Variação sem espaço
-    ('mercado pago', 'extrato', 'pdf'): _wrap_extrato_pdf(process_mercadopago_extrato_pdf),
-    ('mercadopago', 'extrato', 'pdf'): _wrap_extrato_pdf(process_mercadopago_extrato_pdf),
+    ('mercado pago', 'extrato', 'excel'): MP_EXTRATO_EXCEL,
+    ('mercadopago', 'extrato', 'excel'): MP_EXTRATO_EXCEL,  # Variação sem espaço
+    ('mercado pago', 'extrato', 'pdf'): MP_EXTRATO_PDF,
+    ('mercadopago', 'extrato', 'pdf'): MP_EXTRATO_PDF,
     # Mercado Pago - Fatura
-    ('mercado pago', 'fatura', 'pdf'): process_mercadopago_fatura_pdf,
-    ('mercadopago', 'fatura', 'pdf'): process_mercadopago_fatura_pdf,
+    ('mercado pago', 'fatura', 'pdf'): MP_FATURA_PDF,
+    ('mercadopago', 'fatura', 'pdf'): MP_FATURA_PDF,
 }
 
 
+@functools.lru_cache(maxsize=None)
+def _load_processor(caminho: str) -> ProcessorFunc:
+    """Importa o processador "módulo:função" (1 vez por processo)."""
+    modulo, funcao = caminho.split(':')
+    processor = getattr(importlib.import_module(modulo, __package__), funcao)
+    if caminho in _EXTRATOS_PDF_COM_SALDO:
+        return _wrap_extrato_pdf(processor)
+    return processor
+
+
 def _normalize_bank_name(banco: str) -> str:
     """
     Normaliza nome do banco: lowercase + remove acentos
@@ -91,6 +116,30 @@ def _normalize_bank_name(banco: str) -> str:
     return banco_sem_acento
 
 
+def _resolver_caminho(banco: str, tipo_documento: str, formato: str = None) -> Optional[str]:
+    """Caminho "módulo:função" para banco/tipo/formato (sem importar o processador)."""
+    banco_norm = _normalize_bank_name(banco)
+    tipo_norm = tipo_documento.lower()
+    formato_norm = formato.lower() if formato else None
+
+    # Tentar com formato especificado
+    if formato_norm:
+        caminho = PROCESSORS.get((banco_norm, tipo_norm, formato_norm))
+        if caminho:
+            return caminho
+
+    # Fallback: buscar qualquer formato (retrocompatibilidade)
+    for (b, t, f), caminho in PROCESSORS.items():
+        if b == banco_norm and t == tipo_norm:
+            return caminho
+    return None
+
+
+def usa_pool_proprio(banco: str, tipo_documento: str, formato: str = None) -> bool:
+    """True se o processador paraleliza sozinho (não deve ir ao pool de upload)."""
+    return _resolver_caminho(banco, tipo_documento, formato) in _COM_POOL_PROPRIO
+
+
 def get_processor(banco: str, tipo_documento: str, formato: str = None) -> Optional[ProcessorFunc]:
     """
     Retorna o processador adequado para banco, tipo e formato
@@ -103,27 +152,50 @@ def get_processor(banco: str, tipo_documento: str, formato: str = None) -> Optio
     Returns:
         Função processadora ou None se não encontrado
     """
-    # Normalizar entrada
+    caminho = _resolver_caminho(banco, tipo_documento, formato)
+    if caminho:
+        logger.info(f"✅ Processador encontrado: {caminho}")
+        return _load_processor(caminho)
+
     banco_norm = _normalize_bank_name(banco)
     tipo_norm = tipo_documento.lower()
     formato_norm = formato.lower() if formato else None
-    
-    # Tentar com formato especificado
-    if formato_norm:
-        key = (banco_norm, tipo_norm, formato_norm)
-        processor = PROCESSORS.get(key)
-        
-        if processor:
-            logger.info(f"✅ Processador encontrado: {banco_norm}/{tipo_norm}/{formato_norm}")
-            return processor
-    
-    # Fallback: buscar qualquer formato (retrocompatibilidade)
-    for (b, t, f), proc in PROCESSORS.items():
-        if b == banco_norm and t == tipo_norm:
-            logger.info(f"✅ Processador encontrado (fallback): {b}/{t}/{f}")
-            return proc
-    
     logger.warning(f"⚠️ Processador não encontrado: {banco_norm}/{tipo_norm}/{formato_norm or 'auto'}")
     logger.info(f"📋 Processadores disponíveis: {list(PROCESSORS.keys())}")
     
     return None
+
+
+def process_file(
+    banco: str,
+    tipo_documento: str,
+    formato: str,
+    file_path: Path,
+    nome_arquivo: str,
+    nome_cartao: str = None,
+    final_cartao: str = None,
+    senha: str = None,
+):
+    """
+    Resolve o processador e processa o arquivo.
+
+    Ponto de entrada picklable para o pool de processos (app.core.executors):
+    os wrappers do registry são closures e não atravessam a fronteira de processo,
+    então o lookup é refeito no processo filho a partir de (banco, tipo, formato).
+
+    Returns:
+        Mesmo retorno do processador: List[RawTransaction] ou (List, BalanceValidation)
+
+    Raises:
+        ValueError: Se não houver processador para a combinação
+    """
+    processor = get_processor(banco, tipo_documento, formato)
+    if not processor:
+        raise ValueError(f"Processador não encontrado para {banco}/{tipo_documento}/{formato}")
+    return processor(
+        Path(file_path),
+        nome_arquivo,
+        nome_cartao,
+        final_cartao,
+        **({'senha': senha} if senha else {})
+    )
@@ -3,8 +3,8 @@ Domínio Upload - Repository
 Camada de acesso a dados - TODAS as queries SQL isoladas aqui
 """
 from sqlalchemy.orm import Session
-from sqlalchemy import func, desc
-from typing import Optional, List
+from sqlalchemy import func, desc, insert, literal, select
+from typing import Optional, List, Dict, Any
 from datetime import datetime
 import logging
 from .models import PreviewTransacao
@@ -78,6 +78,94 @@ class UploadRepository:
         self.db.commit()
         return previews
     
+    def bulk_insert_previews(self, rows: List[Dict[str, Any]]) -> int:
+        """
+        Insere previews em bulk (Core executemany — sem unit-of-work por objeto).
+        No PostgreSQL o SQLAlchemy agrupa as linhas em INSERTs multi-VALUES.
+
+        Usa a Table (não a entidade ORM): o bulk ORM quebra o lote em vários
+        executemany sempre que o conjunto de colunas NULL muda entre linhas.
+        Todas as linhas devem ter as mesmas chaves.
+        """
+        if not rows:
+            return 0
+        self.db.execute(PreviewTransacao.__table__.insert(), rows)
+        self.db.commit()
+        return len(rows)
+
+    def count_importable_by_mes(self, session_id: str, user_id: int) -> Dict[Optional[str], int]:
+        """Previews que serão importados (não duplicados, não excluídos) agrupados por mes_fatura"""
+        rows = self.db.query(
+            PreviewTransacao.mes_fatura,
+            func.count(PreviewTransacao.id),
+        ).filter(
+            PreviewTransacao.session_id == session_id,
+            PreviewTransacao.user_id == user_id,
+            PreviewTransacao.is_duplicate == False,
+            PreviewTransacao.excluir == 0,
+        ).group_by(PreviewTransacao.mes_fatura).all()
+        return {mes: total for mes, total in rows}
+
+    def move_preview_to_journal(
+        self,
+        session_id: str,
+        user_id: int,
+        journal_session_id: str,
+        upload_history_id: int,
+        created_at: datetime,
+    ) -> int:
+        """
+        Copia os previews importáveis para journal_entries num único
+        INSERT INTO journal_entries (...) SELECT ... FROM preview_transacoes — executado
+        inteiramente no banco, sem carregar nenhuma linha no Python.
+
+        Não faz commit (o chamador controla a transação). Retorna linhas inseridas.
+        """
+        from app.domains.transactions.models import JournalEntry
+
+        p = PreviewTransacao
+        colunas = {
+            'user_id': p.user_id,
+            'Data': p.data,
+            'data_transacao': p.data_transacao,
+            'Estabelecimento': p.lancamento,
+            'EstabelecimentoBase': p.EstabelecimentoBase,
+            'EstabelecimentoNorm': p.EstabelecimentoNorm,
+            'ChavePadrao': p.ChavePadrao,
+            'Valor': p.valor,
+            'ValorPositivo': p.ValorPositivo,
+            'MesFatura': func.replace(p.mes_fatura, '-', ''),
+            'arquivo_origem': p.nome_arquivo,
+            'banco_origem': p.banco,
+            'NomeCartao': p.nome_cartao,
+            'IdTransacao': p.IdTransacao,
+            'IdParcela': p.IdParcela,
+            'parcela_atual': p.ParcelaAtual,
+            'TotalParcelas': p.TotalParcelas,
+            'GRUPO': p.GRUPO,
+            'SUBGRUPO': p.SUBGRUPO,
+            'TipoGasto': p.TipoGasto,
+            'CategoriaGeral': p.CategoriaGeral,
+            'origem_classificacao': p.origem_classificacao,
+            'tipodocumento': p.tipo_documento,
+            'TipoTransacao': p.TipoTransacao,
+            'Ano': p.Ano,
+            'Mes': p.Mes,
+            'session_id': literal(journal_session_id),
+            'upload_history_id': literal(upload_history_id),
+            'created_at': literal(created_at, JournalEntry.created_at.type),
+        }
+        origem = select(*colunas.values()).where(
+            p.session_id == session_id,
+            p.user_id == user_id,
+            p.is_duplicate == False,
+            p.excluir == 0,
+        ).order_by(p.id)
+        result = self.db.execute(
+            insert(JournalEntry).from_select(list(colunas.keys()), origem)
+        )
+        return result.rowcount
+
     def session_exists(self, session_id: str, user_id: int) -> bool:
         """Verifica se sessão existe"""
         count = self.db.query(func.count(PreviewTransacao.id)).filter(
@@ -117,6 +205,16 @@ class UploadRepository:
         return self.db.query(UploadHistory).filter(
             UploadHistory.session_id == session_id
         ).first()
+
+    def get_imported_by_hash(self, user_id: int, arquivo_hash: str) -> Optional[UploadHistory]:
+        """Upload confirmado mais recente do usuário com exatamente este arquivo (SHA-256)"""
+        if not arquivo_hash:
+            return None
+        return self.db.query(UploadHistory).filter(
+            UploadHistory.user_id == user_id,
+            UploadHistory.arquivo_hash == arquivo_hash,
+            UploadHistory.status == 'success'
+        ).order_by(UploadHistory.id.desc()).first()
     
     def list_upload_history(
         self,
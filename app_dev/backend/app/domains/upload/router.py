@@ -1,6 +1,10 @@
 """
 Domínio Upload - Router
 Endpoints HTTP - apenas validação e chamadas de service
+
+Handlers são async, mas o service é síncrono (SQLAlchemy, pandas, pdfplumber, OCR):
+toda chamada bloqueante passa por run_in_thread (pool limitado em Settings), e o
+parsing CPU-bound roda no pool de processos — o event loop segue livre.
 """
 from typing import List, Optional
 from dataclasses import asdict
@@ -8,34 +12,17 @@ import json
 from fastapi import APIRouter, Depends, UploadFile, File, Form, Query, HTTPException
 from sqlalchemy.orm import Session
 
-# Validação de upload — segurança contra DoS e arquivos maliciosos
-MAX_UPLOAD_BYTES = 50 * 1024 * 1024  # 50MB
-EXTENSOES_PERMITIDAS = {"csv", "xls", "xlsx", "pdf", "ofx", "txt"}
-
 # Bancos que não geram IdTransacao v5 confiável (não identificados)
 _BANCOS_INVALIDOS = {'', 'generico', 'outros', 'outro', 'desconhecido'}
-MIME_TYPES_PERMITIDOS = {
-    "text/csv", "text/plain",
-    "application/pdf",
-    "application/vnd.ms-excel",
-    "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
-    "application/octet-stream",  # .ofx em alguns browsers
-    "application/x-ofx",
-}
-
-def _validar_arquivo(file: UploadFile) -> None:
-    """Valida extensão, MIME type. Tamanho é validado após leitura."""
-    ext = (file.filename or "").rsplit(".", 1)[-1].lower()
-    if ext not in EXTENSOES_PERMITIDAS:
-        raise HTTPException(400, f"Extensão .{ext} não permitida. Use: {', '.join(sorted(EXTENSOES_PERMITIDAS))}")
-    if file.content_type and file.content_type.split(";")[0].strip() not in MIME_TYPES_PERMITIDOS:
-        raise HTTPException(400, f"Tipo de arquivo não permitido: {file.content_type}")
 
 from app.core.database import get_db
+from app.core.executors import run_in_thread, run_in_process
 from app.shared.dependencies import get_current_user_id
 from .service import UploadService
+from .repository import UploadRepository
 from .fingerprints import DetectionEngine, DetectionResult
 from .content_extractor import extract_content_sample
+from .ingest import ingerir_upload
 from .history_models import UploadHistory
 from .schemas import (
     UploadPreviewResponse,
@@ -58,15 +45,27 @@ async def detect_arquivo(
     Sprint 3: Detecta banco/tipo/período + verifica duplicata (S30).
     Retorna sugestão de processamento e alerta se já existe upload similar.
     """
-    file_bytes = await file.read()
-    content_sample = extract_content_sample(file_bytes, file.filename or "arquivo")
+    return await run_in_thread(_detect_sync, file, user_id, db)
+
+
+def _detect_sync(file: UploadFile, user_id: int, db: Session) -> dict:
+    """
+    Parte bloqueante do /detect: cópia em blocos para disco (hash + limite de tamanho),
+    extração da amostra (pool de processos recebe só o caminho) e checagem de duplicata.
+    """
+    filename = file.filename
+    with ingerir_upload(file.file, filename, file.size) as arquivo:
+        content_sample = run_in_process(extract_content_sample, str(arquivo.path), arquivo.nome)
 
     engine = DetectionEngine()
-    result = engine.detect(file.filename or "arquivo", content_sample, file_bytes)
+    result = engine.detect(arquivo.nome, content_sample, arquivo_hash=arquivo.sha256)
 
-    # S30: verificar duplicata
-    duplicata = None
-    if result.banco != "generico" and (result.mes_fatura or result.periodo_inicio):
+    # Arquivo idêntico (SHA-256) já importado: resposta exata, 1 lookup indexado
+    existing = UploadRepository(db).get_imported_by_hash(user_id, result.arquivo_hash)
+    mesmo_arquivo = existing is not None
+
+    # S30: verificar duplicata (heurística banco + tipo + mês)
+    if existing is None and result.banco != "generico" and (result.mes_fatura or result.periodo_inicio):
         mes = result.mes_fatura
         if not mes and result.periodo_inicio:
             parts = result.periodo_inicio.split("-")
@@ -84,20 +83,23 @@ async def detect_arquivo(
                 )
                 .first()
             )
-            if existing:
-                duplicata = {
-                    "upload_id": existing.id,
-                    "data_importacao": (
-                        existing.data_confirmacao.isoformat()
-                        if existing.data_confirmacao
-                        else (existing.data_upload.isoformat() if existing.data_upload else None)
-                    ),
-                    "total_transacoes": existing.transacoes_importadas or existing.total_registros,
-                }
+
+    duplicata = None
+    if existing:
+        duplicata = {
+            "upload_id": existing.id,
+            "data_importacao": (
+                existing.data_confirmacao.isoformat()
+                if existing.data_confirmacao
+                else (existing.data_upload.isoformat() if existing.data_upload else None)
+            ),
+            "total_transacoes": existing.transacoes_importadas or existing.total_registros,
+            "mesmo_arquivo": mesmo_arquivo,
+        }
 
     return {
         **asdict(result),
-        "filename": file.filename,
+        "filename": filename,
         "duplicata_detectada": duplicata,
     }
 
@@ -146,7 +148,8 @@ async def upload_preview(
         )
 
     service = UploadService(db)
-    return service.process_and_preview(
+    return await run_in_thread(
+        service.process_and_preview,
         file=file,
         banco=banco,
         mes_fatura=mesFatura,
@@ -168,6 +171,9 @@ async def upload_batch(
 ):
     """
     Recebe múltiplos arquivos e processa em lote (CONSOLIDADO em uma única sessão)
+
+    Parsing dos arquivos em paralelo; marcação, classificação, dedup e escrita do
+    preview UMA vez para o lote inteiro (ver UploadService.process_batch).
     
     **Parâmetros:**
     - files: Lista de arquivos
@@ -178,91 +184,18 @@ async def upload_batch(
     - sessionId: ID único da sessão consolidada
     - totalArquivos: Número de arquivos processados
     - totalTransacoes: Número total de transações (de todos os arquivos)
+    - arquivos: Resultado por arquivo, com tempos de ingestão e parsing (ms)
     - erros: Lista de erros (se houver)
+    - tempos: pipeline_ms (marcação/classificação/dedup/escrita) e total_ms
     """
-    import logging
-    from datetime import datetime
-    logger = logging.getLogger(__name__)
-    
-    logger.info(f"📦 Upload em lote iniciado: {len(files)} arquivos")
-    
     service = UploadService(db)
-    resultados = []
-    erros = []
-    total_transacoes = 0
-    
-    # Gerar UMA ÚNICA session_id para todos os arquivos
-    session_id_consolidado = f"session_{datetime.now().strftime('%Y%m%d_%H%M%S')}_{user_id}"
-    logger.info(f"🎯 Sessão consolidada: {session_id_consolidado}")
-    
-    def _formato_from_filename(filename: str) -> str:
-        ext = (filename or "").lower().split(".")[-1]
-        if ext in ("xls", "xlsx", "xlsm"):
-            return "Excel"
-        if ext == "pdf":
-            return "PDF"
-        if ext == "ofx":
-            return "OFX"
-        return "CSV"
-
-    for i, file in enumerate(files, 1):
-        try:
-            logger.info(f"  {i}/{len(files)} - Processando: {file.filename}")
-            
-            formato = _formato_from_filename(file.filename or "")
-            mes_fatura = "2025-01"
-            if tipoDocumento == "fatura" and file.filename:
-                import re
-                match = re.search(r'(\d{4})(\d{2})', file.filename)
-                if match:
-                    ano, mes = match.groups()
-                    mes_fatura = f"{ano}-{mes}"
-            
-            result = service.process_and_preview(
-                file=file,
-                banco=banco,
-                mes_fatura=mes_fatura,
-                user_id=user_id,
-                cartao=None,
-                tipo_documento=tipoDocumento,
-                formato=formato,
-                final_cartao=None,
-                skip_cleanup=(i > 1),
-                shared_session_id=session_id_consolidado
-            )
-            
-            resultados.append({
-                "arquivo": file.filename,
-                "totalRegistros": result.totalRegistros,
-                "success": True
-            })
-            
-            total_transacoes += result.totalRegistros
-            logger.info(f"    ✅ {result.totalRegistros} transações processadas")
-            
-        except Exception as e:
-            logger.error(f"    ❌ Erro: {str(e)}")
-            erros.append({
-                "arquivo": file.filename,
-                "erro": str(e)
-            })
-            resultados.append({
-                "arquivo": file.filename,
-                "success": False,
-                "erro": str(e)
-            })
-    
-    logger.info(f"✅ Lote concluído: {len(resultados)} arquivos, {total_transacoes} transações")
-    
-    return {
-        "success": len(erros) == 0,
-        "sessionId": session_id_consolidado,  # Sessão única consolidada
-        "totalArquivos": len(files),
-        "arquivosProcessados": len([r for r in resultados if r.get("success")]),
-        "totalTransacoes": total_transacoes,
-        "arquivos": resultados,  # Lista de arquivos processados
-        "erros": erros
-    }
+    return await run_in_thread(
+        service.process_batch,
+        files=files,
+        banco=banco,
+        tipo_documento=tipoDocumento,
+        user_id=user_id,
+    )
 
 
 @router.post("/import-planilha")
@@ -285,7 +218,7 @@ async def import_planilha(
         except json.JSONDecodeError:
             pass
     service = UploadService(db)
-    return service.import_planilha(file=file, user_id=user_id, mapeamento=mapeamento_dict)
+    return await run_in_thread(service.import_planilha, file=file, user_id=user_id, mapeamento=mapeamento_dict)
 
 
 @router.get("/preview/{session_id}", response_model=GetPreviewResponse)
@@ -298,7 +231,7 @@ async def get_preview_data(
     Lista os dados de preview de uma sessão específica
     """
     service = UploadService(db)
-    return service.get_preview_data(session_id, user_id)
+    return await run_in_thread(service.get_preview_data, session_id, user_id)
 
 @router.post("/confirm/{session_id}", response_model=ConfirmUploadResponse)
 async def confirm_upload(
@@ -310,7 +243,7 @@ async def confirm_upload(
     Confirma upload e salva dados de preview na tabela principal
     """
     service = UploadService(db)
-    return service.confirm_upload(session_id, user_id)
+    return await run_in_thread(service.confirm_upload, session_id, user_id)
 
 @router.delete("/preview/{session_id}", response_model=DeletePreviewResponse)
 async def delete_preview(
@@ -322,7 +255,7 @@ async def delete_preview(
     Remove dados de preview de uma sessão específica
     """
     service = UploadService(db)
-    return service.delete_preview(session_id, user_id)
+    return await run_in_thread(service.delete_preview, session_id, user_id)
 
 @router.patch("/preview/{session_id}/{preview_id}")
 async def update_preview_classification(
@@ -340,7 +273,8 @@ async def update_preview_classification(
     Sprint D: se criar_regra=True e excluir=1, cria TransacaoExclusao (banco+tipo_documento).
     """
     service = UploadService(db)
-    return service.update_preview_classification(
+    return await run_in_thread(
+        service.update_preview_classification,
         session_id=session_id,
         preview_id=preview_id,
         grupo=grupo,
@@ -360,8 +294,11 @@ async def get_estabelecimentos_sugestoes(
     Retorna grupos históricos por estabelecimento (para classificação em lote).
     Útil no BatchClassifyModal para sugerir grupo ao usuário.
     """
+    return await run_in_thread(_estabelecimentos_sugestoes_sync, user_id, limit, db)
+
+
+def _estabelecimentos_sugestoes_sync(user_id: int, limit: int, db: Session) -> dict:
     from app.domains.transactions.models import JournalEntry
-    from sqlalchemy import func
 
     rows = (
         db.query(JournalEntry.EstabelecimentoBase, JournalEntry.GRUPO)
@@ -396,7 +333,7 @@ async def get_rollback_preview(
     Usado pelo modal de confirmação antes do delete.
     """
     service = UploadService(db)
-    return service.get_rollback_preview(history_id, user_id)
+    return await run_in_thread(service.get_rollback_preview, history_id, user_id)
 
 
 @router.get("/history", response_model=UploadHistoryListResponse)
@@ -412,7 +349,7 @@ async def get_upload_history(
     status='success' retorna apenas uploads confirmados (realizados).
     """
     service = UploadService(db)
-    return service.get_upload_history(user_id, limit, offset, status=status)
+    return await run_in_thread(service.get_upload_history, user_id, limit, offset, status=status)
 
 
 @router.delete("/history/{history_id}")
@@ -428,7 +365,7 @@ async def delete_upload_history(
     - transacoes_deletadas: quantidade de transações removidas
     """
     service = UploadService(db)
-    return service.delete_upload_history(history_id, user_id)
+    return await run_in_thread(service.delete_upload_history, history_id, user_id)
 
 
 @router.post("/recreate-preview/{history_id}")
@@ -446,7 +383,7 @@ async def recreate_preview_from_history(
     - revision_of: ID do upload original
     """
     service = UploadService(db)
-    return service.recreate_preview_from_history(history_id, user_id)
+    return await run_in_thread(service.recreate_preview_from_history, history_id, user_id)
 
 
 @router.patch("/history/{history_id}/periodo")
@@ -466,4 +403,4 @@ async def update_upload_periodo(
     - mes: 1 a 12
     """
     service = UploadService(db)
-    return service.update_upload_periodo(history_id, user_id, ano, mes)
+    return await run_in_thread(service.update_upload_periodo, history_id, user_id, ano, mes)
@@ -78,6 +78,7 @@ class UploadPreviewResponse(BaseModel):
     totalRegistros: int
     stats: Optional[ClassificationStats] = None
     balance_validation: Optional[BalanceValidationResponse] = None
+    arquivoJaImportado: Optional[int] = None  # id do upload confirmado com o mesmo arquivo (SHA-256)
 
 class GetPreviewResponse(BaseModel):
     """Schema de resposta de dados de preview"""
@@ -100,6 +101,7 @@ class ConfirmUploadResponse(BaseModel):
     transacoesCriadas: int
     transacoesDuplicadas: int = 0
     total: int
+    jobId: Optional[int] = None  # Job das fases 5/6/7 — polling em GET /jobs/{jobId}
 
 class DeletePreviewResponse(BaseModel):
     """Schema de resposta de exclusão de preview"""
@@ -3,16 +3,17 @@ Domínio Upload - Service
 Lógica de negócio com pipeline em 3 fases
 """
 from sqlalchemy.orm import Session
-from sqlalchemy import text
-from typing import List, Optional
+from typing import List, Optional, Tuple
 from fastapi import HTTPException, status, UploadFile
 from datetime import datetime
-import tempfile
-import os
+from concurrent.futures import ThreadPoolExecutor
 import logging
+import re
+import time
 from pathlib import Path
 
 from .repository import UploadRepository
+from .ingest import ingerir_upload
 from .models import PreviewTransacao
 from .history_models import UploadHistory
 from .schemas import (
@@ -26,16 +27,63 @@ from .schemas import (
 )
 from .history_schemas import UploadHistoryResponse, UploadHistoryListResponse
 from .processors import get_processor
+from .processors.raw.registry import process_file, usa_pool_proprio
 from .processors.raw.base import PasswordRequiredException
 from .processors.marker import TransactionMarker
 from .processors.classifier import CascadeClassifier
+from .parse_cache import chave_parse, get_parse_cache, set_parse_cache
+from app.core.cache import bump_data_version
+from app.core.config import settings
+from app.core.executors import run_in_process
+from app.domains.jobs.service import enqueue_job, register_job_handler
 from app.domains.exclusoes.models import TransacaoExclusao
 from app.domains.compatibility.service import CompatibilityService
 from app.domains.transactions.models import JournalEntry
+from app.domains.transactions.rollup import meses_do_upload, refresh_journal_rollup
 from app.shared.utils import normalizar
 
 logger = logging.getLogger(__name__)
 
+# Job da fila persistente que roda as fases 5/6/7 após confirm_upload
+POST_CONFIRM_JOB = 'upload_post_confirm'
+
+# Mês da fatura do /batch quando o nome do arquivo não tem YYYYMM
+MES_FATURA_PADRAO_LOTE = "2025-01"
+
+# Colunas de base_parcelas carregadas/regravadas pela fase 5 (além de user_id, id_parcela, updated_at)
+CAMPOS_BASE_PARCELAS = (
+    'estabelecimento_base', 'valor_parcela', 'qtd_parcelas', 'qtd_pagas', 'valor_total_plano',
+    'grupo_sugerido', 'subgrupo_sugerido', 'tipo_gasto_sugerido', 'categoria_geral_sugerida',
+    'data_inicio', 'status', 'created_at',
+)
+
+
+def _ms_desde(inicio: float) -> float:
+    """Milissegundos desde time.perf_counter() = inicio."""
+    return round((time.perf_counter() - inicio) * 1000, 1)
+
+
+def _formato_do_arquivo(filename: Optional[str]) -> str:
+    """Formato do /batch pela extensão (nome usado na tabela de compatibilidade)."""
+    ext = (filename or "").lower().split(".")[-1]
+    if ext in ("xls", "xlsx", "xlsm"):
+        return "Excel"
+    if ext == "pdf":
+        return "PDF"
+    if ext == "ofx":
+        return "OFX"
+    return "CSV"
+
+
+def _mes_fatura_do_nome(filename: Optional[str], tipo_documento: str) -> str:
+    """Mês da fatura (YYYY-MM) pelo YYYYMM no nome do arquivo; extrato usa a data de cada linha."""
+    if tipo_documento == "fatura" and filename:
+        match = re.search(r'(\d{4})(\d{2})', filename)
+        if match:
+            ano, mes = match.groups()
+            return f"{ano}-{mes}"
+    return MES_FATURA_PADRAO_LOTE
+
 
 class UploadService:
     """
@@ -62,11 +110,14 @@ class UploadService:
         senha: str = None
     ) -> UploadPreviewResponse:
         """
-        Processa arquivo em 3 fases com salvamento incremental
+        Processa arquivo em 4 fases com uma única escrita do preview
         
-        Fase 1: Raw Processing → Salvar dados básicos
-        Fase 2: ID Marking → Atualizar com IDs
-        Fase 3: Classification → Atualizar com classificação
+        Fase 1: Raw Processing → RawTransaction
+        Fase 2: ID Marking → IDs (em memória)
+        Fase 3: Classification → classificação (em memória)
+        Fase 4: Deduplication → 1 query IN, depois grava o preview de uma vez
+        
+        Com UPLOAD_INCREMENTAL_SAVE=true (debug) grava o preview após cada fase.
         
         Raises:
             HTTPException: Se dados inválidos ou erro no processamento
@@ -81,34 +132,13 @@ class UploadService:
             )
         
         # ========== VALIDAÇÃO DE COMPATIBILIDADE ==========
-        logger.info(f"🔍 Validando compatibilidade: {banco} + {formato}")
-        
-        try:
-            compatibility_service = CompatibilityService(self.db)
-            validation = compatibility_service.validate_format(banco, formato)
-            
-            if not validation.is_supported:
-                logger.warning(f"❌ Formato não suportado: {banco} + {formato} (status: {validation.status})")
-                raise HTTPException(
-                    status_code=status.HTTP_400_BAD_REQUEST,
-                    detail={
-                        "errorCode": "UPL_002",
-                        "error": f"Formato {formato} não suportado para {banco}",
-                        "status": validation.status,
-                        "message": validation.message,
-                        "suggestion": "Acesse Settings → Bancos para verificar formatos disponíveis"
-                    }
-                )
-            
-            logger.info(f"✅ Compatibilidade OK: {banco} + {formato}")
-            
-        except HTTPException as e:
-            # Se erro 404 (banco não cadastrado) ou 400 (formato inválido), propagar
-            if e.status_code in [404, 400]:
-                raise
-            # Outros erros de validação também propagam
-            raise
+        self._validar_compatibilidade(banco, formato)
         
+        # Upload → disco em blocos: SHA-256 (chave do cache de parsing e do "arquivo já
+        # importado") + limite de tamanho, antes de tocar no preview existente
+        arquivo = ingerir_upload(file.file, file.filename, file.size)
+        arquivo_hash = arquivo.sha256
+
         session_id = None
         history_record = None
         
@@ -127,7 +157,11 @@ class UploadService:
 
             # Usar session_id compartilhado (batch) ou gerar único
             session_id = shared_session_id or f"session_{datetime.now().strftime('%Y%m%d_%H%M%S')}_{user_id}"
-            
+
+            ja_importado = self.repository.get_imported_by_hash(user_id, arquivo_hash)
+            if ja_importado:
+                logger.info(f"♻️  Arquivo idêntico já importado no upload {ja_importado.id} — transações virão como duplicadas")
+
             # Criar ou buscar registro de histórico
             history_record = self.repository.get_history_by_session(session_id)
             if not history_record:
@@ -138,6 +172,7 @@ class UploadService:
                     banco=banco,
                     tipo_documento=tipo_documento,
                     nome_arquivo=file.filename,
+                    arquivo_hash=arquivo_hash,
                     nome_cartao=cartao,
                     final_cartao=final_cartao,
                     mes_fatura=mes_fatura,
@@ -149,91 +184,71 @@ class UploadService:
             else:
                 logger.info(f"📝 Reutilizando histórico existente: ID {history_record.id}")
             
-            # Salvar arquivo temporariamente
-            with tempfile.NamedTemporaryFile(delete=False, suffix=f"_{file.filename}") as tmp:
-                content = file.file.read()
-                tmp.write(content)
-                tmp_path = tmp.name
+            # ========== FASE 1: RAW PROCESSING ==========
+            logger.info("📝 Fase 1: Processamento Raw")
+            raw_transactions, balance_validation = self._fase1_raw_processing(
+                str(arquivo.path),
+                banco,
+                tipo_documento,
+                file.filename,
+                cartao,
+                final_cartao,
+                mes_fatura,
+                senha,
+                user_id=user_id,
+                arquivo_hash=arquivo_hash,
+            )
+            logger.info(f"  ✅ {len(raw_transactions)} transações brutas processadas")
             
-            try:
-                # ========== FASE 1: RAW PROCESSING ==========
-                logger.info("📝 Fase 1: Processamento Raw")
-                raw_transactions, balance_validation = self._fase1_raw_processing(
-                    tmp_path,
-                    banco,
-                    tipo_documento,
-                    file.filename,
-                    cartao,
-                    final_cartao,
-                    mes_fatura,
-                    senha
-                )
-                logger.info(f"  ✅ {len(raw_transactions)} transações brutas processadas")
-                
-                # Log de validação de saldo (se houver)
-                if balance_validation and balance_validation.saldo_inicial is not None:
-                    logger.info(f"  💰 Saldo inicial: R$ {balance_validation.saldo_inicial:.2f}")
-                    logger.info(f"  💰 Saldo final: R$ {balance_validation.saldo_final:.2f}")
-                    logger.info(f"  💰 Soma transações: R$ {balance_validation.soma_transacoes:.2f}")
-                    logger.info(f"  {'✅' if balance_validation.is_valid else '⚠️'} Validação: {balance_validation.is_valid} (diferença: R$ {balance_validation.diferenca:.2f})")
-                
-                # Aplicar regras de exclusão
-                raw_transactions = self._apply_exclusion_rules(
-                    raw_transactions,
-                    banco,
-                    tipo_documento,
-                    user_id
-                )
-                logger.info(f"  🚫 Após exclusões: {len(raw_transactions)} transações restantes")
-                
-                # Preparar balance_validation_dict para salvar no histórico
-                balance_validation_dict = None
-                if balance_validation and balance_validation.saldo_inicial is not None:
-                    balance_validation_dict = balance_validation.to_dict()
-                
-                # Atualizar histórico com total_registros e balance_validation
-                self.repository.update_upload_history(
-                    history_record.id,
-                    total_registros=len(raw_transactions),
-                    balance_validation=balance_validation_dict
-                )
-                
-                # Salvar dados brutos no preview
-                self._save_raw_to_preview(raw_transactions, session_id, user_id)
-                logger.info(f"  💾 Dados brutos salvos no preview")
-                
-                # ========== FASE 2: ID MARKING ==========
-                logger.info("🔖 Fase 2: Marcação de IDs")
-                marked_count = self._fase2_marking(session_id, user_id)
-                logger.info(f"  ✅ {marked_count} transações marcadas com IDs")
-                
-                # ========== FASE 3: CLASSIFICATION ==========
-                logger.info("🎯 Fase 3: Classificação")
-                stats = self._fase3_classification(session_id, user_id)
-                logger.info(f"  ✅ {stats.total} transações classificadas")
-                logger.info(f"  📊 Base Parcelas: {stats.base_parcelas} | Base Padrões: {stats.base_padroes} | Journal: {stats.journal_entries} | Regras Genéricas: {stats.regras_genericas} | Não Classificado: {stats.nao_classificado}")
-                
-                # ========== FASE 4: DEDUPLICATION ==========
-                logger.info("🔍 Fase 4: Deduplicação")
-                duplicates_count = self._fase4_deduplication(session_id, user_id)
-                logger.info(f"  ✅ {duplicates_count} transações duplicadas identificadas")
-                
-                # Atualizar histórico com classification_stats
-                self.repository.update_upload_history(
-                    history_record.id,
-                    classification_stats={
-                        'base_parcelas': stats.base_parcelas,
-                        'base_padroes': stats.base_padroes,
-                        'journal_entries': stats.journal_entries,
-                        'regras_genericas': stats.regras_genericas,
-                        'nao_classificado': stats.nao_classificado,
-                        'duplicadas': duplicates_count,
-                    }
-                )
-                
-            finally:
-                # Limpar arquivo temporário
-                os.unlink(tmp_path)
+            # Log de validação de saldo (se houver)
+            if balance_validation and balance_validation.saldo_inicial is not None:
+                logger.info(f"  💰 Saldo inicial: R$ {balance_validation.saldo_inicial:.2f}")
+                logger.info(f"  💰 Saldo final: R$ {balance_validation.saldo_final:.2f}")
+                logger.info(f"  💰 Soma transações: R$ {balance_validation.soma_transacoes:.2f}")
+                logger.info(f"  {'✅' if balance_validation.is_valid else '⚠️'} Validação: {balance_validation.is_valid} (diferença: R$ {balance_validation.diferenca:.2f})")
+            
+            # Aplicar regras de exclusão
+            raw_transactions = self._apply_exclusion_rules(
+                raw_transactions,
+                banco,
+                tipo_documento,
+                user_id
+            )
+            logger.info(f"  🚫 Após exclusões: {len(raw_transactions)} transações restantes")
+            
+            # Preparar balance_validation_dict para salvar no histórico
+            balance_validation_dict = None
+            if balance_validation and balance_validation.saldo_inicial is not None:
+                balance_validation_dict = balance_validation.to_dict()
+            
+            # Atualizar histórico com total_registros e balance_validation
+            self.repository.update_upload_history(
+                history_record.id,
+                total_registros=len(raw_transactions),
+                balance_validation=balance_validation_dict
+            )
+            
+            if settings.UPLOAD_INCREMENTAL_SAVE:
+                # Modo debug: grava o preview após cada fase (inspecionável fase a fase)
+                stats, duplicates_count = self._pipeline_incremental(raw_transactions, session_id, user_id)
+            else:
+                # ========== FASES 2/3/4 EM MEMÓRIA + 1 ESCRITA ==========
+                stats, duplicates_count = self._pipeline_em_memoria(raw_transactions, session_id, user_id)
+            logger.info(f"  📊 Base Parcelas: {stats.base_parcelas} | Base Padrões: {stats.base_padroes} | Journal: {stats.journal_entries} | Regras Genéricas: {stats.regras_genericas} | Não Classificado: {stats.nao_classificado}")
+            logger.info(f"  ✅ {duplicates_count} transações duplicadas identificadas")
+            
+            # Atualizar histórico com classification_stats
+            self.repository.update_upload_history(
+                history_record.id,
+                classification_stats={
+                    'base_parcelas': stats.base_parcelas,
+                    'base_padroes': stats.base_padroes,
+                    'journal_entries': stats.journal_entries,
+                    'regras_genericas': stats.regras_genericas,
+                    'nao_classificado': stats.nao_classificado,
+                    'duplicadas': duplicates_count,
+                }
+            )
             
             logger.info(f"✅ Upload processado com sucesso! Session: {session_id}")
             
@@ -242,7 +257,8 @@ class UploadService:
                 success=True,
                 sessionId=session_id,
                 totalRegistros=len(raw_transactions),
-                stats=stats
+                stats=stats,
+                arquivoJaImportado=ja_importado.id if ja_importado else None,
             )
             
             # Adicionar validação de saldo se for extrato
@@ -290,6 +306,207 @@ class UploadService:
                     "details": str(e)
                 }
             )
+        finally:
+            arquivo.remover()
+
+    def _validar_compatibilidade(self, banco: str, formato: str) -> None:
+        """
+        Valida se o banco suporta o formato (tabela de compatibilidade)
+
+        Raises:
+            HTTPException: 404 (banco não cadastrado) ou 400 (formato não suportado)
+        """
+        logger.info(f"🔍 Validando compatibilidade: {banco} + {formato}")
+
+        compatibility_service = CompatibilityService(self.db)
+        validation = compatibility_service.validate_format(banco, formato)
+
+        if not validation.is_supported:
+            logger.warning(f"❌ Formato não suportado: {banco} + {formato} (status: {validation.status})")
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail={
+                    "errorCode": "UPL_002",
+                    "error": f"Formato {formato} não suportado para {banco}",
+                    "status": validation.status,
+                    "message": validation.message,
+                    "suggestion": "Acesse Settings → Bancos para verificar formatos disponíveis"
+                }
+            )
+
+        logger.info(f"✅ Compatibilidade OK: {banco} + {formato}")
+
+    def process_batch(
+        self,
+        files: List[UploadFile],
+        banco: str,
+        tipo_documento: str,
+        user_id: int,
+        session_id: str = None,
+    ) -> dict:
+        """
+        Upload em lote consolidado em UMA sessão de preview
+
+        Antes o /batch chamava process_and_preview arquivo a arquivo: N validações,
+        N CascadeClassifier (cada um recarregando o histórico do usuário), N queries
+        de dedup e N escritas, tudo em sequência. Agora:
+
+        1. Ingestão + compatibilidade (1 validação por formato) — erro fica no arquivo
+        2. Fase 1 em paralelo (UPLOAD_BATCH_PARSE_WORKERS arquivos por vez; o parsing
+           roda no pool de processos ou sai do cache de parsing)
+        3. Transações concatenadas na ordem dos arquivos → _pipeline_em_memoria:
+           1 TransactionMarker (sequência de duplicatas entre arquivos determinística,
+           independente de qual parsing terminou primeiro), 1 CascadeClassifier,
+           1 query de dedup contra o journal e 1 escrita do preview
+
+        Returns:
+            Resumo do lote com tempos por arquivo (ingestão/parsing) e do pipeline
+        """
+        inicio = time.perf_counter()
+        session_id = session_id or f"session_{datetime.now().strftime('%Y%m%d_%H%M%S')}_{user_id}"
+        logger.info(f"📦 Upload em lote: {len(files)} arquivos | Banco: {banco} | Sessão: {session_id}")
+
+        itens = [{"arquivo": f.filename, "success": False, "tempos": {}} for f in files]
+        recebidos = {}          # índice do arquivo → ArquivoRecebido
+        compatibilidade = {}    # formato → HTTPException (ou None se suportado)
+        history_record = None
+
+        try:
+            # ========== 1. INGESTÃO + COMPATIBILIDADE ==========
+            for i, file in enumerate(files):
+                t0 = time.perf_counter()
+                try:
+                    formato = _formato_do_arquivo(file.filename)
+                    if formato not in compatibilidade:
+                        try:
+                            self._validar_compatibilidade(banco, formato)
+                            compatibilidade[formato] = None
+                        except HTTPException as e:
+                            compatibilidade[formato] = e
+                    if compatibilidade[formato] is not None:
+                        raise compatibilidade[formato]
+                    recebidos[i] = ingerir_upload(file.file, file.filename, file.size)
+                except Exception as e:
+                    itens[i]["erro"] = str(e)
+                itens[i]["tempos"]["ingestao_ms"] = _ms_desde(t0)
+
+            # ========== 2. FASE 1 EM PARALELO ==========
+            resultados = {}     # índice → (raw_transactions, balance_validation)
+            if recebidos:
+                workers = max(1, min(len(recebidos), settings.UPLOAD_BATCH_PARSE_WORKERS))
+                with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="upload-batch") as pool:
+                    futuros = {
+                        i: pool.submit(self._fase1_lote, arquivo, banco, tipo_documento, user_id, itens[i]["tempos"])
+                        for i, arquivo in recebidos.items()
+                    }
+                    for i, futuro in futuros.items():
+                        try:
+                            resultados[i] = futuro.result()
+                        except Exception as e:
+                            itens[i]["erro"] = str(e)
+
+            # Ordem dos arquivos (não a de término do parsing): marcação determinística
+            ordem = sorted(resultados)
+            raw_transactions = [raw for i in ordem for raw in resultados[i][0]]
+            if ordem:
+                raw_transactions = self._apply_exclusion_rules(raw_transactions, banco, tipo_documento, user_id)
+                mantidas = {id(raw) for raw in raw_transactions}
+                for i in ordem:
+                    itens[i]["success"] = True
+                    itens[i]["totalRegistros"] = sum(1 for raw in resultados[i][0] if id(raw) in mantidas)
+
+                # ========== 3. MARCAÇÃO + CLASSIFICAÇÃO + DEDUP + 1 ESCRITA ==========
+                t0 = time.perf_counter()
+                deleted = self.repository.delete_all_by_user(user_id)
+                if deleted > 0:
+                    logger.info(f"🗑️  Limpeza: {deleted} registros de preview removidos")
+
+                primeiro = recebidos[ordem[0]]
+                history_record = self.repository.create_upload_history(UploadHistory(
+                    user_id=user_id,
+                    session_id=session_id,
+                    banco=banco,
+                    tipo_documento=tipo_documento,
+                    nome_arquivo=primeiro.nome,
+                    arquivo_hash=primeiro.sha256 if len(files) == 1 else None,
+                    mes_fatura=_mes_fatura_do_nome(primeiro.nome, tipo_documento),
+                    status='processing',
+                    total_registros=len(raw_transactions),
+                    data_upload=datetime.now(),
+                ))
+                logger.info(f"📝 Histórico criado: ID {history_record.id}")
+
+                if settings.UPLOAD_INCREMENTAL_SAVE:
+                    stats, duplicates_count = self._pipeline_incremental(raw_transactions, session_id, user_id)
+                else:
+                    stats, duplicates_count = self._pipeline_em_memoria(raw_transactions, session_id, user_id)
+                self.repository.update_upload_history(
+                    history_record.id,
+                    classification_stats={
+                        'base_parcelas': stats.base_parcelas,
+                        'base_padroes': stats.base_padroes,
+                        'journal_entries': stats.journal_entries,
+                        'regras_genericas': stats.regras_genericas,
+                        'nao_classificado': stats.nao_classificado,
+                        'duplicadas': duplicates_count,
+                    }
+                )
+                pipeline_ms = _ms_desde(t0)
+            else:
+                pipeline_ms = 0.0
+
+        except Exception as e:
+            logger.error(f"❌ Erro no lote, fazendo rollback da sessão {session_id}: {e}", exc_info=True)
+            self.repository.delete_by_session_id(session_id, user_id)
+            if history_record:
+                self.repository.update_upload_history(history_record.id, status='error', error_message=str(e))
+            raise HTTPException(
+                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+                detail={
+                    "errorCode": "UPL_006",
+                    "error": "Não foi possível processar o lote de arquivos.",
+                    "details": str(e)
+                }
+            )
+        finally:
+            for arquivo in recebidos.values():
+                arquivo.remover()
+
+        for item in itens:
+            logger.info(
+                f"  {'✅' if item['success'] else '❌'} {item['arquivo']}: "
+                f"{item.get('totalRegistros', item.get('erro'))} | {item['tempos']}"
+            )
+        erros = [{"arquivo": item["arquivo"], "erro": item["erro"]} for item in itens if not item["success"]]
+        total_ms = _ms_desde(inicio)
+        logger.info(f"✅ Lote concluído: {len(raw_transactions)} transações em {total_ms:.0f}ms (pipeline {pipeline_ms:.0f}ms)")
+
+        return {
+            "success": not erros,
+            "sessionId": session_id,
+            "totalArquivos": len(files),
+            "arquivosProcessados": sum(1 for item in itens if item["success"]),
+            "totalTransacoes": len(raw_transactions),
+            "arquivos": itens,
+            "erros": erros,
+            "tempos": {"pipeline_ms": pipeline_ms, "total_ms": total_ms},
+        }
+
+    def _fase1_lote(self, arquivo, banco: str, tipo_documento: str, user_id: int, tempos: dict):
+        """Fase 1 de um arquivo do lote (roda numa thread do process_batch; não usa a Session)."""
+        t0 = time.perf_counter()
+        try:
+            return self._fase1_raw_processing(
+                str(arquivo.path),
+                banco,
+                tipo_documento,
+                arquivo.nome,
+                mes_fatura_input=_mes_fatura_do_nome(arquivo.nome, tipo_documento),
+                user_id=user_id,
+                arquivo_hash=arquivo.sha256,
+            )
+        finally:
+            tempos["parsing_ms"] = _ms_desde(t0)
 
     def import_planilha(
         self,
@@ -317,14 +534,10 @@ class UploadService:
                 detail={"errorCode": "UPL_PL_001", "error": "Formato não suportado. Use CSV ou Excel (XLS/XLSX)."}
             )
 
-        with tempfile.NamedTemporaryFile(delete=False, suffix=f"_{file.filename}") as tmp:
-            content = file.file.read()
-            tmp.write(content)
-            tmp_path = tmp.name
-
+        arquivo = ingerir_upload(file.file, file.filename, file.size)
         try:
             raw_transactions = process_planilha_generica(
-                Path(tmp_path),
+                arquivo.path,
                 file.filename,
                 mapeamento=mapeamento,
             )
@@ -334,10 +547,7 @@ class UploadService:
                 detail={"errorCode": "UPL_PL_002", "error": str(e)}
             )
         finally:
-            try:
-                os.unlink(tmp_path)
-            except OSError:
-                pass
+            arquivo.remover()
 
         if not raw_transactions:
             raise HTTPException(
@@ -362,9 +572,12 @@ class UploadService:
         history_record = self.repository.create_upload_history(history_record)
         self.repository.update_upload_history(history_record.id, total_registros=len(raw_transactions))
 
-        self._save_raw_to_preview(raw_transactions, session_id, user_id)
-        self._fase2_marking(session_id, user_id)
-        self._fase3_classification(session_id, user_id)
+        if settings.UPLOAD_INCREMENTAL_SAVE:
+            self._save_raw_to_preview(raw_transactions, session_id, user_id)
+            self._fase2_marking(session_id, user_id)
+            self._fase3_classification(session_id, user_id)
+        else:
+            self._pipeline_em_memoria(raw_transactions, session_id, user_id, deduplicar=False)
 
         previews = self.repository.get_by_session_id(session_id, user_id)
         preview_rows = []
@@ -487,14 +700,18 @@ class UploadService:
         nome_cartao: str = None,
         final_cartao: str = None,
         mes_fatura_input: str = None,
-        senha: str = None
+        senha: str = None,
+        user_id: int = None,
+        arquivo_hash: str = None,
     ):
         """
         Fase 1: Processa arquivo bruto usando processadores específicos
         
         Args:
             mes_fatura_input: Mês da fatura do Form (YYYY-MM) - usado apenas para faturas
-        
+            user_id/arquivo_hash: chave do cache de parsing (parse_cache.py); sem eles o
+                processador sempre roda
+
         Returns:
             Tupla (raw_transactions, balance_validation)
             Para faturas: balance_validation será None
@@ -517,17 +734,28 @@ class UploadService:
                 }
             )
         
-        # Processar arquivo
+        # Processar arquivo — cache por conteúdo; miss: parsing/OCR CPU-bound no pool de processos
         try:
-            file_path_obj = Path(file_path)
-            result = processor(
-                file_path_obj,
-                nome_arquivo,
-                nome_cartao,
-                final_cartao,
-                **({'senha': senha} if senha else {})
-            )
-            
+            chave_cache = None
+            result = None
+            if user_id is not None and arquivo_hash:
+                chave_cache = chave_parse(
+                    user_id, arquivo_hash, banco, tipo_documento, formato,
+                    nome_arquivo, nome_cartao, final_cartao,
+                )
+                result = get_parse_cache(chave_cache)
+                if result is not None:
+                    logger.info("⚡ Parsing servido do cache (arquivo idêntico já processado)")
+            if result is None:
+                args = (banco, tipo_documento, formato, file_path, nome_arquivo, nome_cartao, final_cartao, senha)
+                if usa_pool_proprio(banco, tipo_documento, formato):
+                    # OCR: páginas vão ao pool OCR deste processo (dono único do pool)
+                    result = process_file(*args)
+                else:
+                    result = run_in_process(process_file, *args)
+                if chave_cache:
+                    set_parse_cache(chave_cache, result)
+
             # Verificar se retornou tupla (extrato com validação) ou lista (fatura)
             if isinstance(result, tuple):
                 raw_transactions, balance_validation = result
@@ -594,48 +822,140 @@ class UploadService:
         
         return raw_transactions, None
     
+    def _pipeline_em_memoria(
+        self,
+        raw_transactions,
+        session_id: str,
+        user_id: int,
+        deduplicar: bool = True,
+    ) -> Tuple[ClassificationStats, int]:
+        """
+        Fases 2, 3 e 4 em uma passada, em memória, com UMA escrita no preview.
+
+        RawTransaction → TransactionMarker → CascadeClassifier → dedup (1 query IN),
+        sem reler a sessão nem reconstruir dataclasses a partir das colunas ORM.
+        Resultado idêntico ao modo incremental (_pipeline_incremental).
+
+        Returns:
+            (ClassificationStats, número de duplicatas)
+        """
+        if not raw_transactions:
+            return ClassificationStats(total=0), 0
+
+        marker = TransactionMarker(user_id=user_id)
+        marked = [marker.mark_transaction(raw) for raw in raw_transactions]
+        logger.info(f"  🔖 {len(marked)} transações marcadas com IDs")
+
+        # __init__ pré-carrega journal_entries e base_parcelas UMA vez para todos os classify()
+        classifier = CascadeClassifier(self.db, user_id)
+        classified = [classifier.classify(m) for m in marked]
+        stats = self._classification_stats(classifier)
+        logger.info(f"  🎯 {stats.total} transações classificadas")
+
+        existentes = {}
+        if deduplicar:
+            existentes = self._journal_existentes(
+                [c.id_transacao for c in classified if c.id_transacao], user_id
+            )
+
+        now = datetime.now()
+        duplicates_count = 0
+        rows = []
+        for c in classified:
+            existente = existentes.get(c.id_transacao) if c.id_transacao else None
+            if existente:
+                duplicates_count += 1
+            rows.append({
+                'session_id': session_id,
+                'user_id': user_id,
+                'created_at': now,
+                'updated_at': now,
+                # Fase 1
+                'banco': c.banco,
+                'tipo_documento': c.tipo_documento,
+                'nome_arquivo': c.nome_arquivo,
+                'data_criacao': c.data_criacao,
+                'data': c.data,
+                'lancamento': c.lancamento,
+                'valor': c.valor,
+                'nome_cartao': c.nome_cartao,
+                'cartao': c.final_cartao,
+                'mes_fatura': c.mes_fatura,
+                # Fase 2
+                'IdTransacao': c.id_transacao,
+                'IdParcela': c.id_parcela,
+                'EstabelecimentoBase': c.estabelecimento_base,
+                'EstabelecimentoNorm': c.estabelecimento_norm,
+                'ChavePadrao': c.chave_padrao,
+                'data_transacao': c.data_transacao,
+                'ParcelaAtual': c.parcela_atual,
+                'TotalParcelas': c.total_parcelas,
+                'ValorPositivo': c.valor_positivo,
+                'TipoTransacao': c.tipo_transacao,
+                'Ano': c.ano,
+                'Mes': c.mes,
+                # Fase 3 (duplicatas aparecem APENAS na aba "Duplicadas")
+                'GRUPO': c.grupo,
+                'SUBGRUPO': c.subgrupo,
+                'TipoGasto': c.tipo_gasto,
+                'CategoriaGeral': c.categoria_geral,
+                'origem_classificacao': None if existente else c.origem_classificacao,
+                'padrao_buscado': c.padrao_buscado,
+                'MarcacaoIA': c.marcacao_ia,
+                # Fase 4
+                'is_duplicate': bool(existente),
+                'duplicate_reason': self._duplicate_reason(existente) if existente else None,
+            })
+
+        self.repository.bulk_insert_previews(rows)
+        logger.info(f"  💾 {len(rows)} transações salvas no preview (1 escrita)")
+        return stats, duplicates_count
+
+    def _pipeline_incremental(self, raw_transactions, session_id: str, user_id: int) -> Tuple[ClassificationStats, int]:
+        """
+        Modo debug (UPLOAD_INCREMENTAL_SAVE): grava o preview após cada fase.
+        Permite inspecionar preview_transacoes entre marcação, classificação e dedup.
+        """
+        self._save_raw_to_preview(raw_transactions, session_id, user_id)
+        logger.info(f"  💾 Dados brutos salvos no preview")
+
+        logger.info("🔖 Fase 2: Marcação de IDs")
+        marked_count = self._fase2_marking(session_id, user_id)
+        logger.info(f"  ✅ {marked_count} transações marcadas com IDs")
+
+        logger.info("🎯 Fase 3: Classificação")
+        stats = self._fase3_classification(session_id, user_id)
+        logger.info(f"  ✅ {stats.total} transações classificadas")
+
+        logger.info("🔍 Fase 4: Deduplicação")
+        duplicates_count = self._fase4_deduplication(session_id, user_id)
+        return stats, duplicates_count
+
     def _save_raw_to_preview(self, raw_transactions, session_id: str, user_id: int):
         """
         Salva transações brutas no preview (Fase 1)
+        Bulk insert (executemany) — campos das fases seguintes ficam NULL até as fases 2/3/4.
         """
-        previews = []
         now = datetime.now()
-        
-        for raw in raw_transactions:
-            preview = PreviewTransacao(
-                session_id=session_id,
-                user_id=user_id,
-                # Campos da Fase 1
-                banco=raw.banco,
-                tipo_documento=raw.tipo_documento,
-                nome_arquivo=raw.nome_arquivo,
-                data_criacao=raw.data_criacao,
-                data=raw.data,
-                lancamento=raw.lancamento,
-                valor=raw.valor,
-                nome_cartao=raw.nome_cartao,
-                cartao=raw.final_cartao,
-                mes_fatura=raw.mes_fatura,
-                created_at=now,
-                # Campos das fases seguintes (NULL por enquanto) - CamelCase
-                IdTransacao=None,
-                IdParcela=None,
-                EstabelecimentoBase=None,
-                ParcelaAtual=None,
-                TotalParcelas=None,
-                ValorPositivo=None,
-                TipoTransacao=None,  # ✅ NOVO - Fase 2
-                Ano=None,            # ✅ NOVO - Fase 2
-                Mes=None,            # ✅ NOVO - Fase 2
-                GRUPO=None,
-                SUBGRUPO=None,
-                TipoGasto=None,
-                CategoriaGeral=None,
-                origem_classificacao=None,
-            )
-            previews.append(preview)
-        
-        self.repository.create_batch(previews)
+        rows = [
+            {
+                'session_id': session_id,
+                'user_id': user_id,
+                'banco': raw.banco,
+                'tipo_documento': raw.tipo_documento,
+                'nome_arquivo': raw.nome_arquivo,
+                'data_criacao': raw.data_criacao,
+                'data': raw.data,
+                'lancamento': raw.lancamento,
+                'valor': raw.valor,
+                'nome_cartao': raw.nome_cartao,
+                'cartao': raw.final_cartao,
+                'mes_fatura': raw.mes_fatura,
+                'created_at': now,
+            }
+            for raw in raw_transactions
+        ]
+        self.repository.bulk_insert_previews(rows)
     
     def _fase2_marking(self, session_id: str, user_id: int) -> int:
         """
@@ -668,6 +988,9 @@ class UploadService:
             p.IdTransacao = marked.id_transacao
             p.IdParcela = marked.id_parcela
             p.EstabelecimentoBase = marked.estabelecimento_base
+            p.EstabelecimentoNorm = marked.estabelecimento_norm
+            p.ChavePadrao = marked.chave_padrao
+            p.data_transacao = marked.data_transacao
             p.ParcelaAtual = marked.parcela_atual
             p.TotalParcelas = marked.total_parcelas
             p.ValorPositivo = marked.valor_positivo
@@ -728,7 +1051,11 @@ class UploadService:
             p.updated_at = now
 
         self.db.commit()
+        return self._classification_stats(classifier)
 
+    @staticmethod
+    def _classification_stats(classifier: CascadeClassifier) -> ClassificationStats:
+        """Converte os contadores do classificador no schema da resposta"""
         stats_dict = classifier.get_stats()
         return ClassificationStats(
             total=stats_dict['total'],
@@ -747,8 +1074,6 @@ class UploadService:
         Returns:
             Número de duplicatas encontradas
         """
-        from app.domains.transactions.models import JournalEntry
-
         previews = self.repository.get_by_session_id(session_id, user_id)
         if not previews:
             return 0
@@ -759,16 +1084,7 @@ class UploadService:
             return 0
 
         # 1 query IN para todos (em vez de N queries individuais)
-        existentes = self.db.query(
-            JournalEntry.IdTransacao,
-            JournalEntry.id,
-            JournalEntry.Data
-        ).filter(
-            JournalEntry.IdTransacao.in_(ids_para_verificar),
-            JournalEntry.user_id == user_id
-        ).all()
-
-        existentes_map = {row.IdTransacao: row for row in existentes}
+        existentes_map = self._journal_existentes(ids_para_verificar, user_id)
 
         duplicates_count = 0
         for preview in previews:
@@ -777,7 +1093,7 @@ class UploadService:
             row = existentes_map.get(preview.IdTransacao)
             if row:
                 preview.is_duplicate = True
-                preview.duplicate_reason = f"IdTransacao já existe em journal_entries (ID: {row.id}, Data: {row.Data})"
+                preview.duplicate_reason = self._duplicate_reason(row)
                 # Duplicatas aparecem APENAS na aba "Duplicadas"
                 preview.origem_classificacao = None
                 duplicates_count += 1
@@ -786,6 +1102,24 @@ class UploadService:
         self.db.commit()
         return duplicates_count
     
+    def _journal_existentes(self, ids_transacao: List[str], user_id: int) -> dict:
+        """IdTransacao → (IdTransacao, id, Data) dos que já existem em journal_entries (1 query IN)"""
+        if not ids_transacao:
+            return {}
+        existentes = self.db.query(
+            JournalEntry.IdTransacao,
+            JournalEntry.id,
+            JournalEntry.Data
+        ).filter(
+            JournalEntry.IdTransacao.in_(ids_transacao),
+            JournalEntry.user_id == user_id
+        ).all()
+        return {row.IdTransacao: row for row in existentes}
+
+    @staticmethod
+    def _duplicate_reason(row) -> str:
+        return f"IdTransacao já existe em journal_entries (ID: {row.id}, Data: {row.Data})"
+
     def get_preview_data(
         self,
         session_id: str,
@@ -869,15 +1203,11 @@ class UploadService:
             if original_history:
                 history = original_history
         
-        # Buscar dados de preview (filtrar não-duplicatas e não-excluídos)
-        previews = self.db.query(PreviewTransacao).filter(
-            PreviewTransacao.session_id == session_id,
-            PreviewTransacao.user_id == user_id,
-            PreviewTransacao.is_duplicate == False,
-            PreviewTransacao.excluir == 0
-        ).all()
+        # Contagem por mês dos previews importáveis (não-duplicatas e não-excluídos) —
+        # as linhas em si nunca são carregadas: o move para journal_entries roda no banco
+        importaveis_por_mes = self.repository.count_importable_by_mes(session_id, user_id)
         
-        if not previews:
+        if not importaveis_por_mes:
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND,
                 detail={"errorCode": "UPL_009", "error": "Sessão de preview não encontrada ou todas duplicatas"}
@@ -887,9 +1217,11 @@ class UploadService:
             # Importar JournalEntry
             from app.domains.transactions.models import JournalEntry, BaseParcelas
             
-            # Revisão: coletar IdParcela antigos ANTES de deletar (para limpar base_parcelas)
+            # Revisão: coletar IdParcela (e meses, para o rollup) antigos ANTES de deletar
             old_id_parcelas = set()
+            meses_rollup = set()
             if is_revision and original_upload_history_id:
+                meses_rollup = meses_do_upload(self.db, user_id, original_upload_history_id)
                 old_rows = self.db.query(JournalEntry.IdParcela).filter(
                     JournalEntry.upload_history_id == original_upload_history_id,
                     JournalEntry.user_id == user_id,
@@ -905,55 +1237,28 @@ class UploadService:
                 ).delete(synchronize_session=False)
                 logger.info(f"🗑️ Revisão: {deleted_old} transações antigas removidas")
             
-            transacoes_criadas = 0
             now = datetime.now()
             
-            for item in previews:
-                # Criar transação usando os dados já processados
-                nova_transacao = JournalEntry(
-                    user_id=user_id,
-                    Data=item.data,
-                    Estabelecimento=item.lancamento,
-                    EstabelecimentoBase=item.EstabelecimentoBase,  # ✅ CamelCase
-                    Valor=item.valor,
-                    ValorPositivo=item.ValorPositivo,  # ✅ CamelCase
-                    MesFatura=item.mes_fatura.replace('-', '') if item.mes_fatura else None,
-                    arquivo_origem=item.nome_arquivo,
-                    banco_origem=item.banco,
-                    NomeCartao=item.nome_cartao,
-                    IdTransacao=item.IdTransacao,  # ✅ CamelCase
-                    IdParcela=item.IdParcela,  # ✅ CamelCase
-                    parcela_atual=item.ParcelaAtual,  # ✅ CamelCase
-                    TotalParcelas=item.TotalParcelas,  # ✅ CamelCase
-                    GRUPO=item.GRUPO,  # ✅ CamelCase
-                    SUBGRUPO=item.SUBGRUPO,  # ✅ CamelCase
-                    TipoGasto=item.TipoGasto,  # ✅ CamelCase
-                    CategoriaGeral=item.CategoriaGeral,  # ✅ CamelCase
-                    origem_classificacao=item.origem_classificacao,
-                    tipodocumento=item.tipo_documento,
-                    TipoTransacao=item.TipoTransacao,    # ✅ CamelCase
-                    Ano=item.Ano,                        # ✅ CamelCase
-                    Mes=item.Mes,                        # ✅ CamelCase
-                    session_id=history.session_id if is_revision else session_id,  # Original session
-                    upload_history_id=history.id,        # ✅ Sempre o ID do histórico original
-                    created_at=now,
-                )
-                
-                self.db.add(nova_transacao)
-                transacoes_criadas += 1
+            # INSERT INTO journal_entries SELECT ... FROM preview_transacoes (1 statement)
+            transacoes_criadas = self.repository.move_preview_to_journal(
+                session_id,
+                user_id,
+                journal_session_id=history.session_id if is_revision else session_id,  # Original session
+                upload_history_id=history.id,  # ✅ Sempre o ID do histórico original
+                created_at=now,
+            )
+            meses_rollup |= meses_do_upload(self.db, user_id, history.id)
+            refresh_journal_rollup(self.db, user_id, meses_rollup)
             
-            # Salvar todas as transações
+            # Salvar todas as transações (+ rollup mensal, mesma transação)
             self.db.commit()
+            bump_data_version(user_id)
             logger.info(f"✅ {transacoes_criadas} transações salvas no journal_entries")
 
             # Invalida cache de cashflow para os meses afetados pelo upload
             try:
                 from app.domains.plano.service import invalidate_cashflow_cache
-                meses_afetados = list({
-                    item.mes_fatura  # já no formato YYYY-MM
-                    for item in previews
-                    if item.mes_fatura
-                })
+                meses_afetados = [mes for mes in importaveis_por_mes if mes]  # já no formato YYYY-MM
                 if meses_afetados:
                     invalidate_cashflow_cache(self.db, user_id, mes_referencia=meses_afetados)
                     logger.info(f"🗑️ Cache cashflow invalidado para {len(meses_afetados)} meses: {meses_afetados}")
@@ -1000,49 +1305,20 @@ class UploadService:
                     logger.info(f"🗑️ Revisão: {deleted_parcelas} parcelas órfãs removidas de base_parcelas")
             
             # ========== FASES 5, 6, 7 EM BACKGROUND ==========
-            # Evita 502 (timeout Nginx) em uploads grandes — retorna resposta imediata ao usuário
-            # e executa base_parcelas, budget_planning e base_padroes em thread separada
-            import threading
-            _user_id = user_id
-            _history_id = history.id
-
-            def _run_post_confirm_phases():
-                db_bg = None
-                try:
-                    from app.core.database import SessionLocal
-                    db_bg = SessionLocal()
-                    svc = UploadService(db_bg)
-                    try:
-                        logger.info("🔄 [BG] Fase 5: Atualização de Base Parcelas")
-                        resultado_parcelas = svc._fase5_update_base_parcelas(_user_id, _history_id)
-                        logger.info(f"  ✅ [BG] Parcelas: {resultado_parcelas.get('total_processadas', 0)} processadas")
-                    except Exception as e:
-                        logger.warning(f"  ⚠️ [BG] Erro Fase 5: {str(e)}")
-                    try:
-                        logger.info("🔄 [BG] Fase 6: Sincronização Budget Planning")
-                        resultado_budget = svc._fase6_sync_budget_planning(_user_id, _history_id)
-                        logger.info(f"  ✅ [BG] Budget: {resultado_budget.get('criados', 0)} linhas criadas")
-                    except Exception as e:
-                        logger.warning(f"  ⚠️ [BG] Erro Fase 6: {str(e)}")
-                    try:
-                        from app.domains.upload.processors.pattern_generator import regenerar_base_padroes_completa
-                        logger.info("🔄 [BG] Fase 7: Regeneração de Base Padrões")
-                        resultado_padroes = regenerar_base_padroes_completa(db_bg, _user_id)
-                        logger.info(f"  ✅ [BG] Padrões: {resultado_padroes.get('total_padroes_gerados', 0)} gerados")
-                    except Exception as e:
-                        logger.warning(f"  ⚠️ [BG] Erro Fase 7: {str(e)}")
-                except Exception as e:
-                    logger.warning(f"  ⚠️ [BG] Erro ao iniciar sessão: {str(e)}")
-                finally:
-                    if db_bg:
-                        try:
-                            db_bg.close()
-                        except Exception:
-                            pass
-
-            t = threading.Thread(target=_run_post_confirm_phases, daemon=True)
-            t.start()
-            logger.info("📤 Resposta enviada ao usuário; fases 5/6/7 rodando em background")
+            # Evita 502 (timeout Nginx) em uploads grandes — retorna resposta imediata ao usuário.
+            # Fila persistente (background_jobs): sobrevive a restart, limita concorrência e
+            # coalesce confirmações seguidas do mesmo usuário em UMA regeneração de padrões.
+            job_id = None
+            try:
+                job = enqueue_job(
+                    self.db, user_id, POST_CONFIRM_JOB,
+                    {'upload_history_ids': [history.id]}
+                )
+                job_id = job.id
+                logger.info(f"📤 Resposta enviada ao usuário; fases 5/6/7 no job {job_id}")
+            except Exception as e:
+                self.db.rollback()
+                logger.error(f"❌ Erro ao enfileirar fases 5/6/7: {str(e)}", exc_info=True)
 
             # Limpar dados de preview
             deleted = self.repository.delete_by_session_id(session_id, user_id)
@@ -1060,7 +1336,8 @@ class UploadService:
                 success=True,
                 sessionId=session_id,
                 transacoesCriadas=transacoes_criadas,
-                total=transacoes_criadas
+                total=transacoes_criadas,
+                jobId=job_id
             )
             
         except Exception as e:
@@ -1221,6 +1498,8 @@ class UploadService:
                 detail={"errorCode": "UPL_013", "error": "Upload não encontrado"}
             )
         
+        meses_rollup = meses_do_upload(self.db, user_id, upload_history_id)
+        
         # Coletar IdParcela antes de deletar (para limpar base_parcelas)
         old_rows = self.db.query(JournalEntry.IdParcela).filter(
             JournalEntry.upload_history_id == upload_history_id,
@@ -1249,9 +1528,12 @@ class UploadService:
                     BaseParcelas.id_parcela.in_(removed)
                 ).delete(synchronize_session=False)
         
+        refresh_journal_rollup(self.db, user_id, meses_rollup)
+        
         # Deletar registro de upload_history
         self.db.delete(history)
         self.db.commit()
+        bump_data_version(user_id)
         
         logger.info(f"🗑️ Upload {upload_history_id} deletado: {deleted_count} transações removidas")
         
@@ -1281,6 +1563,7 @@ class UploadService:
             )
         
         mes_fatura = f"{ano}{mes:02d}"
+        meses_rollup = meses_do_upload(self.db, user_id, upload_history_id) | {mes_fatura}
         
         # Atualizar journal_entries
         updated = self.db.query(JournalEntry).filter(
@@ -1295,6 +1578,8 @@ class UploadService:
             synchronize_session=False
         )
         
+        refresh_journal_rollup(self.db, user_id, meses_rollup)
+        
         # Atualizar upload_history
         self.repository.update_upload_history(upload_history_id, mes_fatura=mes_fatura)
         
@@ -1305,6 +1590,7 @@ class UploadService:
             self._fase6_sync_budget_planning(user_id, upload_history_id)
         except Exception as e:
             logger.warning(f"⚠️ Erro na sincronização de budget após ajuste de período: {str(e)}")
+        bump_data_version(user_id)
         
         logger.info(f"📅 Período do upload {upload_history_id} ajustado para {mes_fatura} ({updated} transações)")
         
@@ -1378,6 +1664,9 @@ class UploadService:
                 IdTransacao=je.IdTransacao,
                 IdParcela=je.IdParcela,
                 EstabelecimentoBase=je.EstabelecimentoBase,
+                EstabelecimentoNorm=je.EstabelecimentoNorm,
+                ChavePadrao=je.ChavePadrao,
+                data_transacao=je.data_transacao,
                 ParcelaAtual=je.parcela_atual,
                 TotalParcelas=je.TotalParcelas,
                 ValorPositivo=je.ValorPositivo or abs(je.Valor or 0),
@@ -1550,9 +1839,12 @@ class UploadService:
         
         Lógica:
         1. Busca transações parceladas do upload atual
-        2. Para cada IdParcela:
-           - Se existe: atualiza qtd_pagas
-           - Se não existe: cria nova entrada
+        2. Pré-carrega (1 IN) as parcelas existentes e (1 query) o mapa grupo → categoria_geral
+        3. Para cada IdParcela (transações em ordem de id, última vence):
+           - Se existe: qtd_pagas só aumenta; status e classificação sincronizados
+           - Se não existe: nova entrada
+        4. Grava novas/alteradas em um único INSERT ... ON CONFLICT (user_id, id_parcela)
+           DO UPDATE com qtd_pagas = GREATEST(atual, nova)
         
         Args:
             user_id: ID do usuário
@@ -1561,7 +1853,8 @@ class UploadService:
         Returns:
             dict com contadores
         """
-        from app.domains.transactions.models import JournalEntry, BaseParcelas
+        from sqlalchemy.dialects.postgresql import insert as pg_insert
+        from app.domains.transactions.models import BaseParcelas, greatest
         
         # Buscar transações parceladas do upload atual
         transacoes_parceladas = self.db.query(JournalEntry).filter(
@@ -1569,86 +1862,92 @@ class UploadService:
             JournalEntry.upload_history_id == upload_history_id,
             JournalEntry.IdParcela.isnot(None),
             JournalEntry.TotalParcelas > 1
-        ).all()
+        ).order_by(JournalEntry.id).all()
         
         if not transacoes_parceladas:
             return {'atualizadas': 0, 'novas': 0}
         
+        por_id_parcela = {}
+        for transacao in transacoes_parceladas:
+            por_id_parcela.setdefault(transacao.IdParcela, []).append(transacao)
+        
+        existentes = {
+            p.id_parcela: p for p in self.db.query(BaseParcelas).filter(
+                BaseParcelas.user_id == user_id,
+                BaseParcelas.id_parcela.in_(list(por_id_parcela))
+            )
+        }
+        categorias = self._categorias_por_grupo(user_id) if len(existentes) < len(por_id_parcela) else {}
+        
         atualizadas = 0
         novas = 0
         finalizadas = 0
+        agora = datetime.now()
+        linhas = []
         
-        for transacao in transacoes_parceladas:
-            # Verificar se IdParcela já existe
-            parcela_existente = self.db.query(BaseParcelas).filter(
-                BaseParcelas.user_id == user_id,
-                BaseParcelas.id_parcela == transacao.IdParcela
-            ).first()
+        for id_parcela, transacoes in por_id_parcela.items():
+            parcela_existente = existentes.get(id_parcela)
             
             if parcela_existente:
-                # ATUALIZAR qtd_pagas e status (só aumenta qtd_pagas, nunca diminui)
-                updated_any = False
-                if transacao.parcela_atual > parcela_existente.qtd_pagas:
-                    parcela_existente.qtd_pagas = transacao.parcela_atual
-                    updated_any = True
-                if transacao.parcela_atual >= transacao.TotalParcelas:
-                    if parcela_existente.status != 'finalizada':
-                        parcela_existente.status = 'finalizada'
-                        finalizadas += 1
-                        updated_any = True
-                else:
-                    if parcela_existente.status != 'ativa':
-                        parcela_existente.status = 'ativa'
-                        updated_any = True
+                linha = {c: getattr(parcela_existente, c) for c in CAMPOS_BASE_PARCELAS}
+            else:
+                # INSERIR nova compra parcelada (dados da primeira transação do upload)
+                primeira = transacoes[0]
+                linha = {
+                    'estabelecimento_base': primeira.EstabelecimentoBase,
+                    'valor_parcela': primeira.ValorPositivo,
+                    'qtd_parcelas': primeira.TotalParcelas,
+                    'qtd_pagas': primeira.parcela_atual,
+                    'valor_total_plano': primeira.ValorPositivo * primeira.TotalParcelas,
+                    'grupo_sugerido': primeira.GRUPO,
+                    'subgrupo_sugerido': primeira.SUBGRUPO,
+                    'tipo_gasto_sugerido': primeira.TipoGasto,
+                    'categoria_geral_sugerida': categorias.get(primeira.GRUPO, 'Despesa') if primeira.GRUPO else 'Despesa',
+                    'data_inicio': primeira.Data,
+                    'status': None,
+                    'created_at': agora,
+                }
+            status_anterior = linha['status']
+            original = dict(linha)
+            
+            for transacao in transacoes:
+                # qtd_pagas só aumenta, nunca diminui
+                if transacao.parcela_atual > (linha['qtd_pagas'] or 0):
+                    linha['qtd_pagas'] = transacao.parcela_atual
+                linha['status'] = 'finalizada' if transacao.parcela_atual >= transacao.TotalParcelas else 'ativa'
                 # Sincronizar classificação (revisão pode ter alterado grupo/subgrupo)
-                if transacao.GRUPO and transacao.GRUPO != parcela_existente.grupo_sugerido:
-                    parcela_existente.grupo_sugerido = transacao.GRUPO
-                    updated_any = True
-                if transacao.SUBGRUPO and transacao.SUBGRUPO != parcela_existente.subgrupo_sugerido:
-                    parcela_existente.subgrupo_sugerido = transacao.SUBGRUPO
-                    updated_any = True
-                if transacao.TipoGasto and transacao.TipoGasto != parcela_existente.tipo_gasto_sugerido:
-                    parcela_existente.tipo_gasto_sugerido = transacao.TipoGasto
-                    updated_any = True
-                if updated_any:
-                    parcela_existente.updated_at = datetime.now()
-                    atualizadas += 1
+                if transacao.GRUPO:
+                    linha['grupo_sugerido'] = transacao.GRUPO
+                if transacao.SUBGRUPO:
+                    linha['subgrupo_sugerido'] = transacao.SUBGRUPO
+                if transacao.TipoGasto:
+                    linha['tipo_gasto_sugerido'] = transacao.TipoGasto
             
+            if parcela_existente and linha == original:
+                continue
+            if linha['status'] == 'finalizada' and status_anterior != 'finalizada':
+                finalizadas += 1
+            if parcela_existente:
+                atualizadas += 1
             else:
-                # INSERIR nova compra parcelada
-                # Buscar categoria_geral via grupo
-                categoria_geral = self._get_categoria_geral_from_grupo(transacao.GRUPO, user_id)
-                
-                # Determinar status inicial baseado no progresso
-                if transacao.parcela_atual >= transacao.TotalParcelas:
-                    status_inicial = 'finalizada'
-                    status_desc = "finalizada"
-                    finalizadas += 1
-                else:
-                    status_inicial = 'ativa'
-                    status_desc = "ativa"
-                
-                nova_parcela = BaseParcelas(
-                    user_id=user_id,
-                    id_parcela=transacao.IdParcela,
-                    estabelecimento_base=transacao.EstabelecimentoBase,
-                    valor_parcela=transacao.ValorPositivo,
-                    qtd_parcelas=transacao.TotalParcelas,
-                    qtd_pagas=transacao.parcela_atual,
-                    valor_total_plano=transacao.ValorPositivo * transacao.TotalParcelas,
-                    grupo_sugerido=transacao.GRUPO,
-                    subgrupo_sugerido=transacao.SUBGRUPO,
-                    tipo_gasto_sugerido=transacao.TipoGasto,
-                    categoria_geral_sugerida=categoria_geral,
-                    data_inicio=transacao.Data,
-                    status=status_inicial,
-                    created_at=datetime.now(),
-                    updated_at=datetime.now()
-                )
-                
-                self.db.add(nova_parcela)
                 novas += 1
-                logger.debug(f"  ➕ Nova parcela: {transacao.IdParcela} ({transacao.TotalParcelas}x R${transacao.ValorPositivo:.2f}) → {status_desc}")
+                logger.debug(f"  ➕ Nova parcela: {id_parcela} ({linha['qtd_parcelas']}x R${linha['valor_parcela']:.2f}) → {linha['status']}")
+            linhas.append({**linha, 'user_id': user_id, 'id_parcela': id_parcela, 'updated_at': agora})
+        
+        if linhas:
+            stmt = pg_insert(BaseParcelas).values(linhas)
+            stmt = stmt.on_conflict_do_update(
+                index_elements=['user_id', 'id_parcela'],
+                set_={
+                    'qtd_pagas': greatest(BaseParcelas.qtd_pagas, stmt.excluded.qtd_pagas),
+                    'status': stmt.excluded.status,
+                    'grupo_sugerido': stmt.excluded.grupo_sugerido,
+                    'subgrupo_sugerido': stmt.excluded.subgrupo_sugerido,
+                    'tipo_gasto_sugerido': stmt.excluded.tipo_gasto_sugerido,
+                    'updated_at': stmt.excluded.updated_at,
+                }
+            )
+            self.db.execute(stmt)
         
         self.db.commit()
         
@@ -1664,85 +1963,120 @@ class UploadService:
         Garante que TODOS os grupos com gastos (Despesa) e investimentos tenham linha em budget_planning.
         Cria com valor_planejado=0 se não existir.
         Inclui: Despesa + Investimentos (CategoriaGeral em journal_entries)
+        
+        Escopo: só os MesFatura presentes no upload (os demais meses não mudaram).
+        Executa como 1 INSERT ... SELECT DISTINCT ... ON CONFLICT (user_id, grupo, mes_referencia)
+        DO NOTHING — custo proporcional ao upload, não ao histórico do usuário.
         """
+        from sqlalchemy import func, literal, select, true
+        from sqlalchemy.dialects.postgresql import insert as pg_insert
         from app.domains.budget.models import BudgetPlanning
         
-        # Buscar (grupo, mes_fatura) com Despesa OU Investimentos em journal_entries
-        rows_desp = self.db.query(
-            JournalEntry.GRUPO,
-            JournalEntry.MesFatura
-        ).filter(
+        meses_upload = select(JournalEntry.MesFatura).where(
             JournalEntry.user_id == user_id,
-            JournalEntry.CategoriaGeral == 'Despesa',
-            JournalEntry.IgnorarDashboard == 0,
-            JournalEntry.GRUPO.isnot(None),
-            JournalEntry.GRUPO != '',
-            JournalEntry.MesFatura.isnot(None)
-        ).distinct().all()
+            JournalEntry.upload_history_id == upload_history_id
+        ).distinct().scalar_subquery()
         
-        rows_inv = self.db.query(
+        agora = datetime.now()
+        mes_referencia = func.substr(JournalEntry.MesFatura, 1, 4) + '-' + func.substr(JournalEntry.MesFatura, 5, 2)
+        pares = select(
+            JournalEntry.user_id,
             JournalEntry.GRUPO,
-            JournalEntry.MesFatura
-        ).filter(
+            mes_referencia,
+            literal(0.0),
+            literal(0.0),
+            true(),
+            literal(agora),
+            literal(agora),
+        ).where(
             JournalEntry.user_id == user_id,
-            JournalEntry.CategoriaGeral == 'Investimentos',
+            JournalEntry.MesFatura.in_(meses_upload),
+            JournalEntry.CategoriaGeral.in_(['Despesa', 'Investimentos']),
             JournalEntry.IgnorarDashboard == 0,
             JournalEntry.GRUPO.isnot(None),
             JournalEntry.GRUPO != '',
-            JournalEntry.MesFatura.isnot(None)
-        ).distinct().all()
-        
-        # União (grupo, mes_fatura) sem duplicatas
-        seen = set()
-        rows = []
-        for r in rows_desp + rows_inv:
-            key = (r.GRUPO, r.MesFatura)
-            if key not in seen:
-                seen.add(key)
-                rows.append((r.GRUPO, r.MesFatura))
-        
-        criados = 0
-        for grupo, mes_fatura in rows:
-            if not grupo or not mes_fatura or len(mes_fatura) != 6:
-                continue
-            mes_referencia = f"{mes_fatura[:4]}-{mes_fatura[4:6]}"
-            
-            existente = self.db.query(BudgetPlanning).filter(
-                BudgetPlanning.user_id == user_id,
-                BudgetPlanning.grupo == grupo,
-                BudgetPlanning.mes_referencia == mes_referencia
-            ).first()
-            
-            if not existente:
-                novo = BudgetPlanning(
-                    user_id=user_id,
-                    grupo=grupo,
-                    mes_referencia=mes_referencia,
-                    valor_planejado=0.0,
-                    valor_medio_3_meses=0.0,
-                    ativo=1
-                )
-                self.db.add(novo)
-                criados += 1
-                logger.debug(f"  ➕ Budget criado: {grupo} {mes_referencia} (plano 0)")
-        
-        if criados > 0:
+            func.length(JournalEntry.MesFatura) == 6
+        ).distinct()
+        
+        stmt = pg_insert(BudgetPlanning).from_select(
+            ['user_id', 'grupo', 'mes_referencia', 'valor_planejado', 'valor_medio_3_meses',
+             'ativo', 'created_at', 'updated_at'],
+            pares
+        ).on_conflict_do_nothing(
+            index_elements=['user_id', 'grupo', 'mes_referencia']
+        ).returning(BudgetPlanning.grupo, BudgetPlanning.mes_referencia)
+        
+        criados = self.db.execute(stmt).all()
+        for grupo, mes in criados:
+            logger.debug(f"  ➕ Budget criado: {grupo} {mes} (plano 0)")
+        
+        if criados:
             self.db.commit()
         
-        return {'criados': criados}
+        return {'criados': len(criados)}
     
-    def _get_categoria_geral_from_grupo(self, grupo: str, user_id: int) -> str:
+    def _categorias_por_grupo(self, user_id: int) -> dict:
         """
-        Busca CategoriaGeral correspondente ao Grupo via base_grupos_config do usuário
+        Mapa nome_grupo → categoria_geral da base_grupos_config do usuário (1 query)
         """
-        from sqlalchemy import text
-        
-        if not grupo:
-            return 'Despesa'  # Fallback padrão
+        from app.domains.grupos.models import BaseGruposConfig
         
-        result = self.db.execute(
-            text("SELECT categoria_geral FROM base_grupos_config WHERE user_id = :user_id AND nome_grupo = :grupo"),
-            {"user_id": user_id, "grupo": grupo}
-        ).fetchone()
-        
-        return result[0] if result else 'Despesa'
+        return dict(
+            self.db.query(BaseGruposConfig.nome_grupo, BaseGruposConfig.categoria_geral)
+            .filter(BaseGruposConfig.user_id == user_id)
+            .all()
+        )
+
+@register_job_handler(POST_CONFIRM_JOB)
+def run_post_confirm_phases(db: Session, user_id: int, payload: dict) -> dict:
+    """
+    Fases 5/6/7 pós-confirmação (job 'upload_post_confirm').
+
+    payload['upload_history_ids'] acumula todos os uploads coalescidos no job:
+    fases 5 e 6 rodam por upload; a fase 7 (base_padroes incremental — só os padrões
+    tocados pelos uploads) roda UMA vez para todos.
+    Todas as fases são idempotentes — falha em qualquer uma levanta exceção e o job
+    inteiro é reexecutado no retry.
+    """
+    from app.domains.upload.processors.pattern_generator import atualizar_base_padroes_incremental
+
+    svc = UploadService(db)
+    history_ids = payload.get('upload_history_ids') or []
+    resultado = {'uploads': len(history_ids), 'parcelas': 0, 'budget_criados': 0, 'padroes': 0}
+    erros = []
+
+    for history_id in history_ids:
+        try:
+            logger.info(f"🔄 [BG] Fase 5: Atualização de Base Parcelas (upload {history_id})")
+            resultado_parcelas = svc._fase5_update_base_parcelas(user_id, history_id)
+            resultado['parcelas'] += resultado_parcelas.get('total_processadas', 0)
+        except Exception as e:
+            db.rollback()
+            erros.append(f"fase5[{history_id}]: {e}")
+            logger.warning(f"  ⚠️ [BG] Erro Fase 5: {str(e)}")
+        try:
+            logger.info(f"🔄 [BG] Fase 6: Sincronização Budget Planning (upload {history_id})")
+            resultado_budget = svc._fase6_sync_budget_planning(user_id, history_id)
+            resultado['budget_criados'] += resultado_budget.get('criados', 0)
+        except Exception as e:
+            db.rollback()
+            erros.append(f"fase6[{history_id}]: {e}")
+            logger.warning(f"  ⚠️ [BG] Erro Fase 6: {str(e)}")
+
+    try:
+        logger.info("🔄 [BG] Fase 7: Atualização incremental de Base Padrões")
+        resultado_padroes = atualizar_base_padroes_incremental(db, user_id, upload_history_ids=history_ids)
+        resultado['padroes'] = resultado_padroes.get('total_padroes_gerados', 0)
+    except Exception as e:
+        db.rollback()
+        erros.append(f"fase7: {e}")
+        logger.warning(f"  ⚠️ [BG] Erro Fase 7: {str(e)}")
+
+    # Fase 6 cria metas em budget_planning → invalida cache de leitura
+    bump_data_version(user_id)
+
+    if erros:
+        raise RuntimeError("; ".join(erros))
+
+    logger.info(f"  ✅ [BG] Fases 5/6/7 concluídas: {resultado}")
+    return resultado
@@ -293,7 +293,7 @@ class UserService:
             InvestimentoPlanejamento,
         )
         from app.domains.budget.models import BudgetPlanning
-        from app.domains.transactions.models import JournalEntry, BaseParcelas
+        from app.domains.transactions.models import JournalEntry, BaseParcelas, JournalMonthlyRollup
         from app.domains.upload.history_models import UploadHistory
         from app.domains.upload.models import PreviewTransacao
         from app.domains.exclusoes.models import TransacaoExclusao
@@ -310,6 +310,7 @@ class UserService:
         db.query(InvestimentoPlanejamento).filter(InvestimentoPlanejamento.user_id == user_id).delete()
         db.query(BudgetPlanning).filter(BudgetPlanning.user_id == user_id).delete()
         db.query(JournalEntry).filter(JournalEntry.user_id == user_id).delete()
+        db.query(JournalMonthlyRollup).filter(JournalMonthlyRollup.user_id == user_id).delete()
         db.query(UploadHistory).filter(UploadHistory.user_id == user_id).delete()
         db.query(TransacaoExclusao).filter(TransacaoExclusao.user_id == user_id).delete()
         db.query(PreviewTransacao).filter(PreviewTransacao.user_id == user_id).delete()
@@ -320,6 +321,8 @@ class UserService:
         db.query(BaseGruposConfig).filter(BaseGruposConfig.user_id == user_id).delete()
         db.query(User).filter(User.id == user_id).delete()
         db.commit()
+        from app.core.cache import bump_data_version
+        bump_data_version(user_id)
 
         logger.warning("PURGE user_id=%s por admin_id=%s", user_id, executado_por)
         return {"message": f"Usuário {user_id} removido permanentemente"}
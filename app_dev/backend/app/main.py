@@ -1,7 +1,7 @@
 """
 FastAPI Main Application - Arquitetura Modular em Domínios
 """
-from fastapi import FastAPI, Request
+from fastapi import Depends, FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.responses import JSONResponse
 from starlette.middleware.base import BaseHTTPMiddleware
@@ -11,6 +11,9 @@ from slowapi.errors import RateLimitExceeded
 
 from .core.config import settings
 from .core.database import engine, Base
+from .core.cache import cache_stats
+from .core.executors import get_thread_pool, shutdown_executors
+from .shared.dependencies import require_admin
 
 
 class SecurityHeadersMiddleware(BaseHTTPMiddleware):
@@ -51,6 +54,8 @@ from .domains.classification.router import router as classification_router
 from .domains.investimentos.router import router as investimentos_router
 from .domains.onboarding.router import router as onboarding_router
 from .domains.plano.router import router as plano_router
+from .domains.jobs.router import router as jobs_router
+from .domains.jobs.service import start_job_runner, stop_job_runner
 
 # Cria app FastAPI
 # docs/redoc desabilitados em produção (segurança)
@@ -96,6 +101,31 @@ app.include_router(classification_router, prefix="/api/v1", tags=["Classificatio
 app.include_router(investimentos_router, prefix="/api/v1", tags=["Investimentos"])
 app.include_router(onboarding_router, prefix="/api/v1", tags=["Onboarding"])
 app.include_router(plano_router, prefix="/api/v1", tags=["Plano"])
+app.include_router(jobs_router, prefix="/api/v1", tags=["Jobs"])
+
+@app.on_event("startup")
+def _start_job_runner():
+    """Sobe os workers da fila persistente de jobs (app.domains.jobs)"""
+    start_job_runner()
+
+@app.on_event("startup")
+def _prewarm_ocr():
+    """
+    OCR_PREWARM: sobe em background o pool OCR deste processo da API (único dono do pool)
+    com o modelo carregado em cada worker
+    """
+    if not settings.OCR_PREWARM:
+        return
+    from .domains.upload.processors.raw.pdf.ocr_engine import aquecer_pool_ocr
+    get_thread_pool().submit(aquecer_pool_ocr)
+
+@app.on_event("shutdown")
+def _shutdown_executors():
+    """Encerra workers de jobs, pool OCR e pools de threads/processos do upload (app.core.executors)"""
+    from .domains.upload.processors.raw.pdf.ocr_engine import encerrar_pool_ocr
+    stop_job_runner()
+    encerrar_pool_ocr()
+    shutdown_executors()
 
 @app.get("/")
 def root():
@@ -115,6 +145,11 @@ def health_check():
         "database": "connected"
     }
 
+@app.get("/api/health/cache", dependencies=[Depends(require_admin)])
+def cache_health():
+    """Métricas do cache de leitura por usuário (hit/miss/bypass deste processo) — só admin"""
+    return cache_stats()
+
 # Exception handlers
 @app.exception_handler(404)
 async def not_found_handler(request, exc):
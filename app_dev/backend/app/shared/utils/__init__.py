@@ -7,6 +7,7 @@ from .hasher import fnv1a_64_hash, generate_id_simples, generate_id_transacao
 from .normalizer import (
     normalizar_estabelecimento,
     detectar_parcela,
+    parse_data_transacao,
     arredondar_2_decimais,
     get_faixa_valor,
     normalizar,
@@ -22,6 +23,7 @@ __all__ = [
     "generate_id_transacao",
     "normalizar_estabelecimento",
     "detectar_parcela",
+    "parse_data_transacao",
     "arredondar_2_decimais",
     "get_faixa_valor",
     "normalizar",
@@ -6,6 +6,7 @@ Fonte: https://github.com/emangue/FinUp/tree/main/app/utils/normalizer.py
 import re
 import unicodedata
 import math
+from datetime import date
 
 
 def normalizar(texto):
@@ -179,6 +180,27 @@ def detectar_parcela(estabelecimento, origem=''):
     return {'parcela': parcela, 'total': total}
 
 
+def parse_data_transacao(data_str):
+    """
+    Converte a Data DD/MM/YYYY da transação em date (coluna data_transacao)
+    
+    Args:
+        data_str (str): Data no formato DD/MM/YYYY
+        
+    Returns:
+        date or None: Data convertida ou None se vazia/inválida
+    """
+    if not data_str:
+        return None
+    partes = str(data_str).strip().split('/')
+    if len(partes) != 3 or len(partes[2]) != 4:
+        return None
+    try:
+        return date(int(partes[2]), int(partes[1]), int(partes[0]))
+    except ValueError:
+        return None
+
+
 def get_faixa_valor(valor):
     """
     Determina faixa de valor para segmentação
@@ -28,7 +28,7 @@ if not settings.DATABASE_URL.startswith("postgresql"):
 # ─────────────────────────────────────────────────────────────────────────────
 
 # Importar TODOS os modelos para garantir que sejam registrados no Base.metadata
-from app.domains.transactions.models import JournalEntry, BaseParcelas
+from app.domains.transactions.models import JournalEntry, BaseParcelas, JournalMonthlyRollup
 from app.domains.users.models import User
 from app.domains.categories.models import BaseMarcacao
 from app.domains.grupos.models import BaseGruposConfig
@@ -47,6 +47,7 @@ from app.domains.investimentos.models import (
     InvestimentoTransacao,
 )
 from app.domains.plano.models import BaseExpectativa, ExpectativaMes, UserFinancialProfile, PlanoMetaCategoria
+from app.domains.jobs.models import BackgroundJob
 
 # this is the Alembic Config object, which provides
 # access to the values within the .ini file in use.
@@ -0,0 +1,62 @@
+"""Add background_jobs table (fila persistente de jobs)
+
+Revision ID: n9o0p1q2r3s4
+Revises: bbc24ab11c33
+Create Date: 2026-10-18
+
+Substitui threading.Thread(daemon=True) das fases 5/6/7 do confirm_upload:
+- jobs sobrevivem a restart do worker (lock expirado volta para pending)
+- índice único parcial garante 1 job pending por (user_id, job_type) → coalescing
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+revision: str = "n9o0p1q2r3s4"
+down_revision: Union[str, Sequence[str], None] = "bbc24ab11c33"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "background_jobs",
+        sa.Column("id", sa.Integer(), autoincrement=True, nullable=False),
+        sa.Column("user_id", sa.Integer(), nullable=False),
+        sa.Column("job_type", sa.String(50), nullable=False),
+        sa.Column("payload", sa.JSON(), nullable=True),
+        sa.Column("status", sa.String(20), nullable=False, server_default="pending"),
+        sa.Column("attempts", sa.Integer(), nullable=False, server_default="0"),
+        sa.Column("max_attempts", sa.Integer(), nullable=False, server_default="3"),
+        sa.Column("run_after", sa.DateTime(), server_default=sa.text("now()"), nullable=False),
+        sa.Column("locked_at", sa.DateTime(), nullable=True),
+        sa.Column("locked_by", sa.String(100), nullable=True),
+        sa.Column("result", sa.JSON(), nullable=True),
+        sa.Column("last_error", sa.Text(), nullable=True),
+        sa.Column("created_at", sa.DateTime(), server_default=sa.text("now()"), nullable=True),
+        sa.Column("updated_at", sa.DateTime(), server_default=sa.text("now()"), nullable=True),
+        sa.Column("finished_at", sa.DateTime(), nullable=True),
+        sa.ForeignKeyConstraint(["user_id"], ["users.id"], ondelete="CASCADE"),
+        sa.PrimaryKeyConstraint("id"),
+    )
+    op.create_index("ix_background_jobs_id", "background_jobs", ["id"], unique=False)
+    op.create_index("ix_background_jobs_user_id", "background_jobs", ["user_id"], unique=False)
+    op.create_index("idx_background_jobs_status_run_after", "background_jobs", ["status", "run_after"], unique=False)
+    op.create_index("idx_background_jobs_user_type_status", "background_jobs", ["user_id", "job_type", "status"], unique=False)
+    op.create_index(
+        "uq_background_jobs_user_type_pending",
+        "background_jobs",
+        ["user_id", "job_type"],
+        unique=True,
+        postgresql_where=sa.text("status = 'pending'"),
+    )
+
+
+def downgrade() -> None:
+    op.drop_index("uq_background_jobs_user_type_pending", table_name="background_jobs")
+    op.drop_index("idx_background_jobs_user_type_status", table_name="background_jobs")
+    op.drop_index("idx_background_jobs_status_run_after", table_name="background_jobs")
+    op.drop_index("ix_background_jobs_user_id", table_name="background_jobs")
+    op.drop_index("ix_background_jobs_id", table_name="background_jobs")
+    op.drop_table("background_jobs")
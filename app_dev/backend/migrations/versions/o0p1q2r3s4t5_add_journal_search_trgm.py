@@ -0,0 +1,61 @@
+"""Add trigram search columns to journal_entries (pg_trgm)
+
+Revision ID: o0p1q2r3s4t5
+Revises: n9o0p1q2r3s4
+Create Date: 2026-10-18
+
+Busca de transações (search / estabelecimento) deixa de ser ILIKE '%termo%' em 4 colunas
+sem índice (seq scan por tecla digitada):
+- estabelecimento_busca / busca_texto: colunas GERADAS (STORED) em minúsculas e sem acento,
+  mantidas pelo próprio banco em qualquer caminho de escrita (ORM, INSERT ... SELECT, UPDATE em massa)
+- índices GIN gin_trgm_ops: servem LIKE '%termo%' e o operador de similaridade %>
+
+A expressão precisa ser idêntica a dobrar_acentos() em app/domains/transactions/models.py.
+ADD COLUMN ... GENERATED STORED reescreve a tabela (lock exclusivo durante a migração).
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+revision: str = "o0p1q2r3s4t5"
+down_revision: Union[str, Sequence[str], None] = "n9o0p1q2r3s4"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+ACENTOS = "áàâãäéèêëíìîïóòôõöúùûüçñ" + "áàâãäéèêëíìîïóòôõöúùûüçñ".upper()
+SEM_ACENTOS = "aaaaaeeeeiiiiooooouuuucn" * 2
+
+
+def _dobrar(expr: str) -> str:
+    return f"translate(lower({expr}), '{ACENTOS}', '{SEM_ACENTOS}')"
+
+
+def upgrade() -> None:
+    op.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+
+    estabelecimento = _dobrar("""coalesce("Estabelecimento", '')""")
+    busca = _dobrar(
+        """coalesce("Estabelecimento", '') || ' ' || coalesce("GRUPO", '') || ' ' """
+        """|| coalesce("SUBGRUPO", '') || ' ' || coalesce("Data", '')"""
+    )
+    op.execute(
+        f"ALTER TABLE journal_entries "
+        f"ADD COLUMN estabelecimento_busca TEXT GENERATED ALWAYS AS ({estabelecimento}) STORED, "
+        f"ADD COLUMN busca_texto TEXT GENERATED ALWAYS AS ({busca}) STORED"
+    )
+    op.execute(
+        "CREATE INDEX idx_je_busca_texto_trgm ON journal_entries "
+        "USING gin (busca_texto gin_trgm_ops)"
+    )
+    op.execute(
+        "CREATE INDEX idx_je_estabelecimento_busca_trgm ON journal_entries "
+        "USING gin (estabelecimento_busca gin_trgm_ops)"
+    )
+
+
+def downgrade() -> None:
+    op.execute("DROP INDEX IF EXISTS idx_je_estabelecimento_busca_trgm")
+    op.execute("DROP INDEX IF EXISTS idx_je_busca_texto_trgm")
+    op.drop_column("journal_entries", "busca_texto")
+    op.drop_column("journal_entries", "estabelecimento_busca")
+    # pg_trgm fica instalado (pode ser usado por outros objetos)
@@ -0,0 +1,32 @@
+"""Add keyset pagination index to journal_entries
+
+Revision ID: p1q2r3s4t5u6
+Revises: o0p1q2r3s4t5
+Create Date: 2026-10-18
+
+/transactions/list em cursor mode pagina por (MesFatura, id) — WHERE user_id = ?
+AND (coalesce("MesFatura", ''), id) < (?, ?) ORDER BY 2 DESC, id DESC LIMIT n.
+Este índice entrega as linhas já na ordem da listagem: cada página é um range scan de
+`limit` entradas, sem sort e sem depender da profundidade.
+
+A expressão precisa ser idêntica a TransactionRepository._ordem_mes_fatura().
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+revision: str = "p1q2r3s4t5u6"
+down_revision: Union[str, Sequence[str], None] = "o0p1q2r3s4t5"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.execute(
+        "CREATE INDEX IF NOT EXISTS idx_je_user_mesfatura_id_desc ON journal_entries "
+        "(user_id, coalesce(\"MesFatura\", '') DESC, id DESC)"
+    )
+
+
+def downgrade() -> None:
+    op.execute("DROP INDEX IF EXISTS idx_je_user_mesfatura_id_desc")
@@ -0,0 +1,71 @@
+"""Add EstabelecimentoNorm to journal_entries and preview_transacoes
+
+Revision ID: q2r3s4t5u6v7
+Revises: p1q2r3s4t5u6
+Create Date: 2026-10-18
+
+Propagação de padrão (PATCH /transactions com propagate_padrao) e o preview de
+"quantas seriam afetadas" carregavam TODAS as transações do usuário e rodavam
+normalizar_estabelecimento() (regex + NFD) linha a linha. Agora:
+- EstabelecimentoNorm guardado na escrita (marker no upload, create/update, demo)
+- idx_je_user_estab_norm (user_id, EstabelecimentoNorm, ValorPositivo) → 1 UPDATE / 1 COUNT
+
+Backfill em lotes por id (keyset) com a MESMA função Python usada na aplicação —
+regex/unicodedata não têm equivalente exato em SQL. ValorPositivo nulo (legado)
+recebe abs(Valor) para a faixa de valor continuar valendo para essas linhas.
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+from app.shared.utils.normalizer import normalizar_estabelecimento
+
+revision: str = "q2r3s4t5u6v7"
+down_revision: Union[str, Sequence[str], None] = "p1q2r3s4t5u6"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+LOTE = 5000
+
+
+def _backfill(tabela: str, coluna_estab: str) -> None:
+    conn = op.get_bind()
+    selecionar = sa.text(
+        f'SELECT id, "EstabelecimentoBase", "{coluna_estab}" FROM {tabela} '
+        f'WHERE id > :ultimo ORDER BY id LIMIT {LOTE}'
+    )
+    atualizar = sa.text(f'UPDATE {tabela} SET "EstabelecimentoNorm" = :norm WHERE id = :id')
+    ultimo = 0
+    while True:
+        linhas = conn.execute(selecionar, {"ultimo": ultimo}).fetchall()
+        if not linhas:
+            break
+        conn.execute(atualizar, [
+            {"id": id_, "norm": normalizar_estabelecimento(base or estab)}
+            for id_, base, estab in linhas
+        ])
+        ultimo = linhas[-1][0]
+
+
+def upgrade() -> None:
+    op.add_column("journal_entries", sa.Column("EstabelecimentoNorm", sa.String(), nullable=True))
+    op.add_column("preview_transacoes", sa.Column("EstabelecimentoNorm", sa.String(), nullable=True))
+
+    op.execute(
+        'UPDATE journal_entries SET "ValorPositivo" = abs("Valor") '
+        'WHERE "ValorPositivo" IS NULL AND "Valor" IS NOT NULL'
+    )
+    _backfill("journal_entries", "Estabelecimento")
+    _backfill("preview_transacoes", "lancamento")
+
+    op.create_index(
+        "idx_je_user_estab_norm", "journal_entries",
+        ["user_id", "EstabelecimentoNorm", "ValorPositivo"],
+    )
+
+
+def downgrade() -> None:
+    op.drop_index("idx_je_user_estab_norm", table_name="journal_entries")
+    op.drop_column("preview_transacoes", "EstabelecimentoNorm")
+    op.drop_column("journal_entries", "EstabelecimentoNorm")
@@ -0,0 +1,65 @@
+"""Add data_transacao DATE to journal_entries and preview_transacoes
+
+Revision ID: r3s4t5u6v7w8
+Revises: q2r3s4t5u6v7
+Create Date: 2026-10-18
+
+Data é String DD/MM/YYYY: não ordena cronologicamente e não permite intervalo de
+datas sem varrer a tabela. data_transacao (DATE) é gravada pelo pipeline de upload
+(marker → preview → journal), create_transaction e seed demo; consultas por
+intervalo (listagem data_inicio/data_fim, /dashboard/chart-data-daily) usam
+idx_je_user_data_transacao (user_id, data_transacao).
+
+Backfill em lotes por id (keyset) com parse_data_transacao() — a mesma regra da
+aplicação; datas inválidas ficam NULL (to_date() abortaria a migração inteira).
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+from app.shared.utils.normalizer import parse_data_transacao
+
+revision: str = "r3s4t5u6v7w8"
+down_revision: Union[str, Sequence[str], None] = "q2r3s4t5u6v7"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+LOTE = 5000
+
+
+def _backfill(tabela: str, coluna_data: str) -> None:
+    conn = op.get_bind()
+    selecionar = sa.text(
+        f'SELECT id, "{coluna_data}" FROM {tabela} WHERE id > :ultimo ORDER BY id LIMIT {LOTE}'
+    )
+    atualizar = sa.text(f"UPDATE {tabela} SET data_transacao = :data WHERE id = :id")
+    ultimo = 0
+    while True:
+        linhas = conn.execute(selecionar, {"ultimo": ultimo}).fetchall()
+        if not linhas:
+            break
+        valores = [
+            {"id": id_, "data": data}
+            for id_, data in ((id_, parse_data_transacao(texto)) for id_, texto in linhas)
+            if data is not None
+        ]
+        if valores:
+            conn.execute(atualizar, valores)
+        ultimo = linhas[-1][0]
+
+
+def upgrade() -> None:
+    op.add_column("journal_entries", sa.Column("data_transacao", sa.Date(), nullable=True))
+    op.add_column("preview_transacoes", sa.Column("data_transacao", sa.Date(), nullable=True))
+
+    _backfill("journal_entries", "Data")
+    _backfill("preview_transacoes", "data")
+
+    op.create_index("idx_je_user_data_transacao", "journal_entries", ["user_id", "data_transacao"])
+
+
+def downgrade() -> None:
+    op.drop_index("idx_je_user_data_transacao", table_name="journal_entries")
+    op.drop_column("preview_transacoes", "data_transacao")
+    op.drop_column("journal_entries", "data_transacao")
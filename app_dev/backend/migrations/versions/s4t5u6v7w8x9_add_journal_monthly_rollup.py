@@ -0,0 +1,65 @@
+"""Add journal_monthly_rollup (fato agregado mensal de journal_entries)
+
+Revision ID: s4t5u6v7w8x9
+Revises: r3s4t5u6v7w8
+Create Date: 2026-10-18
+
+Dashboard (metrics, chart-data, categorias, cartões), budget (mês, YTD, ano) e
+plano/cashflow re-agregavam journal_entries a cada request. journal_monthly_rollup
+guarda SUM(Valor), SUM(ABS(Valor)) e COUNT(*) por (user_id, MesFatura, Ano, Mes,
+CategoriaGeral, GRUPO, SUBGRUPO, NomeCartao, TipoTransacao), só com IgnorarDashboard = 0.
+
+Carga inicial: um INSERT ... SELECT ... GROUP BY (mesma agregação de
+refresh_journal_rollup() em app/domains/transactions/rollup.py).
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+revision: str = "s4t5u6v7w8x9"
+down_revision: Union[str, Sequence[str], None] = "r3s4t5u6v7w8"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+DIMENSOES = '"user_id", "MesFatura", "Ano", "Mes", "CategoriaGeral", "GRUPO", "SUBGRUPO", "NomeCartao", "TipoTransacao"'
+
+
+def upgrade() -> None:
+    op.create_table(
+        "journal_monthly_rollup",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("user_id", sa.Integer(), nullable=False),
+        sa.Column("MesFatura", sa.String(), nullable=True),
+        sa.Column("Ano", sa.Integer(), nullable=True),
+        sa.Column("Mes", sa.Integer(), nullable=True),
+        sa.Column("CategoriaGeral", sa.String(), nullable=True),
+        sa.Column("GRUPO", sa.String(), nullable=True),
+        sa.Column("SUBGRUPO", sa.String(), nullable=True),
+        sa.Column("NomeCartao", sa.String(), nullable=True),
+        sa.Column("TipoTransacao", sa.String(), nullable=True),
+        sa.Column("soma_valor", sa.Float(), nullable=False, server_default="0"),
+        sa.Column("soma_valor_abs", sa.Float(), nullable=False, server_default="0"),
+        sa.Column("quantidade", sa.Integer(), nullable=False, server_default="0"),
+    )
+    op.create_index("ix_journal_monthly_rollup_id", "journal_monthly_rollup", ["id"])
+    op.create_index("idx_jmr_user_mesfatura", "journal_monthly_rollup", ["user_id", "MesFatura"])
+    op.create_index("idx_jmr_user_ano_mes", "journal_monthly_rollup", ["user_id", "Ano", "Mes"])
+
+    op.execute(
+        f"""
+        INSERT INTO journal_monthly_rollup ({DIMENSOES}, soma_valor, soma_valor_abs, quantidade)
+        SELECT {DIMENSOES},
+               coalesce(sum("Valor"), 0), coalesce(sum(abs("Valor")), 0), count(*)
+        FROM journal_entries
+        WHERE user_id IS NOT NULL AND "IgnorarDashboard" = 0
+        GROUP BY {DIMENSOES}
+        """
+    )
+
+
+def downgrade() -> None:
+    op.drop_index("idx_jmr_user_ano_mes", table_name="journal_monthly_rollup")
+    op.drop_index("idx_jmr_user_mesfatura", table_name="journal_monthly_rollup")
+    op.drop_index("ix_journal_monthly_rollup_id", table_name="journal_monthly_rollup")
+    op.drop_table("journal_monthly_rollup")
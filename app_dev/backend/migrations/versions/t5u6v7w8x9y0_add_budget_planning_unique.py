@@ -0,0 +1,45 @@
+"""Add UNIQUE (user_id, grupo, mes_referencia) to budget_planning
+
+Revision ID: t5u6v7w8x9y0
+Revises: s4t5u6v7w8x9
+Create Date: 2026-10-18
+
+Os endpoints de salvar metas (bulk-upsert, bulk-range, copiar para o ano) faziam
+SELECT ... first() + flush() por meta — centenas de round-trips para um plano anual.
+Com a chave natural única, cada request vira um único INSERT ... ON CONFLICT
+(user_id, grupo, mes_referencia) DO UPDATE ... RETURNING (BudgetRepository.upsert_many).
+
+Duplicatas existentes (criadas pelo fluxo antigo) são removidas antes, mantendo a
+meta mais recente (maior id) de cada grupo/mês.
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+revision: str = "t5u6v7w8x9y0"
+down_revision: Union[str, Sequence[str], None] = "s4t5u6v7w8x9"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.execute(sa.text("""
+        DELETE FROM budget_planning
+        WHERE id NOT IN (
+            SELECT max_id FROM (
+                SELECT MAX(id) AS max_id
+                FROM budget_planning
+                GROUP BY user_id, grupo, mes_referencia
+            ) AS manter
+        )
+    """))
+    with op.batch_alter_table("budget_planning") as batch_op:
+        batch_op.create_unique_constraint(
+            "uq_budget_planning_user_grupo_mes", ["user_id", "grupo", "mes_referencia"]
+        )
+
+
+def downgrade() -> None:
+    with op.batch_alter_table("budget_planning") as batch_op:
+        batch_op.drop_constraint("uq_budget_planning_user_grupo_mes", type_="unique")
@@ -0,0 +1,58 @@
+"""Add UNIQUE (user_id, id_parcela) to base_parcelas
+
+Revision ID: u6v7w8x9y0z1
+Revises: t5u6v7w8x9y0
+Create Date: 2026-10-18
+
+A fase 5 do upload (UploadService._fase5_update_base_parcelas) fazia 1 SELECT por
+transação parcelada + 1 SQL por parcela nova para a categoria. Agora pré-carrega as
+parcelas com 1 IN e grava tudo em um único INSERT ... ON CONFLICT (user_id, id_parcela)
+DO UPDATE SET qtd_pagas = GREATEST(qtd_pagas, excluded.qtd_pagas) — que exige a chave única.
+
+Duplicatas existentes (o fluxo antigo, com autoflush desligado, criava uma linha por
+transação do mesmo IdParcela no mesmo upload) são fundidas: fica a linha mais antiga
+(menor id) com o maior qtd_pagas do grupo.
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+revision: str = "u6v7w8x9y0z1"
+down_revision: Union[str, Sequence[str], None] = "t5u6v7w8x9y0"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.execute(sa.text("""
+        UPDATE base_parcelas
+        SET qtd_pagas = (
+            SELECT MAX(d.qtd_pagas) FROM base_parcelas d
+            WHERE d.user_id = base_parcelas.user_id AND d.id_parcela = base_parcelas.id_parcela
+        )
+        WHERE id IN (
+            SELECT MIN(id) FROM base_parcelas
+            WHERE id_parcela IS NOT NULL
+            GROUP BY user_id, id_parcela
+            HAVING COUNT(*) > 1
+        )
+    """))
+    op.execute(sa.text("""
+        DELETE FROM base_parcelas
+        WHERE id_parcela IS NOT NULL
+          AND id NOT IN (
+            SELECT min_id FROM (
+                SELECT MIN(id) AS min_id
+                FROM base_parcelas
+                GROUP BY user_id, id_parcela
+            ) AS manter
+          )
+    """))
+    with op.batch_alter_table("base_parcelas") as batch_op:
+        batch_op.create_unique_constraint("uq_base_parcelas_user_id_parcela", ["user_id", "id_parcela"])
+
+
+def downgrade() -> None:
+    with op.batch_alter_table("base_parcelas") as batch_op:
+        batch_op.drop_constraint("uq_base_parcelas_user_id_parcela", type_="unique")
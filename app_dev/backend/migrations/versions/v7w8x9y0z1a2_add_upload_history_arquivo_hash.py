@@ -0,0 +1,29 @@
+"""Add arquivo_hash to upload_history
+
+Revision ID: v7w8x9y0z1a2
+Revises: u6v7w8x9y0z1
+Create Date: 2026-10-18
+
+SHA-256 do arquivo enviado em upload_history. Permite responder "este arquivo exato já
+foi importado?" com 1 lookup indexado (user_id, arquivo_hash) no /detect e no preview,
+sem depender da heurística banco + tipo + mes_fatura. Uploads antigos ficam com NULL.
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+revision: str = "v7w8x9y0z1a2"
+down_revision: Union[str, Sequence[str], None] = "u6v7w8x9y0z1"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column("upload_history", sa.Column("arquivo_hash", sa.String(64), nullable=True))
+    op.create_index("ix_upload_history_user_arquivo_hash", "upload_history", ["user_id", "arquivo_hash"])
+
+
+def downgrade() -> None:
+    op.drop_index("ix_upload_history_user_arquivo_hash", table_name="upload_history")
+    op.drop_column("upload_history", "arquivo_hash")
@@ -0,0 +1,50 @@
+"""Add UNIQUE (dimensões) NULLS NOT DISTINCT to journal_monthly_rollup
+
+Revision ID: w8x9y0z1a2b3
+Revises: v7w8x9y0z1a2
+Create Date: 2026-10-18
+
+refresh_journal_rollup() faz DELETE + INSERT ... SELECT por usuário/mês. Sem chave
+única, dois refreshes concorrentes do mesmo mês (READ COMMITTED) gravavam as duas
+agregações e os totais do dashboard/budget/plano dobravam até o próximo rebuild.
+Agora o refresh toma um advisory lock por usuário e a tabela tem uma linha por
+combinação de dimensões (NULL = NULL).
+
+Linhas possivelmente duplicadas são descartadas e o rollup é recarregado de
+journal_entries (mesma agregação da carga inicial em s4t5u6v7w8x9) antes do índice.
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+revision: str = "w8x9y0z1a2b3"
+down_revision: Union[str, Sequence[str], None] = "v7w8x9y0z1a2"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+DIMENSOES = '"user_id", "MesFatura", "Ano", "Mes", "CategoriaGeral", "GRUPO", "SUBGRUPO", "NomeCartao", "TipoTransacao"'
+
+
+def upgrade() -> None:
+    op.execute("DELETE FROM journal_monthly_rollup")
+    op.execute(
+        f"""
+        INSERT INTO journal_monthly_rollup ({DIMENSOES}, soma_valor, soma_valor_abs, quantidade)
+        SELECT {DIMENSOES},
+               coalesce(sum("Valor"), 0), coalesce(sum(abs("Valor")), 0), count(*)
+        FROM journal_entries
+        WHERE user_id IS NOT NULL AND "IgnorarDashboard" = 0
+        GROUP BY {DIMENSOES}
+        """
+    )
+    op.create_index(
+        "uq_jmr_dimensoes",
+        "journal_monthly_rollup",
+        ["user_id", "MesFatura", "Ano", "Mes", "CategoriaGeral", "GRUPO", "SUBGRUPO", "NomeCartao", "TipoTransacao"],
+        unique=True,
+        postgresql_nulls_not_distinct=True,
+    )
+
+
+def downgrade() -> None:
+    op.drop_index("uq_jmr_dimensoes", table_name="journal_monthly_rollup")
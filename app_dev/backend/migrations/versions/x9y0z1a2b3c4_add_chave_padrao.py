@@ -0,0 +1,63 @@
+"""Add ChavePadrao to journal_entries and preview_transacoes
+
+Revision ID: x9y0z1a2b3c4
+Revises: w8x9y0z1a2b3
+Create Date: 2026-10-18
+
+A fase 7 do upload (base_padroes incremental) já recalculava só os padrões tocados,
+mas para achar as linhas desses buckets varria TODO o journal do usuário e rodava
+chave_padrao() (regex de parcela + normalização) linha a linha. Agora:
+- ChavePadrao guardada na escrita (marker no upload, create/update, demo)
+- idx_je_user_chave_padrao (user_id, ChavePadrao) → busca só as linhas das chaves tocadas
+
+Backfill em lotes por id (keyset) com a MESMA função Python usada na aplicação —
+a chave depende de regex e do tipo de documento, sem equivalente exato em SQL.
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+from app.domains.upload.processors.pattern_generator import chave_padrao
+
+revision: str = "x9y0z1a2b3c4"
+down_revision: Union[str, Sequence[str], None] = "w8x9y0z1a2b3"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+LOTE = 5000
+
+
+def _backfill(tabela: str, coluna_estab: str, coluna_valor: str, coluna_tipo: str) -> None:
+    conn = op.get_bind()
+    selecionar = sa.text(
+        f'SELECT id, "{coluna_estab}", "{coluna_valor}", "{coluna_tipo}" FROM {tabela} '
+        f'WHERE id > :ultimo ORDER BY id LIMIT {LOTE}'
+    )
+    atualizar = sa.text(f'UPDATE {tabela} SET "ChavePadrao" = :chave WHERE id = :id')
+    ultimo = 0
+    while True:
+        linhas = conn.execute(selecionar, {"ultimo": ultimo}).fetchall()
+        if not linhas:
+            break
+        conn.execute(atualizar, [
+            {"id": id_, "chave": chave_padrao(estab, valor, tipo)}
+            for id_, estab, valor, tipo in linhas
+        ])
+        ultimo = linhas[-1][0]
+
+
+def upgrade() -> None:
+    op.add_column("journal_entries", sa.Column("ChavePadrao", sa.String(), nullable=True))
+    op.add_column("preview_transacoes", sa.Column("ChavePadrao", sa.String(), nullable=True))
+
+    _backfill("journal_entries", "Estabelecimento", "Valor", "tipodocumento")
+    _backfill("preview_transacoes", "lancamento", "valor", "tipo_documento")
+
+    op.create_index("idx_je_user_chave_padrao", "journal_entries", ["user_id", "ChavePadrao"])
+
+
+def downgrade() -> None:
+    op.drop_index("idx_je_user_chave_padrao", table_name="journal_entries")
+    op.drop_column("preview_transacoes", "ChavePadrao")
+    op.drop_column("journal_entries", "ChavePadrao")
@@ -0,0 +1,116 @@
+"""
+Benchmark da busca de transações — ILIKE em 4 colunas vs coluna gerada + pg_trgm.
+
+Cria uma tabela TEMPORÁRIA com N linhas sintéticas (default 500k, 50 usuários) com a mesma
+estrutura de busca de journal_entries (busca_texto gerada + índice GIN gin_trgm_ops) e
+mede, para cada termo, a busca antiga (ILIKE '%termo%' em Estabelecimento/GRUPO/SUBGRUPO/Data)
+contra a nova (LIKE na coluna dobrada OU %> por similaridade). Nada é persistido.
+
+Uso (a partir de app_dev/backend, com DATABASE_URL apontando para um PostgreSQL com pg_trgm):
+    python scripts/benchmark_busca_transacoes.py --linhas 500000 --repeticoes 5
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import text  # noqa: E402
+
+from app.core.config import settings  # noqa: E402
+from app.core.database import engine  # noqa: E402
+from app.domains.transactions.models import ACENTOS, SEM_ACENTOS, dobrar_acentos_texto  # noqa: E402
+
+TERMOS = ["ifood", "ifd", "padaria", "açaí", "15/03", "uber"]
+USER_ID = 7
+
+CRIAR = f"""
+CREATE TEMP TABLE bench_busca (
+    id serial PRIMARY KEY,
+    user_id int NOT NULL,
+    "Estabelecimento" text, "GRUPO" text, "SUBGRUPO" text, "Data" text, "MesFatura" text,
+    busca_texto text GENERATED ALWAYS AS (translate(lower(
+        coalesce("Estabelecimento", '') || ' ' || coalesce("GRUPO", '') || ' '
+        || coalesce("SUBGRUPO", '') || ' ' || coalesce("Data", '')
+    ), '{ACENTOS}', '{SEM_ACENTOS}')) STORED
+)
+"""
+
+POPULAR = """
+INSERT INTO bench_busca (user_id, "Estabelecimento", "GRUPO", "SUBGRUPO", "Data", "MesFatura")
+SELECT
+    1 + (g % :usuarios),
+    (ARRAY['IFOOD *RESTAURANTE', 'UBER TRIP', 'PADARIA SÃO JOSÉ', 'AÇAÍ DA PRAIA', 'POSTO IPIRANGA',
+           'NETFLIX.COM', 'MERCADO LIVRE', 'FARMÁCIA PAGUE MENOS', 'PIX ENVIADO', 'SUPERMERCADO EXTRA'])
+        [1 + (g % 10)] || ' ' || (g % 997),
+    (ARRAY['Alimentação', 'Transporte', 'Casa', 'Saúde', 'Lazer'])[1 + (g % 5)],
+    (ARRAY['Delivery', 'Aplicativo', 'Mercado', 'Farmácia', 'Streaming'])[1 + (g % 5)],
+    lpad((1 + g % 28)::text, 2, '0') || '/' || lpad((1 + g % 12)::text, 2, '0') || '/2025',
+    '2025' || lpad((1 + g % 12)::text, 2, '0')
+FROM generate_series(1, :linhas) AS g
+"""
+
+ANTIGA = """
+SELECT count(*) FROM bench_busca
+WHERE user_id = :user_id AND (
+    "Estabelecimento" ILIKE :padrao OR "GRUPO" ILIKE :padrao
+    OR "SUBGRUPO" ILIKE :padrao OR "Data" ILIKE :padrao
+)
+"""
+
+NOVA = """
+SELECT count(*) FROM bench_busca
+WHERE user_id = :user_id AND (busca_texto LIKE :padrao OR busca_texto %> :termo)
+"""
+
+NOVA_SEM_FUZZY = """
+SELECT count(*) FROM bench_busca
+WHERE user_id = :user_id AND busca_texto LIKE :padrao
+"""
+
+
+def _medir(conn, sql, params, repeticoes):
+    conn.execute(text(sql), params)  # aquecimento (cache de páginas)
+    inicio = time.perf_counter()
+    for _ in range(repeticoes):
+        total = conn.execute(text(sql), params).scalar()
+    return (time.perf_counter() - inicio) * 1000 / repeticoes, total
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--linhas", type=int, default=500_000)
+    parser.add_argument("--usuarios", type=int, default=50)
+    parser.add_argument("--repeticoes", type=int, default=5)
+    args = parser.parse_args()
+
+    with engine.connect() as conn:
+        conn.execute(text("CREATE EXTENSION IF NOT EXISTS pg_trgm"))
+        conn.execute(text(CRIAR))
+        inicio = time.perf_counter()
+        conn.execute(text(POPULAR), {"linhas": args.linhas, "usuarios": args.usuarios})
+        conn.execute(text('CREATE INDEX ON bench_busca (user_id, "MesFatura")'))
+        conn.execute(text("CREATE INDEX ON bench_busca USING gin (busca_texto gin_trgm_ops)"))
+        conn.execute(text("ANALYZE bench_busca"))
+        print(f"📦 {args.linhas} linhas sintéticas + índices em {time.perf_counter() - inicio:.1f}s")
+
+        conn.execute(text("SELECT set_config('pg_trgm.word_similarity_threshold', :t, false)"),
+                     {"t": str(settings.SEARCH_FUZZY_THRESHOLD)})
+
+        print(f"{'termo':<10} {'ILIKE 4 colunas':>18} {'trgm (LIKE)':>14} {'trgm (+ %>)':>14}")
+        for termo in TERMOS:
+            dobrado = dobrar_acentos_texto(termo)
+            antiga_ms, antiga_n = _medir(conn, ANTIGA, {"user_id": USER_ID, "padrao": f"%{termo}%"}, args.repeticoes)
+            like_ms, like_n = _medir(conn, NOVA_SEM_FUZZY, {"user_id": USER_ID, "padrao": f"%{dobrado}%"}, args.repeticoes)
+            nova_ms, nova_n = _medir(
+                conn, NOVA, {"user_id": USER_ID, "padrao": f"%{dobrado}%", "termo": dobrado}, args.repeticoes
+            )
+            print(f"{termo:<10} {antiga_ms:9.1f} ms ({antiga_n:>5}) {like_ms:7.1f} ms ({like_n:>5})"
+                  f" {nova_ms:7.1f} ms ({nova_n:>5})")
+
+        conn.rollback()
+
+
+if __name__ == "__main__":
+    main()
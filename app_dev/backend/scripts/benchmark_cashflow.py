@@ -0,0 +1,54 @@
+"""
+Benchmark do PlanoService.get_cashflow — número de queries e tempo por chamada.
+
+Uso (a partir de app_dev/backend, com DATABASE_URL apontando para o banco):
+    python scripts/benchmark_cashflow.py --user-id 1 --ano 2026 --repeticoes 20
+
+Referência: a versão com 4 agregações por mês fazia 3 + 48 queries por chamada;
+a versão agregada faz 5 (perfil, 2× expectativas, realizados, planejados).
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import event  # noqa: E402
+
+from app.core.database import SessionLocal, engine  # noqa: E402
+from app.domains.upload.history_models import UploadHistory  # noqa: E402, F401
+from app.domains.plano.service import PlanoService  # noqa: E402
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--user-id", type=int, required=True)
+    parser.add_argument("--ano", type=int, required=True)
+    parser.add_argument("--repeticoes", type=int, default=10)
+    args = parser.parse_args()
+
+    contador = {"n": 0}
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def _conta(*_args):
+        contador["n"] += 1
+
+    db = SessionLocal()
+    try:
+        PlanoService(db).get_cashflow(args.user_id, args.ano)  # aquecimento
+        contador["n"] = 0
+        inicio = time.perf_counter()
+        for _ in range(args.repeticoes):
+            PlanoService(db).get_cashflow(args.user_id, args.ano)
+        total_ms = (time.perf_counter() - inicio) * 1000
+    finally:
+        db.close()
+
+    print(f"📊 get_cashflow(user={args.user_id}, ano={args.ano}) × {args.repeticoes}")
+    print(f"   queries/chamada: {contador['n'] / args.repeticoes:.1f}")
+    print(f"   tempo médio:     {total_ms / args.repeticoes:.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,117 @@
+"""
+Benchmark do caminho de gravação do upload — ORM por objeto vs bulk.
+
+Compara, para N linhas sintéticas:
+  1. Fase 1 (preview):  db.add por PreviewTransacao  vs  executemany (bulk_insert_previews)
+  2. Confirmação:       db.add por JournalEntry      vs  INSERT ... SELECT (move_preview_to_journal)
+
+Tudo roda numa transação que sofre rollback no final — nada é persistido.
+
+Uso (a partir de app_dev/backend, com DATABASE_URL apontando para o banco):
+    python scripts/benchmark_confirm_upload.py --user-id 1 --linhas 3000
+"""
+import argparse
+import os
+import sys
+import time
+import uuid
+from datetime import datetime
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.core.database import SessionLocal  # noqa: E402
+from app.domains.transactions.models import JournalEntry  # noqa: E402
+from app.domains.upload.history_models import UploadHistory  # noqa: E402
+from app.domains.upload.models import PreviewTransacao  # noqa: E402
+from app.domains.upload.repository import UploadRepository  # noqa: E402
+
+
+def _linhas(user_id, session_id, n):
+    now = datetime.now()
+    return [{
+        'session_id': session_id, 'user_id': user_id, 'banco': 'Benchmark',
+        'tipo_documento': 'extrato', 'nome_arquivo': 'benchmark.csv', 'data_criacao': now,
+        'data': f"{i % 28 + 1:02d}/{i % 12 + 1:02d}/2025", 'lancamento': f"BENCH {i}",
+        'valor': -1.0 * (i + 1), 'mes_fatura': f"2025-{i % 12 + 1:02d}", 'created_at': now,
+        'IdTransacao': f"bench-{session_id}-{i}", 'ValorPositivo': float(i + 1),
+        'GRUPO': 'Casa', 'SUBGRUPO': 'Mercado', 'TipoGasto': 'Ajustável', 'CategoriaGeral': 'Despesa',
+    } for i in range(n)]
+
+
+def _journal_orm(db, previews, history_id):
+    """Caminho antigo do confirm_upload: um JournalEntry por preview."""
+    now = datetime.now()
+    for item in previews:
+        db.add(JournalEntry(
+            user_id=item.user_id, Data=item.data, Estabelecimento=item.lancamento,
+            EstabelecimentoBase=item.EstabelecimentoBase, Valor=item.valor,
+            ValorPositivo=item.ValorPositivo,
+            MesFatura=item.mes_fatura.replace('-', '') if item.mes_fatura else None,
+            arquivo_origem=item.nome_arquivo, banco_origem=item.banco, NomeCartao=item.nome_cartao,
+            IdTransacao=item.IdTransacao, IdParcela=item.IdParcela, parcela_atual=item.ParcelaAtual,
+            TotalParcelas=item.TotalParcelas, GRUPO=item.GRUPO, SUBGRUPO=item.SUBGRUPO,
+            TipoGasto=item.TipoGasto, CategoriaGeral=item.CategoriaGeral,
+            origem_classificacao=item.origem_classificacao, tipodocumento=item.tipo_documento,
+            TipoTransacao=item.TipoTransacao, Ano=item.Ano, Mes=item.Mes,
+            session_id=item.session_id, upload_history_id=history_id, created_at=now,
+        ))
+    db.flush()
+
+
+def _rodar(user_id, n, bulk):
+    db = SessionLocal()
+    session_id = f"bench-{uuid.uuid4().hex[:12]}"
+    tempos = {}
+    try:
+        history = UploadHistory(user_id=user_id, session_id=session_id, banco='Benchmark',
+                                tipo_documento='extrato', nome_arquivo='benchmark.csv', status='processing')
+        db.add(history)
+        db.flush()
+        linhas = _linhas(user_id, session_id, n)
+
+        inicio = time.perf_counter()
+        if bulk:
+            db.execute(PreviewTransacao.__table__.insert(), linhas)
+        else:
+            db.add_all([PreviewTransacao(**linha) for linha in linhas])
+            db.flush()
+        tempos['preview'] = (time.perf_counter() - inicio) * 1000
+
+        inicio = time.perf_counter()
+        if bulk:
+            UploadRepository(db).move_preview_to_journal(
+                session_id, user_id, session_id, history.id, datetime.now()
+            )
+        else:
+            previews = db.query(PreviewTransacao).filter(
+                PreviewTransacao.session_id == session_id,
+                PreviewTransacao.user_id == user_id,
+                PreviewTransacao.is_duplicate == False,  # noqa: E712
+                PreviewTransacao.excluir == 0,
+            ).all()
+            _journal_orm(db, previews, history.id)
+        tempos['confirm'] = (time.perf_counter() - inicio) * 1000
+    finally:
+        db.rollback()
+        db.close()
+    return tempos
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--user-id", type=int, required=True)
+    parser.add_argument("--linhas", type=int, default=3000)
+    args = parser.parse_args()
+
+    _rodar(args.user_id, 50, bulk=True)  # aquecimento (conexões, metadados)
+    orm = _rodar(args.user_id, args.linhas, bulk=False)
+    bulk = _rodar(args.user_id, args.linhas, bulk=True)
+
+    print(f"📊 Upload com {args.linhas} linhas (user={args.user_id}, rollback no final)")
+    for fase in ('preview', 'confirm'):
+        ganho = orm[fase] / bulk[fase] if bulk[fase] else float('inf')
+        print(f"   {fase:<8} ORM: {orm[fase]:8.1f} ms   bulk: {bulk[fase]:8.1f} ms   ({ganho:.1f}×)")
+
+
+if __name__ == "__main__":
+    main()
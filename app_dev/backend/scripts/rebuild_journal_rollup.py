@@ -0,0 +1,38 @@
+"""
+Reconstrói journal_monthly_rollup a partir de journal_entries.
+
+Uso normal é automático (os caminhos de escrita chamam refresh_journal_rollup()).
+Este comando serve para reparo/auditoria: após correções manuais em journal_entries,
+restore de backup ou para validar que o rollup bate com a agregação direta.
+
+Uso (a partir de app_dev/backend, com DATABASE_URL apontando para o banco):
+    python scripts/rebuild_journal_rollup.py              # todos os usuários
+    python scripts/rebuild_journal_rollup.py --user-id 1  # um usuário
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.core.database import SessionLocal  # noqa: E402
+from app.domains.transactions.rollup import rebuild_journal_rollup  # noqa: E402
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--user-id", type=int, default=None)
+    args = parser.parse_args()
+
+    db = SessionLocal()
+    try:
+        inicio = time.perf_counter()
+        total = rebuild_journal_rollup(db, args.user_id)
+        print(f"✅ journal_monthly_rollup reconstruído: {total} usuário(s) em {time.perf_counter() - inicio:.1f}s")
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -1,7 +1,46 @@
 """
 Pytest conftest - Garante que modelos com relationships estejam no registry.
 Evita KeyError 'UploadHistory' ao usar SessionLocal em testes/scripts.
+
+Fixtures compartilhadas:
+  sqlite_db      — sessão SQLite em memória com Base.metadata.create_all
+  query_counter  — SQL executado no engine de sqlite_db (lista; .clear() zera)
 """
-# Carregar antes de qualquer test que use SessionLocal
+import pytest
+from sqlalchemy import create_engine, event
+from sqlalchemy.orm import sessionmaker
+
+from app.core.database import Base
+
+# Carregar antes de qualquer test que use SessionLocal (e tabelas alvo de FK no create_all)
 from app.domains.upload.history_models import UploadHistory  # noqa: F401
 from app.domains.transactions.models import JournalEntry  # noqa: F401
+from app.domains.users.models import User  # noqa: F401
+from app.domains.classification.models import GenericClassificationRules  # noqa: F401
+from app.domains.patterns.models import BasePadroes  # noqa: F401
+
+
+@pytest.fixture
+def sqlite_db():
+    """Sessão num SQLite em memória com todas as tabelas; cada teste semeia os próprios dados."""
+    engine = create_engine("sqlite://")
+    Base.metadata.create_all(engine)
+    session = sessionmaker(bind=engine)()
+    yield session
+    session.close()
+    engine.dispose()
+
+
+@pytest.fixture
+def query_counter(sqlite_db):
+    """
+    Statements executados no engine de sqlite_db, em ordem.
+    len() = nº de queries; .clear() antes do trecho medido (depois da carga de dados).
+    """
+    statements = []
+
+    def _registrar(conn, cursor, statement, *_args):
+        statements.append(statement)
+
+    event.listen(sqlite_db.get_bind(), "before_cursor_execute", _registrar)
+    return statements
@@ -0,0 +1,152 @@
+"""
+Testes do motor de médias de 3 meses em lote (app.domains.budget.medias).
+
+Cobre:
+  1. medias_3_meses (janela SQL) = regra antiga (soma por mês / meses com dados), inclusive com
+     meses sem transações no meio da janela e virada de ano
+  2. calcular_media_3_meses / get_detalhamento_media / bulk_upsert_budgets usam o motor
+  3. execute_migration recalcula 2 grupos × 49 meses com nº constante de queries
+  4. gravar_medias_3_meses atualiza metas existentes e cria as que faltam
+"""
+import os
+import random
+
+os.environ.setdefault("DATABASE_URL", "postgresql://x:x@localhost/x")
+os.environ.setdefault("JWT_SECRET_KEY", "a" * 64)
+
+import pytest  # noqa: E402
+from app.domains.budget.medias import gravar_medias_3_meses, medias_3_meses  # noqa: E402
+from app.domains.budget.models import BudgetPlanning  # noqa: E402
+from app.domains.budget.service import BudgetService  # noqa: E402
+from app.domains.grupos.models import BaseGruposConfig  # noqa: E402
+from app.domains.transactions.models import JournalEntry  # noqa: E402
+from app.domains.transactions.rollup import rebuild_journal_rollup  # noqa: E402
+from app.domains.transactions.service import TransactionService  # noqa: E402
+
+USER_ID = 1
+GRUPOS = ["Casa", "Mercado", "Lazer"]
+# Meses com lacunas (abr-jul/2024 vazios) e virada de ano
+MESES_FATURA = ["202401", "202402", "202403", "202408", "202410", "202411", "202412", "202501", "202503"]
+# Somas em ordem diferente (SQL vs Python) podem divergir 1 centavo no arredondamento
+CENTAVO = 0.011
+
+
+@pytest.fixture
+def db(sqlite_db):
+    db = sqlite_db
+    rng = random.Random(17)
+    for nome in GRUPOS + ["Outros"]:
+        db.add(BaseGruposConfig(user_id=USER_ID, nome_grupo=nome, tipo_gasto_padrao="Fixo", categoria_geral="Despesa"))
+    for i in range(400):
+        mes_fatura = rng.choice(MESES_FATURA)
+        db.add(JournalEntry(
+            user_id=rng.choice([USER_ID, USER_ID, USER_ID, 2]), IdTransacao=f"t{i}",
+            MesFatura=mes_fatura, Ano=int(mes_fatura[:4]), Mes=int(mes_fatura[4:]),
+            CategoriaGeral=rng.choice(["Despesa", "Despesa", "Despesa", "Receita"]),
+            GRUPO=rng.choice(GRUPOS), SUBGRUPO=rng.choice(["A", "B", "", None]),
+            Valor=round(rng.uniform(-400, 50), 2), IgnorarDashboard=1 if i % 10 == 0 else 0,
+        ))
+    db.commit()
+    rebuild_journal_rollup(db)
+    return db
+
+
+def _meses(ano_inicio, ano_fim):
+    return [f"{a:04d}-{m:02d}" for a in range(ano_inicio, ano_fim + 1) for m in range(1, 13)]
+
+
+def _media_referencia(db, grupo, mes_referencia):
+    """Regra antiga: |Valor| somado por MesFatura nos 3 meses anteriores / meses com dados"""
+    ano, mes = map(int, mes_referencia.split('-'))
+    anteriores = []
+    for i in range(1, 4):
+        m, a = mes - i, ano
+        if m < 1:
+            m, a = m + 12, a - 1
+        anteriores.append(f"{a:04d}{m:02d}")
+    por_mes = {}
+    for t in db.query(JournalEntry).filter(
+        JournalEntry.user_id == USER_ID, JournalEntry.GRUPO == grupo, JournalEntry.CategoriaGeral == 'Despesa',
+        JournalEntry.IgnorarDashboard == 0, JournalEntry.MesFatura.in_(anteriores),
+    ):
+        por_mes[t.MesFatura] = por_mes.get(t.MesFatura, 0.0) + abs(t.Valor)
+    return round(sum(por_mes.values()) / len(por_mes), 2) if por_mes else 0.0
+
+
+def test_medias_em_lote_iguais_a_regra_antiga(db, query_counter):
+    query_counter.clear()
+    medias = medias_3_meses(db, USER_ID)
+    assert len(query_counter) == 1
+
+    for grupo in GRUPOS:
+        for mes_ref in _meses(2024, 2025):
+            esperado = _media_referencia(db, grupo, mes_ref)
+            assert medias.get((grupo, mes_ref), 0.0) == pytest.approx(esperado, abs=CENTAVO), (grupo, mes_ref)
+    # Janela de 3 meses: jun/2025 ainda vê mar/2025, jul/2025 não
+    assert ("Casa", "2025-06") in medias
+    assert ("Casa", "2025-07") not in medias
+
+    filtradas = medias_3_meses(db, USER_ID, grupos=["Casa"], meses_referencia=["2024-05", "2025-02"])
+    assert set(filtradas) <= {("Casa", "2024-05"), ("Casa", "2025-02")}
+    assert filtradas[("Casa", "2025-02")] == medias[("Casa", "2025-02")]
+
+
+def test_service_usa_motor_em_lote(db):
+    service = BudgetService(db)
+
+    esperado = _media_referencia(db, "Mercado", "2025-01")
+    assert service.calcular_media_3_meses(USER_ID, "Mercado", "2025-01") == pytest.approx(esperado, abs=CENTAVO)
+    assert service.calcular_media_3_meses(USER_ID, "Inexistente", "2025-01") == 0.0
+
+    detalhe = service.get_detalhamento_media(USER_ID, "Casa", "2024-10")
+    assert [m.mes_referencia for m in detalhe.meses_considerados] == ["2024-07", "2024-08", "2024-09"]
+    julho, agosto, _ = detalhe.meses_considerados
+    assert julho.quantidade_transacoes == 0 and julho.subgrupos is None
+    assert agosto.valor_total == pytest.approx(sum(s.valor_total for s in agosto.subgrupos), abs=0.02)
+    assert len({s.subgrupo for s in agosto.subgrupos}) == len(agosto.subgrupos)  # '' e nulo juntos
+    assert detalhe.media_calculada == pytest.approx(_media_referencia(db, "Casa", "2024-10"), abs=CENTAVO)
+    assert detalhe.total_geral == pytest.approx(agosto.valor_total, abs=0.01)
+
+    criados = service.bulk_upsert_budgets(USER_ID, "2025-01", [
+        {"grupo": grupo, "valor_planejado": 100.0} for grupo in GRUPOS
+    ])
+    for budget in criados:
+        assert budget.valor_medio_3_meses == pytest.approx(_media_referencia(db, budget.grupo, "2025-01"), abs=CENTAVO)
+
+
+def test_execute_migration_recalcula_medias_em_lote(db, query_counter):
+    db.add(BudgetPlanning(user_id=USER_ID, grupo="Lazer", mes_referencia="2025-01",
+                          valor_planejado=999.0, valor_medio_3_meses=0.0))
+    db.commit()
+
+    query_counter.clear()
+    resposta = TransactionService(db).execute_migration(USER_ID, "Casa", "A", "Lazer", "A")
+    assert resposta.grupos_recalculados == ["Casa", "Lazer"]
+    # Antes: ~2 queries por grupo × mês (≈200); agora independe do nº de meses
+    assert len(query_counter) < 20
+
+    metas = db.query(BudgetPlanning).filter_by(user_id=USER_ID).all()
+    assert len(metas) == 2 * 49
+    for meta in metas:
+        esperado = _media_referencia(db, meta.grupo, meta.mes_referencia)
+        assert meta.valor_medio_3_meses == pytest.approx(esperado, abs=CENTAVO)
+        assert meta.valor_planejado == meta.valor_medio_3_meses
+
+
+def test_gravar_medias_atualiza_e_cria(db):
+    existente = BudgetPlanning(user_id=USER_ID, grupo="Casa", mes_referencia="2024-03",
+                               valor_planejado=500.0, valor_medio_3_meses=-1.0)
+    db.add(existente)
+    db.commit()
+
+    gravados = gravar_medias_3_meses(db, USER_ID, ["Casa", "Mercado"], _meses(2024, 2024), valor_planejado_novo=0.0)
+    db.commit()
+    assert gravados == 24
+
+    db.refresh(existente)
+    assert existente.valor_planejado == 500.0  # planejado do usuário preservado
+    assert existente.valor_medio_3_meses == pytest.approx(_media_referencia(db, "Casa", "2024-03"), abs=CENTAVO)
+    novo = db.query(BudgetPlanning).filter_by(grupo="Mercado", mes_referencia="2024-12").one()
+    assert novo.valor_planejado == 0.0
+    assert novo.valor_medio_3_meses == pytest.approx(_media_referencia(db, "Mercado", "2024-12"), abs=CENTAVO)
+    assert db.query(BudgetPlanning).filter_by(user_id=USER_ID).count() == 24
@@ -0,0 +1,97 @@
+"""
+Testes do motor de realizados em lote do budget (RealizadoPorGrupo).
+
+Cobre:
+  1. _get_budget_planning_impl: nº de queries constante (antes: 1 SUM por meta → N+1)
+  2. Valores realizados por meta/grupo sem meta idênticos à soma direta no journal
+  3. Subgrupos (get_budget_planning_by_id) e dashboard budget-vs-actual usam o mesmo motor
+"""
+import os
+import random
+
+os.environ.setdefault("DATABASE_URL", "postgresql://x:x@localhost/x")
+os.environ.setdefault("JWT_SECRET_KEY", "a" * 64)
+
+import pytest  # noqa: E402
+from sqlalchemy import func  # noqa: E402
+
+from app.domains.budget.models import BudgetPlanning  # noqa: E402
+from app.domains.budget.service import BudgetService  # noqa: E402
+from app.domains.dashboard.repository import DashboardRepository  # noqa: E402
+from app.domains.grupos.models import BaseGruposConfig  # noqa: E402
+from app.domains.transactions.models import JournalEntry  # noqa: E402
+from app.domains.transactions.rollup import rebuild_journal_rollup  # noqa: E402
+
+USER_ID = 1
+MES_REF = "2025-03"
+
+
+def _semear(db, n_grupos, user_id=USER_ID):
+    rng = random.Random(n_grupos)
+    grupos = [(f"G{i:02d}", "Investimentos" if i % 7 == 0 else "Despesa") for i in range(n_grupos)]
+    for nome, cat in grupos:
+        db.add(BaseGruposConfig(user_id=user_id, nome_grupo=nome, tipo_gasto_padrao="Fixo", categoria_geral=cat))
+        db.add(BudgetPlanning(user_id=user_id, grupo=nome, mes_referencia=MES_REF,
+                              valor_planejado=1000.0, valor_medio_3_meses=0.0))
+    for i in range(n_grupos * 8):
+        nome, cat = rng.choice(grupos + [("SemMeta", "Despesa")])
+        db.add(JournalEntry(
+            user_id=user_id, IdTransacao=f"u{user_id}t{i}", MesFatura=rng.choice(["202503", "202503", "202502"]),
+            Ano=2025, Mes=3, CategoriaGeral=cat, GRUPO=nome, SUBGRUPO=rng.choice(["A", "B", None]),
+            Valor=-round(rng.uniform(5, 500), 2), IgnorarDashboard=1 if i % 11 == 0 else 0,
+        ))
+    db.commit()
+    rebuild_journal_rollup(db)
+
+
+@pytest.fixture
+def db(sqlite_db):
+    _semear(sqlite_db, 40)
+    return sqlite_db
+
+
+def _soma_journal(db, grupo, categoria, mes_fatura="202503"):
+    return db.query(func.sum(JournalEntry.Valor)).filter(
+        JournalEntry.user_id == USER_ID, JournalEntry.GRUPO == grupo, JournalEntry.MesFatura == mes_fatura,
+        JournalEntry.CategoriaGeral == categoria, JournalEntry.IgnorarDashboard == 0,
+    ).scalar() or 0.0
+
+
+def test_numero_de_queries_nao_depende_do_numero_de_metas(sqlite_db, query_counter):
+    contagens = []
+    for user_id, n_grupos in ((1, 5), (2, 40)):
+        _semear(sqlite_db, n_grupos, user_id)
+        query_counter.clear()
+        resultado = BudgetService(sqlite_db)._get_budget_planning_impl(user_id, MES_REF)
+        assert len([b for b in resultado["budgets"] if b["id"] is not None]) == n_grupos
+        contagens.append(len(query_counter))
+
+    # metas + grupos_config + realizados (1 query agrupada) + expectativas_mes
+    assert contagens[0] == contagens[1] <= 4
+
+
+def test_valores_realizados_iguais_a_soma_direta(db):
+    resultado = BudgetService(db)._get_budget_planning_impl(USER_ID, MES_REF)
+    por_grupo = {b["grupo"]: b for b in resultado["budgets"]}
+
+    for grupo, item in por_grupo.items():
+        esperado = abs(_soma_journal(db, grupo, item["categoria_geral"]))
+        assert item["valor_realizado"] == pytest.approx(esperado), grupo
+    assert por_grupo["SemMeta"]["id"] is None
+
+
+def test_subgrupos_e_budget_vs_actual_no_mesmo_motor(db, query_counter):
+    service = BudgetService(db)
+    meta = db.query(BudgetPlanning).filter_by(grupo="G01").one()
+
+    query_counter.clear()
+    detalhe = service.get_budget_planning_by_id(USER_ID, meta.id)
+    assert len(query_counter) == 3  # meta + grupo_config + realizados do mês
+    assert sum(s["valor"] for s in detalhe["subgrupos"]) == pytest.approx(detalhe["valor_realizado"])
+
+    query_counter.clear()
+    comparacao = DashboardRepository(db).get_budget_vs_actual(USER_ID, 2025, 3)
+    assert len(query_counter) == 2  # planejados + realizados
+    realizados = {i["grupo"]: i["realizado"] for i in comparacao["items"]}
+    assert realizados["G01"] == pytest.approx(abs(_soma_journal(db, "G01", "Despesa")))
+    assert realizados.get("G07", 0.0) == 0.0  # Investimentos fica fora do budget-vs-actual
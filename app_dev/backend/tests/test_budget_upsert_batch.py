@@ -0,0 +1,179 @@
+"""
+Testes dos upserts em lote de budget_planning (UNIQUE user_id, grupo, mes_referencia).
+
+Cobre:
+  1. bulk-upsert, bulk-range, copy_budget_to_year e bulk_upsert_budgets: 1 INSERT ... ON CONFLICT
+     por request (nº de statements não depende do nº de metas/meses)
+  2. Semântica preservada: atualiza existentes, cria faltantes, cor nula preserva, alterar grupo por id
+  3. Invalidação do cashflow: 1 chamada com todos os meses afetados
+  4. Migração remove duplicatas (mantém maior id) e cria a constraint
+"""
+import importlib.util
+import os
+from pathlib import Path
+
+os.environ.setdefault("DATABASE_URL", "postgresql://x:x@localhost/x")
+os.environ.setdefault("JWT_SECRET_KEY", "a" * 64)
+
+import pytest  # noqa: E402
+from alembic.operations import Operations  # noqa: E402
+from alembic.runtime.migration import MigrationContext  # noqa: E402
+from fastapi import HTTPException  # noqa: E402
+from sqlalchemy import inspect  # noqa: E402
+from sqlalchemy.exc import IntegrityError  # noqa: E402
+
+import app.domains.plano.service as plano_service  # noqa: E402
+from app.domains.budget.models import BudgetPlanning  # noqa: E402
+from app.domains.budget.service import BudgetService  # noqa: E402
+
+USER_ID = 1
+MIGRACAO = Path(__file__).parent.parent / "migrations" / "versions" / "t5u6v7w8x9y0_add_budget_planning_unique.py"
+
+
+@pytest.fixture
+def ctx(sqlite_db, query_counter, monkeypatch):
+    invalidacoes = []
+    monkeypatch.setattr(
+        plano_service, "invalidate_cashflow_cache",
+        lambda _db, user_id, mes_referencia=None, ano_partir=None: invalidacoes.append(list(mes_referencia)),
+    )
+    return sqlite_db, query_counter, invalidacoes
+
+
+def _metas(db):
+    return {
+        (b.grupo, b.mes_referencia): b
+        for b in db.query(BudgetPlanning).filter_by(user_id=USER_ID)
+    }
+
+
+def _escritas(statements):
+    return [s for s in statements if s.lstrip().upper().startswith(("INSERT", "UPDATE", "DELETE"))]
+
+
+def test_bulk_upsert_planning_um_insert_por_request(ctx):
+    db, statements, invalidacoes = ctx
+    db.add(BudgetPlanning(user_id=USER_ID, grupo="Casa", mes_referencia="2026-03", valor_planejado=10.0, cor="#111111"))
+    db.commit()
+    statements.clear()
+
+    budgets = [{"grupo": f"G{i:02d}", "valor_planejado": float(i)} for i in range(30)]
+    budgets.append({"grupo": "Casa", "valor_planejado": 99.0})  # existente, cor nula preserva
+    resultado = BudgetService(db).bulk_upsert_budget_planning(USER_ID, "2026-03", budgets)
+
+    assert [r["grupo"] for r in resultado] == [b["grupo"] for b in budgets]
+    assert len(_escritas(statements)) == 1
+    assert invalidacoes == [["2026-03"]]
+    metas = _metas(db)
+    assert len(metas) == 31
+    assert metas[("Casa", "2026-03")].valor_planejado == 99.0
+    assert metas[("Casa", "2026-03")].cor == "#111111"
+
+
+def test_bulk_upsert_planning_por_id_altera_grupo(ctx):
+    db, _, invalidacoes = ctx
+    antiga = BudgetPlanning(user_id=USER_ID, grupo="Lazer", mes_referencia="2026-02", valor_planejado=5.0)
+    outra = BudgetPlanning(user_id=USER_ID, grupo="Casa", mes_referencia="2026-02", valor_planejado=5.0)
+    db.add_all([antiga, outra])
+    db.commit()
+
+    resultado = BudgetService(db).bulk_upsert_budget_planning(USER_ID, "2026-03", [
+        {"id": antiga.id, "grupo": "Viagem", "valor_planejado": 70.0, "cor": "#222222"},
+        {"grupo": "Mercado", "valor_planejado": 30.0},
+    ])
+    assert resultado[0] == {"id": antiga.id, "grupo": "Viagem", "cor": "#222222",
+                            "mes_referencia": "2026-02", "valor_planejado": 70.0}
+    assert invalidacoes == [["2026-02", "2026-03"]]
+    assert set(_metas(db)) == {("Viagem", "2026-02"), ("Casa", "2026-02"), ("Mercado", "2026-03")}
+
+    # Renomear para um grupo que já existe no mês viola a chave → 409
+    with pytest.raises(HTTPException) as exc:
+        BudgetService(db).bulk_upsert_budget_planning(USER_ID, "2026-02", [
+            {"id": antiga.id, "grupo": "Casa", "valor_planejado": 1.0},
+        ])
+    assert exc.value.status_code == 409
+
+
+def test_bulk_range_e_copy_to_year(ctx):
+    db, statements, invalidacoes = ctx
+    service = BudgetService(db)
+
+    meses, count = service.bulk_upsert_budget_planning_range(USER_ID, "Casa", 50.0, "2026-01", "2026-12")
+    assert count == 12 and len(_escritas(statements)) == 1
+    assert invalidacoes == [meses]
+    meses, _ = service.bulk_upsert_budget_planning_range(USER_ID, "Casa", 80.0, "2026-06", "2026-12")
+    assert {m: b.valor_planejado for (_, m), b in _metas(db).items()}["2026-05"] == 50.0
+    assert all(_metas(db)[("Casa", m)].valor_planejado == 80.0 for m in meses)
+
+    for grupo in ("Mercado", "Lazer", "Saúde"):
+        db.add(BudgetPlanning(user_id=USER_ID, grupo=grupo, mes_referencia="2026-01", valor_planejado=7.0))
+    db.commit()
+    statements.clear()
+    invalidacoes.clear()
+
+    # Sem substituir: Casa (já existe em todos os meses) fica intacta; as outras 3 × 11 meses são criadas
+    resposta = service.copy_budget_to_year(USER_ID, "2026-01", 2026, substituir_existentes=False)
+    assert resposta["metas_copiadas"] == 3 * 11 and resposta["meses_criados"] == 11
+    assert len(_escritas(statements)) == 1
+    assert len(invalidacoes) == 1 and len(invalidacoes[0]) == 11
+    assert _metas(db)[("Casa", "2026-12")].valor_planejado == 80.0
+
+    resposta = service.copy_budget_to_year(USER_ID, "2026-01", 2026, substituir_existentes=True)
+    assert resposta["metas_copiadas"] == 4 * 11
+    assert _metas(db)[("Casa", "2026-12")].valor_planejado == 50.0
+    assert len(_metas(db)) == 4 * 12
+
+
+def test_bulk_upsert_budgets_com_media(ctx):
+    db, statements, invalidacoes = ctx
+    db.add(BudgetPlanning(user_id=USER_ID, grupo="Casa", mes_referencia="2026-03", valor_planejado=1.0))
+    db.commit()
+    statements.clear()
+
+    resposta = BudgetService(db).bulk_upsert_budgets(USER_ID, "2026-03", [
+        {"grupo": "Mercado", "valor_planejado": 20.0},
+        {"grupo": "Casa", "valor_planejado": 10.0},
+    ])
+    assert [(b.grupo, b.valor_planejado) for b in resposta] == [("Mercado", 20.0), ("Casa", 10.0)]
+    assert len(_escritas(statements)) == 1
+    assert invalidacoes == [["2026-03"]]
+
+
+def test_unique_constraint_no_modelo(ctx):
+    db, _, _ = ctx
+    db.add(BudgetPlanning(user_id=USER_ID, grupo="Casa", mes_referencia="2026-03", valor_planejado=1.0))
+    db.add(BudgetPlanning(user_id=USER_ID, grupo="Casa", mes_referencia="2026-03", valor_planejado=2.0))
+    with pytest.raises(IntegrityError):
+        db.commit()
+
+
+def test_migracao_remove_duplicatas_e_cria_constraint(sqlite_db):
+    engine = sqlite_db.get_bind()
+    BudgetPlanning.__table__.drop(engine)
+    with engine.begin() as conn:
+        conn.exec_driver_sql(
+            "CREATE TABLE budget_planning (id INTEGER PRIMARY KEY, user_id INTEGER NOT NULL, grupo VARCHAR(100) NOT NULL,"
+            " mes_referencia VARCHAR(7) NOT NULL, valor_planejado FLOAT NOT NULL, valor_medio_3_meses FLOAT NOT NULL,"
+            " cor VARCHAR(7), ativo BOOLEAN NOT NULL, created_at DATETIME NOT NULL, updated_at DATETIME NOT NULL)"
+        )
+        for id_, grupo, valor in [(1, "Casa", 1.0), (2, "Casa", 2.0), (3, "Mercado", 3.0), (4, "Casa", 4.0)]:
+            conn.exec_driver_sql(
+                "INSERT INTO budget_planning VALUES (?, 1, ?, '2026-03', ?, 0, NULL, 1, '2026-01-01', '2026-01-01')",
+                (id_, grupo, valor),
+            )
+
+    spec = importlib.util.spec_from_file_location("migracao_budget_unique", MIGRACAO)
+    migracao = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(migracao)
+    with engine.begin() as conn:
+        with Operations.context(MigrationContext.configure(conn)):
+            migracao.upgrade()
+
+    with engine.connect() as conn:
+        linhas = conn.exec_driver_sql("SELECT id, grupo, valor_planejado FROM budget_planning ORDER BY id").fetchall()
+    assert [tuple(linha) for linha in linhas] == [(3, "Mercado", 3.0), (4, "Casa", 4.0)]
+    unicas = inspect(engine).get_unique_constraints("budget_planning")
+    assert {"name": "uq_budget_planning_user_grupo_mes",
+            "column_names": ["user_id", "grupo", "mes_referencia"]} in [
+        {"name": u["name"], "column_names": u["column_names"]} for u in unicas
+    ]
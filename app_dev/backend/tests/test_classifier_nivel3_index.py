@@ -0,0 +1,130 @@
+"""
+Testes do índice invertido do nível 3 (CascadeClassifier._classify_nivel3_journal).
+
+Garante que a busca via posting lists escolhe exatamente o mesmo vencedor da
+varredura completa original (réplica do n8n) — incluindo limiar de tokens,
+regra de valor, recência por data_transacao (cronológica), desempate por ordem do
+histórico e filtro de PIX.
+"""
+import os
+import random
+from datetime import date, datetime
+from types import SimpleNamespace
+
+os.environ.setdefault("DATABASE_URL", "postgresql://x:x@localhost/x")
+os.environ.setdefault("JWT_SECRET_KEY", "a" * 64)
+
+from app.domains.upload.processors.classifier import CascadeClassifier  # noqa: E402
+from app.domains.upload.processors.marker import MarkedTransaction  # noqa: E402
+from app.shared.utils import tokensValidos, intersecaoCount, toNumberFlexible, parse_data_transacao  # noqa: E402
+
+
+def _vencedor_varredura(historico, marked):
+    """Réplica da varredura O(histórico) anterior ao índice invertido."""
+    tokens_estab = tokensValidos(marked.estabelecimento_base)
+    v_trans = abs(toNumberFlexible(marked.valor_positivo))
+    candidatos = []
+    for h in historico:
+        tokens_hist = tokensValidos(h.Estabelecimento or '')
+        inter = intersecaoCount(tokens_hist, tokens_estab)
+        v_hist = abs(toNumberFlexible(h.Valor))
+        if not (v_trans and v_hist):
+            valor_ok = True
+        elif abs(v_hist - v_trans) <= 5:
+            valor_ok = True
+        else:
+            valor_ok = abs(v_hist - v_trans) / max(v_hist, v_trans) <= 0.20
+        completo = bool(h.GRUPO and h.SUBGRUPO and h.TipoGasto)
+        limiar = 1 if min(len(tokens_estab), len(tokens_hist)) == 1 else 2
+        if completo and valor_ok and inter >= limiar:
+            candidatos.append({'h': h, 'data': h.data_transacao or date.min})
+    if not candidatos:
+        return None
+    candidatos.sort(key=lambda x: x['data'], reverse=True)
+    if 'PIX' in marked.estabelecimento_base.upper():
+        return None
+    return candidatos[0]['h']
+
+
+def _classifier(historico):
+    classifier = CascadeClassifier.__new__(CascadeClassifier)
+    classifier._historico_cache = historico
+    classifier._build_historico_index()
+    return classifier
+
+
+def _marked(estab, valor):
+    return MarkedTransaction(
+        banco="itau", tipo_documento="fatura", nome_arquivo="f.csv",
+        data_criacao=datetime(2026, 1, 1), data="01/01/2026",
+        lancamento=estab, valor=-valor, estabelecimento_base=estab,
+        valor_positivo=valor,
+    )
+
+
+def _row(i, estab, valor, data, grupo="Alimentação", subgrupo="Restaurante", tipo="Ajustável"):
+    return SimpleNamespace(
+        id=i, Estabelecimento=estab, Valor=-valor, Data=data, data_transacao=parse_data_transacao(data),
+        GRUPO=grupo, SUBGRUPO=subgrupo, TipoGasto=tipo,
+    )
+
+
+_PALAVRAS = [
+    "IFOOD", "UBER", "TRIP", "MERCADO", "LIVRE", "PADARIA", "CENTRAL", "POSTO",
+    "SHELL", "DROGARIA", "SAO", "PAULO", "AMAZON", "PRIME", "NETFLIX", "COMPRA", "PIX",
+]
+
+
+class TestNivel3Indice:
+
+    def test_mesmo_vencedor_que_varredura(self):
+        rnd = random.Random(42)
+        historico = []
+        for i in range(600):
+            estab = " ".join(rnd.choice(_PALAVRAS) for _ in range(rnd.randint(1, 4)))
+            valor = rnd.choice([0, 10, 25.5, 49.9, 120, 300])
+            data = f"{rnd.randint(1, 28):02d}/{rnd.randint(1, 12):02d}/202{rnd.randint(3, 5)}"
+            grupo = rnd.choice(["Alimentação", "Transporte", None, ""])
+            historico.append(_row(i, estab, valor, data, grupo=grupo, subgrupo=f"S{i}"))
+
+        classifier = _classifier(historico)
+        for _ in range(300):
+            estab = " ".join(rnd.choice(_PALAVRAS) for _ in range(rnd.randint(1, 4)))
+            marked = _marked(estab, rnd.choice([0, 9, 26, 50, 110, 1000]))
+            esperado = _vencedor_varredura(historico, marked)
+            result = classifier._classify_nivel3_journal(marked)
+            obtido = result.subgrupo if result else None
+            assert obtido == (esperado.SUBGRUPO if esperado else None), f"Divergência para '{estab}'"
+
+    def test_desempate_mantem_ordem_do_historico(self):
+        historico = [
+            _row(1, "PADARIA CENTRAL", 20, "10/01/2026", subgrupo="Primeiro"),
+            _row(2, "PADARIA CENTRAL", 20, "10/01/2026", subgrupo="Segundo"),
+        ]
+        result = _classifier(historico)._classify_nivel3_journal(_marked("PADARIA CENTRAL", 20))
+        assert result.subgrupo == "Primeiro"
+
+    def test_mais_recente_em_ordem_cronologica(self):
+        # Como string DD/MM/YYYY, "20/12/2025" > "10/01/2026" — a data real decide
+        historico = [
+            _row(1, "PADARIA CENTRAL", 20, "20/12/2025", subgrupo="Antigo"),
+            _row(2, "PADARIA CENTRAL", 20, "10/01/2026", subgrupo="Recente"),
+        ]
+        result = _classifier(historico)._classify_nivel3_journal(_marked("PADARIA CENTRAL", 20))
+        assert result.subgrupo == "Recente"
+
+    def test_limiar_dois_tokens(self):
+        historico = [_row(1, "POSTO SHELL CENTRAL", 100, "01/02/2026")]
+        classifier = _classifier(historico)
+        assert classifier._classify_nivel3_journal(_marked("POSTO IPIRANGA", 100)) is None
+        assert classifier._classify_nivel3_journal(_marked("POSTO SHELL", 100)) is not None
+
+    def test_pix_ignorado(self):
+        historico = [_row(1, "PIX MERCADO CENTRAL", 50, "01/02/2026")]
+        assert _classifier(historico)._classify_nivel3_journal(_marked("PIX MERCADO CENTRAL", 50)) is None
+
+    def test_linhas_incompletas_fora_do_indice(self):
+        historico = [_row(1, "NETFLIX", 40, "01/02/2026", tipo=None)]
+        classifier = _classifier(historico)
+        assert classifier._historico_rows == []
+        assert classifier._classify_nivel3_journal(_marked("NETFLIX", 40)) is None
@@ -0,0 +1,115 @@
+"""
+Testes do /dashboard/summary com seções paralelas.
+
+Cobre:
+  1. Seções rodam concorrentemente (latência ≈ seção mais lenta, não a soma)
+  2. Timeout/erro de uma seção vira null sem derrubar as demais
+  3. Header Server-Timing com a duração de cada seção
+"""
+import os
+import threading
+import time
+
+os.environ.setdefault("DATABASE_URL", "postgresql://x:x@localhost/x")
+os.environ.setdefault("JWT_SECRET_KEY", "a" * 64)
+
+import asyncio  # noqa: E402
+import importlib  # noqa: E402
+
+import pytest  # noqa: E402
+from fastapi import Response  # noqa: E402
+
+from app.core.config import settings  # noqa: E402
+
+# app.domains.dashboard reexporta o APIRouter como "router" — importar o módulo explicitamente
+dashboard_router = importlib.import_module("app.domains.dashboard.router")
+
+
+class FakeSession:
+    def __init__(self):
+        self.fechada = False
+
+    def rollback(self):
+        pass
+
+    def close(self):
+        self.fechada = True
+
+
+@pytest.fixture
+def sessoes(monkeypatch):
+    criadas = []
+
+    def fake_session_local():
+        s = FakeSession()
+        criadas.append(s)
+        return s
+
+    monkeypatch.setattr(dashboard_router, "SessionLocal", fake_session_local)
+    return criadas
+
+
+def _summary(sections):
+    response = Response()
+    body = asyncio.run(dashboard_router.dashboard_summary(
+        response=response, year=2025, month=3, ytd_month=None, sections=sections, user_id=1,
+    ))
+    return body, response.headers
+
+
+def _secao_lenta(valor, segundos=0.3):
+    def func(db, user_id, year, month, ytd_month):
+        time.sleep(segundos)
+        return {"valor": valor, "thread": threading.current_thread().name}
+    return func
+
+
+def test_secoes_em_paralelo_com_sessao_propria(sessoes, monkeypatch):
+    monkeypatch.setattr(dashboard_router, "SUMMARY_SECTIONS", {
+        "metrics": ("metrics", _secao_lenta(1)),
+        "chart": ("chart", _secao_lenta(2)),
+        "credit-cards": ("credit_cards", _secao_lenta(3)),
+    })
+
+    inicio = time.perf_counter()
+    body, _ = _summary("metrics,chart,credit-cards")
+    duracao = time.perf_counter() - inicio
+
+    assert [body[k]["valor"] for k in ("metrics", "chart", "credit_cards")] == [1, 2, 3]
+    assert duracao < 0.8  # sequencial seria >= 0.9s
+    assert len(sessoes) == 3 and all(s.fechada for s in sessoes)
+
+
+def test_timeout_e_erro_viram_null(sessoes, monkeypatch):
+    def quebra(db, user_id, year, month, ytd_month):
+        raise RuntimeError("boom")
+
+    monkeypatch.setattr(settings, "DASHBOARD_SECTION_TIMEOUT_SECONDS", 0.2)
+    monkeypatch.setattr(dashboard_router, "SUMMARY_SECTIONS", {
+        "metrics": ("metrics", _secao_lenta("ok", 0.01)),
+        "chart": ("chart", _secao_lenta("lento", 1.0)),
+        "income-sources": ("income_sources", quebra),
+    })
+
+    body, headers = _summary("metrics,chart,income-sources")
+
+    assert body["metrics"]["valor"] == "ok"
+    assert body["chart"] is None
+    assert body["income_sources"] is None
+
+    timing = headers["Server-Timing"]
+    assert 'chart;dur=' in timing and 'desc="timeout"' in timing
+    assert 'desc="error"' in timing
+    assert timing.split(", ")[-1].startswith("total;dur=")
+
+
+def test_secao_nao_solicitada_fica_ausente(sessoes, monkeypatch):
+    monkeypatch.setattr(dashboard_router, "SUMMARY_SECTIONS", {
+        "metrics": ("metrics", _secao_lenta(1, 0)),
+        "chart": ("chart", _secao_lenta(2, 0)),
+    })
+
+    body, headers = _summary("chart")
+
+    assert set(body) == {"chart"}
+    assert headers["Server-Timing"].startswith("chart;dur=")
@@ -0,0 +1,140 @@
+"""
+Testes da coluna data_transacao (DATE) de journal_entries.
+
+Cobre:
+  1. parse_data_transacao: DD/MM/YYYY válida → date; vazia/inválida → None
+  2. Marker parseia a data uma vez; confirm (INSERT ... SELECT) leva data_transacao ao journal
+  3. Listagem/contagem/cursor com data_inicio/data_fim (range em data_transacao)
+  4. /dashboard/chart-data-daily: 1 query agrupada por dia, dias vazios com zero
+  5. Backfill da migração em lotes (datas inválidas ficam NULL)
+"""
+import importlib.util
+import os
+from datetime import date, datetime
+from pathlib import Path
+
+os.environ.setdefault("DATABASE_URL", "postgresql://x:x@localhost/x")
+os.environ.setdefault("JWT_SECRET_KEY", "a" * 64)
+
+import pytest  # noqa: E402
+from alembic.operations import Operations  # noqa: E402
+from alembic.runtime.migration import MigrationContext  # noqa: E402
+from sqlalchemy import text  # noqa: E402
+
+from app.domains.dashboard.repository import DashboardRepository  # noqa: E402
+from app.domains.transactions.models import JournalEntry  # noqa: E402
+from app.domains.transactions.repository import TransactionRepository  # noqa: E402
+from app.domains.transactions.schemas import TransactionFilters  # noqa: E402
+from app.domains.upload.history_models import UploadHistory  # noqa: E402
+from app.domains.upload.models import PreviewTransacao  # noqa: E402
+from app.domains.upload.processors.marker import TransactionMarker  # noqa: E402
+from app.domains.upload.processors.raw.base import RawTransaction  # noqa: E402
+from app.domains.upload.repository import UploadRepository  # noqa: E402
+from app.shared.utils import parse_data_transacao  # noqa: E402
+
+USER_ID = 1
+MIGRACAO = Path(__file__).parent.parent / "migrations" / "versions" / "r3s4t5u6v7w8_add_data_transacao.py"
+
+
+@pytest.fixture
+def db(sqlite_db):
+    session = sqlite_db
+    linhas = [
+        ("28/12/2025", "202601", "Despesa", -30.0),
+        ("02/01/2026", "202601", "Despesa", -10.0),
+        ("02/01/2026", "202601", "Receita", 500.0),
+        ("05/01/2026", "202602", "Despesa", -20.0),
+        ("15/02/2026", "202602", "Despesa", -40.0),
+    ]
+    for i, (data, mes, categoria, valor) in enumerate(linhas):
+        session.add(JournalEntry(
+            user_id=USER_ID, IdTransacao=f"t{i}", Estabelecimento=f"LOJA {i}", Data=data,
+            data_transacao=parse_data_transacao(data), MesFatura=mes, CategoriaGeral=categoria,
+            Valor=valor, TipoTransacao="Despesas", IgnorarDashboard=0,
+        ))
+    session.add(JournalEntry(user_id=2, IdTransacao="x", Estabelecimento="OUTRO", Data="02/01/2026",
+                             data_transacao=date(2026, 1, 2), CategoriaGeral="Despesa", Valor=-99.0,
+                             IgnorarDashboard=0))
+    session.commit()
+    return session
+
+
+def test_parse_data_transacao():
+    assert parse_data_transacao("05/03/2025") == date(2025, 3, 5)
+    assert parse_data_transacao(" 5/3/2025 ") == date(2025, 3, 5)
+    for invalida in (None, "", "31/02/2025", "2025-03-05", "05/03/25", "ab/cd/efgh"):
+        assert parse_data_transacao(invalida) is None
+
+
+def test_marker_e_confirm_levam_data_transacao(db):
+    raw = RawTransaction(
+        banco="Itaú", tipo_documento="extrato", nome_arquivo="e.csv", data_criacao=None,
+        data="28/12/2025", lancamento="PADARIA", valor=-12.0,
+    )
+    marked = TransactionMarker(user_id=USER_ID).mark_transaction(raw)
+    assert marked.data_transacao == date(2025, 12, 28)
+    assert (marked.ano, marked.mes) == (2025, 12)
+
+    db.add(UploadHistory(id=7, user_id=USER_ID, session_id="s1", banco="Itaú", tipo_documento="extrato",
+                         nome_arquivo="e.csv", status="processing"))
+    db.add(PreviewTransacao(
+        session_id="s1", user_id=USER_ID, banco="Itaú", nome_arquivo="e.csv", data=marked.data,
+        lancamento=marked.lancamento, valor=marked.valor, IdTransacao="novo", mes_fatura="2025-12",
+        data_transacao=marked.data_transacao, excluir=0, is_duplicate=False,
+    ))
+    db.commit()
+    UploadRepository(db).move_preview_to_journal("s1", USER_ID, "s1", 7, datetime.now())
+    db.commit()
+    assert db.query(JournalEntry).filter_by(IdTransacao="novo").one().data_transacao == date(2025, 12, 28)
+
+
+def test_listagem_por_intervalo_de_datas(db):
+    repo = TransactionRepository(db)
+    filtros = TransactionFilters(data_inicio=date(2026, 1, 1), data_fim=date(2026, 1, 31))
+
+    assert sorted(t.IdTransacao for t in repo.list_with_filters(USER_ID, filtros)) == ["t1", "t2", "t3"]
+    assert repo.count_with_filters(USER_ID, filtros) == 3
+    assert sorted(t.IdTransacao for t in repo.list_with_filters_cursor(USER_ID, filtros)) == ["t1", "t2", "t3"]
+
+    # Combina com MesFatura: 02/01 a 31/01 da fatura 202602
+    filtros = TransactionFilters(year=2026, month=2, data_fim=date(2026, 1, 31))
+    assert [t.IdTransacao for t in repo.list_with_filters(USER_ID, filtros)] == ["t3"]
+
+
+def test_chart_data_daily(db, query_counter):
+    query_counter.clear()
+    pontos = DashboardRepository(db).get_chart_data_daily(USER_ID, date(2025, 12, 31), date(2026, 1, 5))
+    statements = [" ".join(stmt.split()) for stmt in query_counter]
+
+    assert len(statements) == 1
+    assert "journal_entries.data_transacao >= ?" in statements[0]
+    assert "GROUP BY journal_entries.data_transacao" in statements[0]
+    assert [p["date"] for p in pontos] == [
+        "2025-12-31", "2026-01-01", "2026-01-02", "2026-01-03", "2026-01-04", "2026-01-05",
+    ]
+    por_dia = {p["date"]: (p["receitas"], p["despesas"]) for p in pontos}
+    assert por_dia["2026-01-02"] == (500.0, 10.0)
+    assert por_dia["2026-01-05"] == (0.0, 20.0)
+    assert por_dia["2026-01-01"] == (0.0, 0.0)
+
+
+def test_backfill_da_migracao_em_lotes(db):
+    db.add(JournalEntry(user_id=USER_ID, IdTransacao="ruim", Estabelecimento="X", Data="31/02/2026"))
+    db.commit()
+    db.execute(text("UPDATE journal_entries SET data_transacao = NULL"))
+    db.commit()
+
+    spec = importlib.util.spec_from_file_location("migracao_data", MIGRACAO)
+    migracao = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(migracao)
+    migracao.LOTE = 2
+
+    with db.get_bind().begin() as conn:
+        with Operations.context(MigrationContext.configure(conn)):
+            migracao._backfill("journal_entries", "Data")
+
+    db.expire_all()
+    datas = {t.IdTransacao: t.data_transacao for t in db.query(JournalEntry)}
+    assert datas["t0"] == date(2025, 12, 28)
+    assert datas["t4"] == date(2026, 2, 15)
+    assert datas["ruim"] is None
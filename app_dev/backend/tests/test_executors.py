@@ -0,0 +1,48 @@
+"""
+Testes dos executores de upload (app.core.executors).
+
+Cobre:
+  1. run_in_thread libera o event loop (handlers async do upload)
+  2. run_in_process executa inline quando UPLOAD_PROCESS_WORKERS=0
+  3. PasswordRequiredException atravessa o pool de processos sem perder campos
+"""
+import asyncio
+import os
+import pickle
+
+os.environ.setdefault("DATABASE_URL", "postgresql://x:x@localhost/x")
+os.environ.setdefault("JWT_SECRET_KEY", "a" * 64)
+
+from app.core import executors  # noqa: E402
+from app.core.config import settings  # noqa: E402
+from app.domains.upload.processors.raw.base import PasswordRequiredException  # noqa: E402
+
+
+def test_run_in_thread_nao_bloqueia_event_loop():
+    import time
+
+    async def main():
+        ticks = []
+
+        async def ticker():
+            for _ in range(5):
+                ticks.append(1)
+                await asyncio.sleep(0.01)
+
+        await asyncio.gather(executors.run_in_thread(time.sleep, 0.2), ticker())
+        return ticks
+
+    assert len(asyncio.run(main())) == 5
+
+
+def test_run_in_process_inline_sem_workers(monkeypatch):
+    monkeypatch.setattr(settings, "UPLOAD_PROCESS_WORKERS", 0)
+    assert executors.get_process_pool() is None
+    assert executors.run_in_process(sum, [1, 2, 3]) == 6
+
+
+def test_password_required_exception_picklable():
+    exc = pickle.loads(pickle.dumps(PasswordRequiredException("fatura.pdf", wrong_password=True)))
+    assert isinstance(exc, PasswordRequiredException)
+    assert exc.filename == "fatura.pdf"
+    assert exc.wrong_password is True
@@ -0,0 +1,71 @@
+"""
+Orçamento de cold start do app.main (python -X importtime num processo limpo).
+
+Cobre:
+  1. Nenhum parser pesado (pandas, PyMuPDF, pdfplumber, openpyxl, OCR...) no import do app —
+     o registry de processadores é lazy (processors/raw/registry.py)
+  2. Nº de módulos carregados e tempo acumulado de import de app.main dentro do orçamento
+  3. Todo caminho "módulo:função" do registry resolve para um processador
+
+Orçamento de tempo ajustável por ambiente: IMPORT_TIME_BUDGET_MS (CI mais lento/rápido).
+"""
+import os
+import subprocess
+import sys
+from pathlib import Path
+
+os.environ.setdefault("DATABASE_URL", "postgresql://x:x@localhost/x")
+os.environ.setdefault("JWT_SECRET_KEY", "a" * 64)
+
+import pytest  # noqa: E402
+
+BACKEND = Path(__file__).parent.parent
+
+# Só carregados quando um upload precisa do processador
+MODULOS_PESADOS = (
+    "pandas", "numpy", "fitz", "pymupdf", "pdfplumber", "openpyxl", "xlrd",
+    "msoffcrypto", "rapidocr_onnxruntime", "onnxruntime", "cv2",
+)
+# Hoje ~910 módulos (antes do registry lazy: ~1640)
+MAX_MODULOS = 1100
+ORCAMENTO_MS = float(os.environ.get("IMPORT_TIME_BUDGET_MS", "6000"))
+
+
+@pytest.fixture(scope="module")
+def importtime():
+    env = {**os.environ, "PYTHONPATH": str(BACKEND)}
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import app.main"],
+        cwd=BACKEND, env=env, capture_output=True, text=True, timeout=120,
+    )
+    assert proc.returncode == 0, proc.stderr[-2000:]
+    modulos = {}
+    for linha in proc.stderr.splitlines():
+        if not linha.startswith("import time:") or "|" not in linha:
+            continue
+        _, cumulativo, nome = linha.split("|")
+        if cumulativo.strip().isdigit():
+            modulos[nome.strip()] = int(cumulativo)
+    return modulos
+
+
+def test_app_main_nao_importa_parsers_pesados(importtime):
+    carregados = {nome.split(".")[0] for nome in importtime}
+    assert not carregados & set(MODULOS_PESADOS)
+    assert not [n for n in importtime if n.startswith("app.domains.upload.processors.raw.") and
+                n.rsplit(".", 1)[-1] not in ("raw", "base", "registry")]
+
+
+def test_app_main_dentro_do_orcamento(importtime):
+    assert len(importtime) <= MAX_MODULOS
+    assert importtime["app.main"] / 1000 <= ORCAMENTO_MS
+
+
+def test_registry_resolve_todos_os_processadores():
+    from app.domains.upload.processors.raw import registry
+
+    for chave, caminho in registry.PROCESSORS.items():
+        processor = registry._load_processor(caminho)
+        assert callable(processor), chave
+    assert registry.get_processor("Itaú", "fatura", "csv") is registry._load_processor(registry.ITAU_FATURA_CSV)
+    assert registry.get_processor("Mercado Pago", "extrato", "pdf").__name__ == "wrapper"
@@ -0,0 +1,392 @@
+"""
+Testes da fila persistente de jobs (app.domains.jobs).
+
+Lógica pura:
+  1. Coalescing — mescla de payloads de enqueues seguidos do mesmo usuário
+  2. Registro do handler das fases 5/6/7 do upload
+
+Comportamento com sessão real (SQLite em arquivo, relógio da fila monkeypatchado):
+  3. enqueue_job: coalescing por usuário e debounce reiniciado a cada enqueue
+  4. claim_next: FOR UPDATE SKIP LOCKED; workers concorrentes nunca pegam o mesmo job;
+     nada é reivindicado para (user_id, job_type) com job running
+  5. _execute_job: retry com backoff exponencial e estado final 'error'
+  6. requeue_stale_jobs: job running de worker reiniciado volta para a fila
+  7. Endpoint de status (GET /jobs/{id} e GET /jobs)
+"""
+import importlib
+import os
+import threading
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+
+os.environ.setdefault("DATABASE_URL", "postgresql://x:x@localhost/x")
+os.environ.setdefault("JWT_SECRET_KEY", "a" * 64)
+
+import pytest  # noqa: E402
+from fastapi import HTTPException  # noqa: E402
+from sqlalchemy import create_engine, func  # noqa: E402
+from sqlalchemy.dialects import postgresql  # noqa: E402
+from sqlalchemy.exc import IntegrityError  # noqa: E402
+from sqlalchemy.orm import sessionmaker  # noqa: E402
+
+from app.core import database  # noqa: E402
+from app.core.config import settings  # noqa: E402
+from app.core.database import Base  # noqa: E402
+from app.domains.jobs import service as jobs_service  # noqa: E402
+from app.domains.jobs.models import BackgroundJob  # noqa: E402
+from app.domains.jobs.repository import JobRepository  # noqa: E402
+from app.domains.jobs.service import (  # noqa: E402
+    JOB_HANDLERS,
+    _execute_job,
+    _merge_payload,
+    enqueue_job,
+    requeue_stale_jobs,
+)
+from app.domains.users.models import User  # noqa: E402, F401
+
+jobs_router = importlib.import_module("app.domains.jobs.router")
+
+T0 = datetime(2026, 3, 2, 12, 0, 0)
+JOB_TESTE = "teste_fila"
+
+
+class TestMergePayload:
+
+    def test_listas_viram_uniao_ordenada(self):
+        merged = _merge_payload({"upload_history_ids": [10, 11]}, {"upload_history_ids": [11, 12]})
+        assert merged == {"upload_history_ids": [10, 11, 12]}
+
+    def test_escalares_ultimo_vence(self):
+        merged = _merge_payload({"modo": "full", "ids": [1]}, {"modo": "incremental"})
+        assert merged == {"modo": "incremental", "ids": [1]}
+
+    def test_payload_vazio(self):
+        assert _merge_payload(None, {"ids": [1]}) == {"ids": [1]}
+        assert _merge_payload({"ids": [1]}, None) == {"ids": [1]}
+
+
+def test_handler_pos_confirmacao_registrado():
+    from app.domains.upload.service import POST_CONFIRM_JOB, run_post_confirm_phases
+    assert JOB_HANDLERS[POST_CONFIRM_JOB] is run_post_confirm_phases
+
+
+@pytest.fixture
+def fila(tmp_path, monkeypatch):
+    """Banco em arquivo (sessões/threads independentes) e relógio da fila controlado."""
+    engine = create_engine(f"sqlite:///{tmp_path / 'fila.db'}")
+    Base.metadata.create_all(engine)
+    Sessao = sessionmaker(bind=engine)
+    relogio = SimpleNamespace(agora=T0)
+
+    def avancar(segundos):
+        relogio.agora += timedelta(seconds=segundos)
+
+    monkeypatch.setattr(jobs_service, "_agora", lambda: relogio.agora)
+    monkeypatch.setattr(database, "SessionLocal", Sessao)
+    monkeypatch.setattr(settings, "JOB_MAX_ATTEMPTS", 3)
+    monkeypatch.setattr(settings, "JOB_RETRY_BACKOFF_SECONDS", 30.0)
+    monkeypatch.setattr(settings, "JOB_LOCK_TIMEOUT_SECONDS", 900)
+    db = Sessao()
+    yield SimpleNamespace(db=db, Sessao=Sessao, relogio=relogio, avancar=avancar)
+    db.close()
+    engine.dispose()
+
+
+def _claim(fila, worker_id="w0"):
+    db = fila.Sessao()
+    try:
+        return JobRepository(db).claim_next(worker_id, fila.relogio.agora)
+    finally:
+        db.close()
+
+
+def _requeue(fila):
+    """Como no JobRunner: sessão nova a cada varredura."""
+    db = fila.Sessao()
+    try:
+        return requeue_stale_jobs(db)
+    finally:
+        db.close()
+
+
+def _job(fila, job_id):
+    fila.db.expire_all()
+    return fila.db.get(BackgroundJob, job_id)
+
+
+class TestEnqueue:
+
+    def test_coalescing_por_usuario_reinicia_debounce(self, fila):
+        primeiro = enqueue_job(fila.db, 1, JOB_TESTE, {"upload_history_ids": [10]}, debounce_seconds=5)
+        assert primeiro.run_after == T0 + timedelta(seconds=5)
+
+        fila.avancar(3)
+        segundo = enqueue_job(fila.db, 1, JOB_TESTE, {"upload_history_ids": [11]}, debounce_seconds=5)
+        outro_usuario = enqueue_job(fila.db, 2, JOB_TESTE, {"upload_history_ids": [20]}, debounce_seconds=5)
+
+        assert segundo.id == primeiro.id
+        assert segundo.payload == {"upload_history_ids": [10, 11]}
+        assert segundo.run_after == T0 + timedelta(seconds=8)
+        assert outro_usuario.id != primeiro.id
+        assert fila.db.query(BackgroundJob).filter_by(user_id=1).count() == 1
+
+        # Debounce: a janela reiniciada ainda não venceu para o user 1
+        fila.avancar(4)  # T0+7
+        assert _claim(fila) is None
+        fila.avancar(1)  # T0+8
+        assert {_claim(fila), _claim(fila)} == {primeiro.id, outro_usuario.id}
+
+    def test_enqueue_com_job_running_cria_novo_pendente(self, fila):
+        job = enqueue_job(fila.db, 1, JOB_TESTE, {"upload_history_ids": [1]}, debounce_seconds=0)
+        assert _claim(fila) == job.id
+
+        novo = enqueue_job(fila.db, 1, JOB_TESTE, {"upload_history_ids": [2]}, debounce_seconds=0)
+        assert novo.id != job.id and novo.status == "pending"
+        assert novo.payload == {"upload_history_ids": [2]}
+
+    def test_corrida_entre_enqueues_mescla_no_pendente(self, fila, monkeypatch):
+        existente = enqueue_job(fila.db, 1, JOB_TESTE, {"upload_history_ids": [1]}, debounce_seconds=0)
+        buscar_original = JobRepository.get_pending_for_update
+        chamadas = []
+
+        def buscar_sem_ver_o_outro(self, user_id, job_type):
+            # 1ª busca não enxerga o pendente (commit concorrente) → INSERT bate no índice único
+            chamadas.append(user_id)
+            return None if len(chamadas) == 1 else buscar_original(self, user_id, job_type)
+
+        monkeypatch.setattr(JobRepository, "get_pending_for_update", buscar_sem_ver_o_outro)
+        job = enqueue_job(fila.db, 1, JOB_TESTE, {"upload_history_ids": [2]}, debounce_seconds=0)
+
+        assert job.id == existente.id
+        assert job.payload == {"upload_history_ids": [1, 2]}
+        assert len(chamadas) == 2
+
+    def test_indice_unico_so_vale_para_pendentes(self, fila):
+        fila.db.add(BackgroundJob(user_id=1, job_type=JOB_TESTE, status="success", run_after=T0))
+        fila.db.add(BackgroundJob(user_id=1, job_type=JOB_TESTE, status="pending", run_after=T0))
+        fila.db.commit()
+
+        fila.db.add(BackgroundJob(user_id=1, job_type=JOB_TESTE, status="pending", run_after=T0))
+        with pytest.raises(IntegrityError):
+            fila.db.commit()
+        fila.db.rollback()
+
+
+class TestClaim:
+
+    def test_claim_usa_skip_locked(self):
+        class DbFalso:
+            def execute(self, stmt):
+                self.stmt = stmt
+                return SimpleNamespace(fetchone=lambda: None)
+
+            def commit(self):
+                pass
+
+        db = DbFalso()
+        assert JobRepository(db).claim_next("w0", func.now()) is None
+        sql = str(db.stmt.compile(dialect=postgresql.dialect()))
+        assert "FOR UPDATE SKIP LOCKED" in sql
+        assert "j.run_after <= now()" in sql and "RETURNING background_jobs.id" in sql
+
+    def test_workers_concorrentes_nunca_pegam_o_mesmo_job(self, fila):
+        ids = [
+            enqueue_job(fila.db, user_id, JOB_TESTE, {"n": user_id}, debounce_seconds=0).id
+            for user_id in range(1, 21)
+        ]
+        largada = threading.Barrier(4)
+        reivindicados = []
+        erros = []
+
+        def worker(indice):
+            try:
+                largada.wait()
+                while True:
+                    job_id = _claim(fila, f"w{indice}")
+                    if job_id is None:
+                        return
+                    reivindicados.append((job_id, f"w{indice}"))
+            except Exception as e:  # pragma: no cover - falha do teste
+                erros.append(e)
+
+        threads = [threading.Thread(target=worker, args=(i,)) for i in range(4)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+
+        assert erros == []
+        assert sorted(job_id for job_id, _ in reivindicados) == ids  # cada job uma única vez
+        for job_id, worker_id in reivindicados:
+            job = _job(fila, job_id)
+            assert (job.status, job.locked_by, job.attempts) == ("running", worker_id, 1)
+
+    def test_serial_por_usuario_e_ordem_por_run_after(self, fila):
+        tardio = enqueue_job(fila.db, 1, JOB_TESTE, {}, debounce_seconds=2)
+        cedo = enqueue_job(fila.db, 2, JOB_TESTE, {}, debounce_seconds=1)
+        fila.avancar(2)
+        assert _claim(fila) == cedo.id
+        assert _claim(fila) == tardio.id
+
+        # user 1 já tem job running → o novo pendente dele espera
+        pendente = enqueue_job(fila.db, 1, JOB_TESTE, {}, debounce_seconds=0)
+        assert _claim(fila) is None
+        _job(fila, tardio.id).status = "success"
+        fila.db.commit()
+        assert _claim(fila) == pendente.id
+
+
+class TestExecucao:
+
+    def test_sucesso_grava_resultado(self, fila, monkeypatch):
+        recebidos = []
+        monkeypatch.setitem(JOB_HANDLERS, JOB_TESTE,
+                            lambda db, user_id, payload: recebidos.append((user_id, payload)) or {"ok": 1})
+        job = enqueue_job(fila.db, 7, JOB_TESTE, {"upload_history_ids": [3]}, debounce_seconds=0)
+
+        _execute_job(_claim(fila), "w0")
+
+        job = _job(fila, job.id)
+        assert recebidos == [(7, {"upload_history_ids": [3]})]
+        assert (job.status, job.result, job.last_error) == ("success", {"ok": 1}, None)
+        assert job.finished_at == T0
+
+    def test_retry_com_backoff_ate_falha_definitiva(self, fila, monkeypatch):
+        tentativas = []
+
+        def handler_com_falha(db, user_id, payload):
+            tentativas.append(user_id)
+            raise ValueError(f"falha {len(tentativas)}")
+
+        monkeypatch.setitem(JOB_HANDLERS, JOB_TESTE, handler_com_falha)
+        job = enqueue_job(fila.db, 1, JOB_TESTE, {}, debounce_seconds=0)
+
+        # 1ª falha → pending com backoff de 30s
+        _execute_job(_claim(fila), "w0")
+        job = _job(fila, job.id)
+        assert (job.status, job.attempts, job.last_error) == ("pending", 1, "falha 1")
+        assert job.run_after == T0 + timedelta(seconds=30)
+        assert job.locked_by is None and job.locked_at is None
+
+        fila.avancar(29)
+        assert _claim(fila) is None
+        fila.avancar(1)  # T0+30
+
+        # 2ª falha → backoff dobra (60s)
+        _execute_job(_claim(fila), "w0")
+        job = _job(fila, job.id)
+        assert (job.status, job.attempts) == ("pending", 2)
+        assert job.run_after == T0 + timedelta(seconds=90)
+
+        fila.avancar(60)
+        # 3ª falha = max_attempts → error definitivo, sem novo run_after
+        _execute_job(_claim(fila), "w0")
+        job = _job(fila, job.id)
+        assert (job.status, job.attempts, job.last_error) == ("error", 3, "falha 3")
+        assert job.finished_at == T0 + timedelta(seconds=90)
+        assert len(tentativas) == 3
+
+        fila.avancar(3600)
+        assert _claim(fila) is None
+
+    def test_handler_nao_registrado_falha_sem_retry(self, fila):
+        job = enqueue_job(fila.db, 1, "tipo_sem_handler", {}, debounce_seconds=0)
+        _execute_job(_claim(fila), "w0")
+        job = _job(fila, job.id)
+        assert (job.status, job.attempts) == ("error", 1)
+        assert "Handler não registrado" in job.last_error
+
+    def test_retry_com_pendente_existente_mescla_payload(self, fila, monkeypatch):
+        def handler_com_falha(db, user_id, payload):
+            raise ValueError("falha")
+
+        monkeypatch.setitem(JOB_HANDLERS, JOB_TESTE, handler_com_falha)
+        job = enqueue_job(fila.db, 1, JOB_TESTE, {"upload_history_ids": [1]}, debounce_seconds=0)
+        job_id = _claim(fila)
+        # Enquanto roda, outro upload do mesmo usuário enfileira
+        novo = enqueue_job(fila.db, 1, JOB_TESTE, {"upload_history_ids": [2]}, debounce_seconds=0)
+
+        _execute_job(job_id, "w0")
+
+        job, novo = _job(fila, job.id), _job(fila, novo.id)
+        assert job.status == "error" and "retry mesclado" in job.last_error
+        assert novo.status == "pending"
+        assert novo.payload == {"upload_history_ids": [2, 1]}
+
+
+class TestRequeueStale:
+
+    def test_worker_reiniciado_devolve_job_para_a_fila(self, fila):
+        job = enqueue_job(fila.db, 1, JOB_TESTE, {"upload_history_ids": [1]}, debounce_seconds=0)
+        assert _claim(fila, "worker-morto") == job.id
+
+        fila.avancar(899)
+        assert _requeue(fila) == 0
+        assert _job(fila, job.id).status == "running"
+
+        fila.avancar(2)  # lock com mais de JOB_LOCK_TIMEOUT_SECONDS
+        assert _requeue(fila) == 1
+        job = _job(fila, job.id)
+        assert (job.status, job.locked_by, job.locked_at) == ("pending", None, None)
+        assert job.run_after == T0 + timedelta(seconds=901)
+
+        assert _claim(fila, "worker-novo") == job.id
+        assert _job(fila, job.id).attempts == 2
+
+    def test_stale_com_pendente_do_usuario_mescla_payload(self, fila):
+        job = enqueue_job(fila.db, 1, JOB_TESTE, {"upload_history_ids": [1]}, debounce_seconds=0)
+        _claim(fila)
+        pendente = enqueue_job(fila.db, 1, JOB_TESTE, {"upload_history_ids": [2]}, debounce_seconds=60)
+
+        fila.avancar(1000)
+        assert _requeue(fila) == 1
+
+        job, pendente = _job(fila, job.id), _job(fila, pendente.id)
+        assert job.status == "error" and f"job {pendente.id}" in job.last_error
+        assert pendente.payload == {"upload_history_ids": [2, 1]}
+
+    def test_stale_sem_tentativas_restantes_vira_erro(self, fila, monkeypatch):
+        monkeypatch.setattr(settings, "JOB_MAX_ATTEMPTS", 1)
+        job = enqueue_job(fila.db, 1, JOB_TESTE, {}, debounce_seconds=0)
+        _claim(fila)
+
+        fila.avancar(1000)
+        assert _requeue(fila) == 1
+        job = _job(fila, job.id)
+        assert job.status == "error" and "tentativas esgotadas" in job.last_error
+        assert job.finished_at == T0 + timedelta(seconds=1000)
+
+
+class TestEndpointStatus:
+
+    def test_status_do_job_ao_longo_da_execucao(self, fila, monkeypatch):
+        monkeypatch.setitem(JOB_HANDLERS, JOB_TESTE, lambda db, user_id, payload: {"padroes": 4})
+        job = enqueue_job(fila.db, 1, JOB_TESTE, {"upload_history_ids": [5]}, debounce_seconds=0)
+
+        resposta = jobs_router.get_job(job.id, user_id=1, db=fila.db)
+        assert (resposta.status, resposta.attempts, resposta.result) == ("pending", 0, None)
+
+        _execute_job(_claim(fila), "w0")
+        fila.db.expire_all()
+        resposta = jobs_router.get_job(job.id, user_id=1, db=fila.db)
+        assert (resposta.status, resposta.attempts, resposta.result) == ("success", 1, {"padroes": 4})
+        assert resposta.payload == {"upload_history_ids": [5]}
+
+    def test_job_de_outro_usuario_404(self, fila):
+        job = enqueue_job(fila.db, 1, JOB_TESTE, {}, debounce_seconds=0)
+        with pytest.raises(HTTPException) as exc:
+            jobs_router.get_job(job.id, user_id=2, db=fila.db)
+        assert exc.value.status_code == 404
+        assert exc.value.detail["errorCode"] == "JOB_001"
+
+    def test_lista_filtra_por_status_mais_novos_primeiro(self, fila):
+        antigo = enqueue_job(fila.db, 1, JOB_TESTE, {}, debounce_seconds=0)
+        _claim(fila)
+        novo = enqueue_job(fila.db, 1, JOB_TESTE, {}, debounce_seconds=0)
+        enqueue_job(fila.db, 2, JOB_TESTE, {}, debounce_seconds=0)
+
+        todos = jobs_router.list_jobs(limit=20, status=None, job_type=None, user_id=1, db=fila.db)
+        assert todos.success and [j.id for j in todos.jobs] == [novo.id, antigo.id]
+
+        running = jobs_router.list_jobs(limit=20, status="running", job_type=JOB_TESTE, user_id=1, db=fila.db)
+        assert [j.id for j in running.jobs] == [antigo.id]
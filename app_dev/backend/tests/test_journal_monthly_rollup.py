@@ -0,0 +1,297 @@
+"""
+Testes do journal_monthly_rollup (fato agregado mensal de journal_entries).
+
+Cobre:
+  1. Leituras do dashboard/budget/plano sobre o rollup = agregação direta no journal
+  2. Caminhos de escrita (criar, editar, ignorar, excluir, migrar grupo) mantêm o rollup consistente
+  3. Refresh por mês não toca outros meses; rebuild limpa usuários sem transações
+  4. Carga inicial da migração = refresh_journal_rollup()
+  5. Refreshes repetidos do mesmo mês: uma linha por chave (índice único + advisory lock)
+"""
+import importlib.util
+import os
+import random
+from pathlib import Path
+from types import SimpleNamespace
+
+os.environ.setdefault("DATABASE_URL", "postgresql://x:x@localhost/x")
+os.environ.setdefault("JWT_SECRET_KEY", "a" * 64)
+
+import pytest  # noqa: E402
+from alembic.operations import Operations  # noqa: E402
+from alembic.runtime.migration import MigrationContext  # noqa: E402
+from sqlalchemy import create_engine, func, inspect  # noqa: E402
+from sqlalchemy.exc import IntegrityError  # noqa: E402
+from sqlalchemy.orm import sessionmaker  # noqa: E402
+
+from app.core.database import Base  # noqa: E402
+from app.domains.budget.realizado import RealizadoPorGrupo  # noqa: E402
+from app.domains.dashboard.repository import DashboardRepository  # noqa: E402
+from app.domains.grupos.models import BaseGruposConfig  # noqa: E402
+from app.domains.transactions.models import JournalEntry, JournalMonthlyRollup  # noqa: E402
+from app.domains.transactions import rollup  # noqa: E402
+from app.domains.transactions.rollup import rebuild_journal_rollup, refresh_journal_rollup  # noqa: E402
+from app.domains.transactions.schemas import TransactionCreate, TransactionUpdate  # noqa: E402
+from app.domains.transactions.service import TransactionService  # noqa: E402
+from app.domains.upload.history_models import UploadHistory  # noqa: E402, F401
+from app.domains.users.models import User  # noqa: E402, F401
+
+USER_ID = 1
+ANO = 2025
+MIGRACOES = Path(__file__).parent.parent / "migrations" / "versions"
+MIGRACAO = MIGRACOES / "s4t5u6v7w8x9_add_journal_monthly_rollup.py"
+MIGRACAO_UNICA = MIGRACOES / "w8x9y0z1a2b3_add_journal_rollup_unique.py"
+
+GRUPOS = [("Casa", "Despesa"), ("Mercado", "Despesa"), ("Salário", "Receita"), ("Aplicações", "Investimentos")]
+
+
+@pytest.fixture
+def db():
+    engine = create_engine("sqlite://")
+    Base.metadata.create_all(engine)
+    session = sessionmaker(bind=engine)()
+    rng = random.Random(7)
+    for nome, cat in GRUPOS:
+        session.add(BaseGruposConfig(user_id=USER_ID, nome_grupo=nome, tipo_gasto_padrao="Fixo", categoria_geral=cat))
+    for i in range(300):
+        m = rng.randint(1, 12)
+        grupo, cat = rng.choice(GRUPOS)
+        session.add(JournalEntry(
+            user_id=rng.choice([USER_ID, USER_ID, 2]), IdTransacao=f"t{i}",
+            MesFatura=f"{ANO}{m:02d}", Ano=ANO, Mes=m, CategoriaGeral=cat, GRUPO=grupo,
+            SUBGRUPO=rng.choice(["A", "B", None]), NomeCartao=rng.choice(["Visa", "Master", "", None]),
+            TipoTransacao=rng.choice(["Cartão de Crédito", "Despesas", "Receitas"]),
+            Valor=round(rng.uniform(10, 900), 2) * (1 if cat == "Receita" else -1),
+            IgnorarDashboard=1 if i % 13 == 0 else 0,
+        ))
+    session.commit()
+    rebuild_journal_rollup(session)
+    yield session
+    session.close()
+
+
+def _snapshot(db):
+    """Linhas do rollup como multiconjunto comparável (somas arredondadas)"""
+    R = JournalMonthlyRollup
+    rows = db.query(
+        R.user_id, R.MesFatura, R.Ano, R.Mes, R.CategoriaGeral, R.GRUPO, R.SUBGRUPO,
+        R.NomeCartao, R.TipoTransacao, R.soma_valor, R.soma_valor_abs, R.quantidade,
+    ).all()
+    return sorted((tuple(r[:9]) + (round(r[9], 6), round(r[10], 6), r[11]) for r in rows), key=repr)
+
+
+def _snapshot_recalculado(db):
+    """Rollup esperado: agregação direta de journal_entries"""
+    esperado = {}
+    for je in db.query(JournalEntry).filter(JournalEntry.IgnorarDashboard == 0):
+        chave = (je.user_id, je.MesFatura, je.Ano, je.Mes, je.CategoriaGeral, je.GRUPO, je.SUBGRUPO,
+                 je.NomeCartao, je.TipoTransacao)
+        soma, soma_abs, n = esperado.get(chave, (0.0, 0.0, 0))
+        esperado[chave] = (soma + (je.Valor or 0), soma_abs + abs(je.Valor or 0), n + 1)
+    return sorted((k + (round(s, 6), round(a, 6), n) for k, (s, a, n) in esperado.items()), key=repr)
+
+
+def _soma_journal(db, *filtros):
+    return db.query(func.sum(JournalEntry.Valor)).filter(
+        JournalEntry.user_id == USER_ID, JournalEntry.IgnorarDashboard == 0, *filtros
+    ).scalar() or 0.0
+
+
+def test_rebuild_igual_agregacao_direta(db):
+    assert _snapshot(db) == _snapshot_recalculado(db)
+    assert db.query(JournalMonthlyRollup).count() < db.query(JournalEntry).count()
+
+
+@pytest.mark.parametrize("month,ytd_month", [(3, None), (None, None), (None, 6)])
+def test_metrics_do_rollup_iguais_ao_journal(db, month, ytd_month):
+    metrics = DashboardRepository(db).get_metrics(USER_ID, ANO, month, ytd_month)
+
+    if month is not None:
+        periodo = [JournalEntry.MesFatura == f"{ANO}{month:02d}"]
+    elif ytd_month is not None:
+        periodo = [JournalEntry.Ano == ANO, JournalEntry.Mes <= ytd_month]
+    else:
+        periodo = [JournalEntry.Ano == ANO]
+
+    assert metrics["total_despesas"] == pytest.approx(abs(_soma_journal(db, *periodo, JournalEntry.CategoriaGeral == "Despesa")))
+    assert metrics["total_receitas"] == pytest.approx(_soma_journal(db, *periodo, JournalEntry.CategoriaGeral == "Receita"))
+    cartoes = db.query(func.sum(func.abs(JournalEntry.Valor))).filter(
+        JournalEntry.user_id == USER_ID, JournalEntry.IgnorarDashboard == 0, *periodo,
+        JournalEntry.TipoTransacao == "Cartão de Crédito",
+    ).scalar()
+    assert metrics["total_cartoes"] == pytest.approx(cartoes)
+    assert metrics["num_transacoes"] == db.query(JournalEntry).filter(
+        JournalEntry.user_id == USER_ID, JournalEntry.IgnorarDashboard == 0, *periodo
+    ).count()
+
+
+def test_chart_categorias_e_cartoes_do_rollup(db):
+    repo = DashboardRepository(db)
+
+    chart = repo.get_chart_data(USER_ID, ANO, 12)
+    for ponto in chart:
+        mes = [JournalEntry.MesFatura == f"{ponto['year']}{ponto['month']:02d}"]
+        assert ponto["receitas"] == pytest.approx(_soma_journal(db, *mes, JournalEntry.CategoriaGeral == "Receita"))
+        assert ponto["despesas"] == pytest.approx(abs(_soma_journal(db, *mes, JournalEntry.CategoriaGeral == "Despesa")))
+
+    categorias = {c["categoria"]: c["total"] for c in repo.get_category_expenses(USER_ID, ANO, 5)}
+    for grupo in ("Casa", "Mercado"):
+        esperado = abs(_soma_journal(db, JournalEntry.MesFatura == f"{ANO}05", JournalEntry.GRUPO == grupo,
+                                     JournalEntry.CategoriaGeral == "Despesa"))
+        assert categorias.get(grupo, 0.0) == pytest.approx(esperado)
+
+    cartoes = {c["cartao"]: c for c in repo.get_credit_card_expenses(USER_ID, ANO)}
+    assert set(cartoes) <= {"Visa", "Master"}
+    for nome, c in cartoes.items():
+        filtros = [JournalEntry.Ano == ANO, JournalEntry.NomeCartao == nome, JournalEntry.CategoriaGeral == "Despesa"]
+        assert c["total"] == pytest.approx(abs(_soma_journal(db, *filtros)))
+        assert c["num_transacoes"] == db.query(JournalEntry).filter(
+            JournalEntry.user_id == USER_ID, JournalEntry.IgnorarDashboard == 0, *filtros
+        ).count()
+
+
+def test_budget_realizado_por_grupo_do_rollup(db):
+    meses = [f"{ANO}{m:02d}" for m in range(1, 7)]
+    realizado = RealizadoPorGrupo.carregar(db, USER_ID, meses_fatura=meses).por_grupo("Despesa")
+    for grupo in ("Casa", "Mercado"):
+        esperado = _soma_journal(db, JournalEntry.MesFatura.in_(meses), JournalEntry.GRUPO == grupo,
+                                 JournalEntry.CategoriaGeral == "Despesa")
+        assert realizado[grupo] == pytest.approx(esperado)
+    assert "Salário" not in realizado
+
+
+def test_caminhos_de_escrita_mantem_rollup(db):
+    service = TransactionService(db)
+
+    criada = service.create_transaction(TransactionCreate(
+        user_id=USER_ID, IdTransacao="nova", Data="10/03/2025", Estabelecimento="PADARIA",
+        Valor=-42.5, TipoTransacao="Cartão de Crédito", GRUPO="Mercado", NomeCartao="Visa",
+    ))
+    assert _snapshot(db) == _snapshot_recalculado(db)
+
+    # Ignorar no dashboard (toggle) e reclassificar
+    alvo = db.query(JournalEntry).filter_by(user_id=USER_ID, IgnorarDashboard=0).first()
+    service.update_transaction(alvo.IdTransacao, USER_ID, TransactionUpdate(IgnorarDashboard=1))
+    assert _snapshot(db) == _snapshot_recalculado(db)
+    service.update_transaction(alvo.IdTransacao, USER_ID, TransactionUpdate(IgnorarDashboard=0, Valor=-1.0))
+    assert _snapshot(db) == _snapshot_recalculado(db)
+
+    service.delete_transaction(criada.IdTransacao, USER_ID)
+    assert _snapshot(db) == _snapshot_recalculado(db)
+
+    # Migração de grupo (Casa/A → Aplicações/A): muda CategoriaGeral em vários meses
+    service.execute_migration(USER_ID, "Casa", "A", "Aplicações", "A")
+    assert _snapshot(db) == _snapshot_recalculado(db)
+
+
+def test_refresh_por_mes_nao_toca_outros_meses(db):
+    R = JournalMonthlyRollup
+    marco = db.query(R).filter(R.user_id == USER_ID, R.MesFatura == f"{ANO}03").first()
+    marco.soma_valor = 123456.0
+    db.commit()
+
+    refresh_journal_rollup(db, USER_ID, [f"{ANO}04"])
+    db.commit()
+    assert db.query(R).filter(R.soma_valor == 123456.0).count() == 1
+
+    refresh_journal_rollup(db, USER_ID, [f"{ANO}03"])
+    db.commit()
+    assert db.query(R).filter(R.soma_valor == 123456.0).count() == 0
+    assert _snapshot(db) == _snapshot_recalculado(db)
+
+
+def test_rebuild_limpa_usuario_sem_transacoes(db):
+    db.query(JournalEntry).filter(JournalEntry.user_id == 2).delete()
+    db.commit()
+    assert db.query(JournalMonthlyRollup).filter_by(user_id=2).count() > 0
+
+    assert rebuild_journal_rollup(db) == 1
+    assert db.query(JournalMonthlyRollup).filter_by(user_id=2).count() == 0
+    assert _snapshot(db) == _snapshot_recalculado(db)
+
+
+def test_carga_da_migracao_igual_refresh(db):
+    esperado = _snapshot(db)
+    engine = db.get_bind()
+    db.close()
+    JournalMonthlyRollup.__table__.drop(engine)
+
+    _rodar_migracao(engine, MIGRACAO)
+
+    assert _snapshot(sessionmaker(bind=engine)()) == esperado
+
+
+def _rodar_migracao(engine, caminho):
+    spec = importlib.util.spec_from_file_location(caminho.stem, caminho)
+    migracao = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(migracao)
+    with engine.begin() as conn:
+        with Operations.context(MigrationContext.configure(conn)):
+            migracao.upgrade()
+
+
+def _chaves_duplicadas(db):
+    R = JournalMonthlyRollup
+    dimensoes = [getattr(R, d) for d in rollup.DIMENSOES]
+    return db.query(*dimensoes).group_by(*dimensoes).having(func.count() > 1).all()
+
+
+def test_dois_refreshes_no_mesmo_mes_sem_chaves_duplicadas(db):
+    mes = f"{ANO}05"
+    refresh_journal_rollup(db, USER_ID, [mes])
+    refresh_journal_rollup(db, USER_ID, [mes])   # mesma transação (lock reentrante)
+    db.commit()
+    db.add(JournalEntry(user_id=USER_ID, IdTransacao="novo", MesFatura=mes, Ano=ANO, Mes=5,
+                        CategoriaGeral="Despesa", GRUPO="Casa", SUBGRUPO="A", NomeCartao="Visa",
+                        TipoTransacao="Despesas", Valor=-10.0, IgnorarDashboard=0))
+    refresh_journal_rollup(db, USER_ID, [mes])
+    db.commit()
+
+    assert _chaves_duplicadas(db) == []
+    assert _snapshot(db) == _snapshot_recalculado(db)
+
+    # Chave repetida é rejeitada pelo banco em vez de dobrar os totais
+    R = JournalMonthlyRollup
+    linha = db.query(R).filter(R.user_id == USER_ID, R.MesFatura == mes, R.GRUPO == "Casa",
+                               R.SUBGRUPO == "A", R.NomeCartao == "Visa", R.TipoTransacao == "Despesas").one()
+    db.add(R(**{d: getattr(linha, d) for d in rollup.DIMENSOES}, soma_valor=1.0, soma_valor_abs=1.0, quantidade=1))
+    with pytest.raises(IntegrityError):
+        db.commit()
+    db.rollback()
+
+
+def test_refresh_toma_advisory_lock_por_usuario(db, monkeypatch):
+    travados = []
+    monkeypatch.setattr(rollup, "_travar_rollup_do_usuario", lambda sessao, uid: travados.append(uid))
+    refresh_journal_rollup(db, USER_ID, [f"{ANO}05"])
+    assert travados == [USER_ID]
+
+    executados = []
+    postgres = SimpleNamespace(
+        get_bind=lambda: SimpleNamespace(dialect=SimpleNamespace(name="postgresql")),
+        execute=lambda sql, params: executados.append((str(sql), params)),
+    )
+    monkeypatch.undo()
+    rollup._travar_rollup_do_usuario(postgres, USER_ID)
+    assert executados == [("SELECT pg_advisory_xact_lock(:namespace, :user_id)",
+                           {"namespace": rollup.LOCK_NAMESPACE_ROLLUP, "user_id": USER_ID})]
+
+
+def test_migracao_unica_remove_duplicatas_e_cria_indice(db):
+    esperado = _snapshot(db)
+    engine = db.get_bind()
+    R = JournalMonthlyRollup
+    linha = db.query(R).filter(R.user_id == USER_ID).first()
+    db.close()
+    with engine.begin() as conn:
+        conn.exec_driver_sql("DROP INDEX uq_jmr_dimensoes")
+        conn.execute(R.__table__.insert().values(
+            **{d: getattr(linha, d) for d in rollup.DIMENSOES}, soma_valor=9.0, soma_valor_abs=9.0, quantidade=1,
+        ))
+
+    _rodar_migracao(engine, MIGRACAO_UNICA)
+
+    sessao = sessionmaker(bind=engine)()
+    assert _snapshot(sessao) == esperado
+    indices = {i["name"]: i for i in inspect(engine).get_indexes("journal_monthly_rollup")}
+    assert indices["uq_jmr_dimensoes"]["unique"]
@@ -0,0 +1,237 @@
+"""
+Testes do motor OCR por página (processors/raw/pdf/ocr_engine.py) e da fatura Mercado Pago PDF.
+
+Cobre:
+  1. Fan-out por página: merge na ordem das páginas, mesmo com páginas terminando fora de ordem
+  2. Transações idênticas ao fluxo antigo (OCR 3x sequencial na thread do request)
+  3. Caminho rápido (cinza + zoom menor): aceito com confiança alta, fallback 3x com baixa
+  4. Métricas por página
+  5. Pool de processos real (modelo pré-carregado no initializer) = OCR inline
+  6. Dono único do pool OCR: o parser não vai ao pool de upload e não há pool aninhado;
+     aquecimento com um _ping por worker OCR
+"""
+import os
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from datetime import datetime
+
+os.environ.setdefault("DATABASE_URL", "postgresql://x:x@localhost/x")
+os.environ.setdefault("JWT_SECRET_KEY", "a" * 64)
+
+import pytest  # noqa: E402
+
+fitz = pytest.importorskip("fitz")
+
+from app.core import executors  # noqa: E402
+from app.core.config import settings  # noqa: E402
+from app.domains.upload import service as upload_service  # noqa: E402
+from app.domains.upload.processors.raw.pdf import mercadopago_fatura_pdf as mp  # noqa: E402
+from app.domains.upload.processors.raw.pdf import ocr_engine  # noqa: E402
+
+# (x, y, texto) por página de transações; página 3 é de parcelamento (ignorada)
+PAGINAS = {
+    1: [(40, 60, "Movimentações na fatura"),
+        (40, 90, "25/06"), (120, 90, "Pagamento da fatura de julho/2025"), (450, 90, "R$ 500,00"),
+        (40, 130, "Cartão Visa [***5966]"),
+        (40, 160, "02/07"), (120, 160, "PADARIA CENTRAL"), (450, 160, "R$ 12,50"),
+        (40, 190, "15/06"), (120, 190, "POSTO BR"), (450, 190, "R$ 200,00")],
+    2: [(40, 60, "Cartão Visa [***1234]"),
+        (40, 90, "03/07"), (120, 90, "MERCADO LIVRE"), (450, 90, "R$ 99,90"),
+        (40, 120, "04/07"), (120, 120, "NETFLIX"), (450, 120, "R$ 55,90")],
+    3: [(40, 60, "Parcele a fatura em até 12x")],
+    4: [(40, 60, "Cartão Visa [***1234]"),
+        (40, 90, "05/07"), (120, 90, "UBER TRIP"), (450, 90, "R$ 31,70")],
+}
+
+
+@pytest.fixture
+def pdf(tmp_path):
+    caminho = tmp_path / "FaturaMercadoPago202507.pdf"
+    doc = fitz.open()
+    capa = doc.new_page()
+    capa.insert_text((40, 60), "Emitido em: 30/07/2025")
+    capa.insert_text((40, 90), "Total a pagar")
+    capa.insert_text((40, 120), "R$ 400,00")
+    for numero in sorted(PAGINAS):
+        page = doc.new_page()
+        for x, y, texto in PAGINAS[numero]:
+            page.insert_text((x, y), texto)
+    doc.save(str(caminho))
+    doc.close()
+    return caminho
+
+
+class LeitorFalso:
+    """
+    Substitui o RapidOCR: reconhece o PNG exato de cada render (página × zoom × cor)
+    e devolve os textos da página com bbox na escala do render.
+    """
+
+    def __init__(self, caminho, confianca_cinza=0.95, atraso_por_pagina=None):
+        self.renders = {}
+        self.chamadas = []
+        self.atraso_por_pagina = atraso_por_pagina or {}
+        doc = fitz.open(str(caminho))
+        for numero, textos in PAGINAS.items():
+            for zoom, cinza, conf in [(3.0, False, 0.95), (2.0, True, confianca_cinza)]:
+                mat = fitz.Matrix(zoom, zoom)
+                pix = doc[numero].get_pixmap(matrix=mat, colorspace=fitz.csGRAY) if cinza else doc[numero].get_pixmap(matrix=mat)
+                itens = [
+                    [[[x * zoom, (y - 10) * zoom], [(x + 8 * len(t)) * zoom, (y - 10) * zoom],
+                      [(x + 8 * len(t)) * zoom, y * zoom], [x * zoom, y * zoom]], t, conf]
+                    for x, y, t in reversed(textos)  # ordem "de OCR" ≠ ordem visual
+                ]
+                self.renders[pix.tobytes("png")] = (numero, zoom, itens)
+        doc.close()
+
+    def __call__(self, img_bytes):
+        numero, zoom, itens = self.renders[img_bytes]
+        self.chamadas.append((numero, zoom))
+        time.sleep(self.atraso_por_pagina.get(numero, 0))
+        return itens, 0.0
+
+
+def _fluxo_antigo(caminho, reader):
+    """OCR 3x página a página na thread atual — o loop de antes do ocr_engine."""
+    doc = fitz.open(str(caminho))
+    mes_fatura = mp._extract_mes_fatura(caminho.name)
+    ano, mes = mp._extract_ano_mes_from_cover(doc, caminho.name)
+    transacoes, pagamento = [], None
+    for page_num in range(1, doc.page_count):
+        page = doc[page_num]
+        if mp._is_installment_page(page.get_text("text")):
+            continue
+        rows = ocr_engine._ocr_page_to_rows(reader, page)
+        txs, valor, data = mp._parse_rows(rows, caminho.name, "Mercado Pago", mes_fatura, ano, mes, datetime.now())
+        transacoes.extend(txs)
+        if valor is not None and pagamento is None:
+            pagamento = (valor, data)
+    doc.close()
+    return transacoes, pagamento
+
+
+def _chave(transacoes):
+    return [(t.data, t.lancamento, t.valor, t.final_cartao, t.mes_fatura) for t in transacoes]
+
+
+@pytest.fixture
+def sem_pool(monkeypatch):
+    monkeypatch.setattr(settings, "OCR_PROCESS_WORKERS", 0)
+    monkeypatch.setattr(settings, "OCR_FAST_PATH", False)
+
+
+def test_transacoes_identicas_ao_fluxo_sequencial(pdf, monkeypatch, sem_pool):
+    leitor = LeitorFalso(pdf)
+    monkeypatch.setattr(ocr_engine, "_ocr_reader", leitor)
+
+    antigas, pagamento = _fluxo_antigo(pdf, leitor)
+    assert pagamento == (500.0, "2025-06-25")
+    assert [t.lancamento for t in antigas] == ["PADARIA CENTRAL", "POSTO BR", "MERCADO LIVRE", "NETFLIX", "UBER TRIP"]
+
+    # Inline (OCR_PROCESS_WORKERS=0) e com fan-out num pool (threads no lugar de processos)
+    transacoes, balance = mp.process_mercadopago_fatura_pdf(pdf, pdf.name)
+    with ThreadPoolExecutor(max_workers=4) as pool:
+        monkeypatch.setattr(ocr_engine, "get_ocr_pool", lambda: pool)
+        transacoes_pool, _ = mp.process_mercadopago_fatura_pdf(pdf, pdf.name)
+
+    assert _chave(transacoes) == _chave(antigas) + [("2025-06-25", "Saldo anterior fatura Mercado Pago", -100.0, "", "202507")]
+    assert _chave(transacoes_pool) == _chave(transacoes)
+    assert balance.saldo_final == 400.0
+    assert 3 not in {numero for numero, _ in leitor.chamadas}  # parcelamento não passa pelo OCR
+
+
+def test_fan_out_preserva_ordem_das_paginas(pdf, monkeypatch, sem_pool):
+    # Página 1 é a mais lenta: termina por último no pool, mas vem primeiro no resultado
+    leitor = LeitorFalso(pdf, atraso_por_pagina={1: 0.5, 2: 0.3})
+    monkeypatch.setattr(ocr_engine, "_ocr_reader", leitor)
+    with ThreadPoolExecutor(max_workers=3) as pool:
+        monkeypatch.setattr(ocr_engine, "get_ocr_pool", lambda: pool)
+        inicio = time.perf_counter()
+        resultados = ocr_engine.ocr_paginas(pdf, [1, 2, 4])
+        decorrido = time.perf_counter() - inicio
+
+    assert [m.pagina for _, m in resultados] == [2, 3, 5]
+    assert decorrido < 0.8  # páginas em paralelo (sequencial seria ≥ 0.8s)
+    sequencial = [ocr_engine._ocr_pagina(str(pdf), n, ocr_engine.OpcoesOCR()) for n in (1, 2, 4)]
+    assert [rows for rows, _ in resultados] == [rows for rows, _ in sequencial]
+    for rows, metrica in resultados:
+        assert metrica.zoom == 3.0 and not metrica.fallback
+        assert metrica.itens == sum(len(r) for r in rows)
+        assert metrica.render_ms >= 0 and metrica.ocr_ms >= 0 and metrica.confianca_media == pytest.approx(0.95)
+
+
+@pytest.mark.parametrize("confianca_cinza, fallback", [(0.95, False), (0.5, True)])
+def test_caminho_rapido_com_fallback_3x(pdf, monkeypatch, sem_pool, confianca_cinza, fallback):
+    leitor = LeitorFalso(pdf, confianca_cinza=confianca_cinza)
+    monkeypatch.setattr(ocr_engine, "_ocr_reader", leitor)
+    opcoes = ocr_engine.OpcoesOCR(fast_path=True, zoom_rapido=2.0, confianca_minima=0.9)
+
+    rapido = ocr_engine.ocr_paginas(pdf, [1, 2, 4], opcoes)
+    padrao = ocr_engine.ocr_paginas(pdf, [1, 2, 4], ocr_engine.OpcoesOCR())
+
+    assert all(m.fallback is fallback for _, m in rapido)
+    assert all(m.zoom == (3.0 if fallback else 2.0) for _, m in rapido)
+    # bbox reescalada para 3x: mesmas linhas, mesmos textos, mesma ordem
+    textos = lambda res: [[[t for _, t, _ in row] for row in rows] for rows, _ in res]  # noqa: E731
+    assert textos(rapido) == textos(padrao)
+    if fallback:
+        assert [rows for rows, _ in rapido] == [rows for rows, _ in padrao]
+        assert leitor.chamadas[:2] == [(1, 2.0), (1, 3.0)]
+
+
+def test_pool_de_processos_real_igual_ao_inline(pdf, monkeypatch):
+    pytest.importorskip("rapidocr_onnxruntime")
+    monkeypatch.setattr(settings, "OCR_FAST_PATH", False)
+    monkeypatch.setattr(settings, "OCR_PROCESS_WORKERS", 1)
+    try:
+        ocr_engine.aquecer_pool_ocr()
+        assert ocr_engine.get_ocr_pool() is not None
+        no_pool = ocr_engine.ocr_paginas(pdf, [2])
+    finally:
+        ocr_engine.encerrar_pool_ocr()
+    monkeypatch.setattr(settings, "OCR_PROCESS_WORKERS", 0)
+    inline = ocr_engine.ocr_paginas(pdf, [2])
+
+    assert [rows for rows, _ in no_pool] == [rows for rows, _ in inline]
+    assert no_pool[0][1].itens > 0
+
+
+def test_sem_pool_ocr_aninhado_em_worker_de_upload(monkeypatch):
+    monkeypatch.setattr(settings, "OCR_PROCESS_WORKERS", 2)
+    monkeypatch.setattr(executors, "_em_worker_de_upload", True)
+    assert ocr_engine.get_ocr_pool() is None
+    assert ocr_engine._ocr_pool is None
+
+
+@pytest.mark.parametrize("banco, formato, no_pool_de_upload", [
+    ("Mercado Pago", "pdf", False),
+    ("Itaú", "csv", True),
+])
+def test_fatura_ocr_roda_no_processo_da_api(monkeypatch, tmp_path, banco, formato, no_pool_de_upload):
+    monkeypatch.setattr(settings, "UPLOAD_PARSE_CACHE_ENABLED", False)
+    chamadas = []
+    monkeypatch.setattr(upload_service, "process_file", lambda *a: chamadas.append(("inline", a[0])) or [])
+    monkeypatch.setattr(upload_service, "run_in_process", lambda func, *a: chamadas.append(("pool", a[0])) or [])
+    arquivo = tmp_path / f"fatura-202507.{formato}"
+    arquivo.write_bytes(b"x")
+
+    upload_service.UploadService(db=None)._fase1_raw_processing(str(arquivo), banco, "fatura", arquivo.name)
+    assert chamadas == [("pool" if no_pool_de_upload else "inline", banco)]
+
+
+def test_aquecimento_um_ping_por_worker_ocr(monkeypatch):
+    class PoolFalso:
+        def __init__(self):
+            self.submetidos = []
+
+        def submit(self, func):
+            self.submetidos.append(func)
+            futuro = Future()
+            futuro.set_result(func())
+            return futuro
+
+    pool = PoolFalso()
+    monkeypatch.setattr(settings, "OCR_PROCESS_WORKERS", 3)
+    monkeypatch.setattr(ocr_engine, "get_ocr_pool", lambda: pool)
+    ocr_engine.aquecer_pool_ocr()
+    assert pool.submetidos == [ocr_engine._ping] * 3
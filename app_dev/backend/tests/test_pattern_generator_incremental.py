@@ -0,0 +1,263 @@
+"""
+Testes do modo incremental de base_padroes (pattern_generator).
+
+Cobre:
+  1. Buckets restritos às chaves tocadas geram os MESMOS padrões que a regeneração completa
+  2. Mapa de categorias pré-carregado equivale à busca padrão a padrão
+  3. Upsert em lote: um único INSERT ... ON CONFLICT, último vence para hash repetido
+  4. atualizar_base_padroes_incremental lê só as linhas das chaves tocadas (ChavePadrao
+     persistida), sem varrer o journal do usuário
+  5. ChavePadrao gravada pelo marker (upload) e recalculada no update da transação
+  6. Edição manual (PATCH) recalcula os buckets da chave antiga e da nova
+"""
+import os
+import random
+from types import SimpleNamespace
+
+os.environ.setdefault("DATABASE_URL", "postgresql://x:x@localhost/x")
+os.environ.setdefault("JWT_SECRET_KEY", "a" * 64)
+
+from datetime import datetime  # noqa: E402
+
+import pytest  # noqa: E402
+from sqlalchemy import create_engine, event  # noqa: E402
+from sqlalchemy.dialects import postgresql  # noqa: E402
+from sqlalchemy.orm import sessionmaker  # noqa: E402
+
+from app.core.database import Base  # noqa: E402
+from app.domains.grupos.models import BaseGruposConfig  # noqa: E402, F401
+from app.domains.patterns.models import BasePadroes  # noqa: E402, F401
+from app.domains.transactions.models import JournalEntry  # noqa: E402
+from app.domains.transactions.schemas import TransactionUpdate  # noqa: E402
+from app.domains.transactions.service import TransactionService  # noqa: E402
+from app.domains.upload.history_models import UploadHistory  # noqa: E402, F401
+from app.domains.upload.processors import pattern_generator  # noqa: E402
+from app.domains.upload.processors.marker import TransactionMarker  # noqa: E402
+from app.domains.upload.processors.pattern_generator import (  # noqa: E402
+    agrupar_por_padrao,
+    atualizar_base_padroes_incremental,
+    chave_padrao,
+    gerar_padroes_dos_buckets,
+    upsert_base_padroes,
+)
+from app.domains.upload.processors.raw.base import RawTransaction  # noqa: E402
+from app.domains.users.models import User  # noqa: E402, F401
+
+CATEGORIAS = {"Alimentação": "Despesa", "Casa": "Despesa", "Salário": "Receita"}
+
+
+def _transacoes(n=600, seed=7):
+    rng = random.Random(seed)
+    estabs = ["IFOOD *REST", "CONTA VIVO", "PADARIA SAO JOSE", "NETFLIX.COM",
+              "AMAZON MKTPLACE 02/10", "LOJA X 03/06", "UBER TRIP", "SALARIO EMPRESA"]
+    classes = [("Alimentação", "Delivery", "Ajustável"), ("Casa", "Telefone", "Fixo"),
+               ("Salário", "Mensal", "Receita")]
+    out = []
+    for i in range(n):
+        grupo, sub, tipo = rng.choice(classes[:1] * 8 + classes)
+        out.append(SimpleNamespace(
+            Estabelecimento=rng.choice(estabs),
+            Valor=-round(rng.choice([rng.uniform(5, 60), rng.uniform(100, 3000)]), 2),
+            tipodocumento=rng.choice(["fatura", "extrato"]),
+            GRUPO=grupo, SUBGRUPO=sub, TipoGasto=tipo,
+            Data=f"{rng.randint(1, 28):02d}/{rng.randint(1, 12):02d}/2025",
+        ))
+    return out
+
+
+def _comparavel(padroes):
+    # exemplos vem de set() e data_criacao de now() — não determinísticos também no completo
+    return sorted(
+        ({k: v for k, v in p.items() if k not in ("exemplos", "data_criacao")} for p in padroes),
+        key=lambda p: p["padrao_num"],
+    )
+
+
+def test_incremental_identico_a_regeneracao_completa():
+    transacoes = _transacoes()
+    completo = gerar_padroes_dos_buckets(None, 1, agrupar_por_padrao(transacoes), CATEGORIAS)
+
+    tocadas = transacoes[-20:]  # "upload" recém-confirmado
+    chaves = {chave_padrao(t.Estabelecimento, t.Valor, t.tipodocumento) for t in tocadas}
+    incremental = gerar_padroes_dos_buckets(
+        None, 1, agrupar_por_padrao(transacoes, chaves=chaves), CATEGORIAS
+    )
+
+    def _base(p):
+        return p["padrao_estabelecimento"].split(" [")[0]
+
+    esperado = [p for p in completo if _base(p) in chaves]
+    assert incremental
+    assert _comparavel(incremental) == _comparavel(esperado)
+
+
+def test_categorias_pre_carregadas_equivalem_a_busca_por_padrao():
+    class FakeResult:
+        def __init__(self, row):
+            self.row = row
+
+        def fetchone(self):
+            return self.row
+
+    class FakeDb:
+        def execute(self, _sql, params):
+            cat = CATEGORIAS.get(params["grupo"])
+            return FakeResult((cat,) if cat else None)
+
+    buckets = agrupar_por_padrao(_transacoes(200, seed=3))
+    por_query = gerar_padroes_dos_buckets(FakeDb(), 1, buckets)
+    por_mapa = gerar_padroes_dos_buckets(None, 1, buckets, CATEGORIAS)
+    assert _comparavel(por_query) == _comparavel(por_mapa)
+
+
+def test_upsert_em_lote_um_unico_statement():
+    executados = []
+
+    class FakeDb:
+        def execute(self, stmt):
+            executados.append(stmt)
+
+    padroes = gerar_padroes_dos_buckets(None, 1, agrupar_por_padrao(_transacoes(200)), CATEGORIAS)
+    repetido = dict(padroes[0], contagem=999)
+
+    assert upsert_base_padroes(FakeDb(), 1, padroes + [repetido]) == len(padroes)
+    assert len(executados) == 1
+
+    sql = str(executados[0].compile(dialect=postgresql.dialect()))
+    assert "ON CONFLICT ON CONSTRAINT base_padroes_user_id_padrao_num_key DO UPDATE" in sql
+    assert "padrao_estabelecimento = excluded" not in sql
+
+
+def test_upsert_sem_padroes_nao_executa():
+    class FakeDb:
+        def execute(self, stmt):
+            raise AssertionError("não deveria executar")
+
+    assert upsert_base_padroes(FakeDb(), 1, []) == 0
+
+
+@pytest.fixture
+def db():
+    engine = create_engine("sqlite://")
+    Base.metadata.create_all(engine)
+    session = sessionmaker(bind=engine)()
+    yield session
+    session.close()
+
+
+def _gravar_journal(db, transacoes, upload_history_id=None, inicio=0):
+    for i, t in enumerate(transacoes, start=inicio):
+        db.add(JournalEntry(
+            user_id=1, IdTransacao=f"T{i}", Estabelecimento=t.Estabelecimento, Valor=t.Valor,
+            tipodocumento=t.tipodocumento, GRUPO=t.GRUPO, SUBGRUPO=t.SUBGRUPO, TipoGasto=t.TipoGasto,
+            Data=t.Data, ChavePadrao=chave_padrao(t.Estabelecimento, t.Valor, t.tipodocumento),
+            upload_history_id=upload_history_id,
+        ))
+    db.commit()
+
+
+def test_incremental_busca_so_as_linhas_das_chaves_tocadas(db, monkeypatch):
+    transacoes = _transacoes(400, seed=11)
+    antigas, upload = transacoes[:-10], transacoes[-10:]
+    _gravar_journal(db, antigas)
+    _gravar_journal(db, upload, upload_history_id=7, inicio=len(antigas))
+    chaves = {chave_padrao(t.Estabelecimento, t.Valor, t.tipodocumento) for t in upload}
+
+    gravados, linhas_lidas, sqls = [], [], []
+    agrupar_original = pattern_generator.agrupar_por_padrao
+
+    def agrupar_contando(linhas, chaves=None):
+        linhas = list(linhas)
+        linhas_lidas.append(len(linhas))
+        return agrupar_original(linhas, chaves=chaves)
+
+    monkeypatch.setattr(pattern_generator, "agrupar_por_padrao", agrupar_contando)
+    monkeypatch.setattr(pattern_generator, "carregar_categorias_por_grupo", lambda db, user_id: CATEGORIAS)
+    monkeypatch.setattr(pattern_generator, "upsert_base_padroes",
+                        lambda db, user_id, padroes: gravados.extend(padroes) or len(padroes))
+    event.listen(db.get_bind(), "before_cursor_execute",
+                 lambda conn, cursor, stmt, *a: sqls.append(stmt))
+
+    resultado = atualizar_base_padroes_incremental(db, 1, upload_history_ids=[7])
+
+    # Só as linhas dos buckets tocados saem do banco — nunca o journal inteiro
+    no_bucket = [t for t in transacoes if chave_padrao(t.Estabelecimento, t.Valor, t.tipodocumento) in chaves]
+    assert linhas_lidas == [len(no_bucket)] and len(no_bucket) < len(transacoes)
+    selects_journal = [s for s in sqls if "FROM journal_entries" in s]
+    assert len(selects_journal) == 2
+    assert all('"ChavePadrao"' in s for s in selects_journal)
+
+    # Mesmo resultado da regeneração completa para as chaves tocadas
+    completo = gerar_padroes_dos_buckets(None, 1, agrupar_original(transacoes), CATEGORIAS)
+    esperado = [p for p in completo if p["padrao_estabelecimento"].split(" [")[0] in chaves]
+    assert resultado["chaves_tocadas"] == len(chaves)
+    assert resultado["gravados"] == len(gravados) == len(esperado)
+    assert _comparavel(gravados) == _comparavel(esperado)
+
+
+def test_incremental_sem_upload_nao_consulta_o_journal(db, monkeypatch):
+    monkeypatch.setattr(pattern_generator, "upsert_base_padroes",
+                        lambda *a: pytest.fail("não deveria gravar"))
+    assert atualizar_base_padroes_incremental(db, 1, upload_history_ids=[])["chaves_tocadas"] == 0
+
+
+def test_chave_padrao_gravada_no_marker_e_no_update(db, monkeypatch):
+    raw = RawTransaction(
+        banco="Itaú", tipo_documento="fatura", nome_arquivo="f.csv", data_criacao=datetime(2025, 4, 1),
+        data="10/01/2025", lancamento="LOJA X 03/06", valor=-50.0, nome_cartao="Black",
+        final_cartao="4321", mes_fatura="202501",
+    )
+    marcada = TransactionMarker(user_id=1).mark_transaction(raw)
+    assert marcada.chave_padrao == chave_padrao("LOJA X 03/06", -50.0, "fatura") == "LOJAX|30000|06"
+
+    db.add(JournalEntry(user_id=1, IdTransacao="X1", Estabelecimento="LOJA X 03/06", Valor=-50.0,
+                        tipodocumento="fatura", ChavePadrao=marcada.chave_padrao, MesFatura="202501",
+                        Data="10/01/2025", TipoTransacao="Cartão de Crédito"))
+    db.commit()
+    monkeypatch.setattr("app.domains.transactions.service.bump_data_version", lambda user_id: None)
+    TransactionService(db).update_transaction("X1", 1, TransactionUpdate(Valor=-60.0))
+
+    assert db.query(JournalEntry.ChavePadrao).filter_by(IdTransacao="X1").scalar() == "LOJAX|36000|06"
+
+
+def test_update_transaction_recalcula_bucket_antigo_e_novo(db, monkeypatch):
+    for i, (estab, valor, grupo) in enumerate([
+        ("PADARIA SAO JOSE", -10.0, "Alimentação"),
+        ("PADARIA SAO JOSE", -10.0, "Alimentação"),
+        ("PADARIA SAO JOSE", -10.0, "Alimentação"),
+        ("CONTA VIVO", -50.0, "Casa"),
+        ("CONTA VIVO", -50.0, "Casa"),
+    ]):
+        db.add(JournalEntry(user_id=1, IdTransacao=f"E{i}", Estabelecimento=estab, Valor=valor,
+                            tipodocumento="extrato", GRUPO=grupo, SUBGRUPO="Geral", MesFatura="202501",
+                            Data="10/01/2025", TipoTransacao="Despesas",
+                            ChavePadrao=chave_padrao(estab, valor, "extrato")))
+    db.commit()
+    antiga, nova = chave_padrao("PADARIA SAO JOSE", -10.0, "extrato"), chave_padrao("CONTA VIVO", -50.0, "extrato")
+
+    gravados = []
+    monkeypatch.setattr("app.domains.transactions.service.bump_data_version", lambda user_id: None)
+    monkeypatch.setattr(pattern_generator, "carregar_categorias_por_grupo", lambda db, user_id: CATEGORIAS)
+    monkeypatch.setattr(pattern_generator, "upsert_base_padroes",
+                        lambda db, user_id, padroes: gravados.extend(padroes) or len(padroes))
+
+    TransactionService(db).update_transaction(
+        "E0", 1, TransactionUpdate(GRUPO="Casa", Estabelecimento="CONTA VIVO", Valor=-50.0)
+    )
+
+    por_chave = {p["padrao_estabelecimento"].split(" [")[0]: p for p in gravados}
+    assert set(por_chave) == {antiga, nova}
+    assert (por_chave[antiga]["contagem"], por_chave[antiga]["grupo_sugerido"]) == (2, "Alimentação")
+    assert (por_chave[nova]["contagem"], por_chave[nova]["grupo_sugerido"]) == (3, "Casa")
+
+
+def test_update_sem_campo_do_padrao_nao_recalcula(db, monkeypatch):
+    db.add(JournalEntry(user_id=1, IdTransacao="E0", Estabelecimento="CONTA VIVO", Valor=-50.0,
+                        tipodocumento="extrato", MesFatura="202501", Data="10/01/2025",
+                        TipoTransacao="Despesas", ChavePadrao=chave_padrao("CONTA VIVO", -50.0, "extrato")))
+    db.commit()
+    monkeypatch.setattr("app.domains.transactions.service.bump_data_version", lambda user_id: None)
+    monkeypatch.setattr(pattern_generator, "atualizar_base_padroes_incremental",
+                        lambda *a, **k: pytest.fail("não deveria recalcular"))
+
+    TransactionService(db).update_transaction("E0", 1, TransactionUpdate(IgnorarDashboard=1))
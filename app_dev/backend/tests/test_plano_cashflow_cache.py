@@ -0,0 +1,131 @@
+"""
+Testes da tabela materializada plano_cashflow_mes (ano inteiro por cache miss).
+
+Cobre:
+  1. Miss em um mês computa o ano UMA vez e grava os 12 meses num único INSERT ... ON CONFLICT
+  2. get_cashflow_cached serve o ano da tabela quando os 12 meses estão frescos
+  3. Mês invalidado/ausente força recomputar o ano
+"""
+import os
+from datetime import datetime, timezone
+
+os.environ.setdefault("DATABASE_URL", "postgresql://x:x@localhost/x")
+os.environ.setdefault("JWT_SECRET_KEY", "a" * 64)
+
+from sqlalchemy.dialects import postgresql  # noqa: E402
+
+from app.domains.plano import service as plano_service  # noqa: E402
+from app.domains.plano.models import PlanoCashflowMes  # noqa: E402
+
+ANO = 2025
+USER_ID = 1
+
+
+def _cashflow_fake(ano):
+    meses = [{
+        "mes_referencia": f"{ano}-{m:02d}",
+        "renda_esperada": 10000.0, "renda_realizada": None, "renda_usada": 10000,
+        "gastos_recorrentes": 8000.0, "extras_creditos": 0.0, "extras_debitos": 0.0,
+        "gastos_extras_esperados": 0.0, "gastos_realizados": None, "gastos_usados": 8000.0,
+        "total_gastos": 8000 if m != 3 else 12000, "aporte_planejado": 1500.0,
+        "investimentos_realizados": None, "aporte_usado": 2000 if m != 3 else -2000,
+        "use_realizado": False, "saldo_projetado": 2000 if m != 3 else -2000,
+        "status_mes": "futuro", "grupos": [], "expectativas": [],
+    } for m in range(1, 13)]
+    return {"ano": ano, "nudge_acumulado": -2000, "meses": meses}
+
+
+class FakeQuery:
+    def __init__(self, rows):
+        self.rows = rows
+
+    def filter(self, *_a):
+        return self
+
+    def filter_by(self, **kw):
+        return FakeQuery([r for r in self.rows if r.mes == kw["mes"]])
+
+    def order_by(self, *_a):
+        return self
+
+    def first(self):
+        return self.rows[0] if self.rows else None
+
+    def all(self):
+        return self.rows
+
+
+class FakeDb:
+    def __init__(self, rows=()):
+        self.rows = list(rows)
+        self.executados = []
+        self.commits = 0
+
+    def query(self, _model):
+        return FakeQuery(self.rows)
+
+    def execute(self, stmt):
+        self.executados.append(stmt)
+
+    def commit(self):
+        self.commits += 1
+
+
+def _rows_frescas(invalidar_mes=None):
+    return [PlanoCashflowMes(
+        user_id=USER_ID, ano=ANO, mes=m, mes_referencia=f"{ANO}-{m:02d}",
+        aporte_usado=-500.0 if m == 2 else 100.0, status_mes="ok",
+        computed_at=datetime.now(timezone.utc), invalidated=(m == invalidar_mes),
+    ) for m in range(1, 13)]
+
+
+def _patch_get_cashflow(monkeypatch):
+    chamadas = []
+
+    def fake(self, user_id, ano, modo_plano_sempre=False):
+        chamadas.append((user_id, ano))
+        return _cashflow_fake(ano)
+
+    monkeypatch.setattr(plano_service.PlanoService, "get_cashflow", fake)
+    return chamadas
+
+
+def test_miss_de_um_mes_materializa_o_ano_num_unico_upsert(monkeypatch):
+    chamadas = _patch_get_cashflow(monkeypatch)
+    db = FakeDb()
+
+    mes = plano_service.get_cashflow_mes_cached(db, USER_ID, ANO, 3)
+
+    assert chamadas == [(USER_ID, ANO)]
+    assert mes["mes_referencia"] == f"{ANO}-03"
+    assert mes["aporte_usado"] == -2000
+    assert len(db.executados) == 1 and db.commits == 1
+
+    stmt = db.executados[0]
+    sql = str(stmt.compile(dialect=postgresql.dialect()))
+    assert "ON CONFLICT ON CONSTRAINT uq_plano_cashflow_mes DO UPDATE" in sql
+    params = stmt.compile(dialect=postgresql.dialect()).params
+    assert sorted(v for k, v in params.items() if k.startswith("mes_m")) == list(range(1, 13))
+
+
+def test_cashflow_anual_servido_da_tabela_quando_fresco(monkeypatch):
+    chamadas = _patch_get_cashflow(monkeypatch)
+    db = FakeDb(_rows_frescas())
+
+    resultado = plano_service.get_cashflow_cached(db, USER_ID, ANO)
+
+    assert chamadas == []
+    assert db.executados == []
+    assert [m["mes_referencia"] for m in resultado["meses"]] == [f"{ANO}-{m:02d}" for m in range(1, 13)]
+    assert resultado["nudge_acumulado"] == -500.0
+
+
+def test_mes_invalidado_recomputa_o_ano(monkeypatch):
+    chamadas = _patch_get_cashflow(monkeypatch)
+    db = FakeDb(_rows_frescas(invalidar_mes=7))
+
+    resultado = plano_service.get_cashflow_cached(db, USER_ID, ANO)
+
+    assert chamadas == [(USER_ID, ANO)]
+    assert len(db.executados) == 1
+    assert resultado["nudge_acumulado"] == -2000
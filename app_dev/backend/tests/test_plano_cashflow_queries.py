@@ -0,0 +1,95 @@
+"""
+Testes do PlanoService.get_cashflow agregado (SQLite em memória).
+
+Cobre:
+  1. Valores realizados/planejados idênticos às somas por mês (4 queries/mês da versão antiga)
+  2. Número de queries constante por chamada (antes: 48+ por ano)
+"""
+import os
+import random
+
+os.environ.setdefault("DATABASE_URL", "postgresql://x:x@localhost/x")
+os.environ.setdefault("JWT_SECRET_KEY", "a" * 64)
+
+import pytest  # noqa: E402
+from sqlalchemy import func  # noqa: E402
+
+from app.domains.budget.models import BudgetPlanning  # noqa: E402
+from app.domains.grupos.models import BaseGruposConfig  # noqa: E402
+from app.domains.plano.models import UserFinancialProfile  # noqa: E402
+from app.domains.plano.service import PlanoService  # noqa: E402
+from app.domains.transactions.models import JournalEntry  # noqa: E402
+from app.domains.transactions.rollup import rebuild_journal_rollup  # noqa: E402
+
+ANO = 2025
+USER_ID = 1
+
+
+@pytest.fixture
+def db(sqlite_db):
+    db = sqlite_db
+    rng = random.Random(11)
+    db.add(UserFinancialProfile(user_id=USER_ID, renda_mensal_liquida=10000, aporte_planejado=1500))
+    for nome, cat in [("Casa", "Despesa"), ("Salário", "Receita"), ("Aplicações", "Investimentos")]:
+        db.add(BaseGruposConfig(user_id=USER_ID, nome_grupo=nome, tipo_gasto_padrao="Fixo", categoria_geral=cat))
+    for m in range(1, 13):
+        mes_ref = f"{ANO}-{m:02d}"
+        db.add(BudgetPlanning(user_id=USER_ID, grupo="Casa", mes_referencia=mes_ref,
+                              valor_planejado=rng.uniform(2000, 4000), ativo=m != 5))
+        db.add(BudgetPlanning(user_id=USER_ID, grupo="Salário", mes_referencia=mes_ref, valor_planejado=9000))
+    for i in range(400):
+        m = rng.randint(1, 12)
+        cat = rng.choice(["Receita", "Despesa", "Despesa", "Investimentos", "Transferência"])
+        valor = rng.uniform(10, 3000) * (1 if cat == "Receita" else -1)
+        db.add(JournalEntry(
+            user_id=USER_ID, IdTransacao=f"t{i}", MesFatura=f"{ANO}{m:02d}" if m != 7 else f"{ANO - 1}12",
+            CategoriaGeral=cat, Valor=valor, IgnorarDashboard=1 if i % 17 == 0 else 0,
+        ))
+    # Outro usuário não pode vazar para o cashflow
+    db.add(JournalEntry(user_id=2, IdTransacao="x", MesFatura=f"{ANO}03", CategoriaGeral="Receita",
+                        Valor=99999, IgnorarDashboard=0))
+    db.commit()
+    rebuild_journal_rollup(db)  # seed direto no journal: rollup mensal reconstruído
+    return db
+
+
+def _soma_mes(db, mes_fatura, categoria):
+    return db.query(func.sum(JournalEntry.Valor)).filter(
+        JournalEntry.user_id == USER_ID,
+        JournalEntry.MesFatura == mes_fatura,
+        JournalEntry.CategoriaGeral == categoria,
+        JournalEntry.IgnorarDashboard == 0,
+    ).scalar()
+
+
+def test_cashflow_identico_as_somas_por_mes(db):
+    resultado = PlanoService(db).get_cashflow(USER_ID, ANO)
+
+    for m, mes in enumerate(resultado["meses"], start=1):
+        mes_fatura = f"{ANO}{m:02d}"
+        receita = _soma_mes(db, mes_fatura, "Receita")
+        invest = _soma_mes(db, mes_fatura, "Investimentos")
+        despesa = _soma_mes(db, mes_fatura, "Despesa")
+        planejado = db.query(func.sum(BudgetPlanning.valor_planejado)).join(
+            BaseGruposConfig,
+            (BudgetPlanning.user_id == BaseGruposConfig.user_id)
+            & (BudgetPlanning.grupo == BaseGruposConfig.nome_grupo),
+        ).filter(
+            BudgetPlanning.user_id == USER_ID,
+            BudgetPlanning.mes_referencia == mes["mes_referencia"],
+            BudgetPlanning.ativo == True,  # noqa: E712
+            BaseGruposConfig.categoria_geral == "Despesa",
+        ).scalar()
+
+        assert mes["renda_realizada"] == (round(max(0.0, receita), 2) if receita else None)
+        assert mes["investimentos_realizados"] == (round(abs(invest), 2) if invest else None)
+        # gastos_realizados não é arredondado: SUM em float depende da ordem de varredura
+        assert mes["gastos_realizados"] == (pytest.approx(abs(despesa), rel=1e-12) if despesa else None)
+        assert mes["gastos_recorrentes"] == round(float(planejado or 0), 2)
+
+
+def test_cashflow_numero_de_queries_constante(db, query_counter):
+    query_counter.clear()
+    PlanoService(db).get_cashflow(USER_ID, ANO)
+    # perfil + 2 expectativas + realizados + planejados (antes: 3 + 4 × 12)
+    assert len(query_counter) <= 5
@@ -0,0 +1,146 @@
+"""
+Testes da busca de transações (colunas geradas + pg_trgm).
+
+Cobre:
+  1. Colunas de busca geradas pelo banco (SQLite: lower; PostgreSQL: lower + sem acento)
+  2. search/estabelecimento em list/count/cursor usam as colunas geradas; curingas escapados
+  3. Relevância: quem contém o termo vem antes, em ordem cronológica
+  4. PostgreSQL: operador %> (similaridade) + limiar via set_config; expressão = migração
+"""
+import importlib.util
+import os
+import re
+from pathlib import Path
+from unittest import mock
+
+os.environ.setdefault("DATABASE_URL", "postgresql://x:x@localhost/x")
+os.environ.setdefault("JWT_SECRET_KEY", "a" * 64)
+
+import pytest  # noqa: E402
+from sqlalchemy import create_engine  # noqa: E402
+from sqlalchemy.dialects import postgresql  # noqa: E402
+from sqlalchemy.orm import Query, sessionmaker  # noqa: E402
+from sqlalchemy.schema import CreateTable  # noqa: E402
+
+from app.core.database import Base  # noqa: E402
+from app.domains.transactions.models import JournalEntry, dobrar_acentos_texto  # noqa: E402
+from app.domains.transactions.repository import TransactionRepository  # noqa: E402
+from app.domains.transactions.schemas import TransactionFilters  # noqa: E402
+from app.domains.upload.history_models import UploadHistory  # noqa: E402, F401
+from app.domains.users.models import User  # noqa: E402, F401
+
+USER_ID = 1
+MIGRACAO = Path(__file__).parent.parent / "migrations" / "versions" / "o0p1q2r3s4t5_add_journal_search_trgm.py"
+
+
+@pytest.fixture
+def db():
+    engine = create_engine("sqlite://")
+    Base.metadata.create_all(engine)
+    session = sessionmaker(bind=engine)()
+    linhas = [
+        ("IFOOD *RESTAURANTE", "Alimentação", "Delivery", "10/03/2025", "202503"),
+        ("UBER TRIP", "Transporte", "Aplicativo", "15/03/2025", "202503"),
+        ("POSTO 100% SHELL", "Transporte", "Combustível", "02/02/2025", "202502"),
+        ("IFOOD *MERCADO", "Alimentação", "Mercado", "20/04/2025", "202504"),
+        ("NETFLIX", "Assinaturas", "Streaming", "05/04/2025", "202504"),
+    ]
+    for i, (estab, grupo, sub, data, mes) in enumerate(linhas):
+        session.add(JournalEntry(
+            user_id=USER_ID, IdTransacao=f"t{i}", Estabelecimento=estab, GRUPO=grupo,
+            SUBGRUPO=sub, Data=data, MesFatura=mes, Valor=-10.0 * (i + 1),
+        ))
+    session.add(JournalEntry(user_id=2, IdTransacao="x", Estabelecimento="IFOOD *OUTRO", MesFatura="202504"))
+    session.commit()
+    yield session
+    session.close()
+
+
+def _estabs(rows):
+    return [r.Estabelecimento for r in rows]
+
+
+def test_colunas_geradas_pelo_banco(db):
+    je = db.query(JournalEntry).filter_by(IdTransacao="t1").one()
+    assert je.estabelecimento_busca == "uber trip"
+    assert je.busca_texto == "uber trip transporte aplicativo 15/03/2025"
+
+
+def test_search_em_list_count_e_cursor(db):
+    repo = TransactionRepository(db)
+
+    filtros = TransactionFilters(search="ifood")
+    assert _estabs(repo.list_with_filters(USER_ID, filtros)) == ["IFOOD *MERCADO", "IFOOD *RESTAURANTE"]
+    assert repo.count_with_filters(USER_ID, filtros) == 2
+    assert _estabs(repo.list_with_filters_cursor(USER_ID, filtros)) == [
+        "IFOOD *MERCADO", "IFOOD *RESTAURANTE"
+    ]
+
+    # GRUPO, SUBGRUPO e Data continuam pesquisáveis
+    assert repo.count_with_filters(USER_ID, TransactionFilters(search="transporte")) == 2
+    assert repo.count_with_filters(USER_ID, TransactionFilters(search="streaming")) == 1
+    assert _estabs(repo.list_with_filters(USER_ID, TransactionFilters(search="15/03"))) == ["UBER TRIP"]
+
+    # estabelecimento busca só no nome
+    assert repo.count_with_filters(USER_ID, TransactionFilters(estabelecimento="transporte")) == 0
+    assert repo.count_with_filters(USER_ID, TransactionFilters(estabelecimento="Uber")) == 1
+
+
+def test_curingas_do_usuario_sao_literais(db):
+    repo = TransactionRepository(db)
+    assert _estabs(repo.list_with_filters(USER_ID, TransactionFilters(search="100%"))) == ["POSTO 100% SHELL"]
+    assert repo.count_with_filters(USER_ID, TransactionFilters(search="%")) == 1
+    assert repo.count_with_filters(USER_ID, TransactionFilters(search="_")) == 0
+
+
+def test_dobra_de_acentos_python():
+    assert dobrar_acentos_texto("AÇAÍ Pão") == "acai pao"
+    assert dobrar_acentos_texto("Combustível") == "combustivel"
+
+
+def _repo_pg():
+    repo = TransactionRepository(mock.MagicMock())
+    repo._is_postgres = lambda: True
+    return repo
+
+
+def _sql(query):
+    return str(query.statement.compile(dialect=postgresql.dialect(), compile_kwargs={"literal_binds": True}))
+
+
+def test_postgres_usa_similaridade_e_limiar():
+    repo = _repo_pg()
+    query = repo._aplicar_busca(Query(JournalEntry.id), TransactionFilters(search="Açaí"))
+    sql = _sql(query.order_by(repo._relevancia_busca("Açaí").desc()))
+
+    assert "journal_entries.busca_texto LIKE '%%acai%%'" in sql
+    assert "journal_entries.busca_texto %%> 'acai'" in sql
+    assert "word_similarity('acai', journal_entries.busca_texto)" in sql
+    stmt = repo.db.execute.call_args[0][0]
+    assert "pg_trgm.word_similarity_threshold" in str(stmt.compile(compile_kwargs={"literal_binds": True}))
+
+
+def test_postgres_termo_curto_ou_numerico_so_substring():
+    repo = _repo_pg()
+    sql = _sql(repo._aplicar_busca(Query(JournalEntry.id), TransactionFilters(search="15/03")))
+    assert "%%>" not in sql
+    sql = _sql(repo._aplicar_busca(Query(JournalEntry.id), TransactionFilters(search="if")))
+    assert "%%>" not in sql
+    repo.db.execute.assert_not_called()
+
+
+def test_expressao_do_modelo_igual_a_migracao():
+    spec = importlib.util.spec_from_file_location("migracao_busca", MIGRACAO)
+    migracao = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(migracao)
+
+    ddl = str(CreateTable(JournalEntry.__table__).compile(dialect=postgresql.dialect()))
+    normalizar = lambda sql: re.sub(r"\s+", " ", sql).strip()  # noqa: E731
+
+    esperado_estab = migracao._dobrar("""coalesce("Estabelecimento", '')""")
+    assert f"estabelecimento_busca TEXT GENERATED ALWAYS AS ({esperado_estab}) STORED" in normalizar(ddl)
+    esperado_busca = migracao._dobrar(
+        """coalesce("Estabelecimento", '') || ' ' || coalesce("GRUPO", '') || ' ' """
+        """|| coalesce("SUBGRUPO", '') || ' ' || coalesce("Data", '')"""
+    )
+    assert f"busca_texto TEXT GENERATED ALWAYS AS ({normalizar(esperado_busca)}) STORED" in normalizar(ddl)
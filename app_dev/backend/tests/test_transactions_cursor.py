@@ -0,0 +1,130 @@
+"""
+Testes da paginação por cursor (keyset em (MesFatura, id)) de /transactions/list.
+
+Cobre:
+  1. Percorrer todas as páginas não pula nem repete linhas (ids fora de ordem entre meses, MesFatura nulo)
+  2. Cursor opaco: ida e volta, cursor antigo (id inteiro) e cursor inválido -> 400 TRX_001
+  3. Sem COUNT(*): total_aproximado só quando pedido (None fora do PostgreSQL)
+  4. Condição de linha + ordenação usam a expressão do índice (modelo = migração)
+"""
+import importlib.util
+import os
+import re
+from pathlib import Path
+
+os.environ.setdefault("DATABASE_URL", "postgresql://x:x@localhost/x")
+os.environ.setdefault("JWT_SECRET_KEY", "a" * 64)
+
+import pytest  # noqa: E402
+from fastapi import HTTPException  # noqa: E402
+from sqlalchemy.dialects import postgresql  # noqa: E402
+from sqlalchemy.schema import CreateIndex  # noqa: E402
+
+from app.domains.transactions.models import JournalEntry  # noqa: E402
+from app.domains.transactions.repository import TransactionRepository  # noqa: E402
+from app.domains.transactions.schemas import TransactionFilters  # noqa: E402
+from app.domains.transactions.service import TransactionService  # noqa: E402
+
+USER_ID = 1
+MIGRACAO = Path(__file__).parent.parent / "migrations" / "versions" / "p1q2r3s4t5u6_add_journal_cursor_index.py"
+
+
+@pytest.fixture
+def db(sqlite_db):
+    session = sqlite_db
+    # Ids crescentes com meses "fora de ordem" (upload de fatura antiga depois de uma recente):
+    # paginar só por id < cursor pularia/repetiria linhas
+    meses = ["202504", "202504", "202502", "202503", "202504", None, "202502", "202503", "202501", "202503"]
+    for i, mes in enumerate(meses):
+        session.add(JournalEntry(user_id=USER_ID, IdTransacao=f"t{i}", Estabelecimento=f"LOJA {i}",
+                                 Data="01/01/2025", MesFatura=mes, Valor=-1.0, TipoTransacao="Despesas"))
+    session.add(JournalEntry(user_id=2, IdTransacao="x", Estabelecimento="OUTRO", MesFatura="202504"))
+    session.commit()
+    return session
+
+
+def _todas_as_paginas(service, limit, filtros=None):
+    vistos, cursor, paginas = [], "", 0
+    while True:
+        resp = service.list_transactions_cursor(USER_ID, filtros, cursor, limit)
+        vistos += [t.IdTransacao for t in resp.transactions]
+        paginas += 1
+        if not resp.has_more:
+            assert resp.next_cursor is None
+            return vistos, paginas
+        cursor = resp.next_cursor
+
+
+def test_paginas_sem_pular_nem_repetir(db):
+    esperado = [
+        t.IdTransacao for t in sorted(
+            db.query(JournalEntry).filter_by(user_id=USER_ID),
+            key=lambda t: (t.MesFatura or "", t.id), reverse=True,
+        )
+    ]
+    assert esperado[-1] == "t5"  # MesFatura nulo fica no fim
+    service = TransactionService(db)
+    for limit in (1, 2, 3, 4, 10, 50):
+        vistos, paginas = _todas_as_paginas(service, limit)
+        assert vistos == esperado
+        assert paginas == max(1, -(-len(esperado) // limit))
+
+
+def test_paginas_com_filtro(db):
+    vistos, _ = _todas_as_paginas(TransactionService(db), 2, TransactionFilters(year=2025, month=3))
+    assert vistos == ["t9", "t7", "t3"]
+
+
+def test_cursor_opaco_e_cursor_antigo(db):
+    service = TransactionService(db)
+    primeira = service.list_transactions_cursor(USER_ID, None, "", 3)
+    assert [t.IdTransacao for t in primeira.transactions] == ["t4", "t1", "t0"]
+    assert not primeira.next_cursor.isdigit()
+    assert service._decode_cursor(USER_ID, primeira.next_cursor) == ("202504", primeira.transactions[-1].id)
+
+    # Cursor antigo (id puro) continua funcionando: posição = (MesFatura, id) da transação
+    t0 = db.query(JournalEntry).filter_by(IdTransacao="t0").one()
+    antigo = service.list_transactions_cursor(USER_ID, None, str(t0.id), 3)
+    novo = service.list_transactions_cursor(USER_ID, None, primeira.next_cursor, 3)
+    assert [t.IdTransacao for t in antigo.transactions] == [t.IdTransacao for t in novo.transactions]
+
+
+@pytest.mark.parametrize("cursor", ["nao-e-base64!", "W10", "WyIyMDI1MDQiLCJ4Il0", "999999"])
+def test_cursor_invalido(db, cursor):
+    with pytest.raises(HTTPException) as exc:
+        TransactionService(db).list_transactions_cursor(USER_ID, None, cursor, 3)
+    assert exc.value.status_code == 400
+    assert exc.value.detail["errorCode"] == "TRX_001"
+
+
+def test_cursor_nao_roda_count(db, query_counter):
+    query_counter.clear()
+    service = TransactionService(db)
+    resp = service.list_transactions_cursor(USER_ID, None, "", 3, incluir_total=True)
+    segunda = service.list_transactions_cursor(USER_ID, None, resp.next_cursor, 3, incluir_total=True)
+
+    assert not any("count(" in s.lower() for s in query_counter)
+    assert len(query_counter) == 2  # uma query por página
+    assert resp.total == -1 and resp.total_aproximado is None  # estimativa só existe no PostgreSQL
+    assert segunda.total_aproximado is None
+
+
+def test_condicao_de_linha_usa_expressao_do_indice(db, query_counter):
+    TransactionRepository(db).list_with_filters_cursor(USER_ID, TransactionFilters(), ("202504", 10), 5)
+
+    sql = re.sub(r"\s+", " ", query_counter[-1])
+    chave = "coalesce(journal_entries.\"MesFatura\", '')"
+    assert f"({chave}, journal_entries.id) < (?, ?)" in sql
+    assert f"ORDER BY {chave} DESC, journal_entries.id DESC" in sql
+
+
+def test_indice_do_modelo_igual_a_migracao():
+    indice = next(i for i in JournalEntry.__table__.indexes if i.name == "idx_je_user_mesfatura_id_desc")
+    ddl = str(CreateIndex(indice).compile(dialect=postgresql.dialect()))
+    assert "(user_id, coalesce(\"MesFatura\", '') DESC, id DESC)" in ddl
+
+    spec = importlib.util.spec_from_file_location("migracao_cursor", MIGRACAO)
+    migracao = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(migracao)
+    assert migracao.down_revision == "o0p1q2r3s4t5"
+    assert "(user_id, coalesce(\\\"MesFatura\\\", '') DESC, id DESC)" in MIGRACAO.read_text()
@@ -0,0 +1,141 @@
+"""
+Testes da propagação de padrão com EstabelecimentoNorm (coluna persistida + índice).
+
+Cobre:
+  1. Marker preenche estabelecimento_norm (mesma normalização usada na busca do padrão)
+  2. get_propagate_info: 1 COUNT indexado (sem carregar o journal), mesmo resultado de antes
+  3. _propagate_to_padrao: 1 UPDATE em massa, respeita faixa de valor e outros usuários
+  4. Backfill da migração em lotes com a função Python
+  5. create_transaction: parcelado manual cai no mesmo padrão (EstabelecimentoBase or Estabelecimento)
+"""
+import importlib.util
+import os
+from pathlib import Path
+
+os.environ.setdefault("DATABASE_URL", "postgresql://x:x@localhost/x")
+os.environ.setdefault("JWT_SECRET_KEY", "a" * 64)
+
+import pytest  # noqa: E402
+from alembic.operations import Operations  # noqa: E402
+from alembic.runtime.migration import MigrationContext  # noqa: E402
+from sqlalchemy import text  # noqa: E402
+
+from app.domains.grupos.models import BaseGruposConfig  # noqa: E402
+from app.domains.patterns.models import BasePadroes  # noqa: E402
+from app.domains.transactions.models import JournalEntry  # noqa: E402
+from app.domains.transactions.schemas import TransactionCreate  # noqa: E402
+from app.domains.transactions.service import TransactionService  # noqa: E402
+from app.domains.upload.processors.marker import TransactionMarker  # noqa: E402
+from app.domains.upload.processors.raw.base import RawTransaction  # noqa: E402
+from app.shared.utils import normalizar_estabelecimento  # noqa: E402
+
+USER_ID = 1
+MIGRACAO = Path(__file__).parent.parent / "migrations" / "versions" / "q2r3s4t5u6v7_add_estabelecimento_norm.py"
+
+
+def _je(id_transacao, estab, valor, user_id=USER_ID, base=None):
+    return JournalEntry(
+        user_id=user_id, IdTransacao=id_transacao, Estabelecimento=estab, EstabelecimentoBase=base,
+        EstabelecimentoNorm=normalizar_estabelecimento(base or estab), Valor=valor, ValorPositivo=abs(valor),
+        GRUPO="Outros", SUBGRUPO="Outros", MesFatura="202503", Data="10/03/2025", TipoTransacao="Despesas",
+    )
+
+
+@pytest.fixture
+def db(sqlite_db):
+    session = sqlite_db
+    session.add_all([
+        _je("alvo", "Padaria São José 01/03", -60.0, base="Padaria São José"),
+        _je("igual", "PADARIA SAO JOSE", -55.0),
+        _je("asterisco", "PADARIA* SÃO JOSÉ", -70.0),
+        _je("fora-da-faixa", "PADARIA SAO JOSE", -500.0),
+        _je("outro-estab", "PADARIA CENTRAL", -60.0),
+        _je("outro-usuario", "PADARIA SAO JOSE", -60.0, user_id=2),
+        BasePadroes(user_id=USER_ID, padrao_estabelecimento="PADARIA SAO JOSE [50-100]", padrao_num="p1",
+                    contagem=3, valor_medio=60.0, valor_min=50.0, valor_max=100.0,
+                    percentual_consistencia=100, confianca="alta"),
+        BaseGruposConfig(user_id=USER_ID, nome_grupo="Alimentação", tipo_gasto_padrao="Ajustável",
+                         categoria_geral="Despesa"),
+    ])
+    session.commit()
+    return session
+
+
+def _normalizadas(statements):
+    return [" ".join(stmt.split()) for stmt in statements]
+
+
+def test_marker_preenche_estabelecimento_norm():
+    raw = RawTransaction(
+        banco="Itaú", tipo_documento="fatura", nome_arquivo="f.csv", data_criacao=None,
+        data="10/03/2025", lancamento="PADARIA* SÃO JOSÉ 02/10", valor=-60.0, mes_fatura="2025-03",
+    )
+    marked = TransactionMarker(user_id=USER_ID).mark_transaction(raw)
+    assert marked.estabelecimento_norm == "PADARIA SAO JOSE"
+    assert marked.estabelecimento_norm == normalizar_estabelecimento(marked.estabelecimento_base)
+
+
+def test_propagate_info_um_count(db, query_counter):
+    query_counter.clear()
+    info = TransactionService(db).get_propagate_info("alvo", USER_ID)
+    statements = _normalizadas(query_counter)
+
+    assert info == {"same_parcela_count": 0, "has_padrao": True, "same_padrao_count": 2}
+    journal = [s for s in statements if "FROM journal_entries" in s]
+    assert len(journal) == 2  # get_by_id + COUNT
+    assert "count(journal_entries.id)" in journal[-1]
+    assert '"EstabelecimentoNorm" = ?' in journal[-1]
+
+
+def test_propagate_to_padrao_um_update(db, query_counter):
+    service = TransactionService(db)
+    alvo = db.query(JournalEntry).filter_by(IdTransacao="alvo").one()
+    query_counter.clear()
+    service._propagate_to_padrao(USER_ID, alvo, "Alimentação", "Padaria")
+    statements = _normalizadas(query_counter)
+
+    assert not any(s.startswith("SELECT journal_entries.id, ") for s in statements)
+    assert sum(s.startswith("UPDATE journal_entries") for s in statements) == 1
+
+    grupos = {t.IdTransacao: (t.GRUPO, t.SUBGRUPO, t.TipoGasto, t.origem_classificacao)
+              for t in db.query(JournalEntry)}
+    for afetada in ("alvo", "igual", "asterisco"):
+        assert grupos[afetada] == ("Alimentação", "Padaria", "Ajustável", "Manual")
+    for intocada in ("fora-da-faixa", "outro-estab", "outro-usuario"):
+        assert grupos[intocada][0] == "Outros"
+    padrao = db.query(BasePadroes).one()
+    assert (padrao.grupo_sugerido, padrao.subgrupo_sugerido) == ("Alimentação", "Padaria")
+
+
+def test_backfill_da_migracao_em_lotes(db):
+    db.execute(text('UPDATE journal_entries SET "EstabelecimentoNorm" = NULL'))
+    db.commit()
+
+    spec = importlib.util.spec_from_file_location("migracao_norm", MIGRACAO)
+    migracao = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(migracao)
+    migracao.LOTE = 2
+
+    with db.get_bind().begin() as conn:
+        with Operations.context(MigrationContext.configure(conn)):
+            migracao._backfill("journal_entries", "Estabelecimento")
+
+    db.expire_all()
+    for t in db.query(JournalEntry):
+        assert t.EstabelecimentoNorm == normalizar_estabelecimento(t.EstabelecimentoBase or t.Estabelecimento)
+    assert db.query(JournalEntry).filter_by(EstabelecimentoNorm="PADARIA SAO JOSE").count() == 5
+
+
+def test_create_transaction_parcelada_entra_no_mesmo_padrao(db, monkeypatch):
+    monkeypatch.setattr("app.domains.transactions.service.bump_data_version", lambda user_id: None)
+    service = TransactionService(db)
+    service.create_transaction(TransactionCreate(
+        user_id=USER_ID, IdTransacao="manual", Data="12/03/2025", Estabelecimento="PADARIA* SÃO JOSÉ (2/5)",
+        Valor=-65.0, TipoTransacao="Despesas",
+    ))
+
+    criada = db.query(JournalEntry).filter_by(IdTransacao="manual").one()
+    assert criada.EstabelecimentoBase == "PADARIA* SÃO JOSÉ"
+    assert criada.EstabelecimentoNorm == normalizar_estabelecimento(criada.EstabelecimentoBase)
+    assert criada.EstabelecimentoNorm == db.query(JournalEntry).filter_by(IdTransacao="alvo").one().EstabelecimentoNorm
+    assert service.get_propagate_info("alvo", USER_ID)["same_padrao_count"] == 3
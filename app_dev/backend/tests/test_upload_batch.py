@@ -0,0 +1,190 @@
+"""
+Testes do upload em lote consolidado (UploadService.process_batch, SQLite em memória).
+
+Cobre:
+  1. Parsing dos arquivos em paralelo; transações na ordem dos arquivos, não na de término
+  2. Marcação com UM TransactionMarker: sequência de duplicatas entre arquivos determinística
+  3. UMA validação de compatibilidade por formato, UM CascadeClassifier, UMA query de dedup,
+     UMA escrita do preview e UM registro de histórico
+  4. Erro em um arquivo não derruba o lote; tempos por arquivo; temporários removidos
+"""
+import io
+import os
+import time
+from datetime import datetime
+from types import SimpleNamespace
+
+os.environ.setdefault("DATABASE_URL", "postgresql://x:x@localhost/x")
+os.environ.setdefault("JWT_SECRET_KEY", "a" * 64)
+
+import pytest  # noqa: E402
+from fastapi import UploadFile  # noqa: E402
+from sqlalchemy import create_engine  # noqa: E402
+from sqlalchemy.orm import sessionmaker  # noqa: E402
+
+from app.core.config import settings  # noqa: E402
+from app.core.database import Base  # noqa: E402
+from app.domains.classification.models import GenericClassificationRules  # noqa: E402, F401
+from app.domains.patterns.models import BasePadroes  # noqa: E402, F401
+from app.domains.transactions.models import JournalEntry  # noqa: E402
+from app.domains.upload import ingest, service as upload_service  # noqa: E402
+from app.domains.upload.history_models import UploadHistory  # noqa: E402
+from app.domains.upload.models import PreviewTransacao  # noqa: E402
+from app.domains.upload.processors.marker import TransactionMarker  # noqa: E402
+from app.domains.upload.processors.raw.base import RawTransaction  # noqa: E402
+from app.domains.upload.service import UploadService  # noqa: E402
+from app.domains.users.models import User  # noqa: E402, F401
+
+USER_ID = 1
+# nome do arquivo → (atraso do parsing em s, lançamentos); UBER TRIP repete entre arquivos
+ARQUIVOS = {
+    "fatura-202501.csv": (0.6, ["UBER TRIP", "PADARIA SAO JOSE", "NETFLIX.COM"]),
+    "fatura-202502.csv": (0.0, ["UBER TRIP", "POSTO IPIRANGA"]),
+    "fatura-202503.csv": (0.4, ["UBER TRIP", "FARMACIA PAGUE MENOS", "MERCADO LIVRE 02/10"]),
+}
+
+
+def _raws(nome_arquivo):
+    return [
+        RawTransaction(
+            banco="Itaú", tipo_documento="fatura", nome_arquivo=nome_arquivo,
+            data_criacao=datetime(2025, 4, 1), data="10/01/2025", lancamento=lanc,
+            valor=-10.0 - len(lanc), nome_cartao="Black", final_cartao="4321", mes_fatura=None,
+        )
+        for lanc in ARQUIVOS[nome_arquivo][1]
+    ]
+
+
+def _upload(nome):
+    return UploadFile(io.BytesIO(f"data;lancamento;valor\n{nome}\n".encode()), filename=nome)
+
+
+class Contador:
+    """Envolve uma classe/função contando as chamadas."""
+
+    def __init__(self, alvo):
+        self.alvo = alvo
+        self.chamadas = 0
+
+    def __call__(self, *args, **kwargs):
+        self.chamadas += 1
+        return self.alvo(*args, **kwargs)
+
+
+@pytest.fixture
+def db():
+    engine = create_engine("sqlite://")
+    Base.metadata.create_all(engine)
+    session = sessionmaker(bind=engine)()
+    # PADARIA já importada: duplicata na dedup do lote
+    padaria = _raws("fatura-202501.csv")[1]
+    padaria.mes_fatura = "202501"
+    ja_importada = TransactionMarker(user_id=USER_ID).mark_transaction(padaria)
+    session.add(JournalEntry(
+        user_id=USER_ID, IdTransacao=ja_importada.id_transacao, Data=ja_importada.data,
+        Estabelecimento="PADARIA SAO JOSE", EstabelecimentoBase="PADARIA SAO JOSE",
+        GRUPO="Alimentação", SUBGRUPO="Padaria", TipoGasto="Ajustável", CategoriaGeral="Despesa",
+        MesFatura="202501", Valor=padaria.valor,
+    ))
+    session.commit()
+    yield session
+    session.close()
+
+
+@pytest.fixture
+def lote(db, monkeypatch, tmp_path):
+    monkeypatch.setattr(ingest.tempfile, "tempdir", str(tmp_path))
+    monkeypatch.setattr(settings, "UPLOAD_BATCH_PARSE_WORKERS", 4)
+    monkeypatch.setattr(settings, "UPLOAD_INCREMENTAL_SAVE", False)
+    monkeypatch.setattr(settings, "UPLOAD_PARSE_CACHE_ENABLED", False)
+    upload_service.get_processor("Itaú", "fatura", "csv")  # import do processador fora da medição
+
+    def processador_falso(func, banco, tipo, formato, path, nome_arquivo, *args):
+        assert os.path.exists(path)
+        time.sleep(ARQUIVOS[nome_arquivo][0])
+        return _raws(nome_arquivo)
+
+    compatibilidade = Contador(lambda db: SimpleNamespace(
+        validate_format=lambda banco, formato: SimpleNamespace(is_supported=True, status="OK", message="")
+    ))
+    contadores = SimpleNamespace(
+        compatibilidade=compatibilidade,
+        classifier=Contador(upload_service.CascadeClassifier),
+        dedup=Contador(UploadService._journal_existentes),
+        escritas=Contador(upload_service.UploadRepository.bulk_insert_previews),
+        tmp_path=tmp_path,
+    )
+    monkeypatch.setattr(upload_service, "run_in_process", processador_falso)
+    monkeypatch.setattr(upload_service, "CompatibilityService", compatibilidade)
+    monkeypatch.setattr(upload_service, "CascadeClassifier", contadores.classifier)
+    monkeypatch.setattr(UploadService, "_journal_existentes", lambda self, *a: contadores.dedup(self, *a))
+    monkeypatch.setattr(upload_service.UploadRepository, "bulk_insert_previews",
+                        lambda self, rows: contadores.escritas(self, rows))
+    return contadores
+
+
+def _esperado():
+    """Marcação sequencial com um único marker, na ordem dos arquivos."""
+    marker = TransactionMarker(user_id=USER_ID)
+    ids = []
+    for nome in ARQUIVOS:
+        for raw in _raws(nome):
+            raw.mes_fatura = nome[7:13]
+            ids.append(marker.mark_transaction(raw).id_transacao)
+    return ids
+
+
+def test_lote_consolidado_em_uma_passada(db, lote):
+    inicio = time.perf_counter()
+    resposta = UploadService(db).process_batch(
+        [_upload(nome) for nome in ARQUIVOS], "Itaú", "fatura", USER_ID, session_id="lote",
+    )
+    decorrido = time.perf_counter() - inicio
+
+    assert resposta["success"] is True and resposta["erros"] == []
+    assert resposta["totalTransacoes"] == 8 and resposta["arquivosProcessados"] == 3
+    assert [a["totalRegistros"] for a in resposta["arquivos"]] == [3, 2, 3]
+    assert decorrido < 0.9  # parsing em paralelo (sequencial seria ≥ 1.0s)
+    assert resposta["arquivos"][0]["tempos"]["parsing_ms"] >= 600
+    assert all({"ingestao_ms", "parsing_ms"} <= set(a["tempos"]) for a in resposta["arquivos"])
+    assert resposta["tempos"]["total_ms"] >= resposta["tempos"]["pipeline_ms"] > 0
+
+    previews = db.query(PreviewTransacao).filter_by(session_id="lote").order_by(PreviewTransacao.id).all()
+    # Ordem dos arquivos, mesmo com o 1º terminando por último; UBER TRIP com sequência 1, 2, 3
+    assert [p.IdTransacao for p in previews] == _esperado()
+    assert len({p.IdTransacao for p in previews if p.lancamento == "UBER TRIP"}) == 3
+    assert [p.mes_fatura for p in previews] == ["202501"] * 3 + ["202502"] * 2 + ["202503"] * 3
+    assert [p.lancamento for p in previews if p.is_duplicate] == ["PADARIA SAO JOSE"]
+
+    assert lote.compatibilidade.chamadas == 1
+    assert lote.classifier.chamadas == 1
+    assert lote.dedup.chamadas == 1
+    assert lote.escritas.chamadas == 1
+    historicos = db.query(UploadHistory).filter_by(session_id="lote").all()
+    assert len(historicos) == 1 and historicos[0].total_registros == 8
+    assert historicos[0].classification_stats["duplicadas"] == 1
+    assert list(lote.tmp_path.iterdir()) == []
+
+
+def test_erro_em_um_arquivo_nao_derruba_o_lote(db, lote):
+    arquivos = [_upload("fatura-202501.csv"), _upload("programa.exe"), _upload("fatura-202502.csv")]
+    resposta = UploadService(db).process_batch(arquivos, "Itaú", "fatura", USER_ID, session_id="lote")
+
+    assert resposta["success"] is False
+    assert [a["success"] for a in resposta["arquivos"]] == [True, False, True]
+    assert resposta["erros"][0]["arquivo"] == "programa.exe" and "UPL_016" in resposta["erros"][0]["erro"]
+    assert resposta["totalTransacoes"] == 5
+    assert db.query(PreviewTransacao).filter_by(session_id="lote").count() == 5
+    assert list(lote.tmp_path.iterdir()) == []
+
+
+def test_lote_sem_arquivo_valido_preserva_preview_anterior(db, lote):
+    db.add(PreviewTransacao(session_id="anterior", user_id=USER_ID, banco="Itaú", tipo_documento="fatura",
+                            nome_arquivo="f.csv", data="01/01/2025", lancamento="X", valor=-1.0))
+    db.commit()
+
+    resposta = UploadService(db).process_batch([_upload("programa.exe")], "Itaú", "fatura", USER_ID)
+
+    assert resposta["arquivosProcessados"] == 0 and resposta["totalTransacoes"] == 0
+    assert db.query(PreviewTransacao).filter_by(session_id="anterior").count() == 1
+    assert lote.escritas.chamadas == 0
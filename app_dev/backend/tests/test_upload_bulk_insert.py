@@ -0,0 +1,115 @@
+"""
+Testes do caminho bulk do upload (SQLite em memória).
+
+Cobre:
+  1. _save_raw_to_preview grava todas as linhas num único executemany
+  2. move_preview_to_journal (INSERT ... SELECT) gera exatamente as mesmas colunas
+     que o loop ORM antigo do confirm_upload, ignorando duplicatas/excluídos
+  3. count_importable_by_mes alimenta contadores e invalidação de cashflow
+"""
+import os
+from datetime import datetime
+
+os.environ.setdefault("DATABASE_URL", "postgresql://x:x@localhost/x")
+os.environ.setdefault("JWT_SECRET_KEY", "a" * 64)
+
+from app.domains.transactions.models import JournalEntry  # noqa: E402
+from app.domains.upload.history_models import UploadHistory  # noqa: E402
+from app.domains.upload.models import PreviewTransacao  # noqa: E402
+from app.domains.upload.processors.raw.base import RawTransaction  # noqa: E402
+from app.domains.upload.repository import UploadRepository  # noqa: E402
+from app.domains.upload.service import UploadService  # noqa: E402
+
+USER_ID = 1
+SESSION = "sess-1"
+
+
+def _raw(i):
+    return RawTransaction(
+        banco="Itaú", tipo_documento="fatura", nome_arquivo="fatura.csv",
+        data_criacao=datetime(2025, 3, 1), data=f"{i % 28 + 1:02d}/03/2025",
+        lancamento=f"LOJA {i}", valor=-10.0 * (i + 1), nome_cartao="Black",
+        final_cartao="4321", mes_fatura="2025-03" if i % 3 else "2025-04",
+    )
+
+
+def _journal_legado(item, history_id, session_id, now):
+    """Mapeamento do loop ORM antigo do confirm_upload (referência)."""
+    return dict(
+        user_id=USER_ID, Data=item.data, Estabelecimento=item.lancamento,
+        EstabelecimentoBase=item.EstabelecimentoBase, Valor=item.valor,
+        ValorPositivo=item.ValorPositivo,
+        MesFatura=item.mes_fatura.replace('-', '') if item.mes_fatura else None,
+        arquivo_origem=item.nome_arquivo, banco_origem=item.banco, NomeCartao=item.nome_cartao,
+        IdTransacao=item.IdTransacao, IdParcela=item.IdParcela, parcela_atual=item.ParcelaAtual,
+        TotalParcelas=item.TotalParcelas, GRUPO=item.GRUPO, SUBGRUPO=item.SUBGRUPO,
+        TipoGasto=item.TipoGasto, CategoriaGeral=item.CategoriaGeral,
+        origem_classificacao=item.origem_classificacao, tipodocumento=item.tipo_documento,
+        TipoTransacao=item.TipoTransacao, Ano=item.Ano, Mes=item.Mes,
+        session_id=session_id, upload_history_id=history_id, created_at=now,
+    )
+
+
+def _preparar_previews(db):
+    UploadService(db)._save_raw_to_preview([_raw(i) for i in range(30)], SESSION, USER_ID)
+    for p in db.query(PreviewTransacao).all():
+        p.IdTransacao = f"id-{p.id}"
+        p.EstabelecimentoBase = p.lancamento.lower()
+        p.ValorPositivo = abs(p.valor)
+        p.TipoTransacao = "Cartão de Crédito"
+        p.Ano, p.Mes = 2025, 3
+        p.GRUPO, p.SUBGRUPO, p.TipoGasto, p.CategoriaGeral = "Casa", "Mercado", "Ajustável", "Despesa"
+        p.origem_classificacao = "Base Padrões"
+        if p.id % 7 == 0:
+            p.is_duplicate = True
+        if p.id % 11 == 0:
+            p.excluir = 1
+    db.commit()
+
+
+def test_save_raw_to_preview_um_unico_executemany(sqlite_db, query_counter):
+    query_counter.clear()
+    UploadService(sqlite_db)._save_raw_to_preview([_raw(i) for i in range(50)], SESSION, USER_ID)
+
+    inserts = [s for s in query_counter if s.startswith("INSERT")]
+    assert len(inserts) == 1
+    assert sqlite_db.query(PreviewTransacao).count() == 50
+    p = sqlite_db.query(PreviewTransacao).filter_by(lancamento="LOJA 4").one()
+    assert (p.cartao, p.mes_fatura, p.excluir, p.is_duplicate) == ("4321", "2025-03", 0, False)
+
+
+def test_insert_select_identico_ao_loop_orm(sqlite_db):
+    _preparar_previews(sqlite_db)
+    history = UploadHistory(user_id=USER_ID, session_id=SESSION, banco="Itaú", tipo_documento="fatura",
+                            nome_arquivo="fatura.csv", status="processing")
+    sqlite_db.add(history)
+    sqlite_db.commit()
+    now = datetime(2025, 3, 10, 12, 0, 0)
+
+    importaveis = sqlite_db.query(PreviewTransacao).filter(
+        PreviewTransacao.is_duplicate == False,  # noqa: E712
+        PreviewTransacao.excluir == 0,
+    ).order_by(PreviewTransacao.id).all()
+    esperado = [_journal_legado(p, history.id, SESSION, now) for p in importaveis]
+
+    repo = UploadRepository(sqlite_db)
+    por_mes = repo.count_importable_by_mes(SESSION, USER_ID)
+    inseridas = repo.move_preview_to_journal(SESSION, USER_ID, SESSION, history.id, now)
+    sqlite_db.commit()
+
+    assert inseridas == len(esperado) == sum(por_mes.values())
+    assert set(por_mes) == {"2025-03", "2025-04"}
+
+    colunas = list(esperado[0].keys())
+    obtido = [
+        {c: getattr(je, c) for c in colunas}
+        for je in sqlite_db.query(JournalEntry).order_by(JournalEntry.id).all()
+    ]
+    assert obtido == esperado
+
+
+def test_outra_sessao_nao_vaza(sqlite_db):
+    _preparar_previews(sqlite_db)
+    repo = UploadRepository(sqlite_db)
+    assert repo.count_importable_by_mes("outra", USER_ID) == {}
+    assert repo.move_preview_to_journal(SESSION, 2, SESSION, 1, datetime.now()) == 0
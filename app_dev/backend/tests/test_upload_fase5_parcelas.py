@@ -0,0 +1,149 @@
+"""
+Testes da fase 5 do upload em lote (UploadService._fase5_update_base_parcelas).
+
+Cobre:
+  1. Nº de queries constante (antes: 1 SELECT por transação + 1 SQL por parcela nova)
+  2. Regras preservadas: qtd_pagas só aumenta, status finalizada/ativa, sincronização de
+     grupo/subgrupo/tipo_gasto, categoria via base_grupos_config (fallback Despesa)
+  3. Mesmo IdParcela repetido no upload gera 1 linha (UNIQUE user_id, id_parcela)
+  4. Migração funde duplicatas (menor id, maior qtd_pagas) e cria a constraint
+"""
+import importlib.util
+import os
+from pathlib import Path
+
+os.environ.setdefault("DATABASE_URL", "postgresql://x:x@localhost/x")
+os.environ.setdefault("JWT_SECRET_KEY", "a" * 64)
+
+import pytest  # noqa: E402
+from alembic.operations import Operations  # noqa: E402
+from alembic.runtime.migration import MigrationContext  # noqa: E402
+from sqlalchemy import inspect  # noqa: E402
+
+from app.domains.grupos.models import BaseGruposConfig  # noqa: E402
+from app.domains.transactions.models import BaseParcelas, JournalEntry  # noqa: E402
+from app.domains.upload.service import UploadService  # noqa: E402
+
+USER_ID = 1
+UPLOAD_ID = 7
+MIGRACAO = Path(__file__).parent.parent / "migrations" / "versions" / "u6v7w8x9y0z1_add_base_parcelas_unique.py"
+
+
+def _semear(db, n_parcelas, user_id=USER_ID, upload_id=UPLOAD_ID):
+    db.add(BaseGruposConfig(user_id=user_id, nome_grupo="Casa", tipo_gasto_padrao="Fixo", categoria_geral="Despesa"))
+    db.add(BaseGruposConfig(user_id=user_id, nome_grupo="Aplicações", tipo_gasto_padrao="Fixo", categoria_geral="Investimentos"))
+    for i in range(n_parcelas):
+        db.add(JournalEntry(
+            user_id=user_id, upload_history_id=upload_id, IdTransacao=f"u{user_id}t{i}", IdParcela=f"p{i}",
+            EstabelecimentoBase=f"LOJA {i}", ValorPositivo=10.0 + i, TotalParcelas=6, parcela_atual=1 + i % 6,
+            GRUPO="Aplicações" if i % 5 == 0 else "Casa", SUBGRUPO="Sub", TipoGasto="Fixo", Data="10/03/2026",
+        ))
+    db.commit()
+
+
+def _parcelas(db):
+    return {p.id_parcela: p for p in db.query(BaseParcelas).filter_by(user_id=USER_ID)}
+
+
+def test_numero_de_queries_constante(sqlite_db, query_counter):
+    contagens = []
+    for user_id, upload_id, n in ((1, 7, 10), (2, 8, 80)):
+        _semear(sqlite_db, n, user_id, upload_id)
+        query_counter.clear()
+        resultado = UploadService(sqlite_db)._fase5_update_base_parcelas(user_id, upload_id)
+        assert resultado["novas"] == n
+        contagens.append(len(query_counter))
+    # transações + grupos_config + upsert (+ parcelas existentes)
+    assert contagens[0] == contagens[1] <= 4
+
+
+def test_regras_de_atualizacao_preservadas(sqlite_db):
+    db = sqlite_db
+    _semear(db, 6)
+    db.add_all([
+        # p0: já existe com qtd maior → qtd não diminui; classificação sincronizada
+        BaseParcelas(user_id=USER_ID, id_parcela="p0", qtd_parcelas=6, qtd_pagas=4, status="ativa",
+                     grupo_sugerido="Antigo", subgrupo_sugerido="Sub", tipo_gasto_sugerido="Fixo",
+                     categoria_geral_sugerida="Despesa"),
+        # p5: parcela 6/6 chega → finalizada
+        BaseParcelas(user_id=USER_ID, id_parcela="p5", qtd_parcelas=6, qtd_pagas=5, status="ativa",
+                     grupo_sugerido="Casa", subgrupo_sugerido="Sub", tipo_gasto_sugerido="Fixo"),
+        # p3: já igual ao upload → não conta como atualizada
+        BaseParcelas(user_id=USER_ID, id_parcela="p3", qtd_parcelas=6, qtd_pagas=4, status="ativa",
+                     grupo_sugerido="Casa", subgrupo_sugerido="Sub", tipo_gasto_sugerido="Fixo"),
+        # p6: mesma compra duas vezes no upload (parcelas 2 e 3) sem grupo
+        JournalEntry(user_id=USER_ID, upload_history_id=UPLOAD_ID, IdTransacao="x1", IdParcela="p6",
+                     ValorPositivo=50.0, TotalParcelas=3, parcela_atual=2, Data="01/02/2026"),
+        JournalEntry(user_id=USER_ID, upload_history_id=UPLOAD_ID, IdTransacao="x2", IdParcela="p6",
+                     ValorPositivo=50.0, TotalParcelas=3, parcela_atual=3, Data="01/03/2026"),
+    ])
+    db.commit()
+    atualizada_em = _parcelas(db)["p3"].updated_at
+
+    resultado = UploadService(db)._fase5_update_base_parcelas(USER_ID, UPLOAD_ID)
+    assert resultado == {"atualizadas": 2, "novas": 4, "finalizadas": 2, "total_processadas": 6}
+
+    db.expire_all()
+    parcelas = _parcelas(db)
+    assert len(parcelas) == 7
+    assert parcelas["p0"].qtd_pagas == 4 and parcelas["p0"].grupo_sugerido == "Aplicações"
+    assert parcelas["p0"].categoria_geral_sugerida == "Despesa"  # existente: categoria não é recalculada
+    assert parcelas["p5"].status == "finalizada" and parcelas["p5"].qtd_pagas == 6
+    assert parcelas["p3"].updated_at == atualizada_em
+    assert parcelas["p1"].categoria_geral_sugerida == "Despesa" and parcelas["p1"].status == "ativa"
+    assert parcelas["p1"].valor_total_plano == pytest.approx(11.0 * 6)
+    assert parcelas["p6"].qtd_pagas == 3 and parcelas["p6"].status == "finalizada"
+    assert parcelas["p6"].categoria_geral_sugerida == "Despesa" and parcelas["p6"].data_inicio == "01/02/2026"
+
+    # Reprocessar o mesmo upload é idempotente
+    assert UploadService(db)._fase5_update_base_parcelas(USER_ID, UPLOAD_ID)["total_processadas"] == 0
+
+
+def test_categoria_da_parcela_nova_vem_do_grupo(sqlite_db):
+    _semear(sqlite_db, 5)
+    UploadService(sqlite_db)._fase5_update_base_parcelas(USER_ID, UPLOAD_ID)
+    parcelas = _parcelas(sqlite_db)
+    assert parcelas["p0"].categoria_geral_sugerida == "Investimentos"
+    assert parcelas["p1"].categoria_geral_sugerida == "Despesa"
+
+
+def test_migracao_funde_duplicatas_e_cria_constraint(sqlite_db):
+    engine = sqlite_db.get_bind()
+    BaseParcelas.__table__.drop(engine)
+    with engine.begin() as conn:
+        conn.exec_driver_sql(
+            "CREATE TABLE base_parcelas (id INTEGER PRIMARY KEY, user_id INTEGER, upload_history_id INTEGER,"
+            " id_parcela VARCHAR, estabelecimento_base VARCHAR, valor_parcela FLOAT, qtd_parcelas INTEGER,"
+            " qtd_pagas INTEGER, valor_total_plano FLOAT, grupo_sugerido VARCHAR, subgrupo_sugerido VARCHAR,"
+            " tipo_gasto_sugerido VARCHAR, categoria_geral_sugerida VARCHAR, data_inicio VARCHAR, status VARCHAR,"
+            " created_at DATETIME, updated_at DATETIME)"
+        )
+        for id_, user_id, id_parcela, qtd in [(1, 1, "a", 2), (2, 1, "a", 5), (3, 2, "a", 1), (4, 1, "b", 3),
+                                              (5, 1, None, 1), (6, 1, None, 1)]:
+            conn.exec_driver_sql(
+                "INSERT INTO base_parcelas (id, user_id, id_parcela, qtd_pagas) VALUES (?, ?, ?, ?)",
+                (id_, user_id, id_parcela, qtd),
+            )
+
+    spec = importlib.util.spec_from_file_location("migracao_parcelas_unique", MIGRACAO)
+    migracao = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(migracao)
+    with engine.begin() as conn:
+        with Operations.context(MigrationContext.configure(conn)):
+            migracao.upgrade()
+
+    with engine.connect() as conn:
+        linhas = conn.exec_driver_sql("SELECT id, user_id, id_parcela, qtd_pagas FROM base_parcelas ORDER BY id").fetchall()
+    assert [tuple(linha) for linha in linhas] == [(1, 1, "a", 5), (3, 2, "a", 1), (4, 1, "b", 3), (5, 1, None, 1), (6, 1, None, 1)]
+    unicas = inspect(engine).get_unique_constraints("base_parcelas")
+    assert ["user_id", "id_parcela"] in [u["column_names"] for u in unicas]
+
+
+def test_greatest_por_dialeto():
+    from sqlalchemy.dialects import postgresql, sqlite
+
+    from app.domains.transactions.models import greatest
+
+    expr = greatest(BaseParcelas.qtd_pagas, 3)
+    assert str(expr.compile(dialect=postgresql.dialect())).startswith("greatest(base_parcelas.qtd_pagas")
+    assert str(expr.compile(dialect=sqlite.dialect())).startswith("max(base_parcelas.qtd_pagas")
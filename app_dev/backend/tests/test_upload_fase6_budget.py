@@ -0,0 +1,68 @@
+"""
+Testes da fase 6 do upload (UploadService._fase6_sync_budget_planning).
+
+Cobre:
+  1. Escopo: só os MesFatura presentes no upload (histórico antigo não é varrido)
+  2. 1 statement (INSERT ... SELECT DISTINCT ... ON CONFLICT DO NOTHING), independente do histórico
+  3. Filtros preservados: Despesa + Investimentos, IgnorarDashboard = 0, GRUPO não vazio
+  4. Metas existentes não são tocadas; reprocessar é idempotente
+"""
+import os
+
+os.environ.setdefault("DATABASE_URL", "postgresql://x:x@localhost/x")
+os.environ.setdefault("JWT_SECRET_KEY", "a" * 64)
+
+import pytest  # noqa: E402
+
+from app.domains.budget.models import BudgetPlanning  # noqa: E402
+from app.domains.transactions.models import JournalEntry  # noqa: E402
+from app.domains.upload.service import UploadService  # noqa: E402
+
+USER_ID = 1
+UPLOAD_ID = 9
+
+
+def _semear(db, meses_historico):
+    n = 0
+    # Histórico antigo: 3 grupos por mês, de uploads anteriores
+    for i in range(meses_historico):
+        mes_fatura = f"{2020 + i // 12}{i % 12 + 1:02d}"
+        for grupo in ("Casa", "Mercado", "Lazer"):
+            n += 1
+            db.add(JournalEntry(user_id=USER_ID, IdTransacao=f"h{n}", MesFatura=mes_fatura, GRUPO=grupo,
+                                CategoriaGeral="Despesa", IgnorarDashboard=0, upload_history_id=1))
+    # Upload atual: março/2026
+    for idx, (grupo, categoria, ignorar) in enumerate([
+        ("Casa", "Despesa", 0), ("Casa", "Despesa", 0), ("Aplicações", "Investimentos", 0),
+        ("Salário", "Receita", 0), ("Ignorado", "Despesa", 1), ("", "Despesa", 0), (None, "Despesa", 0),
+    ]):
+        db.add(JournalEntry(user_id=USER_ID, IdTransacao=f"u{idx}", MesFatura="202603", GRUPO=grupo,
+                            CategoriaGeral=categoria, IgnorarDashboard=ignorar, upload_history_id=UPLOAD_ID))
+    # Outro upload no mesmo mês (entra no escopo) e outro usuário (fora)
+    db.add(JournalEntry(user_id=USER_ID, IdTransacao="o1", MesFatura="202603", GRUPO="Mercado",
+                        CategoriaGeral="Despesa", IgnorarDashboard=0, upload_history_id=2))
+    db.add(JournalEntry(user_id=2, IdTransacao="o2", MesFatura="202603", GRUPO="Viagem",
+                        CategoriaGeral="Despesa", IgnorarDashboard=0, upload_history_id=UPLOAD_ID))
+    db.commit()
+
+
+@pytest.mark.parametrize("meses_historico", [3, 60])
+def test_sync_limitado_aos_meses_do_upload(meses_historico, sqlite_db, query_counter):
+    db = sqlite_db
+    _semear(db, meses_historico)
+    db.add(BudgetPlanning(user_id=USER_ID, grupo="Casa", mes_referencia="2026-03", valor_planejado=500.0))
+    db.commit()
+    query_counter.clear()
+
+    resultado = UploadService(db)._fase6_sync_budget_planning(USER_ID, UPLOAD_ID)
+
+    assert resultado == {"criados": 2}
+    assert len([s for s in query_counter if s.lstrip().upper().startswith(("SELECT", "INSERT"))]) == 1
+    metas = {(b.grupo, b.mes_referencia): b for b in db.query(BudgetPlanning).filter_by(user_id=USER_ID)}
+    assert set(metas) == {("Casa", "2026-03"), ("Aplicações", "2026-03"), ("Mercado", "2026-03")}
+    assert metas[("Casa", "2026-03")].valor_planejado == 500.0
+    assert metas[("Mercado", "2026-03")].valor_planejado == 0.0
+    assert metas[("Mercado", "2026-03")].valor_medio_3_meses == 0.0
+    assert db.query(BudgetPlanning).filter_by(user_id=2).count() == 0
+
+    assert UploadService(db)._fase6_sync_budget_planning(USER_ID, UPLOAD_ID) == {"criados": 0}
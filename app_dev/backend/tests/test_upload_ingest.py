@@ -0,0 +1,152 @@
+"""
+Testes da ingestão de uploads em blocos (upload/ingest.py) e da amostra por caminho.
+
+Cobre:
+  1. SHA-256 incremental = hashlib do conteúdo inteiro; temporário removido na saída do with
+  2. Limite de tamanho: 413 no meio da cópia (sem ler o resto) ou antes dela (UploadFile.size)
+  3. Extensão e magic bytes: .pdf que não é PDF → 400; xlsx protegido (OLE) e .xls HTML aceitos
+  4. extract_content_sample lê só o cabeçalho do arquivo em disco
+  5. /detect: arquivo grande rejeitado antes da extração no pool de processos
+"""
+import hashlib
+import importlib
+import io
+import os
+
+os.environ.setdefault("DATABASE_URL", "postgresql://x:x@localhost/x")
+os.environ.setdefault("JWT_SECRET_KEY", "a" * 64)
+
+import pytest  # noqa: E402
+from fastapi import HTTPException, UploadFile  # noqa: E402
+
+from app.core.config import settings  # noqa: E402
+from app.domains.upload import content_extractor, ingest  # noqa: E402
+
+upload_router = importlib.import_module("app.domains.upload.router")
+
+
+class OrigemContada(io.BytesIO):
+    """BytesIO que conta quantos bytes foram lidos."""
+
+    def __init__(self, conteudo):
+        super().__init__(conteudo)
+        self.lidos = 0
+
+    def read(self, n=-1):
+        bloco = super().read(n)
+        self.lidos += len(bloco)
+        return bloco
+
+
+@pytest.fixture
+def tmpdir_ingest(tmp_path, monkeypatch):
+    monkeypatch.setattr(ingest.tempfile, "tempdir", str(tmp_path))
+    monkeypatch.setattr(ingest, "TAMANHO_BLOCO", 1000)
+    return tmp_path
+
+
+def test_hash_incremental_e_remocao(tmpdir_ingest):
+    conteudo = b"data;descricao;valor\n" + b"01/03/2026;LOJA;10,50\n" * 500
+    with ingest.ingerir_upload(io.BytesIO(conteudo), "fatura-202603.csv") as arquivo:
+        assert arquivo.sha256 == hashlib.sha256(conteudo).hexdigest()
+        assert arquivo.tamanho == len(conteudo)
+        assert arquivo.tipo == ingest.TIPO_TEXTO
+        assert arquivo.path.name.endswith("_fatura-202603.csv")
+        assert arquivo.path.read_bytes() == conteudo
+        assert arquivo.cabecalho(20) == conteudo[:20]
+    assert not arquivo.path.exists()
+    assert list(tmpdir_ingest.iterdir()) == []
+    arquivo.remover()  # idempotente
+
+
+def test_limite_de_tamanho_aborta_a_copia(tmpdir_ingest):
+    origem = OrigemContada(b"x" * 100_000)
+    with pytest.raises(HTTPException) as exc:
+        ingest.ingerir_upload(origem, "extrato.csv", max_bytes=5_000)
+    assert exc.value.status_code == 413
+    assert exc.value.detail["errorCode"] == "UPL_015"
+    assert origem.lidos <= 6_000  # parou no 1º bloco além do limite
+    assert list(tmpdir_ingest.iterdir()) == []
+
+
+def test_limite_pelo_tamanho_declarado(tmpdir_ingest, monkeypatch):
+    monkeypatch.setattr(settings, "UPLOAD_MAX_BYTES", 10)
+    origem = OrigemContada(b"x" * 100)
+    with pytest.raises(HTTPException) as exc:
+        ingest.ingerir_upload(origem, "extrato.csv", tamanho_declarado=100)
+    assert exc.value.status_code == 413
+    assert origem.lidos == 0
+
+
+@pytest.mark.parametrize("nome, conteudo, tipo", [
+    ("fatura.pdf", b"\n%PDF-1.7\n...", ingest.TIPO_PDF),
+    ("extrato.xlsx", b"PK\x03\x04" + b"\x00" * 40, ingest.TIPO_ZIP),
+    ("protegido.xlsx", b"\xd0\xcf\x11\xe0\xa1\xb1\x1a\xe1" + b"\x00" * 40, ingest.TIPO_OLE),
+    ("itau.xls", b"<html><table><tr><td>Data</td></tr></table></html>", ingest.TIPO_TEXTO),
+    ("extrato.ofx", b"OFXHEADER:100\nDATA:OFXSGML\n", ingest.TIPO_TEXTO),
+    ("utf16.csv", "data;valor\n".encode("utf-16"), ingest.TIPO_TEXTO),
+])
+def test_magic_bytes_compativeis(tmpdir_ingest, nome, conteudo, tipo):
+    with ingest.ingerir_upload(io.BytesIO(conteudo), nome) as arquivo:
+        assert arquivo.tipo == tipo
+
+
+@pytest.mark.parametrize("nome, conteudo, codigo", [
+    ("fatura.pdf", b"PK\x03\x04" + b"\x00" * 40, "UPL_017"),
+    ("extrato.csv", b"%PDF-1.4\n", "UPL_017"),
+    ("extrato.xlsx", b"MZ\x90\x00\x03\x00", "UPL_017"),
+    ("programa.exe", b"MZ\x90\x00", "UPL_016"),
+    (None, b"data;valor\n", "UPL_016"),
+])
+def test_extensao_ou_conteudo_invalido(tmpdir_ingest, nome, conteudo, codigo):
+    with pytest.raises(HTTPException) as exc:
+        ingest.ingerir_upload(io.BytesIO(conteudo), nome)
+    assert exc.value.status_code == 400
+    assert exc.value.detail["errorCode"] == codigo
+    assert list(tmpdir_ingest.iterdir()) == []
+
+
+def test_amostra_le_so_o_cabecalho(tmp_path, monkeypatch):
+    caminho = tmp_path / "extrato.csv"
+    caminho.write_bytes(b"data;descricao;valor\n" + b"01/03/2026;LOJA;10,50\n" * 200_000)
+    lidos = []
+
+    def open_contado(path, mode="r"):
+        f = io.open(path, mode)
+        read_original = f.read
+        f.read = lambda n=-1: lidos.append(n) or read_original(n)
+        return f
+
+    monkeypatch.setattr(content_extractor, "open", open_contado, raising=False)
+    amostra = content_extractor.extract_content_sample(caminho, "extrato.csv")
+
+    assert amostra.startswith("data;descricao;valor")
+    assert len(amostra) == content_extractor.AMOSTRA_TEXTO_BYTES
+    assert lidos == [content_extractor.AMOSTRA_TEXTO_BYTES]
+
+
+def test_amostra_pdf_primeira_pagina(tmp_path):
+    fitz = pytest.importorskip("fitz")
+    pytest.importorskip("pdfplumber")
+    caminho = tmp_path / "fatura.pdf"
+    doc = fitz.open()
+    for texto in ("Total a pagar R$ 400,00", "Outra pagina"):
+        doc.new_page().insert_text((40, 60), texto)
+    doc.save(str(caminho))
+    doc.close()
+
+    amostra = content_extractor.extract_content_sample(str(caminho), "fatura.pdf")
+    assert "Total a pagar" in amostra and "Outra pagina" not in amostra
+
+
+def test_detect_rejeita_arquivo_grande_antes_da_extracao(tmpdir_ingest, monkeypatch):
+    monkeypatch.setattr(settings, "UPLOAD_MAX_BYTES", 1_500)
+    chamadas = []
+    monkeypatch.setattr(upload_router, "run_in_process", lambda *a: chamadas.append(a))
+    upload = UploadFile(io.BytesIO(b"x" * 10_000), filename="extrato.csv")
+
+    with pytest.raises(HTTPException) as exc:
+        upload_router._detect_sync(upload, 1, db=None)
+    assert exc.value.status_code == 413
+    assert chamadas == []
+    assert list(tmpdir_ingest.iterdir()) == []
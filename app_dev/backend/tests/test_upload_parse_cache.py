@@ -0,0 +1,202 @@
+"""
+Testes do cache de parsing por conteúdo (upload/parse_cache.py) e do "arquivo já importado".
+
+Cobre:
+  1. Serialização compacta: lista e tupla (com BalanceValidation) voltam iguais
+  2. Chave: muda com usuário, hash, argumentos do processador e versão dos parsers
+  3. Fase 1: reenvio do mesmo arquivo não roda o processador; Redis fora → bypass
+  4. upload_history por hash: lookup exato no repository e no /detect (mesmo_arquivo)
+"""
+import hashlib
+import importlib
+import io
+import json
+import os
+from datetime import datetime
+
+os.environ.setdefault("DATABASE_URL", "postgresql://x:x@localhost/x")
+os.environ.setdefault("JWT_SECRET_KEY", "a" * 64)
+
+import pytest  # noqa: E402
+from fastapi import UploadFile  # noqa: E402
+from sqlalchemy import create_engine  # noqa: E402
+from sqlalchemy.orm import sessionmaker  # noqa: E402
+
+from app.core.config import settings  # noqa: E402
+from app.core.database import Base  # noqa: E402
+from app.domains.upload import parse_cache, service as upload_service  # noqa: E402
+from app.domains.upload.history_models import UploadHistory  # noqa: E402
+from app.domains.upload.processors.raw.base import BalanceValidation, RawTransaction  # noqa: E402
+from app.domains.upload.repository import UploadRepository  # noqa: E402
+from app.domains.upload.service import UploadService  # noqa: E402
+from app.domains.users.models import User  # noqa: E402, F401
+
+# app.domains.upload exporta o APIRouter como `router` — o módulo vem do importlib
+upload_router = importlib.import_module("app.domains.upload.router")
+
+USER_ID = 1
+HASH = "a" * 64
+
+
+class FakeRedisBinario:
+    def __init__(self):
+        self.data = {}
+
+    def get(self, key):
+        return self.data.get(key)
+
+    def set(self, key, value, ex=None):
+        assert isinstance(value, bytes)
+        self.data[key] = value
+        return True
+
+
+class Indisponivel:
+    def __getattr__(self, _name):
+        raise ConnectionError("redis down")
+
+
+def _transacoes(n=3):
+    return [
+        RawTransaction(banco="Itaú", tipo_documento="fatura", nome_arquivo="fatura.csv",
+                       data_criacao=datetime(2026, 1, 1), data=f"{i + 1:02d}/03/2026",
+                       lancamento=f"LOJA {i} ÇÃO", valor=-10.5 * (i + 1), nome_cartao="Black",
+                       final_cartao="1234", mes_fatura="202603")
+        for i in range(n)
+    ]
+
+
+def _sem_data_criacao(transacoes):
+    return [{k: v for k, v in vars(t).items() if k != "data_criacao"} for t in transacoes]
+
+
+@pytest.fixture
+def redis_fake(monkeypatch):
+    fake = FakeRedisBinario()
+    monkeypatch.setattr(parse_cache, "get_redis_binary", lambda: fake)
+    monkeypatch.setattr(settings, "UPLOAD_PARSE_CACHE_ENABLED", True)
+    return fake
+
+
+def test_serializacao_lista_e_tupla():
+    transacoes = _transacoes(200)
+    lista = parse_cache.desserializar(parse_cache.serializar(transacoes))
+    assert isinstance(lista, list)
+    assert _sem_data_criacao(lista) == _sem_data_criacao(transacoes)
+    assert all(isinstance(t.data_criacao, datetime) for t in lista)
+
+    balance = BalanceValidation(saldo_inicial=100.0, saldo_final=50.0, soma_transacoes=-50.0)
+    balance.validate()
+    tupla = parse_cache.desserializar(parse_cache.serializar((transacoes[:2], balance)))
+    assert isinstance(tupla, tuple)
+    assert _sem_data_criacao(tupla[0]) == _sem_data_criacao(transacoes[:2])
+    assert tupla[1] == balance
+
+    # Compacto: bem menor que o JSON de dicts por transação
+    json_ingenuo = json.dumps([t.to_dict() for t in transacoes], default=str).encode()
+    assert len(parse_cache.serializar(transacoes)) < len(json_ingenuo) / 5
+
+
+def test_chave_depende_de_usuario_arquivo_argumentos_e_versao(monkeypatch):
+    base = dict(user_id=1, arquivo_hash=HASH, banco="Itaú", tipo_documento="fatura", formato="csv",
+                nome_arquivo="fatura-202603.csv", nome_cartao="Black", final_cartao="1234")
+    chave = parse_cache.chave_parse(**base)
+    assert chave == parse_cache.chave_parse(**{**base, "banco": " itaú "})
+    for campo, valor in [("user_id", 2), ("arquivo_hash", "b" * 64), ("nome_arquivo", "fatura-202604.csv"),
+                         ("final_cartao", "9999"), ("formato", "pdf")]:
+        assert parse_cache.chave_parse(**{**base, campo: valor}) != chave
+    monkeypatch.setattr(parse_cache, "versao_parsers", lambda: "outra")
+    assert parse_cache.chave_parse(**base) != chave
+
+
+def test_versao_parsers_estavel():
+    assert parse_cache.versao_parsers() == parse_cache.versao_parsers()
+    assert len(parse_cache.versao_parsers()) == 16
+
+
+def _fase1(service, tmp_path, user_id=USER_ID, arquivo_hash=HASH):
+    arquivo = tmp_path / "fatura.csv"
+    arquivo.write_text("x")
+    return service._fase1_raw_processing(
+        str(arquivo), "Itaú", "fatura", "fatura.csv", "Black", "1234", "2026-03",
+        user_id=user_id, arquivo_hash=arquivo_hash,
+    )
+
+
+def test_fase1_reenvio_nao_roda_processador(redis_fake, monkeypatch, tmp_path):
+    chamadas = []
+
+    def processador_falso(*args):
+        chamadas.append(args)
+        return _transacoes()
+
+    monkeypatch.setattr(upload_service, "run_in_process", processador_falso)
+    service = UploadService(db=None)
+
+    primeira, _ = _fase1(service, tmp_path)
+    segunda, balance = _fase1(service, tmp_path)
+    assert len(chamadas) == 1
+    assert balance is None
+    assert _sem_data_criacao(segunda) == _sem_data_criacao(primeira)
+    # Pós-processamento da fase 1 (banco/mes_fatura do form) também vale no hit
+    assert {t.banco for t in segunda} == {"Itaú"} and {t.mes_fatura for t in segunda} == {"202603"}
+
+    _fase1(service, tmp_path, user_id=2)            # outro usuário: miss
+    _fase1(service, tmp_path, arquivo_hash=None)    # sem hash: sempre processa
+    assert len(chamadas) == 3
+
+
+def test_fase1_redis_indisponivel_bypass(monkeypatch, tmp_path):
+    monkeypatch.setattr(parse_cache, "get_redis_binary", lambda: Indisponivel())
+    monkeypatch.setattr(settings, "UPLOAD_PARSE_CACHE_ENABLED", True)
+    chamadas = []
+    monkeypatch.setattr(upload_service, "run_in_process", lambda *a: chamadas.append(a) or _transacoes())
+
+    service = UploadService(db=None)
+    _fase1(service, tmp_path)
+    _fase1(service, tmp_path)
+    assert len(chamadas) == 2
+
+
+@pytest.fixture
+def db():
+    engine = create_engine("sqlite://")
+    Base.metadata.create_all(engine)
+    sessao = sessionmaker(bind=engine)()
+    for id_, status, hash_ in [(1, "success", HASH), (2, "cancelled", "c" * 64), (3, "success", None)]:
+        sessao.add(UploadHistory(id=id_, user_id=USER_ID, session_id=f"s{id_}", banco="itau",
+                                 tipo_documento="fatura", nome_arquivo="f.csv", arquivo_hash=hash_,
+                                 status=status, mes_fatura="202603", total_registros=7))
+    sessao.commit()
+    yield sessao
+    sessao.close()
+
+
+def test_repository_busca_upload_confirmado_por_hash(db):
+    repo = UploadRepository(db)
+    assert repo.get_imported_by_hash(USER_ID, HASH).id == 1
+    assert repo.get_imported_by_hash(2, HASH) is None
+    assert repo.get_imported_by_hash(USER_ID, "c" * 64) is None  # cancelado não conta
+    assert repo.get_imported_by_hash(USER_ID, None) is None
+
+
+def test_detect_responde_mesmo_arquivo(db, monkeypatch):
+    monkeypatch.setattr(upload_router, "run_in_process", lambda func, *a: "conteúdo sem banco")
+    hash_igual = hashlib.sha256(b"igual").hexdigest()
+
+    class HashFixo(upload_router.DetectionEngine):
+        def detect(self, filename, content_sample, file_bytes=b"", arquivo_hash=None):
+            resultado = super().detect(filename, content_sample, file_bytes, arquivo_hash)
+            resultado.arquivo_hash = HASH if arquivo_hash == hash_igual else resultado.arquivo_hash
+            return resultado
+
+    monkeypatch.setattr(upload_router, "DetectionEngine", HashFixo)
+
+    def _upload(conteudo):
+        return UploadFile(io.BytesIO(conteudo), filename="planilha.csv")
+
+    resposta = upload_router._detect_sync(_upload(b"igual"), USER_ID, db)
+    assert resposta["duplicata_detectada"]["upload_id"] == 1
+    assert resposta["duplicata_detectada"]["mesmo_arquivo"] is True
+
+    assert upload_router._detect_sync(_upload(b"outro"), USER_ID, db)["duplicata_detectada"] is None
@@ -0,0 +1,96 @@
+"""
+Testes do pipeline de upload em memória (SQLite em memória).
+
+Cobre:
+  1. Preview gerado pelo pipeline em memória == modo incremental (UPLOAD_INCREMENTAL_SAVE)
+  2. Uma única escrita em preview_transacoes e nenhum commit/releitura entre fases
+  3. Duplicatas contra journal_entries marcadas na mesma passada
+"""
+import os
+from datetime import datetime
+
+os.environ.setdefault("DATABASE_URL", "postgresql://x:x@localhost/x")
+os.environ.setdefault("JWT_SECRET_KEY", "a" * 64)
+
+import pytest  # noqa: E402
+from sqlalchemy import event  # noqa: E402
+
+from app.domains.transactions.models import JournalEntry  # noqa: E402
+from app.domains.upload.models import PreviewTransacao  # noqa: E402
+from app.domains.upload.processors.marker import TransactionMarker  # noqa: E402
+from app.domains.upload.processors.raw.base import RawTransaction  # noqa: E402
+from app.domains.upload.service import UploadService  # noqa: E402
+
+USER_ID = 1
+IGNORADAS = {"id", "session_id", "created_at", "updated_at"}
+
+
+def _raws():
+    lancamentos = ["MERCADO LIVRE 02/10", "UBER TRIP", "UBER TRIP", "PADARIA SAO JOSE",
+                   "NETFLIX.COM", "MERCADO LIVRE 03/10", "POSTO IPIRANGA", "FARMACIA PAGUE MENOS"]
+    return [
+        RawTransaction(
+            banco="Itaú", tipo_documento="fatura", nome_arquivo="fatura.csv",
+            data_criacao=datetime(2025, 3, 1), data=f"{i % 28 + 1:02d}/02/2025",
+            lancamento=lanc, valor=-12.5 * (i + 1) if i != 2 else -12.5 * 2,
+            nome_cartao="Black", final_cartao="4321", mes_fatura="2025-03",
+        )
+        for i, lanc in enumerate(lancamentos * 3)
+    ]
+
+
+@pytest.fixture
+def db(sqlite_db):
+    session = sqlite_db
+    # Histórico do usuário: classificação por journal (nível 3) e duplicata por IdTransacao
+    ja_importada = TransactionMarker(user_id=USER_ID).mark_transaction(_raws()[3])
+    session.add(JournalEntry(
+        user_id=USER_ID, IdTransacao=ja_importada.id_transacao, Data=ja_importada.data,
+        Estabelecimento="PADARIA SAO JOSE", EstabelecimentoBase="PADARIA SAO JOSE",
+        GRUPO="Alimentação", SUBGRUPO="Padaria", TipoGasto="Ajustável", CategoriaGeral="Despesa",
+        MesFatura="202502", Valor=-50.0,
+    ))
+    session.commit()
+    return session
+
+
+def _linhas(db, session_id):
+    previews = db.query(PreviewTransacao).filter_by(session_id=session_id).order_by(PreviewTransacao.id).all()
+    return [
+        {c.name: getattr(p, c.key) for c in PreviewTransacao.__table__.columns if c.name not in IGNORADAS}
+        for p in previews
+    ]
+
+
+def test_em_memoria_identico_ao_incremental(db):
+    service = UploadService(db)
+    stats_inc, dup_inc = service._pipeline_incremental(_raws(), "inc", USER_ID)
+    stats_mem, dup_mem = service._pipeline_em_memoria(_raws(), "mem", USER_ID)
+
+    assert stats_mem == stats_inc
+    assert dup_mem == dup_inc == 1
+    assert _linhas(db, "mem") == _linhas(db, "inc")
+
+    duplicadas = [linha for linha in _linhas(db, "mem") if linha["is_duplicate"]]
+    assert {linha["lancamento"] for linha in duplicadas} == {"PADARIA SAO JOSE"}
+    assert all(linha["origem_classificacao"] is None for linha in duplicadas)
+
+
+def test_uma_escrita_sem_commits_intermediarios(db, query_counter):
+    query_counter.clear()
+    commits = []
+    event.listen(db, "after_commit", lambda _s: commits.append(1))
+
+    UploadService(db)._pipeline_em_memoria(_raws(), "mem", USER_ID)
+
+    escritas = [s for s in query_counter if s.lstrip().upper().startswith(("INSERT", "UPDATE"))]
+    assert len(escritas) == 1 and "preview_transacoes" in escritas[0]
+    assert not any("FROM preview_transacoes" in s for s in query_counter)
+    assert len(commits) == 1
+
+
+def test_sem_deduplicacao_para_planilha(db):
+    stats, duplicadas = UploadService(db)._pipeline_em_memoria(_raws(), "pl", USER_ID, deduplicar=False)
+    assert duplicadas == 0
+    assert stats.total == len(_raws())
+    assert not any(linha["is_duplicate"] for linha in _linhas(db, "pl"))
@@ -0,0 +1,148 @@
+"""
+Testes do cache read-through versionado por usuário (app.core.cache).
+
+Cobre:
+  1. Miss → hit com o mesmo valor; parâmetros diferentes = chaves diferentes
+  2. bump_data_version invalida só o usuário afetado
+  3. Redis indisponível → bypass (sem erro); valores não-JSON não são cacheados
+  4. Métricas hit/miss/bypass
+"""
+import os
+
+os.environ.setdefault("DATABASE_URL", "postgresql://x:x@localhost/x")
+os.environ.setdefault("JWT_SECRET_KEY", "a" * 64)
+
+import pytest  # noqa: E402
+
+from app.core import cache  # noqa: E402
+
+
+class FakeRedis:
+    def __init__(self):
+        self.data = {}
+
+    def get(self, key):
+        return self.data.get(key)
+
+    def set(self, key, value, ex=None, nx=False):
+        if nx and key in self.data:
+            return None
+        self.data[key] = str(value)
+        return True
+
+    def incr(self, key):
+        self.data[key] = str(int(self.data.get(key, 0)) + 1)
+        return int(self.data[key])
+
+    def pipeline(self, transaction=True):
+        redis = self
+
+        class Pipe:
+            def __init__(self):
+                self.ops = []
+
+            def set(self, *a, **kw):
+                self.ops.append(lambda: redis.set(*a, **kw))
+
+            def incr(self, *a):
+                self.ops.append(lambda: redis.incr(*a))
+
+            def execute(self):
+                return [op() for op in self.ops]
+
+        return Pipe()
+
+
+class Indisponivel:
+    def __getattr__(self, _name):
+        raise ConnectionError("redis down")
+
+
+class Repo:
+    def __init__(self):
+        self.chamadas = 0
+
+    @cache.cached_per_user("teste:soma")
+    def soma(self, user_id, year, month=None):
+        self.chamadas += 1
+        return {"user": user_id, "year": year, "month": month, "total": 10.5}
+
+    @cache.cached_per_user("teste:chave_int")
+    def chave_int(self, user_id):
+        self.chamadas += 1
+        return {1: "janeiro"}
+
+
+@pytest.fixture
+def redis_fake(monkeypatch):
+    fake = FakeRedis()
+    monkeypatch.setattr(cache, "get_redis", lambda: fake)
+    monkeypatch.setattr(cache, "_stats", cache.defaultdict(lambda: {"hit": 0, "miss": 0, "bypass": 0}))
+    return fake
+
+
+def test_miss_depois_hit(redis_fake):
+    repo = Repo()
+    primeiro = repo.soma(1, 2025, month=3)
+    segundo = repo.soma(1, 2025, month=3)
+
+    assert primeiro == segundo == {"user": 1, "year": 2025, "month": 3, "total": 10.5}
+    assert repo.chamadas == 1
+
+    repo.soma(1, 2025, month=4)
+    assert repo.chamadas == 2
+
+    stats = cache.cache_stats()["endpoints"]["teste:soma"]
+    assert (stats["hit"], stats["miss"]) == (1, 2)
+
+
+def test_bump_invalida_apenas_o_usuario(redis_fake):
+    repo = Repo()
+    repo.soma(1, 2025)
+    repo.soma(2, 2025)
+
+    cache.bump_data_version(1)
+    repo.soma(1, 2025)
+    repo.soma(2, 2025)
+
+    assert repo.chamadas == 3  # user 1 recalculou, user 2 veio do cache
+
+
+def test_versao_expulsa_nao_reaproveita_entradas_antigas(redis_fake, monkeypatch):
+    relogio = iter([1_000.0, 1_060.0])  # eviction acontece depois, nunca no mesmo ms
+    monkeypatch.setattr(cache.time, "time", lambda: next(relogio))
+    repo = Repo()
+    cache.bump_data_version(1)  # versão criada pelo bump (sem get prévio)
+    repo.soma(1, 2025)
+    del redis_fake.data["data_version:1"]  # LRU expulsou a versão
+
+    cache.bump_data_version(1)
+    repo.soma(1, 2025)
+
+    assert repo.chamadas == 2
+
+
+def test_redis_indisponivel_faz_bypass(monkeypatch):
+    monkeypatch.setattr(cache, "get_redis", lambda: Indisponivel())
+    repo = Repo()
+
+    assert repo.soma(1, 2025)["total"] == 10.5
+    assert repo.soma(1, 2025)["total"] == 10.5
+    assert repo.chamadas == 2
+    cache.bump_data_version(1)  # não levanta
+
+
+def test_valor_nao_json_nao_e_cacheado(redis_fake):
+    repo = Repo()
+    assert repo.chave_int(1) == {1: "janeiro"}
+    assert repo.chave_int(1) == {1: "janeiro"}
+    assert repo.chamadas == 2
+
+
+def test_cache_desligado(redis_fake, monkeypatch):
+    monkeypatch.setattr(cache.settings, "CACHE_ENABLED", False)
+    repo = Repo()
+    repo.soma(1, 2025)
+    repo.soma(1, 2025)
+    assert repo.chamadas == 2
+    assert redis_fake.data == {}
@@ -510,19 +510,20 @@ export async function fetchCreditCards(
 // credit-cards, orcamento-investimentos, cashflow-mes, aporte-mes
 // ============================================================================
 
+// Seção ausente = não solicitada; null = falhou ou estourou o timeout no backend
 export interface DashboardSummary {
-  metrics?: DashboardMetrics
-  chart?: { data: ChartDataPoint[] }
-  chart_yearly?: { data: ChartDataPoint[] }
-  income_sources?: { sources: IncomeSource[]; total_receitas: number }
+  metrics?: DashboardMetrics | null
+  chart?: { data: ChartDataPoint[] } | null
+  chart_yearly?: { data: ChartDataPoint[] } | null
+  income_sources?: { sources: IncomeSource[]; total_receitas: number } | null
   budget_vs_actual?: {
     items: { grupo: string; realizado: number; planejado: number }[]
     total_realizado: number
     total_planejado: number
     percentual_geral: number
-  }
-  credit_cards?: CreditCardExpense[]
-  orcamento_investimentos?: OrcamentoInvestimentosResponse
+  } | null
+  credit_cards?: CreditCardExpense[] | null
+  orcamento_investimentos?: OrcamentoInvestimentosResponse | null
   cashflow_mes?: PlanoCashflowMes | null
   aporte_mes?: { aporte: number } | null
 }
@@ -79,11 +79,13 @@ export function FileDetectionCard({
                 <AlertTriangle className="h-5 w-5 text-amber-600 shrink-0 mt-0.5" />
                 <div>
                   <p className="font-medium text-amber-900 text-sm">
-                    Possível duplicata
+                    {duplicata.mesmo_arquivo ? 'Arquivo já importado' : 'Possível duplicata'}
                   </p>
                   <p className="text-xs text-amber-800 mt-0.5">
-                    Já existe um upload similar ({duplicata.total_transacoes} transações).
-                    Carregar de qualquer forma pode criar duplicatas.
+                    {duplicata.mesmo_arquivo
+                      ? `Este mesmo arquivo já foi importado (${duplicata.total_transacoes} transações).`
+                      : `Já existe um upload similar (${duplicata.total_transacoes} transações).`}
+                    {' '}Carregar de qualquer forma pode criar duplicatas.
                   </p>
                 </div>
               </div>
@@ -23,6 +23,8 @@ export interface DetectionResult {
     upload_id: number;
     data_importacao: string | null;
     total_transacoes: number;
+    /** true = o mesmo arquivo (SHA-256) já foi importado; false = upload similar (banco/tipo/mês) */
+    mesmo_arquivo?: boolean;
   } | null;
 }
 